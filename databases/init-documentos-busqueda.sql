@@ -0,0 +1,77 @@
+-- Búsqueda de documentos para mcp-core (retrieve_context_snippets,
+-- buscar_documento_por_accion): texto completo en español sin acentos
+-- (tsvector + GIN) y similitud por trigramas (pg_trgm) sobre el nombre.
+--
+-- Es idempotente: se ejecuta al inicializar la base y puede repetirse con
+-- psql cuando ya existe la tabla documentos:
+--   psql -U munbot -d munbot -f databases/init-documentos-busqueda.sql
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+CREATE EXTENSION IF NOT EXISTS unaccent;
+
+-- unaccent() es STABLE; los índices por expresión necesitan una versión IMMUTABLE
+CREATE OR REPLACE FUNCTION munbot_unaccent(texto TEXT) RETURNS TEXT
+    LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT
+    AS $$ SELECT public.unaccent('public.unaccent'::regdictionary, texto) $$;
+
+-- Configuración española que además quita acentos ("cédula" = "cedula")
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_ts_config WHERE cfgname = 'es_unaccent') THEN
+        CREATE TEXT SEARCH CONFIGURATION es_unaccent (COPY = spanish);
+        ALTER TEXT SEARCH CONFIGURATION es_unaccent
+            ALTER MAPPING FOR hword, hword_part, word WITH unaccent, spanish_stem;
+    END IF;
+END
+$$;
+
+DO $$
+BEGIN
+    -- Sin la tabla no se crea nada: mcp-core sigue usando la búsqueda LIKE
+    IF to_regclass('documentos') IS NULL THEN
+        RAISE NOTICE 'Tabla documentos inexistente; se omiten los índices y buscar_documentos';
+        RETURN;
+    END IF;
+
+    -- Nombre con más peso que la descripción
+    ALTER TABLE documentos ADD COLUMN IF NOT EXISTS busqueda TSVECTOR
+        GENERATED ALWAYS AS (
+            setweight(to_tsvector('es_unaccent', coalesce(nombre, '')), 'A') ||
+            setweight(to_tsvector('es_unaccent', coalesce(descripcion, '')), 'B')
+        ) STORED;
+
+    CREATE INDEX IF NOT EXISTS idx_documentos_busqueda
+        ON documentos USING gin (busqueda);
+    CREATE INDEX IF NOT EXISTS idx_documentos_nombre_trgm
+        ON documentos USING gin (munbot_unaccent(lower(nombre)) gin_trgm_ops);
+
+    -- Documentos más relevantes para una pregunta libre del usuario.
+    -- Cualquier palabra significativa de la pregunta puede coincidir (OR de
+    -- lexemas, sin stopwords); además se aceptan nombres parecidos a la
+    -- pregunta aunque tengan errores de tipeo (operador % de pg_trgm, con la
+    -- columna indexada a la izquierda para que use idx_documentos_nombre_trgm).
+    -- El puntaje combina ts_rank_cd y cuánto del nombre aparece en la pregunta.
+    CREATE OR REPLACE FUNCTION buscar_documentos(consulta TEXT, limite INT DEFAULT 3)
+    RETURNS TABLE (id_documento TEXT, nombre TEXT, descripcion TEXT, score REAL)
+    LANGUAGE plpgsql STABLE
+    AS $fn$
+    #variable_conflict use_column
+    DECLARE
+        palabras TSQUERY := replace(plainto_tsquery('es_unaccent', consulta)::TEXT, '&', '|')::TSQUERY;
+        texto TEXT := munbot_unaccent(lower(consulta));
+    BEGIN
+        RETURN QUERY
+        SELECT d.id_documento::TEXT,
+               d.nombre::TEXT,
+               d.descripcion::TEXT,
+               (ts_rank_cd(d.busqueda, palabras, 32)
+                + word_similarity(munbot_unaccent(lower(d.nombre)), texto))::REAL AS score
+        FROM documentos d
+        WHERE (numnode(palabras) > 0 AND d.busqueda @@ palabras)
+           OR munbot_unaccent(lower(d.nombre)) % texto
+        ORDER BY score DESC, d.nombre
+        LIMIT limite;
+    END
+    $fn$;
+END
+$$;
@@ -0,0 +1,199 @@
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+from collections import defaultdict
+from contextlib import AbstractContextManager
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from psycopg2.extras import execute_values
+
+logger = logging.getLogger(__name__)
+
+# Eventos pendientes como máximo; los que no caben se descartan y se cuentan
+ANALYTICS_QUEUE_MAX = int(os.getenv("ANALYTICS_QUEUE_MAX", "10000"))
+# Eventos por lote y segundos máximos que un evento espera antes de escribirse
+ANALYTICS_BATCH_SIZE = int(os.getenv("ANALYTICS_BATCH_SIZE", "200"))
+ANALYTICS_FLUSH_SECONDS = float(os.getenv("ANALYTICS_FLUSH_SECONDS", "2"))
+
+_INSERTS = {
+    "unanswered": (
+        "INSERT INTO preguntas_no_contestadas "
+        "(texto_pregunta, respuesta_dada, intent_detectada, canal, usuario_id) VALUES %s"
+    ),
+    "feedback": "INSERT INTO feedback_usuario (pregunta_id, feedback_texto, usuario_id) VALUES %s",
+}
+
+_STOP = object()
+
+
+class AnalyticsSink:
+    """Cola de escritura diferida para preguntas no contestadas, feedback y CSV.
+
+    Los ``record_*`` solo encolan el evento y nunca bloquean la petición. Un
+    hilo de fondo agrupa los eventos hasta juntar ``batch_size`` o hasta que
+    pasen ``flush_seconds`` y los escribe con un INSERT de varias filas por
+    tabla y una sola apertura del CSV. La cola es acotada: si está llena, o
+    si la base de datos falla al escribir un lote, los eventos se descartan y
+    se cuentan en ``dropped``. ``close`` escribe lo pendiente al apagar.
+    """
+
+    def __init__(
+        self,
+        connection: Callable[[], AbstractContextManager],
+        csv_path: str,
+        max_queue: int = ANALYTICS_QUEUE_MAX,
+        batch_size: int = ANALYTICS_BATCH_SIZE,
+        flush_seconds: float = ANALYTICS_FLUSH_SECONDS,
+    ):
+        self._connection = connection
+        self.csv_path = csv_path
+        self.batch_size = max(1, batch_size)
+        self.flush_seconds = flush_seconds
+        self._queue: "queue.Queue[Any]" = queue.Queue(maxsize=max(1, max_queue))
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._closed = False
+        self._stats: Dict[str, int] = defaultdict(int)
+
+    # ---- Productores ----
+    def record_unanswered(
+        self,
+        texto_pregunta: str,
+        respuesta_dada: str,
+        intent_detectada: str = "unknown",
+        canal: Optional[str] = None,
+        usuario_id: Optional[str] = None,
+    ):
+        self._put("unanswered", (texto_pregunta, respuesta_dada, intent_detectada, canal, usuario_id))
+
+    def record_feedback(self, pregunta_id: Optional[int], feedback_texto: str, usuario_id: Optional[str] = None):
+        self._put("feedback", (pregunta_id, feedback_texto, usuario_id))
+
+    def record_missed(self, question: str, best_alt: Optional[str] = None, best_score: Optional[int] = None):
+        line = f"{datetime.now().isoformat()},{question.replace(',', ' ')},{best_alt or ''},{best_score or ''}\n"
+        self._put("missed", line)
+
+    def _put(self, kind: str, row: Any):
+        if self._closed:
+            self._count("dropped")
+            return
+        self._ensure_worker()
+        try:
+            self._queue.put_nowait((kind, row))
+            self._count("enqueued")
+        except queue.Full:
+            self._count("dropped")
+            logger.warning("Cola de analítica llena; se descarta un evento %s", kind)
+
+    # ---- Hilo de escritura ----
+    def _count(self, name: str, amount: int = 1):
+        with self._lock:
+            self._stats[name] += amount
+
+    def _ensure_worker(self):
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="analytics-sink", daemon=True)
+                self._thread.start()
+
+    def _next_batch(self) -> Tuple[List[Tuple[str, Any]], bool]:
+        """Bloquea hasta el primer evento y junta más hasta el tamaño o el tiempo límite."""
+        first = self._queue.get()
+        if first is _STOP:
+            return [], True
+        batch = [first]
+        deadline = time.monotonic() + self.flush_seconds
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is _STOP:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _run(self):
+        stop = False
+        while not stop:
+            batch, stop = self._next_batch()
+            if batch:
+                self._write(batch)
+            if stop:
+                self._queue.task_done()  # el marcador _STOP
+
+    def _write(self, batch: List[Tuple[str, Any]]):
+        groups: Dict[str, List[Any]] = defaultdict(list)
+        for kind, row in batch:
+            groups[kind].append(row)
+        for kind, rows in groups.items():
+            try:
+                if kind == "missed":
+                    self._write_csv(rows)
+                else:
+                    self._write_db(kind, rows)
+                self._count("written", len(rows))
+            except Exception as e:
+                self._count("dropped", len(rows))
+                logger.warning("No se pudieron escribir %s eventos %s: %s", len(rows), kind, e)
+        self._count("batches")
+        for _ in batch:
+            self._queue.task_done()
+
+    def _write_db(self, kind: str, rows: List[tuple]):
+        with self._connection() as conn:
+            with conn.cursor() as cur:
+                execute_values(cur, _INSERTS[kind], rows, page_size=len(rows))
+            conn.commit()
+
+    def _write_csv(self, lines: List[str]):
+        first = not os.path.exists(self.csv_path)
+        with open(self.csv_path, "a", encoding="utf-8") as f:
+            if first:
+                f.write("timestamp,question,best_alt,best_score\n")
+            f.writelines(lines)
+
+    # ---- Control ----
+    def flush(self, timeout: float = 10.0) -> bool:
+        """Espera a que se escriban los eventos encolados; devuelve si lo logró."""
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks:
+            if time.monotonic() > deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def close(self, timeout: float = 10.0):
+        """Deja de aceptar eventos y escribe los pendientes antes de terminar."""
+        if self._closed:
+            return
+        self._closed = True
+        if self._thread is None:
+            return
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            logger.error("No se pudo detener la cola de analítica a tiempo")
+            return
+        self._thread.join(timeout)
+
+    def register_shutdown(self):
+        atexit.register(self.close)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            stats = dict(self._stats)
+        stats["queued"] = self._queue.qsize()
+        for key in ("enqueued", "written", "dropped", "batches"):
+            stats.setdefault(key, 0)
+        return stats
@@ -0,0 +1,71 @@
+"""Microbenchmark de parse_nl_datetime frente a dateparser.search_dates.
+
+Recorre frases de agendamiento como las que escriben los vecinos en el flujo
+del scheduler. Cada turno consulta la misma frase dos veces
+(``extract_entities_scheduler`` y ``parse_date_time``). Se mide:
+
+- dateparser directo, que era el comportamiento anterior;
+- el parser por capas sin memo;
+- el parser por capas con memo.
+
+Uso (desde mcp-core):
+
+    python benchmarks/bench_date_parser.py --rounds 20
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+PHRASES = [
+    "mañana a las 10", "mañana a las 10:30", "hoy a las 16:00", "pasado mañana a las 9",
+    "el lunes 9:30", "el martes a las 11", "el miércoles a las 12:00", "jueves a las 15 hrs",
+    "el viernes", "próximo lunes", "para el jueves a las 10", "sábado", "15:00 del jueves",
+    "15/08", "24/08 a las 10:00", "1/9/2025", "2025-08-14", "2025-08-14 10:30",
+    "el 14 de julio", "14 de agosto a las 9:00", "el 3 de septiembre a las 11:15",
+    "martes 10 de julio", "Mañana a las 3 de la tarde", "El Lunes a las 9.",
+    # Formas que siguen yendo a dateparser
+    "10:30", "a las 9 de la mañana", "en una hora", "la otra semana", "el 5 en la tarde",
+    "quiero una cita el 14 de julio a las 10:00", "mi nombre es Ana Pérez", "hola",
+]
+
+
+def timed(fn, base, rounds):
+    start = time.perf_counter()
+    for r in range(rounds):
+        # Un turno por frase: la fecha base cambia entre turnos, no dentro de uno
+        turn_base = base + timedelta(seconds=r)
+        for phrase in PHRASES:
+            fn(phrase, turn_base)
+            fn(phrase, turn_base)
+    return (time.perf_counter() - start) / (rounds * len(PHRASES)) * 1e3
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    from utils.datetime_utils import _search_dates, parse_fast_datetime, parse_nl_datetime
+    print(f"import datetime_utils: {(time.perf_counter() - start) * 1e3:.1f} ms")
+    start = time.perf_counter()
+    import dateparser.search  # noqa: F401
+    print(f"import dateparser:     {(time.perf_counter() - start) * 1e3:.1f} ms")
+
+    base = datetime(2025, 7, 7, 15, 55, tzinfo=ZoneInfo("America/Santiago"))
+    _search_dates("mañana a las 10", base)  # carga de los datos del idioma
+    fast = sum(parse_fast_datetime(p, base) is not None for p in PHRASES)
+    print(f"{len(PHRASES)} frases, {fast} por la ruta rápida")
+    print(f"  {'dateparser':<12} {timed(_search_dates, base, args.rounds):8.3f} ms/turno")
+    print(f"  {'por capas':<12} {timed(parse_nl_datetime.__wrapped__, base, args.rounds):8.3f} ms/turno")
+    parse_nl_datetime.cache_clear()
+    print(f"  {'con memo':<12} {timed(parse_nl_datetime, base, args.rounds):8.3f} ms/turno")
+
+
+if __name__ == "__main__":
+    main()
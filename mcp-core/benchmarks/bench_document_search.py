@@ -0,0 +1,145 @@
+"""Compara el LIKE anterior con ``buscar_documentos`` sobre 100k documentos.
+
+Crea un esquema temporal ``bench_docsearch`` con una tabla ``documentos``
+sintética, mide las preguntas de ejemplo con el ``LIKE '%...%'`` de
+``retrieve_context_snippets``, aplica ``databases/init-documentos-busqueda.sql``
+y repite la medición con la búsqueda rankeada. Al terminar borra el esquema
+(salvo ``--keep``). Necesita un PostgreSQL con permiso para crear las
+extensiones ``pg_trgm`` y ``unaccent``; usa las variables POSTGRES_*.
+
+Uso (desde mcp-core):
+
+    POSTGRES_HOST=localhost python benchmarks/bench_document_search.py --rows 100000
+"""
+import argparse
+import os
+import statistics
+import time
+
+import psycopg2
+
+MIGRATION = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "..", "..", "databases", "init-documentos-busqueda.sql"
+)
+SCHEMA = "bench_docsearch"
+
+PREGUNTAS = [
+    "quiero sacar la patente comercial",
+    "que necesito para la licencia de conducir",
+    "como obtengo el permiso de circulacion",
+    "certificado de residencia",
+    "cedula de identidad",
+    "patente comersial",  # error de tipeo
+    "subsidio de vivienda para adulto mayor",
+    "horario de la oficina de transito",
+]
+
+CREATE = f"""
+-- La migración usa public.unaccent: las extensiones no van al esquema temporal
+CREATE EXTENSION IF NOT EXISTS pg_trgm SCHEMA public;
+CREATE EXTENSION IF NOT EXISTS unaccent SCHEMA public;
+CREATE SCHEMA {SCHEMA};
+SET search_path = {SCHEMA}, public;
+CREATE TABLE documentos (
+    id SERIAL PRIMARY KEY,
+    id_documento TEXT UNIQUE NOT NULL,
+    nombre TEXT NOT NULL,
+    clase TEXT,
+    aplica_a TEXT,
+    descripcion TEXT
+);
+INSERT INTO documentos (id_documento, nombre, clase, aplica_a, descripcion)
+SELECT 'DOC-' || g,
+       tipos[1 + g %% array_length(tipos, 1)] || ' ' || temas[1 + (g / 7) %% array_length(temas, 1)] || ' ' || g,
+       'clase' || g %% 5,
+       'persona',
+       'Trámite municipal de ' || temas[1 + (g / 3) %% array_length(temas, 1)]
+         || ' para ' || publico[1 + g %% array_length(publico, 1)]
+         || '. Requiere ' || requisitos[1 + (g / 11) %% array_length(requisitos, 1)] || '.'
+FROM generate_series(1, %(rows)s) AS g,
+     (SELECT ARRAY['Permiso', 'Licencia', 'Certificado', 'Patente', 'Subsidio', 'Solicitud'] AS tipos,
+             ARRAY['circulación', 'conducir', 'residencia', 'comercial', 'vivienda', 'alcoholes',
+                   'construcción', 'tránsito', 'aseo', 'feria libre', 'poda', 'ruidos molestos'] AS temas,
+             ARRAY['vecinos', 'empresas', 'adultos mayores', 'estudiantes'] AS publico,
+             ARRAY['cédula de identidad', 'comprobante de domicilio', 'pago de derechos',
+                   'declaración jurada'] AS requisitos) AS v;
+ANALYZE documentos;
+"""
+
+LIKE_SQL = (
+    "SELECT nombre, descripcion FROM documentos "
+    "WHERE LOWER(nombre) LIKE %s OR LOWER(descripcion) LIKE %s LIMIT %s"
+)
+RANKED_SQL = "SELECT nombre, descripcion, score FROM buscar_documentos(%s, %s)"
+EXPLAIN_SQL = (
+    "EXPLAIN (ANALYZE, BUFFERS) SELECT id FROM documentos "
+    "WHERE munbot_unaccent(lower(nombre)) %% munbot_unaccent(lower(%s))"
+)
+
+
+def measure(cur, sql, params_for, repeat):
+    tiempos, aciertos = [], 0
+    for pregunta in PREGUNTAS:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            cur.execute(sql, params_for(pregunta))
+            rows = cur.fetchall()
+            tiempos.append((time.perf_counter() - start) * 1000)
+        aciertos += bool(rows)
+    tiempos.sort()
+    return statistics.median(tiempos), tiempos[int(len(tiempos) * 0.95) - 1], aciertos
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--limit", type=int, default=3)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--keep", action="store_true", help="no borrar el esquema al terminar")
+    args = parser.parse_args()
+
+    conn = psycopg2.connect(
+        host=os.getenv("POSTGRES_HOST", "localhost"),
+        port=int(os.getenv("POSTGRES_PORT", "5432")),
+        dbname=os.getenv("POSTGRES_DB", "munbot"),
+        user=os.getenv("POSTGRES_USER", "munbot"),
+        password=os.getenv("POSTGRES_PASSWORD", "1234"),
+    )
+    conn.autocommit = True
+    cur = conn.cursor()
+    try:
+        start = time.perf_counter()
+        cur.execute(CREATE, {"rows": args.rows})
+        print(f"{args.rows} documentos generados en {time.perf_counter() - start:.1f}s")
+
+        like = measure(
+            cur, LIKE_SQL, lambda p: (f"%{p}%", f"%{p}%", args.limit), args.repeat
+        )
+
+        start = time.perf_counter()
+        with open(MIGRATION, encoding="utf-8") as f:
+            cur.execute(f.read())
+        cur.execute("ANALYZE documentos")
+        print(f"migración aplicada en {time.perf_counter() - start:.1f}s")
+
+        ranked = measure(cur, RANKED_SQL, lambda p: (p, args.limit), args.repeat)
+
+        print(f"{'':<10} {'p50 ms':>8} {'p95 ms':>8} {'preguntas con resultado':>24}")
+        for label, (p50, p95, aciertos) in (("LIKE", like), ("rankeada", ranked)):
+            print(f"{label:<10} {p50:8.2f} {p95:8.2f} {aciertos:>18}/{len(PREGUNTAS)}")
+
+        print("\nEjemplo:", PREGUNTAS[0])
+        cur.execute(RANKED_SQL, (PREGUNTAS[0], args.limit))
+        for nombre, _, score in cur.fetchall():
+            print(f"  {score:6.3f}  {nombre}")
+        # El plan de la función no es visible; se muestra el de su filtro de nombre
+        cur.execute(EXPLAIN_SQL, (PREGUNTAS[0],))
+        print("\n".join(r[0] for r in cur.fetchall()))
+    finally:
+        if not args.keep:
+            cur.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""Microbenchmark de FAQIndex frente al recorrido lineal de la FAQ.
+
+Genera una FAQ sintética de ~10k preguntas alternativas y mide, por consulta,
+las tres etapas de ``lookup_faq_respuesta`` (exacta, fuzzy y palabras clave).
+
+Uso (desde mcp-core):
+
+    python benchmarks/bench_faq_index.py --phrasings 10000 --queries 200
+"""
+import argparse
+import os
+import random
+import re
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rapidfuzz import fuzz  # noqa: E402
+
+from faq_index import FAQIndex  # noqa: E402
+from utils.text import normalize_text  # noqa: E402
+
+VOCAB = (
+    "permiso circulacion licencia conducir patente comercial basura retiro horario "
+    "oficina pago multa hora reclamo vecino ruido poda arbol luminaria calle bache "
+    "subsidio vivienda registro social hogares certificado residencia feria libre"
+).split()
+STOPWORDS = {"de", "la", "el", "los", "las", "un", "una", "en", "por", "para", "que"}
+
+
+def tokenize(text):
+    return [w for w in re.findall(r"\w+", text) if len(w) >= 3 and w not in STOPWORDS]
+
+
+def build_faq(phrasings, seed=1):
+    rnd = random.Random(seed)
+    faqs = []
+    while sum(len(e["pregunta"]) for e in faqs) < phrasings:
+        faqs.append({
+            "pregunta": [
+                "como " + " ".join(rnd.sample(VOCAB, rnd.randint(3, 7))) for _ in range(rnd.randint(2, 6))
+            ],
+            "respuesta": f"respuesta {len(faqs)}",
+        })
+    return faqs
+
+
+def linear_lookup(faqs, pregunta):
+    """Las tres pasadas originales sobre todas las alternativas."""
+    q = normalize_text(pregunta)
+    for entry in faqs:
+        for alt in entry["pregunta"]:
+            if normalize_text(alt) == q:
+                return "exacta"
+    high = []
+    for entry in faqs:
+        for alt in entry["pregunta"]:
+            if fuzz.ratio(q, normalize_text(alt)) >= 85:
+                high.append(alt)
+    if high:
+        return "fuzzy"
+    tokens = set(tokenize(q))
+    hits = []
+    for entry in faqs:
+        for alt in entry["pregunta"]:
+            t = set(tokenize(normalize_text(alt)))
+            if len(tokens & t) >= 2 or len(tokens & t) / len(tokens | t) >= 0.3:
+                hits.append(alt)
+                break
+    return "claves" if hits else None
+
+
+def index_lookup(index, pregunta):
+    q = normalize_text(pregunta)
+    if index.exact(q):
+        return "exacta"
+    if index.fuzzy(q, 85):
+        return "fuzzy"
+    return "claves" if index.keyword_hits(q) else None
+
+
+def timed(fn, queries):
+    out = []
+    for q in queries:
+        start = time.perf_counter()
+        fn(q)
+        out.append((time.perf_counter() - start) * 1000)
+    return out
+
+
+def report(label, ms):
+    ms = sorted(ms)
+    p95 = ms[int(len(ms) * 0.95) - 1]
+    print(f"{label:<14} media={statistics.mean(ms):9.2f} ms  p50={statistics.median(ms):9.2f} ms  p95={p95:9.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--phrasings", type=int, default=10000)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    faqs = build_faq(args.phrasings)
+    rnd = random.Random(2)
+    alts = [alt for e in faqs for alt in e["pregunta"]]
+    queries = [rnd.choice(alts) if i % 3 == 0 else " ".join(rnd.sample(VOCAB, 4)) for i in range(args.queries)]
+
+    start = time.perf_counter()
+    index = FAQIndex(faqs, normalize=normalize_text, tokenize=tokenize)
+    print(f"{len(index)} alternativas, índice construido en {(time.perf_counter() - start) * 1000:.0f} ms")
+
+    mismatches = sum(linear_lookup(faqs, q) != index_lookup(index, q) for q in queries)
+    print(f"resultados distintos: {mismatches}")
+    report("lineal", timed(lambda q: linear_lookup(faqs, q), queries))
+    report("índice", timed(lambda q: index_lookup(index, q), queries))
+
+    # Pregunta completa + subpreguntas: una llamada por fragmento vs. una matriz cdist
+    compuestas = [[" ".join(rnd.sample(VOCAB, 4)) for _ in range(4)] for _ in range(args.queries)]
+    report("por fragmento", timed(lambda qs: [index.fuzzy(normalize_text(q), 85) for q in qs], compuestas))
+    report("cdist", timed(lambda qs: index.fuzzy_batch([normalize_text(q) for q in qs], 85), compuestas))
+
+
+if __name__ == "__main__":
+    main()
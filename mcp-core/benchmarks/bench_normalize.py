@@ -0,0 +1,70 @@
+"""Microbenchmark de normalize_text sobre los corpus de FAQ y documentos.
+
+Compara la implementación anterior (NFD + generadores por carácter) con la
+actual sin memo (tablas ``str.translate``) y con memo (llamadas repetidas,
+como en los recorridos de FAQ, alias y palabras clave de cada turno).
+Verifica además que las tres den el mismo resultado.
+
+Uso (desde mcp-core):
+
+    python benchmarks/bench_normalize.py --rounds 20
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import unicodedata
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.text import normalize_text  # noqa: E402
+
+DATABASES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "databases")
+
+
+def legacy_normalize_text(text):
+    text = text.lower().strip()
+    text = "".join(c for c in unicodedata.normalize("NFD", text) if unicodedata.category(c) != "Mn")
+    return "".join(c for c in text if c.isalnum() or c.isspace())
+
+
+def strings(value):
+    if isinstance(value, str):
+        yield value
+    elif isinstance(value, dict):
+        for v in value.values():
+            yield from strings(v)
+    elif isinstance(value, list):
+        for v in value:
+            yield from strings(v)
+
+
+def timed(fn, corpus, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for s in corpus:
+            fn(s)
+    return (time.perf_counter() - start) / (rounds * len(corpus)) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+
+    for name in ("faq_respuestas.json", "documento_requisito.json"):
+        with open(os.path.join(DATABASES, name), encoding="utf-8") as f:
+            corpus = list(strings(json.load(f)))
+        uncached = normalize_text.__wrapped__
+        assert all(legacy_normalize_text(s) == uncached(s) for s in corpus)
+        normalize_text.cache_clear()
+        chars = sum(len(s) for s in corpus) / len(corpus)
+        print(f"{name}: {len(corpus)} textos, {chars:.0f} caracteres en promedio")
+        print(f"  {'anterior':<12} {timed(legacy_normalize_text, corpus, args.rounds):8.2f} µs/texto")
+        print(f"  {'translate':<12} {timed(uncached, corpus, args.rounds):8.2f} µs/texto")
+        print(f"  {'con memo':<12} {timed(normalize_text, corpus, args.rounds):8.2f} µs/texto")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""Benchmark de la caché KV de prefijos sobre los prompts del orquestador.
+
+Alterna prompts de intención y de respuesta (como ocurre en cada turno real)
+y mide el tiempo de evaluación del prompt (``max_tokens=1``) con y sin
+restaurar el estado del prefijo estático.
+
+Uso (desde mcp-core, con el modelo disponible en LLAMA_MODEL_PATH):
+
+    PROMPTS_PATH=prompts python benchmarks/bench_prefix_cache.py --rounds 10
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import orchestrator  # noqa: E402
+from llama_client import PrefixStateCache  # noqa: E402
+
+PREGUNTAS = [
+    "¿Qué necesito para sacar la licencia de conducir?",
+    "¿A qué hora abre la oficina de partes?",
+    "Quiero reclamar por un bache en mi calle",
+    "¿Dónde pago el permiso de circulación?",
+    "Necesito una hora para la dirección de obras",
+]
+
+
+def build_prompts():
+    template = orchestrator.load_prompt("doc-generar_respuesta_llm.txt")
+    historial = "Usuario: hola\nAsistente: ¡Hola! ¿En qué puedo ayudarte?"
+    prompts = []
+    for pregunta in PREGUNTAS:
+        prompts.append(
+            orchestrator.INTENT_PROMPT_PREFIX
+            + f"Historial:\n{historial}\nMensaje: {pregunta}\nJSON:"
+        )
+        prompts.append(
+            orchestrator.fill_prompt(
+                template,
+                {"language": "es", "faq_context": "", "historial": historial, "pregunta": pregunta},
+            )
+        )
+    answer_prefix = orchestrator.prompt_static_prefix(template, {"language": "es"})
+    return prompts, [orchestrator.INTENT_PROMPT_PREFIX, answer_prefix]
+
+
+def run(model, prompts, rounds, cache=None):
+    timings = []
+    for _ in range(rounds):
+        for prompt in prompts:
+            start = time.perf_counter()
+            if cache is not None:
+                cache.prepare(model, prompt)
+            model(prompt, max_tokens=1, temperature=0.0)
+            timings.append(time.perf_counter() - start)
+    return timings
+
+
+def report(label, timings):
+    ms = sorted(t * 1000 for t in timings)
+    p95 = ms[int(len(ms) * 0.95) - 1]
+    print(f"{label:<12} media={statistics.mean(ms):8.1f} ms  p50={statistics.median(ms):8.1f} ms  p95={p95:8.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    model = orchestrator.llm.llm
+    prompts, prefixes = build_prompts()
+    for prefix in prefixes:
+        print(f"prefijo estático: {len(model.tokenize(prefix.encode('utf-8')))} tokens")
+
+    model.reset()
+    report("sin caché", run(model, prompts, args.rounds))
+
+    cache = PrefixStateCache()
+    for prefix in prefixes:
+        cache.register(prefix)
+    model.reset()
+    report("con caché", run(model, prompts, args.rounds, cache))
+    print(cache.stats())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""Cuenta las operaciones Redis por turno de ``orchestrate``.
+
+Ejecuta una conversación de ejemplo sobre fakeredis con y sin la unidad de
+trabajo de sesión y muestra los comandos enviados por turno. No usa el LLM:
+``--stub-llm`` reemplaza llama_cpp por un módulo vacío para poder importar
+el orquestador sin el modelo.
+
+Uso (desde mcp-core):
+
+    DISABLE_PERIODIC_MIGRATION=1 FAQ_DB_PATH=databases/faq_respuestas.json \\
+        PROMPTS_PATH=prompts python benchmarks/bench_session_ops.py --stub-llm
+"""
+import argparse
+import os
+import statistics
+import sys
+import types
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+CONVERSACION = [
+    "hola",
+    "cual es el horario de atencion",
+    "quiero informacion de la patente comercial",
+    "que requisitos necesito",
+    "gracias",
+    "quiero hacer un reclamo",
+    "cancelar",
+]
+
+
+def stub_llama_cpp():
+    module = types.ModuleType("llama_cpp")
+
+    class Llama:
+        def __init__(self, *args, **kwargs):
+            pass
+
+        def __call__(self, *args, **kwargs):
+            return {"choices": [{"text": "{}"}]}
+
+    module.Llama = Llama
+    sys.modules["llama_cpp"] = module
+
+
+def run(orchestrator, redis_client, session_id):
+    per_turn, sent = [], []
+    for mensaje in CONVERSACION:
+        before, before_bytes = len(redis_client.commands), redis_client.bytes_sent
+        orchestrator.orchestrate(mensaje, session_id=session_id)
+        per_turn.append(Counter(redis_client.commands[before:]))
+        sent.append(redis_client.bytes_sent - before_bytes)
+    return per_turn, sent
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--stub-llm", action="store_true")
+    args = parser.parse_args()
+    if args.stub_llm:
+        stub_llama_cpp()
+
+    import fakeredis
+    import context_manager
+    import orchestrator
+
+    class CountingRedis(fakeredis.FakeRedis):
+        def __init__(self, *a, **kw):
+            super().__init__(*a, **kw)
+            self.commands = []
+            self.bytes_sent = 0
+
+        def execute_command(self, *a, **kw):
+            self.commands.append(a[0])
+            return super().execute_command(*a, **kw)
+
+        def pipeline(self, *a, **kw):
+            pipe = super().pipeline(*a, **kw)
+            execute = pipe.execute
+
+            def counted(*ea, **ekw):
+                # Un pipeline es un solo viaje; se etiqueta con sus comandos
+                self.commands.append("+".join(cmd[0][0] for cmd in pipe.command_stack))
+                self.bytes_sent += sum(
+                    len(str(arg)) for cmd in pipe.command_stack for arg in cmd[0]
+                )
+                return execute(*ea, **ekw)
+
+            pipe.execute = counted
+            return pipe
+
+    redis_client = CountingRedis(decode_responses=True)
+    orchestrator.redis_client = redis_client
+    orchestrator.context_manager.redis_client = redis_client
+    orchestrator.response_cache.redis_client = redis_client
+    orchestrator.get_db = lambda: (_ for _ in ()).throw(Exception("db deshabilitada"))
+
+    for label, enabled in (("sin unidad", False), ("con unidad", True)):
+        context_manager.SESSION_UNIT_OF_WORK = enabled
+        per_turn, sent = run(orchestrator, redis_client, f"bench-{label}")
+        totals = [sum(c.values()) for c in per_turn]
+        print(
+            f"{label:<11} ops/turno media={statistics.mean(totals):5.1f} máx={max(totals):3d}"
+            f" bytes/turno media={statistics.mean(sent):7.0f}"
+        )
+        for mensaje, counter in zip(CONVERSACION, per_turn):
+            print(f"    {mensaje[:40]:<40} {dict(counter)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,28 @@
+import asyncio
 import redis
+import redis.asyncio
+import copy
 import json
-from typing import Dict, Optional, Any, List
+import logging
+import os
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional, Tuple
 from datetime import datetime, date, time
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+
+logger = logging.getLogger(__name__)
+
+# Permite desactivar la unidad de trabajo por turno (SESSION_UNIT_OF_WORK=0)
+SESSION_UNIT_OF_WORK = os.getenv("SESSION_UNIT_OF_WORK", "1") != "0"
+# Reintentos de una escritura de sesión que perdió la carrera con otro turno
+SESSION_CAS_RETRIES = int(os.getenv("SESSION_CAS_RETRIES", "5"))
+# Campo del hash de sesión con el número de versión
+VERSION_FIELD = "_v"
+
+
+class SessionConflictError(Exception):
+    """La sesión cambió en cada reintento de escritura."""
 
 
 @dataclass
@@ -10,108 +30,542 @@ class AgendaState:
     fecha: date | None = None
     hora: time | None = None
 
+
+@dataclass
+class _SessionUnit:
+    """Copia en memoria de una sesión durante un turno.
+
+    ``original`` y ``original_history`` guardan los campos tal como se leyeron
+    de Redis (ya serializados) para escribir al final solo lo que cambió.
+    """
+    context: Dict[str, Any]
+    original: Dict[str, str] = field(default_factory=dict)
+    original_history: List[str] = field(default_factory=list)
+    version: int = 0
+    expiry: Optional[int] = None
+    dirty: bool = False
+    deleted: bool = False
+
+
+@dataclass
+class _UnitOfWork:
+    sessions: Dict[str, _SessionUnit] = field(default_factory=dict)
+    redis_ops: int = 0
+
+
+# Unidad de trabajo activa en el turno actual (una por petición/hilo)
+_CURRENT_UNIT: ContextVar[Optional[_UnitOfWork]] = ContextVar("session_unit_of_work", default=None)
+
+
+def _decode(value: Any) -> Any:
+    return value.decode("utf-8") if isinstance(value, bytes) else value
+
+
+def _encode_value(value: Any) -> str:
+    return json.dumps(value, ensure_ascii=False)
+
+
 class ConversationalContextManager:
+    """Contexto conversacional por sesión almacenado en Redis.
+
+    Cada sesión ocupa dos claves: un hash ``session:{id}`` con un campo JSON
+    por cada clave de primer nivel del contexto y una lista
+    ``session:{id}:history`` con los últimos ``HISTORY_LIMIT`` mensajes. Así
+    modificar un campo reescribe solo ese campo y agregar un mensaje es un
+    ``RPUSH``/``LTRIM``. Las sesiones guardadas con el formato anterior (un
+    string JSON) se migran al leerlas por primera vez.
+
+    Los turnos que corren en un event loop usan ``unit_of_work_async`` y
+    ``get_context_async``/``preload_async``: la lectura inicial y la escritura
+    final van por ``async_redis_client`` y los accesos intermedios trabajan
+    sobre la copia en memoria, así que ninguno bloquea el loop.
+    """
+
+    HISTORY_LIMIT = 10
+
     def __init__(self, host: str = 'localhost', port: int = 6379, db: int = 0):
         """Inicializa el gestor de contexto con valores por defecto."""
         self.redis_client = redis.Redis(host=host, port=port, db=db, decode_responses=True)
+        self.async_redis_client = redis.asyncio.Redis(host=host, port=port, db=db, decode_responses=True)
         self.session_expiry_seconds = 300  # 5 minutos
+        self.redis_ops = 0
+        self.conflicts = 0
+
+    @staticmethod
+    def _key(session_id: str) -> str:
+        return f"session:{session_id}"
+
+    @staticmethod
+    def _history_key(session_id: str) -> str:
+        return f"session:{session_id}:history"
+
+    # ---- Unidad de trabajo por turno ----
+    @contextmanager
+    def unit_of_work(self) -> Iterator[None]:
+        """Agrupa los accesos a sesión de un turno en una lectura y una escritura.
+
+        Dentro del bloque cada sesión se lee de Redis una sola vez; los
+        setters modifican la copia en memoria y al salir (también si hubo una
+        excepción) solo se escriben los campos modificados. Si ya hay una
+        unidad activa, el bloque se une a ella.
+        """
+        if not SESSION_UNIT_OF_WORK or _CURRENT_UNIT.get() is not None:
+            yield
+            return
+        unit = _UnitOfWork()
+        token = _CURRENT_UNIT.set(unit)
+        try:
+            yield
+        finally:
+            _CURRENT_UNIT.reset(token)
+            self._flush(unit)
+            logger.debug("Operaciones Redis del turno: %s", unit.redis_ops)
+
+    @asynccontextmanager
+    async def unit_of_work_async(self) -> AsyncIterator[None]:
+        """Variante de ``unit_of_work`` para corrutinas.
+
+        La escritura final se hace con el cliente asíncrono. Las sesiones
+        deben leerse con ``get_context_async``/``preload_async`` antes de
+        usar los getters y setters, que luego no tocan Redis.
+        """
+        if not SESSION_UNIT_OF_WORK or _CURRENT_UNIT.get() is not None:
+            yield
+            return
+        unit = _UnitOfWork()
+        token = _CURRENT_UNIT.set(unit)
+        try:
+            yield
+        finally:
+            _CURRENT_UNIT.reset(token)
+            await self._flush_async(unit)
+            logger.debug("Operaciones Redis del turno: %s", unit.redis_ops)
+
+    async def preload_async(self, *session_ids: str):
+        """Lee en la unidad activa las sesiones que todavía no tiene."""
+        unit = _CURRENT_UNIT.get()
+        if unit is None:
+            return
+        for session_id in session_ids:
+            if session_id not in unit.sessions:
+                unit.sessions[session_id] = await self._fetch_async(session_id, unit)
+
+    def _count_op(self, unit: Optional[_UnitOfWork] = None):
+        self.redis_ops += 1
+        if unit is not None:
+            unit.redis_ops += 1
+
+    def _encode(self, context: Dict[str, Any]):
+        fields = {k: _encode_value(v) for k, v in context.items() if k != "history"}
+        history = [_encode_value(m) for m in context.get("history") or []]
+        return fields, history
+
+    def _parse(self, fields: Dict[Any, Any], history: List[Any]) -> _SessionUnit:
+        original = {_decode(k): _decode(v) for k, v in fields.items()}
+        version = int(original.pop(VERSION_FIELD, 0))
+        original_history = [_decode(m) for m in history]
+        context = {k: json.loads(v) for k, v in original.items()}
+        if original_history:
+            context["history"] = [json.loads(m) for m in original_history]
+        return _SessionUnit(
+            context=context, original=original, original_history=original_history, version=version
+        )
+
+    def _fetch(self, session_id: str, unit: Optional[_UnitOfWork] = None) -> _SessionUnit:
+        """Lee hash e historial en un solo viaje a Redis."""
+        self._count_op(unit)
+        pipe = self.redis_client.pipeline(transaction=False)
+        pipe.hgetall(self._key(session_id))
+        pipe.lrange(self._history_key(session_id), 0, -1)
+        fields, history = pipe.execute(raise_on_error=False)
+        if isinstance(fields, redis.ResponseError):
+            # WRONGTYPE: la sesión todavía está guardada como string JSON
+            return self._migrate_legacy(session_id, unit)
+        if isinstance(history, redis.ResponseError):
+            history = []
+        return self._parse(fields, history)
+
+    async def _fetch_async(self, session_id: str, unit: Optional[_UnitOfWork] = None) -> _SessionUnit:
+        """Variante de ``_fetch`` con el cliente asíncrono."""
+        self._count_op(unit)
+        pipe = self.async_redis_client.pipeline(transaction=False)
+        pipe.hgetall(self._key(session_id))
+        pipe.lrange(self._history_key(session_id), 0, -1)
+        fields, history = await pipe.execute(raise_on_error=False)
+        if isinstance(fields, redis.ResponseError):
+            # La migración del formato anterior es excepcional: va por el cliente síncrono
+            return await asyncio.to_thread(self._migrate_legacy, session_id, unit)
+        if isinstance(history, redis.ResponseError):
+            history = []
+        return self._parse(fields, history)
+
+    def load_many(self, session_ids: List[str]) -> Dict[str, Tuple[Dict[str, Any], int]]:
+        """Contexto y versión de varias sesiones leídos en un solo pipeline.
+
+        Omite las sesiones vacías o vencidas; las que siguen en el formato
+        string JSON se migran una por una.
+        """
+        if not session_ids:
+            return {}
+        self._count_op()
+        pipe = self.redis_client.pipeline(transaction=False)
+        for session_id in session_ids:
+            pipe.hgetall(self._key(session_id))
+            pipe.lrange(self._history_key(session_id), 0, -1)
+        replies = pipe.execute(raise_on_error=False)
+        sessions = {}
+        for i, session_id in enumerate(session_ids):
+            fields, history = replies[2 * i], replies[2 * i + 1]
+            if isinstance(fields, redis.ResponseError):
+                session = self._migrate_legacy(session_id)
+            else:
+                if isinstance(history, redis.ResponseError):
+                    history = []
+                session = self._parse(fields, history)
+            if session.context:
+                sessions[session_id] = (session.context, session.version)
+        return sessions
+
+    def _migrate_legacy(self, session_id: str, unit: Optional[_UnitOfWork] = None) -> _SessionUnit:
+        """Convierte una sesión del formato string JSON al formato hash."""
+        self._count_op(unit)
+        pipe = self.redis_client.pipeline(transaction=False)
+        pipe.get(self._key(session_id))
+        pipe.ttl(self._key(session_id))
+        raw, ttl = pipe.execute()
+        context = json.loads(_decode(raw)) if raw else {}
+        session = _SessionUnit(context=context, expiry=ttl if ttl and ttl > 0 else None, deleted=True)
+        version = self._store(session_id, session, unit)
+        logger.info("Sesión %s migrada al formato hash", session_id)
+        fields, history = self._encode(context)
+        return _SessionUnit(context=context, original=fields, original_history=history, version=version)
+
+    @staticmethod
+    def _appended(before: List[str], after: List[str]) -> Optional[List[str]]:
+        """Mensajes agregados al final de ``before`` para obtener ``after``.
+
+        ``after`` puede haber descartado mensajes del principio (historial
+        acotado). Devuelve ``None`` si el cambio no es solo un agregado.
+        """
+        for start in range(len(before) + 1):
+            tail = before[start:]
+            if after[:len(tail)] == tail:
+                return after[len(tail):]
+        return None
+
+    def _rebase(self, session: _SessionUnit, fresh: _SessionUnit) -> _SessionUnit:
+        """Aplica los cambios de ``session`` sobre una versión más nueva de la sesión.
+
+        Se conservan los campos que otro turno modificó y este no; los
+        mensajes agregados se suman al final del historial actual. Si ambos
+        modificaron el mismo campo gana este turno (el último en escribir).
+        """
+        fields, history = self._encode(session.context)
+        changed = {k: v for k, v in fields.items() if session.original.get(k) != v}
+        removed = [k for k in session.original if k not in fields]
+        overlapping = [
+            k for k in [*changed, *removed] if fresh.original.get(k) != session.original.get(k)
+        ]
+        if overlapping:
+            logger.warning("Campos de sesión modificados por dos turnos a la vez: %s", overlapping)
+        merged = {k: v for k, v in fresh.context.items() if k != "history" and k not in removed}
+        merged.update({k: session.context[k] for k in changed})
+        appended = self._appended(session.original_history, history)
+        if appended is None:
+            merged_history = session.context.get("history") or []
+        else:
+            merged_history = (fresh.context.get("history") or []) + [json.loads(m) for m in appended]
+        if merged_history:
+            merged["history"] = merged_history[-self.HISTORY_LIMIT:]
+        self.conflicts += 1
+        return _SessionUnit(
+            context=merged,
+            original=fresh.original,
+            original_history=fresh.original_history,
+            version=fresh.version,
+            expiry=session.expiry,
+            dirty=True,
+        )
+
+    def _plan(self, session_id: str, session: _SessionUnit) -> List[Callable[[Any], Any]]:
+        """Comandos que llevan lo almacenado (``original``) al contexto en memoria."""
+        key, history_key = self._key(session_id), self._history_key(session_id)
+        fields, history = self._encode(session.context)
+        base_fields = {} if session.deleted else session.original
+        base_history = [] if session.deleted else session.original_history
+        ops: List[Callable[[Any], Any]] = []
+        if session.deleted:
+            ops.append(lambda p: p.delete(key, history_key))
+        changed = {k: v for k, v in fields.items() if base_fields.get(k) != v}
+        removed = [k for k in base_fields if k not in fields]
+        if changed:
+            ops.append(lambda p: p.hset(key, mapping=changed))
+        if removed:
+            ops.append(lambda p: p.hdel(key, *removed))
+        appended = self._appended(base_history, history)
+        if appended is None:
+            ops.append(lambda p: p.delete(history_key))
+            if history:
+                ops.append(lambda p: p.rpush(history_key, *history))
+        elif appended:
+            ops.append(lambda p: p.rpush(history_key, *appended))
+            ops.append(lambda p: p.ltrim(history_key, -len(history), -1))
+        elif len(history) < len(base_history):
+            if history:
+                ops.append(lambda p: p.ltrim(history_key, -len(history), -1))
+            else:
+                ops.append(lambda p: p.delete(history_key))
+        return ops
+
+    @staticmethod
+    def _stored_version(pipe, key: str) -> int:
+        try:
+            return int(_decode(pipe.hget(key, VERSION_FIELD)) or 0)
+        except redis.ResponseError:
+            return 0  # sesión en formato string anterior
+
+    def _store(
+        self,
+        session_id: str,
+        session: _SessionUnit,
+        unit: Optional[_UnitOfWork] = None,
+        rebase: bool = True,
+    ) -> Optional[int]:
+        """Escribe solo los campos modificados si nadie cambió la sesión desde la lectura.
+
+        Cada escritura incrementa el campo de versión ``_v`` del hash. Si la
+        versión almacenada ya no es la que se leyó (otro turno escribió en el
+        medio) los cambios se reaplican sobre la versión actual y se
+        reintenta; con ``rebase=False`` se devuelve ``None`` para que el
+        llamador repita su lectura. Devuelve la versión escrita.
+        """
+        key, history_key = self._key(session_id), self._history_key(session_id)
+        expiry = session.expiry or self.session_expiry_seconds
+        for attempt in range(SESSION_CAS_RETRIES + 1):
+            if not self._plan(session_id, session):
+                return session.version
+            with self.redis_client.pipeline() as pipe:
+                try:
+                    self._count_op(unit)
+                    pipe.watch(key)
+                    self._count_op(unit)
+                    current = self._stored_version(pipe, key)
+                    if current != session.version and not session.deleted:
+                        if not rebase:
+                            return None
+                        self._count_op(unit)
+                        fresh = self._parse(pipe.hgetall(key), pipe.lrange(history_key, 0, -1))
+                        session = self._rebase(session, fresh)
+                    self._queue_write(pipe, session_id, session, current + 1, expiry)
+                    self._count_op(unit)
+                    pipe.execute()
+                    return current + 1
+                except redis.WatchError:
+                    if not rebase:
+                        return None
+        logger.error("Sesión %s: no se pudo escribir tras %s reintentos", session_id, SESSION_CAS_RETRIES)
+        raise SessionConflictError(session_id)
+
+    def _queue_write(self, pipe, session_id: str, session: _SessionUnit, version: int, expiry: int):
+        """Encola en la transacción los cambios de la sesión y su nueva versión."""
+        key, history_key = self._key(session_id), self._history_key(session_id)
+        ops = self._plan(session_id, session)
+        pipe.multi()
+        for op in ops:
+            op(pipe)
+        pipe.hset(key, VERSION_FIELD, version)
+        pipe.expire(key, expiry)
+        pipe.expire(history_key, expiry)
+
+    async def _store_async(
+        self, session_id: str, session: _SessionUnit, unit: Optional[_UnitOfWork] = None
+    ) -> int:
+        """Variante de ``_store`` (siempre con rebase) con el cliente asíncrono."""
+        key, history_key = self._key(session_id), self._history_key(session_id)
+        expiry = session.expiry or self.session_expiry_seconds
+        for attempt in range(SESSION_CAS_RETRIES + 1):
+            if not self._plan(session_id, session):
+                return session.version
+            async with self.async_redis_client.pipeline() as pipe:
+                try:
+                    self._count_op(unit)
+                    await pipe.watch(key)
+                    self._count_op(unit)
+                    try:
+                        current = int(_decode(await pipe.hget(key, VERSION_FIELD)) or 0)
+                    except redis.ResponseError:
+                        current = 0  # sesión en formato string anterior
+                    if current != session.version and not session.deleted:
+                        self._count_op(unit)
+                        fresh = self._parse(await pipe.hgetall(key), await pipe.lrange(history_key, 0, -1))
+                        session = self._rebase(session, fresh)
+                    self._queue_write(pipe, session_id, session, current + 1, expiry)
+                    self._count_op(unit)
+                    await pipe.execute()
+                    return current + 1
+                except redis.WatchError:
+                    continue
+        logger.error("Sesión %s: no se pudo escribir tras %s reintentos", session_id, SESSION_CAS_RETRIES)
+        raise SessionConflictError(session_id)
+
+    def _unit_session(self, unit: _UnitOfWork, session_id: str) -> _SessionUnit:
+        session = unit.sessions.get(session_id)
+        if session is None:
+            session = self._fetch(session_id, unit)
+            unit.sessions[session_id] = session
+        return session
+
+    def _flush(self, unit: _UnitOfWork):
+        for session_id, session in unit.sessions.items():
+            if session.dirty or session.deleted:
+                self._store(session_id, session, unit)
+
+    async def _flush_async(self, unit: _UnitOfWork):
+        for session_id, session in unit.sessions.items():
+            if session.dirty or session.deleted:
+                await self._store_async(session_id, session, unit)
+
+    def _read(self, session_id: str) -> Dict[str, Any]:
+        """Contexto almacenado (sin copiar); solo para uso interno."""
+        unit = _CURRENT_UNIT.get()
+        if unit is None:
+            return self._fetch(session_id).context
+        return self._unit_session(unit, session_id).context
+
+    def _with_defaults(self, context: Dict[str, Any]) -> Dict[str, Any]:
+        if "agenda" not in context:
+            context["agenda"] = {"fecha": None, "hora": None}
+        return context
+
+    def _update(self, session_id: str, mutate: Callable[[Dict[str, Any]], None]):
+        """Aplica ``mutate`` al contexto de la sesión y lo guarda.
+
+        Dentro de una unidad de trabajo modifica la copia del turno. Fuera de
+        ella es una lectura-modificación-escritura optimista: si otro escritor
+        cambió la sesión en el medio, se vuelve a leer y se reaplica
+        ``mutate`` sobre la versión nueva.
+        """
+        unit = _CURRENT_UNIT.get()
+        if unit is not None:
+            session = self._unit_session(unit, session_id)
+            mutate(self._with_defaults(session.context))
+            session.dirty = True
+            return
+        for _ in range(SESSION_CAS_RETRIES + 1):
+            session = self._fetch(session_id)
+            mutate(self._with_defaults(session.context))
+            if self._store(session_id, session, rebase=False) is not None:
+                return
+            self.conflicts += 1
+        logger.error("Sesión %s: no se pudo escribir tras %s reintentos", session_id, SESSION_CAS_RETRIES)
+        raise SessionConflictError(session_id)
+
+    def _set_fields(self, session_id: str, /, **fields: Any):
+        """Asigna campos del contexto y guarda la sesión."""
+        self._update(session_id, lambda context: context.update(fields))
+
+    def _del_fields(self, session_id: str, /, *names: str):
+        """Elimina campos del contexto (si existen) y guarda la sesión."""
+        def remove(context: Dict[str, Any]):
+            for name in names:
+                context.pop(name, None)
+
+        self._update(session_id, remove)
+
+    def _get_field(self, session_id: str, name: str, default: Any = None) -> Any:
+        return copy.deepcopy(self._read(session_id).get(name, default))
+
+    def replace_context(self, session_id: str, context: Dict[str, Any], expiry_seconds: Optional[int] = None):
+        """Reemplaza el contexto completo de la sesión."""
+        context = copy.deepcopy(context)
+        unit = _CURRENT_UNIT.get()
+        if unit is None:
+            # Sin unidad activa no hay lectura previa contra la cual comparar
+            self._store(session_id, _SessionUnit(context=context, expiry=expiry_seconds, deleted=True))
+            return
+        session = self._unit_session(unit, session_id)
+        session.context = context
+        session.expiry = expiry_seconds
+        session.dirty = True
+
+    def get_stored_context(self, session_id: str) -> Dict[str, Any]:
+        """Contexto tal como está almacenado, sin valores por defecto."""
+        return copy.deepcopy(self._read(session_id))
 
     def clear_context(self, session_id: str):
         """Elimina todo el contexto almacenado para la sesión."""
-        self.redis_client.delete(f"session:{session_id}")
+        unit = _CURRENT_UNIT.get()
+        if unit is None:
+            self._count_op()
+            self.redis_client.delete(self._key(session_id), self._history_key(session_id))
+            return
+        unit.sessions[session_id] = _SessionUnit(context={}, deleted=True)
 
     def get_context(self, session_id: str) -> Dict[str, Any]:
         """Obtiene el contexto completo de la sesión."""
-        context_str = self.redis_client.get(f"session:{session_id}")
-        context = json.loads(context_str) if context_str else {}
-        if "agenda" not in context:
-            context["agenda"] = {"fecha": None, "hora": None}
-        return context
+        return self._with_defaults(copy.deepcopy(self._read(session_id)))
+
+    async def get_context_async(self, session_id: str) -> Dict[str, Any]:
+        """Variante de ``get_context`` que lee la sesión sin bloquear el loop."""
+        if _CURRENT_UNIT.get() is None:
+            return self._with_defaults((await self._fetch_async(session_id)).context)
+        await self.preload_async(session_id)
+        return self.get_context(session_id)
 
     def update_context(self, session_id: str, user_input: str, bot_response: str):
         """Actualiza el contexto de la conversación."""
-        context = self.get_context(session_id)
-        
-        # Actualizar historial
-        if "history" not in context:
-            context["history"] = []
-        context["history"].append({
-            "role": "user",
-            "content": user_input,
-            "timestamp": datetime.now().isoformat()
-        })
-        context["history"].append({
-            "role": "assistant",
-            "content": bot_response,
-            "timestamp": datetime.now().isoformat()
-        })
-
-        # Registrar última actividad
-        context["last_activity"] = datetime.now().isoformat()
-        
-        # Mantener solo los últimos 10 mensajes
-        context["history"] = context["history"][-10:]
-        
-        # Guardar contexto actualizado
-        self.redis_client.set(
-            f"session:{session_id}",
-            json.dumps(context),
-            ex=self.session_expiry_seconds
-        )
+        def append(context: Dict[str, Any]):
+            # Actualizar historial
+            history = context.setdefault("history", [])
+            history.append({
+                "role": "user",
+                "content": user_input,
+                "timestamp": datetime.now().isoformat()
+            })
+            history.append({
+                "role": "assistant",
+                "content": bot_response,
+                "timestamp": datetime.now().isoformat()
+            })
+
+            # Registrar última actividad
+            context["last_activity"] = datetime.now().isoformat()
+
+            # Mantener solo los últimos mensajes
+            context["history"] = history[-self.HISTORY_LIMIT:]
+
+        self._update(session_id, append)
 
     def update_complaint_state(self, session_id: str, state: str):
         """Actualiza el estado del reclamo en la sesión."""
-        context = self.get_context(session_id)
-        context["complaint_state"] = state
-        self.redis_client.set(
-            f"session:{session_id}",
-            json.dumps(context),
-            ex=self.session_expiry_seconds
-        )
+        self._set_fields(session_id, complaint_state=state)
 
     def clear_complaint_state(self, session_id: str):
         """Limpia el estado del reclamo en la sesión."""
-        context = self.get_context(session_id)
-        if "complaint_state" in context:
-            del context["complaint_state"]
-        self.redis_client.set(
-            f"session:{session_id}",
-            json.dumps(context),
-            ex=self.session_expiry_seconds
-        )
+        self._del_fields(session_id, "complaint_state")
 
     def get_complaint_state(self, session_id: str) -> Optional[str]:
         """Obtiene el estado actual del reclamo."""
-        context = self.get_context(session_id)
-        return context.get("complaint_state")
+        return self._get_field(session_id, "complaint_state")
 
     def update_pending_field(self, session_id: str, field: Optional[str]):
         """Actualiza el campo pendiente en la sesión."""
-        context = self.get_context(session_id)
         if field:
-            context["pending_field"] = field
-        elif "pending_field" in context:
-            del context["pending_field"]
-        self.redis_client.set(
-            f"session:{session_id}",
-            json.dumps(context),
-            ex=self.session_expiry_seconds
-        )
+            self._set_fields(session_id, pending_field=field)
+        else:
+            self._del_fields(session_id, "pending_field")
 
     def get_pending_field(self, session_id: str) -> Optional[str]:
         """Obtiene el campo pendiente actual."""
-        context = self.get_context(session_id)
-        return context.get("pending_field")
+        return self._get_field(session_id, "pending_field")
 
     def get_history(self, session_id: str) -> List[Dict[str, Any]]:
         """Obtiene el historial de la conversación."""
-        context = self.get_context(session_id)
-        return context.get("history", [])
+        return self._get_field(session_id, "history", [])
 
     def get_last_activity(self, session_id: str) -> Optional[str]:
         """Devuelve la marca de tiempo de la última actividad."""
-        context = self.get_context(session_id)
-        return context.get("last_activity")
+        return self._get_field(session_id, "last_activity")
 
     def get_history_as_string(self, history: List[Dict[str, str]]) -> str:
         """Convierte el historial en una cadena de texto."""
@@ -122,360 +576,176 @@ class ConversationalContextManager:
 
     def increment_fallback_count(self, session_id: str):
         """Incrementa el contador de fallbacks."""
-        context = self.get_context(session_id)
-        context["fallback_count"] = context.get("fallback_count", 0) + 1
-        self.redis_client.set(
-            f"session:{session_id}",
-            json.dumps(context),
-            ex=self.session_expiry_seconds
-        )
+        def increment(context: Dict[str, Any]):
+            context["fallback_count"] = context.get("fallback_count", 0) + 1
+
+        self._update(session_id, increment)
 
     def reset_fallback_count(self, session_id: str):
         """Reinicia el contador de fallbacks."""
-        context = self.get_context(session_id)
-        context["fallback_count"] = 0
-        self.redis_client.set(
-            f"session:{session_id}",
-            json.dumps(context),
-            ex=self.session_expiry_seconds
-        )
+        self._set_fields(session_id, fallback_count=0)
 
     def get_fallback_count(self, session_id: str) -> int:
         """Obtiene el contador de fallbacks."""
-        context = self.get_context(session_id)
-        return context.get("fallback_count", 0)
+        return self._get_field(session_id, "fallback_count", 0)
 
     def set_last_sentiment(self, session_id: str, sentiment: str):
         """Guarda el último sentimiento detectado."""
-        context = self.get_context(session_id)
-        context["last_sentiment"] = sentiment
-        self.redis_client.set(
-            f"session:{session_id}",
-            json.dumps(context),
-            ex=self.session_expiry_seconds
-        )
+        self._set_fields(session_id, last_sentiment=sentiment)
 
     def get_last_sentiment(self, session_id: str) -> str:
         """Obtiene el último sentimiento detectado."""
-        context = self.get_context(session_id)
-        return context.get("last_sentiment", "neutral")
+        return self._get_field(session_id, "last_sentiment", "neutral")
 
     def clear_pending_field(self, session_id: str):
         """Limpia el campo pendiente en la sesión."""
-        context = self.get_context(session_id)
-        if "pending_field" in context:
-            del context["pending_field"]
-        self.redis_client.set(
-            f"session:{session_id}",
-            json.dumps(context),
-            ex=self.session_expiry_seconds
-        )
+        self._del_fields(session_id, "pending_field")
 
     def set_faq_clarification(self, session_id: str, data: Dict[str, Any]):
         """Guarda datos de una aclaración de FAQ pendiente."""
-        context = self.get_context(session_id)
-        context["faq_pending"] = data
-        self.redis_client.set(
-            f"session:{session_id}",
-            json.dumps(context),
-            ex=self.session_expiry_seconds
-        )
+        self._set_fields(session_id, faq_pending=copy.deepcopy(data))
 
     def get_faq_clarification(self, session_id: str) -> Optional[Dict[str, Any]]:
         """Obtiene la aclaración de FAQ pendiente si existe."""
-        context = self.get_context(session_id)
-        return context.get("faq_pending")
+        return self._get_field(session_id, "faq_pending")
 
     def clear_faq_clarification(self, session_id: str):
         """Elimina cualquier aclaración de FAQ pendiente."""
-        context = self.get_context(session_id)
-        if "faq_pending" in context:
-            del context["faq_pending"]
-        self.redis_client.set(
-            f"session:{session_id}",
-            json.dumps(context),
-            ex=self.session_expiry_seconds
-        )
+        self._del_fields(session_id, "faq_pending")
 
     # ---- Manejo de selección de documentos ----
     def set_document_options(self, session_id: str, options: List[str]):
         """Guarda en contexto una lista de documentos para que el usuario elija."""
-        context = self.get_context(session_id)
-        context["doc_options"] = options
-        self.redis_client.set(
-            f"session:{session_id}",
-            json.dumps(context),
-            ex=self.session_expiry_seconds
-        )
+        self._set_fields(session_id, doc_options=list(options))
 
     def get_document_options(self, session_id: str) -> Optional[List[str]]:
         """Obtiene la lista de documentos pendientes de selección."""
-        context = self.get_context(session_id)
-        return context.get("doc_options")
+        return self._get_field(session_id, "doc_options")
 
     def clear_document_options(self, session_id: str):
         """Elimina las opciones de documentos almacenadas."""
-        context = self.get_context(session_id)
-        if "doc_options" in context:
-            del context["doc_options"]
-        self.redis_client.set(
-            f"session:{session_id}",
-            json.dumps(context),
-            ex=self.session_expiry_seconds
-        )
+        self._del_fields(session_id, "doc_options")
 
     # ---- Manejo de listas de documentos pendientes ----
     def set_pending_doc_list(self, session_id: str, opciones: List[str]):
         """Guarda una lista de documentos pendiente de selección."""
-        context = self.get_context(session_id)
-        context["pending_doc_list"] = opciones
-        self.redis_client.set(
-            f"session:{session_id}",
-            json.dumps(context),
-            ex=self.session_expiry_seconds,
-        )
+        self._set_fields(session_id, pending_doc_list=list(opciones))
 
     def get_pending_doc_list(self, session_id: str) -> Optional[List[str]]:
         """Obtiene la lista de documentos pendiente de selección."""
-        context = self.get_context(session_id)
-        return context.get("pending_doc_list")
+        return self._get_field(session_id, "pending_doc_list")
 
     def clear_pending_doc_list(self, session_id: str):
         """Elimina la lista de documentos pendiente."""
-        context = self.get_context(session_id)
-        if "pending_doc_list" in context:
-            del context["pending_doc_list"]
-        self.redis_client.set(
-            f"session:{session_id}",
-            json.dumps(context),
-            ex=self.session_expiry_seconds,
-        )
+        self._del_fields(session_id, "pending_doc_list")
 
     def set_pending_doc_type(self, session_id: str, tipo: str):
         """Guarda el tipo de documento asociado a la lista pendiente."""
-        context = self.get_context(session_id)
-        context["pending_doc_type"] = tipo
-        self.redis_client.set(
-            f"session:{session_id}",
-            json.dumps(context),
-            ex=self.session_expiry_seconds,
-        )
+        self._set_fields(session_id, pending_doc_type=tipo)
 
     def get_pending_doc_type(self, session_id: str) -> Optional[str]:
         """Obtiene el tipo de documento para la lista pendiente."""
-        context = self.get_context(session_id)
-        return context.get("pending_doc_type")
+        return self._get_field(session_id, "pending_doc_type")
 
     def clear_pending_doc_type(self, session_id: str):
         """Elimina el tipo de documento pendiente."""
-        context = self.get_context(session_id)
-        if "pending_doc_type" in context:
-            del context["pending_doc_type"]
-        self.redis_client.set(
-            f"session:{session_id}",
-            json.dumps(context),
-            ex=self.session_expiry_seconds,
-        )
+        self._del_fields(session_id, "pending_doc_type")
 
     # ---- Manejo de consultas de trámites pendientes ----
     def set_consultas_tramites_pending(self, session_id: str, value: bool = True):
-        context = self.get_context(session_id)
-        context["consultas_tramites_pending"] = value
-        self.redis_client.set(
-            f"session:{session_id}",
-            json.dumps(context),
-            ex=self.session_expiry_seconds
-        )
+        self._set_fields(session_id, consultas_tramites_pending=value)
 
     def get_consultas_tramites_pending(self, session_id: str) -> bool:
-        context = self.get_context(session_id)
-        return bool(context.get("consultas_tramites_pending"))
+        return bool(self._read(session_id).get("consultas_tramites_pending"))
 
     def clear_consultas_tramites_pending(self, session_id: str):
-        context = self.get_context(session_id)
-        if "consultas_tramites_pending" in context:
-            del context["consultas_tramites_pending"]
-        self.redis_client.set(
-            f"session:{session_id}",
-            json.dumps(context),
-            ex=self.session_expiry_seconds
-        )
+        self._del_fields(session_id, "consultas_tramites_pending")
 
     def clear_suggestion_state(self, session_id: str):
         """Limpia cualquier estado relacionado con sugerencias pendientes."""
-        context = self.get_context(session_id)
-        for key in ("faq_pending", "doc_clarify", "doc_options"):
-            context.pop(key, None)
-        self.redis_client.set(
-            f"session:{session_id}",
-            json.dumps(context),
-            ex=self.session_expiry_seconds,
-        )
+        self._del_fields(session_id, "faq_pending", "doc_clarify", "doc_options")
 
     def set_selected_document(self, session_id: str, name: str):
         """Guarda el documento seleccionado por el usuario."""
-        context = self.get_context(session_id)
-        context["selected_document"] = name
-        self.redis_client.set(
-            f"session:{session_id}",
-            json.dumps(context),
-            ex=self.session_expiry_seconds
-        )
+        self._set_fields(session_id, selected_document=name)
 
     def get_selected_document(self, session_id: str) -> Optional[str]:
         """Obtiene el documento previamente seleccionado."""
-        context = self.get_context(session_id)
-        return context.get("selected_document")
+        return self._get_field(session_id, "selected_document")
 
     def clear_selected_document(self, session_id: str):
         """Elimina cualquier documento seleccionado del contexto."""
-        context = self.get_context(session_id)
-        if "selected_document" in context:
-            del context["selected_document"]
-        self.redis_client.set(
-            f"session:{session_id}",
-            json.dumps(context),
-            ex=self.session_expiry_seconds
-        )
+        self._del_fields(session_id, "selected_document")
 
     # ---- Aclaración de documentos ----
     def set_doc_clarification(self, session_id: str, name: str, question: str):
         """Almacena un documento sugerido pendiente de confirmación."""
-        context = self.get_context(session_id)
-        context["doc_clarify"] = {"doc": name, "question": question}
-        self.redis_client.set(
-            f"session:{session_id}",
-            json.dumps(context),
-            ex=self.session_expiry_seconds,
-        )
+        self._set_fields(session_id, doc_clarify={"doc": name, "question": question})
 
     def get_doc_clarification(self, session_id: str) -> Optional[Dict[str, str]]:
         """Obtiene la aclaración de documento pendiente, si la hay."""
-        context = self.get_context(session_id)
-        return context.get("doc_clarify")
+        return self._get_field(session_id, "doc_clarify")
 
     def clear_doc_clarification(self, session_id: str):
         """Limpia la aclaración de documento pendiente."""
-        context = self.get_context(session_id)
-        if "doc_clarify" in context:
-            del context["doc_clarify"]
-        self.redis_client.set(
-            f"session:{session_id}",
-            json.dumps(context),
-            ex=self.session_expiry_seconds,
-        )
+        self._del_fields(session_id, "doc_clarify")
 
     # ---- Manejo de feedback de usuario ----
     def set_feedback_pending(self, session_id: str, pregunta_id: Optional[int]):
         """Marca una pregunta como pendiente de recibir feedback."""
-        context = self.get_context(session_id)
-        context["feedback_question"] = pregunta_id
-        self.redis_client.set(
-            f"session:{session_id}",
-            json.dumps(context),
-            ex=self.session_expiry_seconds
-        )
+        self._set_fields(session_id, feedback_question=pregunta_id)
 
     def get_feedback_pending(self, session_id: str) -> Optional[int]:
         """Obtiene el ID de la pregunta pendiente de feedback."""
-        context = self.get_context(session_id)
-        return context.get("feedback_question")
+        return self._get_field(session_id, "feedback_question")
 
     def has_feedback_pending(self, session_id: str) -> bool:
         """Indica si hay feedback pendiente para la sesión."""
-        context = self.get_context(session_id)
-        return "feedback_question" in context
+        return "feedback_question" in self._read(session_id)
 
     def clear_feedback_pending(self, session_id: str):
         """Limpia el indicador de feedback pendiente."""
-        context = self.get_context(session_id)
-        if "feedback_question" in context:
-            del context["feedback_question"]
-        self.redis_client.set(
-            f"session:{session_id}",
-            json.dumps(context),
-            ex=self.session_expiry_seconds
-        )
+        self._del_fields(session_id, "feedback_question")
 
     # ---- Manejo de confirmaciones y flujo activo ----
     def set_pending_confirmation(self, session_id: str, value: bool = True):
-        context = self.get_context(session_id)
-        context["pending_confirmation"] = value
-        self.redis_client.set(
-            f"session:{session_id}",
-            json.dumps(context),
-            ex=self.session_expiry_seconds,
-        )
+        self._set_fields(session_id, pending_confirmation=value)
 
     def get_pending_confirmation(self, session_id: str) -> bool:
-        context = self.get_context(session_id)
-        return bool(context.get("pending_confirmation"))
+        return bool(self._read(session_id).get("pending_confirmation"))
 
     def clear_pending_confirmation(self, session_id: str):
-        context = self.get_context(session_id)
-        if "pending_confirmation" in context:
-            del context["pending_confirmation"]
-        self.redis_client.set(
-            f"session:{session_id}",
-            json.dumps(context),
-            ex=self.session_expiry_seconds,
-        )
+        self._del_fields(session_id, "pending_confirmation")
 
     def set_current_flow(self, session_id: str, flow: Optional[str]):
-        context = self.get_context(session_id)
         if flow:
-            context["current_flow"] = flow
-        elif "current_flow" in context:
-            del context["current_flow"]
-        self.redis_client.set(
-            f"session:{session_id}",
-            json.dumps(context),
-            ex=self.session_expiry_seconds,
-        )
+            self._set_fields(session_id, current_flow=flow)
+        else:
+            self._del_fields(session_id, "current_flow")
 
     def get_current_flow(self, session_id: str) -> Optional[str]:
-        context = self.get_context(session_id)
-        return context.get("current_flow")
+        return self._get_field(session_id, "current_flow")
 
     # ---- Utilidades genéricas de contexto ----
     def update_context_data(self, session_id: str, data: Dict[str, Any]):
         """Actualiza el contexto agregando campos arbitrarios."""
-        context = self.get_context(session_id)
-        context.update(data)
-        self.redis_client.set(
-            f"session:{session_id}",
-            json.dumps(context),
-            ex=self.session_expiry_seconds,
-        )
+        self._set_fields(session_id, **copy.deepcopy(data))
 
     def clear_context_field(self, session_id: str, field: str):
         """Elimina un campo específico del contexto de la sesión."""
-        context = self.get_context(session_id)
-        if field in context:
-            del context[field]
-        self.redis_client.set(
-            f"session:{session_id}",
-            json.dumps(context),
-            ex=self.session_expiry_seconds,
-        )
+        self._del_fields(session_id, field)
 
     def get_context_field(self, session_id: str, field: str) -> Optional[Any]:
         """Obtiene un campo arbitrario del contexto."""
-        context = self.get_context(session_id)
-        return context.get(field)
+        return self._get_field(session_id, field)
 
     def get_attempts(self, session_id: str, flow: str) -> int:
-        context = self.get_context(session_id)
-        attempts = context.get("attempts", {})
-        return attempts.get(flow, 0)
+        return self._read(session_id).get("attempts", {}).get(flow, 0)
 
     def inc_attempts(self, session_id: str, flow: str):
-        context = self.get_context(session_id)
-        attempts = context.get("attempts", {})
-        attempts[flow] = attempts.get(flow, 0) + 1
-        context["attempts"] = attempts
-        self.redis_client.set(
-            f"session:{session_id}",
-            json.dumps(context),
-            ex=self.session_expiry_seconds,
-        )
+        def increment(context: Dict[str, Any]):
+            attempts = context.get("attempts", {})
+            attempts[flow] = attempts.get(flow, 0) + 1
+            context["attempts"] = attempts
+
+        self._update(session_id, increment)
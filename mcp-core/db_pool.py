@@ -0,0 +1,337 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, AsyncIterator, Callable, Deque, Dict, Iterator, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Conexiones simultáneas máximas a PostgreSQL por proceso
+DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", "10"))
+# Segundos que una petición espera una conexión libre antes de fallar
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "5"))
+# Segundos de inactividad tras los cuales se verifica la conexión con SELECT 1
+DB_POOL_CHECK_AFTER = float(os.getenv("DB_POOL_CHECK_AFTER", "30"))
+
+
+# Estados de ``connection.poll()`` (mismos valores que ``psycopg2.extensions.POLL_*``)
+POLL_OK, POLL_READ, POLL_WRITE = 0, 1, 2
+
+
+class PoolTimeout(Exception):
+    """No se liberó ninguna conexión dentro del tiempo de espera."""
+
+
+class _PoolStats:
+    """Contadores y cierre comunes a los pools síncrono y asíncrono."""
+
+    def __init__(self, max_size: int, timeout: float, check_after: float):
+        self.max_size = max(1, max_size)
+        self.timeout = timeout
+        self.check_after = check_after
+        self._idle: Deque[Tuple[Any, float]] = deque()
+        self._lock = threading.Lock()
+        self._in_use = 0
+        self._stats: Dict[str, float] = {
+            "acquired": 0, "created": 0, "discarded": 0, "timeouts": 0,
+            "wait_seconds": 0.0, "max_wait_seconds": 0.0, "held_seconds": 0.0,
+        }
+
+    def _count(self, name: str, amount: float = 1):
+        with self._lock:
+            self._stats[name] += amount
+
+    def _acquired(self, waited: float):
+        with self._lock:
+            self._in_use += 1
+            self._stats["acquired"] += 1
+            self._stats["wait_seconds"] += waited
+            self._stats["max_wait_seconds"] = max(self._stats["max_wait_seconds"], waited)
+
+    def _released(self, start: float):
+        with self._lock:
+            self._in_use -= 1
+            self._stats["held_seconds"] += time.perf_counter() - start
+
+    @staticmethod
+    def _is_closed(conn: Any) -> bool:
+        return bool(getattr(conn, "closed", False))
+
+    def _discard(self, conn: Any):
+        self._count("discarded")
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _timeout_error(self) -> PoolTimeout:
+        self._count("timeouts")
+        return PoolTimeout(f"sin conexiones libres tras {self.timeout}s ({self.max_size} en uso)")
+
+    def close(self):
+        """Cierra las conexiones inactivas (p. ej. al apagar el servicio)."""
+        with self._lock:
+            idle = [conn for conn, _ in self._idle]
+            self._idle.clear()
+        for conn in idle:
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            acquired = self._stats["acquired"]
+            return {
+                "max_size": self.max_size,
+                "in_use": self._in_use,
+                "idle": len(self._idle),
+                "utilization": self._in_use / self.max_size,
+                "avg_wait_ms": (self._stats["wait_seconds"] / acquired * 1000) if acquired else 0.0,
+                "max_wait_ms": self._stats["max_wait_seconds"] * 1000,
+                **{k: v for k, v in self._stats.items() if not k.endswith("wait_seconds")},
+            }
+
+
+class ConnectionPool(_PoolStats):
+    """Pool de conexiones compartido entre hilos.
+
+    ``connect`` abre una conexión nueva (p. ej. ``psycopg2.connect``); las
+    conexiones se crean a demanda hasta ``max_size`` y se reutilizan. Una
+    conexión que estuvo inactiva más de ``check_after`` segundos se verifica
+    antes de entregarla y se reemplaza si el servidor la cerró. Al devolverla
+    se hace ``rollback`` de lo no confirmado, también cuando el bloque lanzó
+    una excepción, por lo que ninguna conexión queda abierta ni en medio de
+    una transacción.
+    """
+
+    def __init__(
+        self,
+        connect: Callable[[], Any],
+        max_size: int = DB_POOL_MAX_SIZE,
+        timeout: float = DB_POOL_TIMEOUT,
+        check_after: float = DB_POOL_CHECK_AFTER,
+    ):
+        super().__init__(max_size, timeout, check_after)
+        self._connect = connect
+        self._slots = threading.BoundedSemaphore(self.max_size)
+
+    def _healthy(self, conn: Any) -> bool:
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except Exception as e:
+            logger.info("Conexión inactiva descartada: %s", e)
+            return False
+
+    def _checkout(self) -> Any:
+        while True:
+            with self._lock:
+                conn, last_used = self._idle.pop() if self._idle else (None, 0.0)
+            if conn is None:
+                conn = self._connect()
+                self._count("created")
+                return conn
+            if self._is_closed(conn):
+                self._discard(conn)
+                continue
+            if time.monotonic() - last_used > self.check_after and not self._healthy(conn):
+                self._discard(conn)
+                continue
+            return conn
+
+    def _checkin(self, conn: Any):
+        if not self._is_closed(conn):
+            try:
+                conn.rollback()
+            except Exception:
+                self._discard(conn)
+                return
+            with self._lock:
+                self._idle.append((conn, time.monotonic()))
+        else:
+            self._count("discarded")
+
+    @contextmanager
+    def connection(self) -> Iterator[Any]:
+        """Entrega una conexión del pool y la devuelve al salir del bloque.
+
+        Lanza ``PoolTimeout`` si todas las conexiones siguen ocupadas tras
+        ``timeout`` segundos. Los cambios deben confirmarse con ``commit``
+        dentro del bloque.
+        """
+        start = time.perf_counter()
+        if not self._slots.acquire(timeout=self.timeout):
+            raise self._timeout_error()
+        waited = time.perf_counter() - start
+        try:
+            conn = self._checkout()
+        except Exception:
+            self._slots.release()
+            raise
+        self._acquired(waited)
+        try:
+            yield conn
+        finally:
+            self._released(start)
+            self._checkin(conn)
+            self._slots.release()
+
+
+def _set_ready(ready: "asyncio.Future"):
+    if not ready.done():
+        ready.set_result(None)
+
+
+class AsyncConnection:
+    """Conexión asíncrona de psycopg2 entregada por ``AsyncConnectionPool``.
+
+    ``execute`` envía la consulta y espera el socket en el event loop; el
+    cursor devuelto ya tiene las filas (``fetchone``/``fetchall`` no hacen
+    I/O). Si la espera se interrumpe la conexión queda marcada y el pool la
+    descarta al devolverla.
+    """
+
+    def __init__(self, raw: Any, observe: Optional[Callable[[float], None]] = None):
+        self.raw = raw
+        self.broken = False
+        self._observe = observe
+
+    async def wait(self):
+        """Avanza ``poll()`` hasta ``POLL_OK`` sin bloquear el hilo."""
+        loop = asyncio.get_running_loop()
+        while True:
+            state = self.raw.poll()
+            if state == POLL_OK:
+                return
+            if state == POLL_READ:
+                add, remove = loop.add_reader, loop.remove_reader
+            elif state == POLL_WRITE:
+                add, remove = loop.add_writer, loop.remove_writer
+            else:
+                raise RuntimeError(f"Estado de poll inesperado: {state}")
+            fd = self.raw.fileno()
+            ready = loop.create_future()
+            add(fd, _set_ready, ready)
+            try:
+                await ready
+            except BaseException:
+                self.broken = True
+                raise
+            finally:
+                remove(fd)
+
+    async def execute(self, sql: str, params: Any = None, cursor_factory: Any = None) -> Any:
+        cur = self.raw.cursor(cursor_factory=cursor_factory) if cursor_factory else self.raw.cursor()
+        start = time.perf_counter()
+        try:
+            cur.execute(sql, params)
+            await self.wait()
+        finally:
+            if self._observe is not None:
+                self._observe(time.perf_counter() - start)
+        return cur
+
+
+class AsyncConnectionPool(_PoolStats):
+    """Pool de conexiones para corrutinas, sin hilos bloqueados en PostgreSQL.
+
+    ``connect`` abre una conexión en modo asíncrono sin esperar el handshake
+    (p. ej. ``psycopg2.connect(..., async_=1)``); el pool lo completa y cada
+    consulta espera el socket con ``add_reader``/``add_writer`` del event
+    loop. Las conexiones asíncronas de psycopg2 trabajan en autocommit, así
+    que este pool es para lecturas; las escrituras siguen en
+    ``ConnectionPool``. Límite, espera máxima, verificación de inactivas y
+    estadísticas iguales a las de ``ConnectionPool``; ``observe(segundos)``
+    recibe la duración de cada consulta. Se usa desde un único event loop.
+    """
+
+    def __init__(
+        self,
+        connect: Callable[[], Any],
+        max_size: int = DB_POOL_MAX_SIZE,
+        timeout: float = DB_POOL_TIMEOUT,
+        check_after: float = DB_POOL_CHECK_AFTER,
+        observe: Optional[Callable[[float], None]] = None,
+    ):
+        super().__init__(max_size, timeout, check_after)
+        self._connect = connect
+        self._observe = observe
+        self._slots = asyncio.Semaphore(self.max_size)
+
+    async def _healthy(self, conn: AsyncConnection) -> bool:
+        try:
+            await conn.execute("SELECT 1")
+            return True
+        except Exception as e:
+            logger.info("Conexión inactiva descartada: %s", e)
+            return False
+
+    async def _checkout(self) -> AsyncConnection:
+        while True:
+            with self._lock:
+                conn, last_used = self._idle.pop() if self._idle else (None, 0.0)
+            if conn is None:
+                conn = AsyncConnection(self._connect(), self._observe)
+                try:
+                    await conn.wait()
+                except BaseException:
+                    self._discard(conn.raw)
+                    raise
+                self._count("created")
+                return conn
+            if self._is_closed(conn.raw):
+                self._discard(conn.raw)
+                continue
+            if time.monotonic() - last_used > self.check_after and not await self._healthy(conn):
+                self._discard(conn.raw)
+                continue
+            return conn
+
+    def _checkin(self, conn: AsyncConnection):
+        if conn.broken or self._is_closed(conn.raw):
+            self._discard(conn.raw)
+            return
+        with self._lock:
+            self._idle.append((conn, time.monotonic()))
+
+    @asynccontextmanager
+    async def connection(self) -> AsyncIterator[AsyncConnection]:
+        """Entrega una conexión del pool y la devuelve al salir del bloque.
+
+        Lanza ``PoolTimeout`` si todas siguen ocupadas tras ``timeout`` segundos.
+        """
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(self._slots.acquire(), self.timeout)
+        except asyncio.TimeoutError:
+            raise self._timeout_error() from None
+        waited = time.perf_counter() - start
+        try:
+            conn = await self._checkout()
+        except BaseException:
+            self._slots.release()
+            raise
+        self._acquired(waited)
+        try:
+            yield conn
+        finally:
+            self._released(start)
+            self._checkin(conn)
+            self._slots.release()
+
+    def close(self):
+        """Cierra las conexiones inactivas (p. ej. al apagar el servicio)."""
+        with self._lock:
+            idle = [conn.raw for conn, _ in self._idle]
+            self._idle.clear()
+        for raw in idle:
+            try:
+                raw.close()
+            except Exception:
+                pass
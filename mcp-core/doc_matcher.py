@@ -0,0 +1,142 @@
+from collections import deque
+from typing import Any, Callable, Dict, Iterable, List, Mapping, Optional, Tuple
+
+import numpy as np
+from rapidfuzz import fuzz, process
+
+
+class AhoCorasick:
+    """Autómata Aho–Corasick para buscar muchos patrones en una sola pasada."""
+
+    def __init__(self, patterns: Iterable[str]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        # Índices de los patrones que terminan en cada estado (incluye los de su cadena de fallos)
+        self._out: List[List[int]] = [[]]
+        self._empty: List[int] = []
+        for index, pattern in enumerate(patterns):
+            if not pattern:
+                self._empty.append(index)
+                continue
+            state = 0
+            for char in pattern:
+                nxt = self._goto[state].get(char)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[state][char] = nxt
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append([])
+                state = nxt
+            self._out[state].append(index)
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[nxt] = self._goto[fail].get(char, 0)
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def matches(self, text: str) -> set:
+        """Índices de todos los patrones que aparecen en ``text``."""
+        found = set(self._empty)
+        state = 0
+        goto, fail, out = self._goto, self._fail, self._out
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if out[state]:
+                found.update(out[state])
+        return found
+
+    def first(self, text: str) -> Optional[int]:
+        """Menor índice de patrón que aparece en ``text``."""
+        found = self.matches(text)
+        return min(found) if found else None
+
+
+class DocumentMatcher:
+    """Índice precompilado de documentos para ``responder_sobre_documento``.
+
+    Se construye una vez por versión de la base de conocimiento: autómatas
+    Aho–Corasick sobre los nombres de documento (en minúsculas) y los alias
+    normalizados, nombres normalizados para la búsqueda difusa con
+    ``process.cdist`` y las palabras clave de cada campo ya normalizadas.
+    Cada método toma la misma decisión que el recorrido lineal anterior,
+    incluido el orden de desempate (el primero en el archivo o en el mapa).
+    """
+
+    FIELD_CUTOFF = 85
+
+    def __init__(
+        self,
+        documentos: List[Dict[str, Any]],
+        alias_map: Mapping[str, str],
+        keyword_fields: Mapping[str, Iterable[str]],
+        normalize: Callable[[str], str],
+    ):
+        self.documentos = documentos
+        self._normalize = normalize
+        self._names = AhoCorasick(doc["Nombre_Documento"].lower() for doc in documentos)
+        self._alias_targets = list(alias_map.values())
+        self._aliases = AhoCorasick(alias_map.keys())
+        self._names_norm = [normalize(doc["Nombre_Documento"]) for doc in documentos]
+        self.fields = list(keyword_fields)
+        keywords: List[str] = []
+        self._keyword_field: List[int] = []
+        self._field_keywords: List[List[str]] = []
+        for field_id, kws in enumerate(keyword_fields.values()):
+            normalized = [normalize(kw) for kw in kws]
+            self._field_keywords.append(normalized)
+            keywords.extend(normalized)
+            self._keyword_field.extend([field_id] * len(normalized))
+        self._keywords = AhoCorasick(keywords)
+
+    def by_name(self, pregunta: str) -> Optional[Dict[str, Any]]:
+        """Primer documento cuyo nombre aparece literalmente en la pregunta."""
+        index = self._names.first(pregunta.lower())
+        return None if index is None else self.documentos[index]
+
+    def by_alias(self, pregunta_norm: str) -> Optional[str]:
+        """Nombre real del primer alias contenido en la pregunta normalizada."""
+        index = self._aliases.first(pregunta_norm)
+        return None if index is None else self._alias_targets[index]
+
+    def fuzzy(self, pregunta: str, score_cutoff: float = 0) -> Tuple[Optional[Dict[str, Any]], float]:
+        """Documento con mayor ``max(partial_ratio, token_set_ratio)`` y su puntaje.
+
+        Con ``score_cutoff`` los documentos bajo el umbral no se puntúan; si
+        ninguno lo alcanza devuelve ``(None, 0)``.
+        """
+        if not self.documentos:
+            return None, 0
+        pregunta_norm = self._normalize(pregunta)
+        scores = np.maximum(
+            *(
+                process.cdist(
+                    [pregunta_norm], self._names_norm, scorer=scorer, processor=None,
+                    score_cutoff=score_cutoff, dtype=np.float64,
+                )[0]
+                for scorer in (fuzz.partial_ratio, fuzz.token_set_ratio)
+            )
+        )
+        best = int(np.argmax(scores))
+        if scores[best] <= 0:
+            return None, 0
+        return self.documentos[best], float(scores[best])
+
+    def requested_fields(self, pregunta_norm: str) -> List[str]:
+        """Campos cuyas palabras clave aparecen (o casi) en la pregunta normalizada."""
+        exact = {self._keyword_field[i] for i in self._keywords.matches(pregunta_norm)}
+        campos = []
+        for field_id, campo in enumerate(self.fields):
+            if field_id in exact or process.extractOne(
+                pregunta_norm, self._field_keywords[field_id], scorer=fuzz.partial_ratio,
+                processor=None, score_cutoff=self.FIELD_CUTOFF,
+            ):
+                campos.append(campo)
+        return campos
@@ -0,0 +1,235 @@
+import json
+import logging
+import os
+from contextlib import AbstractAsyncContextManager, AbstractContextManager
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+import redis
+import redis.asyncio
+from psycopg2.extras import RealDictCursor
+
+logger = logging.getLogger(__name__)
+
+# Vigencia en Redis de las fichas de documento
+DOC_CARD_TTL = int(os.getenv("DOC_CARD_TTL", "3600"))
+
+# Subconsulta (json_agg) de cada tabla relacionada con ``documentos``
+SECTIONS: Dict[str, str] = {
+    "requisitos": "SELECT json_agg(t.requisito) FROM documento_requisitos t WHERE t.documento_id = d.id",
+    "oficinas": (
+        "SELECT json_agg(json_build_object('nombre', t.nombre, 'direccion', t.direccion, "
+        "'horario', t.horario, 'correo', t.correo, 'holocom', t.holocom)) "
+        "FROM documento_oficinas t WHERE t.documento_id = d.id"
+    ),
+    "duracion": "SELECT json_agg(t.duracion) FROM documento_duracion t WHERE t.documento_id = d.id",
+    "sanciones": "SELECT json_agg(t.sancion) FROM documento_sanciones t WHERE t.documento_id = d.id",
+    "notas": "SELECT json_agg(t.nota) FROM documento_notas t WHERE t.documento_id = d.id",
+}
+
+
+class DocumentCards:
+    """Ficha de un documento con las tablas relacionadas pedidas, en una consulta.
+
+    Cada sección (``requisitos``, ``oficinas``, ``duracion``, ``sanciones``,
+    ``notas``) es una subconsulta ``json_agg`` sobre el mismo documento, de
+    modo que la fila de ``documentos`` y cualquier subconjunto de secciones
+    llegan en un solo viaje a PostgreSQL. Las fichas se guardan en el hash
+    Redis ``doccard:{id_documento}`` (un campo por sección) y se completan a
+    demanda con las secciones que falten. La vigencia se fija al crear el
+    hash y completar secciones no la renueva, así ninguna sección vive más de
+    ``ttl`` segundos. Las búsquedas por nombre (``por_nombre=True``) guardan
+    un alias ``doccard:alias:{clave}``, también cuando la clave ya es el id,
+    que además se anota en el conjunto ``doccard:{id_documento}:aliases``;
+    sin alias la búsqueda es un fallo de caché sin más consultas a Redis.
+    Los endpoints de administración invalidan al escribir la ficha y solo
+    los alias de ese documento. Si Redis falla se consulta directo a la base.
+    ``get_async`` hace lo mismo con el cliente Redis asíncrono
+    (``async_redis_getter``) y el pool asíncrono (``async_connection``).
+    """
+
+    PREFIX = "doccard"
+
+    def __init__(
+        self,
+        connection: Callable[[], AbstractContextManager],
+        redis_getter: Callable[[], redis.Redis],
+        ttl: int = DOC_CARD_TTL,
+        async_connection: Optional[Callable[[], AbstractAsyncContextManager]] = None,
+        async_redis_getter: Optional[Callable[[], redis.asyncio.Redis]] = None,
+    ):
+        self._connection = connection
+        self._redis_getter = redis_getter
+        self._async_connection = async_connection
+        self._async_redis_getter = async_redis_getter
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+    def _key(self, id_documento: str) -> str:
+        return f"{self.PREFIX}:{id_documento}"
+
+    def _alias_key(self, clave: str) -> str:
+        return f"{self.PREFIX}:alias:{clave.lower()}"
+
+    def _aliases_key(self, id_documento: str) -> str:
+        return f"{self.PREFIX}:{id_documento}:aliases"
+
+    @staticmethod
+    def _sections(secciones: Optional[Iterable[str]]) -> List[str]:
+        if secciones is None:
+            return list(SECTIONS)
+        unknown = set(secciones) - set(SECTIONS)
+        if unknown:
+            raise ValueError(f"Secciones de documento desconocidas: {sorted(unknown)}")
+        return list(dict.fromkeys(secciones))
+
+    @staticmethod
+    def _select(clave: str, secciones: List[str], por_nombre: bool):
+        columns = "".join(f", COALESCE(({SECTIONS[s]}), '[]'::json) AS {s}" for s in secciones)
+        if por_nombre:
+            where, params = "d.id_documento = %s OR LOWER(d.nombre) LIKE %s", (clave, f"%{clave.lower()}%")
+        else:
+            where, params = "d.id_documento = %s", (clave,)
+        return f"SELECT to_json(d) AS documento{columns} FROM documentos d WHERE {where} LIMIT 1", params
+
+    def _query(self, clave: str, secciones: List[str], por_nombre: bool) -> Optional[Dict[str, Any]]:
+        sql, params = self._select(clave, secciones, por_nombre)
+        with self._connection() as conn:
+            with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                cur.execute(sql, params)
+                return cur.fetchone()
+
+    async def _query_async(self, clave: str, secciones: List[str], por_nombre: bool) -> Optional[Dict[str, Any]]:
+        sql, params = self._select(clave, secciones, por_nombre)
+        async with self._async_connection() as conn:
+            cur = await conn.execute(sql, params, cursor_factory=RealDictCursor)
+            return cur.fetchone()
+
+    # ---- Caché ----
+    def _cached(self, clave: str, secciones: List[str], por_nombre: bool) -> Optional[Dict[str, Any]]:
+        fields = ["documento", *secciones]
+        try:
+            client = self._redis_getter()
+            id_documento = clave
+            if por_nombre:
+                alias = client.get(self._alias_key(clave))
+                if not alias:
+                    return None
+                id_documento = alias.decode("utf-8") if isinstance(alias, bytes) else alias
+            values = client.hmget(self._key(id_documento), fields)
+        except redis.RedisError as e:
+            logger.warning("Caché de documentos no disponible: %s", e)
+            return None
+        return self._decode(fields, values)
+
+    async def _cached_async(self, clave: str, secciones: List[str], por_nombre: bool) -> Optional[Dict[str, Any]]:
+        fields = ["documento", *secciones]
+        try:
+            client = self._async_redis_getter()
+            id_documento = clave
+            if por_nombre:
+                alias = await client.get(self._alias_key(clave))
+                if not alias:
+                    return None
+                id_documento = alias.decode("utf-8") if isinstance(alias, bytes) else alias
+            values = await client.hmget(self._key(id_documento), fields)
+        except redis.RedisError as e:
+            logger.warning("Caché de documentos no disponible: %s", e)
+            return None
+        return self._decode(fields, values)
+
+    @staticmethod
+    def _decode(fields: List[str], values: List[Any]) -> Optional[Dict[str, Any]]:
+        if any(v is None for v in values):
+            return None
+        return {k: json.loads(v) for k, v in zip(fields, values)}
+
+    def _queue_store(self, pipe, clave: Optional[str], id_documento: str, row: Dict[str, Any]):
+        key = self._key(id_documento)
+        pipe.hset(key, mapping={k: json.dumps(v, ensure_ascii=False, default=str) for k, v in row.items()})
+        # Solo al crear el hash: completar secciones no alarga la vida de las anteriores
+        pipe.expire(key, self.ttl, nx=True)
+        if clave:
+            alias_key = self._alias_key(clave)
+            aliases_key = self._aliases_key(id_documento)
+            pipe.set(alias_key, id_documento, ex=self.ttl)
+            pipe.sadd(aliases_key, alias_key)
+            pipe.expire(aliases_key, self.ttl)
+
+    def _store(self, clave: Optional[str], row: Dict[str, Any]):
+        id_documento = row["documento"].get("id_documento")
+        if not id_documento:
+            return
+        try:
+            pipe = self._redis_getter().pipeline()
+            self._queue_store(pipe, clave, id_documento, row)
+            pipe.execute()
+        except redis.RedisError as e:
+            logger.warning("No se pudo guardar la ficha %s: %s", id_documento, e)
+
+    async def _store_async(self, clave: Optional[str], row: Dict[str, Any]):
+        id_documento = row["documento"].get("id_documento")
+        if not id_documento:
+            return
+        try:
+            pipe = self._async_redis_getter().pipeline()
+            self._queue_store(pipe, clave, id_documento, row)
+            await pipe.execute()
+        except redis.RedisError as e:
+            logger.warning("No se pudo guardar la ficha %s: %s", id_documento, e)
+
+    def invalidate(self, id_documento: str):
+        """Olvida la ficha de ``id_documento`` y los alias que apuntan a ella."""
+        try:
+            client = self._redis_getter()
+            aliases_key = self._aliases_key(id_documento)
+            aliases = client.smembers(aliases_key)
+            client.delete(self._key(id_documento), aliases_key, *aliases)
+        except redis.RedisError as e:
+            logger.warning("No se pudo invalidar la ficha %s: %s", id_documento, e)
+
+    # ---- Consultas ----
+    @staticmethod
+    def _card(row: Dict[str, Any], secciones: List[str]) -> Dict[str, Any]:
+        card = dict(row["documento"])
+        card.update({s: row[s] or [] for s in secciones})
+        return card
+
+    def get(
+        self, clave: str, secciones: Optional[Iterable[str]] = None, por_nombre: bool = True
+    ) -> Optional[Dict[str, Any]]:
+        """Ficha del documento con ``id_documento == clave`` (o nombre parecido).
+
+        ``secciones`` limita las tablas relacionadas incluidas (todas si es
+        ``None``). Devuelve ``None`` si el documento no existe.
+        """
+        secciones = self._sections(secciones)
+        cached = self._cached(clave, secciones, por_nombre)
+        if cached is not None:
+            self.hits += 1
+            return self._card(cached, secciones)
+        self.misses += 1
+        row = self._query(clave, secciones, por_nombre)
+        if not row:
+            return None
+        self._store(clave if por_nombre else None, row)
+        return self._card(row, secciones)
+
+    async def get_async(
+        self, clave: str, secciones: Optional[Iterable[str]] = None, por_nombre: bool = True
+    ) -> Optional[Dict[str, Any]]:
+        """Variante de ``get`` para corrutinas."""
+        secciones = self._sections(secciones)
+        cached = await self._cached_async(clave, secciones, por_nombre)
+        if cached is not None:
+            self.hits += 1
+            return self._card(cached, secciones)
+        self.misses += 1
+        row = await self._query_async(clave, secciones, por_nombre)
+        if not row:
+            return None
+        await self._store_async(clave if por_nombre else None, row)
+        return self._card(row, secciones)
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses}
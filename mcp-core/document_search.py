@@ -0,0 +1,79 @@
+import logging
+from contextlib import AbstractAsyncContextManager, AbstractContextManager
+from typing import Any, Callable, Dict, List, Optional
+
+import psycopg2
+from psycopg2.extras import RealDictCursor
+
+logger = logging.getLogger(__name__)
+
+
+class DocumentSearch:
+    """Búsqueda rankeada de documentos para preguntas libres.
+
+    Usa la función SQL ``buscar_documentos`` (``databases/init-documentos-busqueda.sql``):
+    texto completo en español sin acentos más similitud por trigramas del
+    nombre, ambos con índices GIN. Si la migración todavía no se aplicó
+    (la función no existe o no puede consultar la tabla) recurre una vez por
+    proceso al ``LIKE`` anterior, que solo encuentra la pregunta completa
+    como substring. ``search_async`` hace lo mismo sobre el pool asíncrono
+    (``async_connection``) para no ocupar un hilo durante la consulta.
+    """
+
+    RANKED_SQL = "SELECT id_documento, nombre, descripcion, score FROM buscar_documentos(%s, %s)"
+    LIKE_SQL = (
+        "SELECT id_documento, nombre, descripcion, 1.0 AS score FROM documentos "
+        "WHERE LOWER(nombre) LIKE %s OR LOWER(descripcion) LIKE %s LIMIT %s"
+    )
+
+    def __init__(
+        self,
+        connection: Callable[[], AbstractContextManager],
+        async_connection: Optional[Callable[[], AbstractAsyncContextManager]] = None,
+    ):
+        self._connection = connection
+        self._async_connection = async_connection
+        self.ranked = True
+
+    def _fetch(self, sql: str, params: tuple) -> List[Dict[str, Any]]:
+        with self._connection() as conn:
+            with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                cur.execute(sql, params)
+                return [dict(row) for row in cur.fetchall()]
+
+    async def _fetch_async(self, sql: str, params: tuple) -> List[Dict[str, Any]]:
+        async with self._async_connection() as conn:
+            cur = await conn.execute(sql, params, cursor_factory=RealDictCursor)
+            return [dict(row) for row in cur.fetchall()]
+
+    def _use_like(self, error: Exception):
+        logger.warning(
+            "Función buscar_documentos no disponible (%s); aplica "
+            "databases/init-documentos-busqueda.sql. Se usa LIKE.",
+            type(error).__name__,
+        )
+        self.ranked = False
+
+    def search(self, consulta: str, limit: int = 3) -> List[Dict[str, Any]]:
+        """Hasta ``limit`` documentos de mayor a menor ``score``."""
+        if limit <= 0 or not consulta.strip():
+            return []
+        if self.ranked:
+            try:
+                return self._fetch(self.RANKED_SQL, (consulta, limit))
+            except psycopg2.ProgrammingError as e:
+                self._use_like(e)
+        like = f"%{consulta.lower()}%"
+        return self._fetch(self.LIKE_SQL, (like, like, limit))
+
+    async def search_async(self, consulta: str, limit: int = 3) -> List[Dict[str, Any]]:
+        """Variante de ``search`` para corrutinas."""
+        if limit <= 0 or not consulta.strip():
+            return []
+        if self.ranked:
+            try:
+                return await self._fetch_async(self.RANKED_SQL, (consulta, limit))
+            except psycopg2.ProgrammingError as e:
+                self._use_like(e)
+        like = f"%{consulta.lower()}%"
+        return await self._fetch_async(self.LIKE_SQL, (like, like, limit))
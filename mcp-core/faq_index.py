@@ -0,0 +1,113 @@
+from collections import defaultdict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+from rapidfuzz import fuzz, process
+
+
+class FAQIndex:
+    """Índice precompilado de la base de FAQ.
+
+    Normaliza y tokeniza cada pregunta alternativa una sola vez al construirse
+    y ofrece las tres etapas de búsqueda de ``lookup_faq_respuesta``:
+    coincidencia exacta, fuzzy (``fuzz.ratio``) y por palabras clave. Cada
+    etapa devuelve los mismos resultados, en el mismo orden, que el recorrido
+    lineal de las entradas y sus alternativas.
+    """
+
+    def __init__(
+        self,
+        faqs: List[Dict[str, Any]],
+        normalize: Callable[[str], str],
+        tokenize: Callable[[str], List[str]],
+    ):
+        self.faqs = faqs
+        self._tokenize = tokenize
+        # Una posición por pregunta alternativa, en orden de aparición
+        self.entry_ids: List[int] = []
+        self.alternatives: List[str] = []
+        self.choices: List[str] = []
+        self.token_sets: List[frozenset] = []
+        self._exact: Dict[str, int] = {}
+        self._postings: Dict[str, List[int]] = defaultdict(list)
+        for entry_id, entry in enumerate(faqs):
+            preguntas = entry["pregunta"]
+            if not isinstance(preguntas, list):
+                preguntas = [preguntas]
+            for alt in preguntas:
+                pos = len(self.choices)
+                alt_norm = normalize(alt)
+                tokens = frozenset(tokenize(alt_norm))
+                self.entry_ids.append(entry_id)
+                self.alternatives.append(alt)
+                self.choices.append(alt_norm)
+                self.token_sets.append(tokens)
+                self._exact.setdefault(alt_norm, pos)
+                for token in tokens:
+                    self._postings[token].append(pos)
+
+    def __len__(self) -> int:
+        return len(self.choices)
+
+    def _hit(self, pos: int) -> Tuple[Dict[str, Any], str]:
+        return self.faqs[self.entry_ids[pos]], self.alternatives[pos]
+
+    def exact(self, pregunta_norm: str) -> Optional[Tuple[Dict[str, Any], str]]:
+        """Primera alternativa cuya forma normalizada coincide con la pregunta."""
+        pos = self._exact.get(pregunta_norm)
+        return None if pos is None else self._hit(pos)
+
+    def fuzzy(self, pregunta_norm: str, score_cutoff: float) -> List[Tuple[Dict[str, Any], str, float]]:
+        """Alternativas con ``fuzz.ratio >= score_cutoff``, de mayor a menor puntaje.
+
+        Los empates conservan el orden del archivo de FAQ.
+        """
+        return self.fuzzy_batch([pregunta_norm], score_cutoff, workers=1)[0]
+
+    def fuzzy_batch(
+        self, preguntas_norm: List[str], score_cutoff: float, workers: int = -1
+    ) -> List[List[Tuple[Dict[str, Any], str, float]]]:
+        """``fuzzy`` para varias preguntas con una sola matriz ``process.cdist``.
+
+        ``workers=-1`` reparte las filas entre todos los núcleos disponibles.
+        """
+        if not preguntas_norm or not self.choices:
+            return [[] for _ in preguntas_norm]
+        matrix = process.cdist(
+            preguntas_norm,
+            self.choices,
+            scorer=fuzz.ratio,
+            processor=None,
+            score_cutoff=score_cutoff,
+            dtype=np.float64,
+            workers=workers,
+        )
+        results = []
+        for row in matrix:
+            positions = np.flatnonzero(row >= score_cutoff)
+            # Mayor puntaje primero; en empate, la posición en el archivo
+            order = positions[np.lexsort((positions, -row[positions]))]
+            results.append([(*self._hit(int(pos)), float(row[pos])) for pos in order])
+        return results
+
+    def keyword_hits(
+        self, pregunta_norm: str, min_common: int = 2, min_jaccard: float = 0.3
+    ) -> List[Tuple[Dict[str, Any], str]]:
+        """Primera alternativa de cada entrada que comparte suficientes palabras clave."""
+        query = set(self._tokenize(pregunta_norm))
+        common: Dict[int, int] = defaultdict(int)
+        for token in query:
+            for pos in self._postings.get(token, ()):
+                common[pos] += 1
+        hits: List[Tuple[Dict[str, Any], str]] = []
+        last_entry = None
+        for pos in sorted(common):
+            entry_id = self.entry_ids[pos]
+            if entry_id == last_entry:
+                continue
+            shared = common[pos]
+            union = len(query) + len(self.token_sets[pos]) - shared
+            if shared >= min_common or shared / union >= min_jaccard:
+                hits.append(self._hit(pos))
+                last_entry = entry_id
+        return hits
@@ -0,0 +1,57 @@
+"""Configuración de gunicorn para servir mcp-core con varios workers.
+
+Uso (desde mcp-core):
+
+    WEB_CONCURRENCY=4 N_THREADS=2 gunicorn -c gunicorn.conf.py orchestrator:app
+
+Con ``preload_app`` el módulo se importa una vez en el maestro; como la
+importación no carga nada pesado ni abre hilos o conexiones (ver ``startup``),
+cada worker inicializa sus componentes en su propio lifespan. Antes del fork
+el maestro deja el GGUF en la page cache y los workers lo mapean de solo
+lectura (``LLM_USE_MMAP``), así que los pesos ocupan memoria una sola vez.
+
+Con ``PROMETHEUS_MULTIPROC_DIR`` cada worker escribe sus métricas en ese
+directorio y ``/metrics`` las agrega; se vacía aquí, antes de importar la app.
+"""
+import logging
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+# Cada worker usa N_THREADS hilos de inferencia: workers * N_THREADS <= núcleos
+workers = int(os.getenv("WEB_CONCURRENCY", "1"))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+keepalive = 5
+
+
+def _reset_multiproc_dir():
+    path = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+    if not path:
+        return
+    os.makedirs(path, exist_ok=True)
+    for name in os.listdir(path):
+        if name.endswith(".db"):
+            os.remove(os.path.join(path, name))
+
+
+_reset_multiproc_dir()
+
+
+def on_starting(server):
+    from llama_client import LLM_USE_MMAP, warm_model_file
+
+    model_path = os.getenv("LLAMA_MODEL_PATH", "models/Llama-3.2-3B-Instruct-Q6_K.gguf")
+    if workers > 1 and LLM_USE_MMAP and os.path.exists(model_path):
+        warm_model_file(model_path)
+
+
+def post_fork(server, worker):
+    logging.getLogger("gunicorn.error").info("Worker %s iniciado", worker.pid)
+
+
+def child_exit(server, worker):
+    from metrics import mark_process_dead
+
+    mark_process_dead(worker.pid)
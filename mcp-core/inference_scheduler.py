@@ -0,0 +1,368 @@
+import asyncio
+import os
+import logging
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Tamaño máximo de un micro-batch y ventana de espera para agrupar peticiones
+LLM_MAX_BATCH = int(os.getenv("LLM_MAX_BATCH", "4"))
+LLM_BATCH_WAIT_MS = float(os.getenv("LLM_BATCH_WAIT_MS", "5"))
+
+# Marca de fin para las colas de tokens en streaming
+_END = object()
+
+
+@dataclass
+class InferenceRequest:
+    prompt: str
+    params: Dict[str, Any]
+    future: Future
+    enqueued_at: float = field(default_factory=time.perf_counter)
+    tokens: Optional[queue.Queue] = None
+    # Aviso opcional tras cada token encolado (lo usa la iteración asíncrona)
+    listener: Optional[Callable[[], None]] = None
+
+    def put_token(self, token: Any):
+        self.tokens.put(token)
+        listener = self.listener
+        if listener is not None:
+            try:
+                listener()
+            except Exception as e:
+                # El consumidor pudo cerrar su event loop: el token queda en la cola
+                logger.debug("No se pudo avisar del token: %s", e)
+
+    @property
+    def batch_key(self) -> Tuple:
+        """Parámetros que deben coincidir para compartir micro-batch."""
+        stop = self.params.get("stop")
+        return (
+            self.tokens is not None,
+            self.params.get("max_tokens"),
+            self.params.get("temperature"),
+            tuple(stop) if stop else None,
+        )
+
+
+class TokenStream:
+    """Iterador de tokens producido por una petición en streaming.
+
+    Se puede recorrer con ``for`` (bloquea el hilo en la cola) o con
+    ``async for``: en ese caso el hilo de inferencia despierta al event loop
+    con ``call_soon_threadsafe`` tras cada token y no se ocupa ningún hilo
+    mientras se espera.
+    """
+
+    def __init__(self, request: InferenceRequest):
+        self._request = request
+        self.future = request.future
+
+    def __iter__(self) -> Iterator[str]:
+        while True:
+            token = self._request.tokens.get()
+            if token is _END:
+                break
+            yield token
+        # Propaga errores del modelo al consumidor
+        self.future.result()
+
+    def __aiter__(self) -> AsyncIterator[str]:
+        return self._aiter()
+
+    async def _aiter(self) -> AsyncIterator[str]:
+        loop = asyncio.get_running_loop()
+        ready = asyncio.Event()
+        self._request.listener = lambda: loop.call_soon_threadsafe(ready.set)
+        try:
+            while True:
+                # Se limpia antes de mirar la cola: un token que llegue justo
+                # después vuelve a marcar el evento
+                ready.clear()
+                try:
+                    token = self._request.tokens.get_nowait()
+                except queue.Empty:
+                    await ready.wait()
+                    continue
+                if token is _END:
+                    break
+                yield token
+        finally:
+            self._request.listener = None
+        self.future.result()
+
+    def cancel(self) -> bool:
+        return self.future.cancel()
+
+
+class InferenceScheduler:
+    """Cola de inferencia con un único hilo dueño del modelo.
+
+    llama.cpp no es seguro entre hilos, por lo que todas las llamadas al
+    modelo pasan por este hilo. Las peticiones que llegan dentro de la
+    ventana de espera se agrupan por parámetros de muestreo
+    (``batch_key``): cada grupo es un micro-batch que se ejecuta seguido y
+    los grupos salen en el orden en que llegó su primera petición. Dentro de un grupo se respeta el orden de
+    llegada.
+
+    ``prepare(model, prompt)`` se invoca en el hilo dueño justo antes de
+    cada llamada al modelo (por ejemplo, para restaurar la caché KV de un
+    prefijo de prompt ya evaluado). ``observe(name, prompt_tokens,
+    completion_tokens, seconds)`` recibe cada generación terminada y
+    ``observe_batch(name, size)`` el tamaño de cada micro-batch ejecutado.
+    """
+
+    def __init__(
+        self,
+        model_getter: Callable[[], Any],
+        max_batch_size: int = LLM_MAX_BATCH,
+        batch_wait_ms: float = LLM_BATCH_WAIT_MS,
+        name: str = "llm",
+        prepare: Optional[Callable[[Any, str], None]] = None,
+        observe: Optional[Callable[[str, int, int, float], None]] = None,
+        observe_batch: Optional[Callable[[str, int], None]] = None,
+    ):
+        self._model_getter = model_getter
+        self._prepare = prepare
+        self._observe = observe
+        self._observe_batch = observe_batch
+        self.max_batch_size = max(1, max_batch_size)
+        self.batch_wait = max(0.0, batch_wait_ms) / 1000.0
+        self.name = name
+        self._queue: "queue.Queue[InferenceRequest]" = queue.Queue()
+        self._worker: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._requests = 0
+        self._batches = 0
+        self._last_batch_size = 0
+        self._max_batch_seen = 0
+        self._batch_sizes: Dict[int, int] = {}
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._busy_seconds = 0.0
+        self._recent_waits: deque = deque(maxlen=1000)
+        self._streams = 0
+        self._ttft_total = 0.0
+        self._ttft_max = 0.0
+        self._ttft_last = 0.0
+        self._prompt_tokens = 0
+        self._completion_tokens = 0
+        self._generation_seconds = 0.0
+
+    # ---- API pública ----
+    def submit(
+        self,
+        prompt: str,
+        max_tokens: int = 512,
+        temperature: float = 0.7,
+        stop: Optional[List[str]] = None,
+    ) -> Future:
+        """Encola un prompt y devuelve un Future con la salida cruda del modelo."""
+        params: Dict[str, Any] = {"max_tokens": max_tokens, "temperature": temperature}
+        if stop:
+            params["stop"] = list(stop)
+        req = InferenceRequest(prompt=prompt, params=params, future=Future())
+        self._ensure_worker()
+        self._queue.put(req)
+        return req.future
+
+    def submit_stream(
+        self,
+        prompt: str,
+        max_tokens: int = 512,
+        temperature: float = 0.7,
+        stop: Optional[List[str]] = None,
+    ) -> TokenStream:
+        """Encola un prompt y devuelve un iterador con los tokens a medida que se generan."""
+        params: Dict[str, Any] = {"max_tokens": max_tokens, "temperature": temperature}
+        if stop:
+            params["stop"] = list(stop)
+        req = InferenceRequest(prompt=prompt, params=params, future=Future(), tokens=queue.Queue())
+        self._ensure_worker()
+        self._queue.put(req)
+        return TokenStream(req)
+
+    def stats(self) -> Dict[str, Any]:
+        """Profundidad de cola, tamaño de batch y tiempos de espera y de generación."""
+        with self._stats_lock:
+            waits = sorted(self._recent_waits)
+            p95 = waits[int(len(waits) * 0.95) - 1] if waits else 0.0
+            return {
+                "queue_depth": self._queue.qsize(),
+                "requests": self._requests,
+                "batches": self._batches,
+                "avg_batch_size": (self._requests / self._batches) if self._batches else 0.0,
+                "last_batch_size": self._last_batch_size,
+                "max_batch_size": self._max_batch_seen,
+                # Cuántos micro-batches se ejecutaron con cada tamaño
+                "batch_sizes": dict(sorted(self._batch_sizes.items())),
+                "avg_wait_ms": (self._wait_total / self._requests * 1000) if self._requests else 0.0,
+                "p95_wait_ms": p95 * 1000,
+                "max_wait_ms": self._wait_max * 1000,
+                "busy_seconds": self._busy_seconds,
+                "streams": self._streams,
+                "avg_ttft_ms": (self._ttft_total / self._streams * 1000) if self._streams else 0.0,
+                "last_ttft_ms": self._ttft_last * 1000,
+                "max_ttft_ms": self._ttft_max * 1000,
+                "prompt_tokens": self._prompt_tokens,
+                "completion_tokens": self._completion_tokens,
+                "generation_seconds": self._generation_seconds,
+                "tokens_per_second": (
+                    self._completion_tokens / self._generation_seconds if self._generation_seconds else 0.0
+                ),
+            }
+
+    # ---- Hilo de trabajo ----
+    def _ensure_worker(self):
+        if self._worker is not None and self._worker.is_alive():
+            return
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(
+                    target=self._run, name=f"inference-{self.name}", daemon=True
+                )
+                self._worker.start()
+
+    def _collect_batch(self) -> List[InferenceRequest]:
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.batch_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                if remaining <= 0:
+                    batch.append(self._queue.get_nowait())
+                else:
+                    batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            groups: Dict[Tuple, List[InferenceRequest]] = {}
+            for req in self._collect_batch():
+                groups.setdefault(req.batch_key, []).append(req)
+            for reqs in groups.values():
+                self._execute_batch(reqs)
+
+    def _execute_batch(self, reqs: List[InferenceRequest]):
+        started = time.perf_counter()
+        executed = 0
+        try:
+            model = self._model_getter()
+        except Exception as e:
+            logger.error("Error de inferencia en %s: %s", self.name, e)
+            for req in reqs:
+                if req.future.set_running_or_notify_cancel():
+                    req.future.set_exception(e)
+                if req.tokens is not None:
+                    req.put_token(_END)
+            return
+        for req in reqs:
+            if not req.future.set_running_or_notify_cancel():
+                if req.tokens is not None:
+                    req.put_token(_END)
+                continue
+            self._record_wait(time.perf_counter() - req.enqueued_at)
+            executed += 1
+            try:
+                if self._prepare is not None:
+                    self._run_prepare(model, req.prompt)
+                generation_start = time.perf_counter()
+                if req.tokens is not None:
+                    output = self._run_stream(model, req)
+                else:
+                    output = model(req.prompt, **req.params)
+                self._record_generation(output, time.perf_counter() - generation_start)
+                req.future.set_result(output)
+            except Exception as e:
+                logger.error("Error de inferencia en %s: %s", self.name, e)
+                req.future.set_exception(e)
+            finally:
+                if req.tokens is not None:
+                    req.put_token(_END)
+        with self._stats_lock:
+            self._busy_seconds += time.perf_counter() - started
+        if executed:
+            self._record_batch(executed)
+
+    def _run_prepare(self, model: Any, prompt: str):
+        try:
+            self._prepare(model, prompt)
+        except Exception as e:
+            # Un fallo al preparar no debe impedir la inferencia
+            logger.warning("Error preparando el modelo en %s: %s", self.name, e)
+
+    def _run_stream(self, model: Any, req: InferenceRequest) -> Dict[str, Any]:
+        output = model(req.prompt, stream=True, **req.params)
+        if isinstance(output, dict):
+            # El modelo no soporta streaming: se entrega la respuesta completa
+            output = [output]
+        parts: List[str] = []
+        usage: Dict[str, int] = {}
+        for chunk in output:
+            usage = chunk.get("usage") or usage
+            text = chunk["choices"][0].get("text", "")
+            if not parts:
+                self._record_ttft(time.perf_counter() - req.enqueued_at)
+            parts.append(text)
+            req.put_token(text)
+        if not usage:
+            # llama.cpp no informa el uso en streaming: un fragmento por token
+            usage = {"prompt_tokens": self._count_tokens(model, req.prompt), "completion_tokens": len(parts)}
+        return {"choices": [{"text": "".join(parts)}], "usage": usage}
+
+    @staticmethod
+    def _count_tokens(model: Any, prompt: str) -> int:
+        try:
+            return len(model.tokenize(prompt.encode("utf-8")))
+        except Exception:
+            return 0
+
+    def _record_generation(self, output: Any, seconds: float):
+        usage = (output.get("usage") if isinstance(output, dict) else None) or {}
+        prompt_tokens = int(usage.get("prompt_tokens") or 0)
+        completion_tokens = int(usage.get("completion_tokens") or 0)
+        with self._stats_lock:
+            self._prompt_tokens += prompt_tokens
+            self._completion_tokens += completion_tokens
+            self._generation_seconds += seconds
+        if self._observe is not None:
+            try:
+                self._observe(self.name, prompt_tokens, completion_tokens, seconds)
+            except Exception as e:
+                logger.warning("Error registrando la generación en %s: %s", self.name, e)
+
+    def _record_ttft(self, ttft: float):
+        with self._stats_lock:
+            self._streams += 1
+            self._ttft_total += ttft
+            self._ttft_max = max(self._ttft_max, ttft)
+            self._ttft_last = ttft
+        logger.info("Tiempo hasta el primer token en %s: %.0f ms", self.name, ttft * 1000)
+
+    def _record_wait(self, wait: float):
+        with self._stats_lock:
+            self._requests += 1
+            self._wait_total += wait
+            self._wait_max = max(self._wait_max, wait)
+            self._recent_waits.append(wait)
+
+    def _record_batch(self, size: int):
+        with self._stats_lock:
+            self._batches += 1
+            self._last_batch_size = size
+            self._max_batch_seen = max(self._max_batch_seen, size)
+            self._batch_sizes[size] = self._batch_sizes.get(size, 0) + 1
+        if self._observe_batch is not None:
+            try:
+                self._observe_batch(self.name, size)
+            except Exception as e:
+                logger.warning("Error registrando el batch en %s: %s", self.name, e)
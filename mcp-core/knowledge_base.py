@@ -0,0 +1,145 @@
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from types import MappingProxyType
+from typing import Any, Callable, Dict, Iterable, Mapping, Optional
+
+logger = logging.getLogger(__name__)
+
+# Segundos entre revisiones de los archivos de la base de conocimiento (0 = desactivado)
+KB_WATCH_INTERVAL = float(os.getenv("KB_WATCH_INTERVAL", "5"))
+
+
+@dataclass(frozen=True)
+class KnowledgeSnapshot:
+    """Versión inmutable de la base de conocimiento y sus índices derivados."""
+
+    version: int
+    loaded_at: datetime
+    load_seconds: float
+    sources: Mapping[str, Optional[float]]
+    data: Mapping[str, Any] = field(repr=False)
+
+    def __getitem__(self, key: str) -> Any:
+        return self.data[key]
+
+
+class KnowledgeBase:
+    """Carga, vigila y recarga los JSON de FAQ, documentos y oficinas.
+
+    ``build`` lee los archivos y construye todas las estructuras derivadas;
+    el resultado se publica como un ``KnowledgeSnapshot`` nuevo reemplazando
+    la referencia en una sola asignación. Las peticiones en curso conservan
+    el snapshot que ya leyeron y nunca ven un índice a medio construir. Si
+    la recarga falla se mantiene la versión anterior.
+    """
+
+    def __init__(self, build: Callable[[], Dict[str, Any]], paths: Iterable[Optional[str]]):
+        self._build = build
+        self.paths = [p for p in dict.fromkeys(paths) if p]
+        self._snapshot: Optional[KnowledgeSnapshot] = None
+        self._reload_lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self._watcher: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self.reloads = 0
+        self.last_error: Optional[str] = None
+
+    @property
+    def snapshot(self) -> KnowledgeSnapshot:
+        snapshot = self._snapshot
+        if snapshot is None:
+            # Primer acceso: una sola carga aunque lleguen varias peticiones a la vez
+            with self._load_lock:
+                snapshot = self._snapshot or self.reload(reason="inicial")
+        return snapshot
+
+    def _mtimes(self) -> Dict[str, Optional[float]]:
+        mtimes: Dict[str, Optional[float]] = {}
+        for path in self.paths:
+            try:
+                mtimes[path] = os.path.getmtime(path)
+            except OSError:
+                mtimes[path] = None
+        return mtimes
+
+    def reload(self, reason: str = "manual") -> KnowledgeSnapshot:
+        """Reconstruye la base completa y la publica; lanza la excepción si falla."""
+        with self._reload_lock:
+            start = time.perf_counter()
+            mtimes = self._mtimes()
+            try:
+                data = self._build()
+            except Exception as e:
+                self.last_error = f"{type(e).__name__}: {e}"
+                logger.error("Error recargando la base de conocimiento (%s): %s", reason, e)
+                raise
+            previous = self._snapshot
+            snapshot = KnowledgeSnapshot(
+                version=(previous.version + 1) if previous else 1,
+                loaded_at=datetime.now(),
+                load_seconds=time.perf_counter() - start,
+                sources=MappingProxyType(mtimes),
+                data=MappingProxyType(data),
+            )
+            self._snapshot = snapshot
+            self.reloads += 1
+            self.last_error = None
+        logger.info(
+            "Base de conocimiento v%s cargada en %.3fs (%s)",
+            snapshot.version, snapshot.load_seconds, reason,
+        )
+        return snapshot
+
+    def reload_async(self, reason: str = "manual") -> threading.Thread:
+        """Recarga en un hilo de fondo; las peticiones siguen usando la versión actual."""
+        def run():
+            try:
+                self.reload(reason=reason)
+            except Exception:
+                pass  # ya registrado en last_error
+
+        thread = threading.Thread(target=run, name="kb-reload", daemon=True)
+        thread.start()
+        return thread
+
+    def changed(self) -> bool:
+        """Indica si algún archivo vigilado cambió desde la última carga."""
+        snapshot = self._snapshot
+        return snapshot is None or self._mtimes() != dict(snapshot.sources)
+
+    def _watch(self, interval: float):
+        while not self._stop.wait(interval):
+            if self.changed():
+                try:
+                    self.reload(reason="archivo modificado")
+                except Exception:
+                    pass  # se reintenta en la próxima revisión
+
+    def start_watcher(self, interval: float = KB_WATCH_INTERVAL):
+        """Vigila los archivos por mtime y recarga cuando cambian."""
+        if interval <= 0 or (self._watcher is not None and self._watcher.is_alive()):
+            return
+        self._stop.clear()
+        self._watcher = threading.Thread(
+            target=self._watch, args=(interval,), name="kb-watcher", daemon=True
+        )
+        self._watcher.start()
+
+    def stop_watcher(self):
+        self._stop.set()
+
+    def stats(self) -> Dict[str, Any]:
+        snapshot = self._snapshot
+        return {
+            "version": snapshot.version if snapshot else None,
+            "loaded_at": snapshot.loaded_at.isoformat() if snapshot else None,
+            "load_seconds": snapshot.load_seconds if snapshot else None,
+            "reloads": self.reloads,
+            "last_error": self.last_error,
+            "watching": self._watcher is not None and self._watcher.is_alive(),
+            "sources": list(self.paths),
+        }
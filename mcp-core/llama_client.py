@@ -1,17 +1,254 @@
 import os
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Dict, Optional, Tuple
 from llama_cpp import Llama
+from inference_scheduler import InferenceScheduler, TokenStream
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# Caché de estados KV para prefijos de prompt estáticos
+LLM_PREFIX_CACHE = os.getenv("LLM_PREFIX_CACHE", "1") != "0"
+LLM_PREFIX_CACHE_MAX = int(os.getenv("LLM_PREFIX_CACHE_MAX", "8"))
+# Pesos mapeados de solo lectura: varios procesos con el mismo GGUF comparten
+# las páginas del archivo en la page cache en vez de tener una copia cada uno
+LLM_USE_MMAP = os.getenv("LLM_USE_MMAP", "1") != "0"
+LLM_USE_MLOCK = os.getenv("LLM_USE_MLOCK", "0") == "1"
+
+# --- Registro de modelos compartido por todo el proceso ---
+# Cada combinación (model_path, n_ctx, n_threads) se carga una sola vez y
+# todas las instancias de LlamaClient la toman prestada desde aquí.
+_MODEL_REGISTRY: Dict[Tuple[str, int, int], Llama] = {}
+# Cargas en curso: quien pide un modelo que se está cargando espera su Future
+# sin retener ``_REGISTRY_LOCK`` (lo usan también las estadísticas de /health)
+_LOADING: Dict[Tuple[str, int, int], Future] = {}
+_REGISTRY_LOCK = threading.Lock()
+_REGISTRY_STATS = {"loads": 0, "reuses": 0, "load_seconds": 0.0}
+# Un planificador de inferencia por modelo: es el único que invoca al modelo.
+_SCHEDULERS: Dict[Tuple[str, int, int], InferenceScheduler] = {}
+_PREFIX_CACHES: Dict[Tuple[str, int, int], "PrefixStateCache"] = {}
+
+
+class PrefixStateCache:
+    """Estados KV de llama.cpp para los prefijos estáticos de los prompts.
+
+    La primera vez que llega un prompt que empieza por un prefijo registrado
+    se evalúa solo el prefijo y se guarda el estado del modelo
+    (``save_state``). Las siguientes llamadas restauran ese estado
+    (``load_state``) y llama_cpp reutiliza los tokens comunes, de modo que
+    únicamente se evalúa la parte propia de cada petición. Solo se usa desde
+    el hilo dueño del modelo.
+    """
+
+    def __init__(self, max_entries: int = LLM_PREFIX_CACHE_MAX):
+        self.max_entries = max(1, max_entries)
+        self._prefixes: Dict[str, None] = {}
+        self._states: "OrderedDict[str, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "eval_seconds": 0.0, "restore_seconds": 0.0}
+
+    def register(self, prefix: str):
+        """Declara un prefijo estático; registrar dos veces el mismo no tiene efecto."""
+        if prefix:
+            with self._lock:
+                self._prefixes[prefix] = None
+
+    def match(self, prompt: str) -> Optional[str]:
+        """Prefijo registrado más largo con el que empieza el prompt."""
+        with self._lock:
+            candidates = [p for p in self._prefixes if prompt.startswith(p)]
+        return max(candidates, key=len) if candidates else None
+
+    def prepare(self, model: Any, prompt: str):
+        """Deja cargada en el modelo la caché KV del prefijo del prompt."""
+        if not hasattr(model, "save_state"):
+            return
+        prefix = self.match(prompt)
+        if prefix is None:
+            return
+        start = time.perf_counter()
+        state = self._states.get(prefix)
+        if state is not None:
+            model.load_state(state)
+            self._states.move_to_end(prefix)
+            with self._lock:
+                self._stats["hits"] += 1
+                self._stats["restore_seconds"] += time.perf_counter() - start
+            return
+        model.reset()
+        model.eval(model.tokenize(prefix.encode("utf-8"), add_bos=True, special=True))
+        self._states[prefix] = model.save_state()
+        evicted = 0
+        while len(self._states) > self.max_entries:
+            self._states.popitem(last=False)
+            evicted += 1
+        with self._lock:
+            self._stats["misses"] += 1
+            self._stats["evictions"] += evicted
+            self._stats["eval_seconds"] += time.perf_counter() - start
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["prefixes"] = len(self._prefixes)
+        stats["states"] = len(self._states)
+        return stats
+
+
+def get_prefix_cache(model_path: str, n_ctx: int, n_threads: int) -> PrefixStateCache:
+    """Devuelve la caché de prefijos asociada al modelo."""
+    key = (model_path, n_ctx, n_threads)
+    with _REGISTRY_LOCK:
+        cache = _PREFIX_CACHES.get(key)
+        if cache is None:
+            cache = _PREFIX_CACHES[key] = PrefixStateCache()
+    return cache
+
+
+def get_model(model_path: str, n_ctx: int, n_threads: int) -> Llama:
+    """Devuelve el modelo registrado para la configuración, cargándolo si no existe."""
+    key = (model_path, n_ctx, n_threads)
+    with _REGISTRY_LOCK:
+        model = _MODEL_REGISTRY.get(key)
+        if model is not None:
+            return model
+        loading = _LOADING.get(key)
+        owner = loading is None
+        if owner:
+            loading = _LOADING[key] = Future()
+    if not owner:
+        return loading.result()
+    start = time.perf_counter()
+    try:
+        model = Llama(
+            model_path=model_path, n_ctx=n_ctx, n_threads=n_threads,
+            use_mmap=LLM_USE_MMAP, use_mlock=LLM_USE_MLOCK,
+        )
+    except BaseException as e:
+        # Sin registrar: el próximo pedido vuelve a intentar la carga
+        with _REGISTRY_LOCK:
+            del _LOADING[key]
+        loading.set_exception(e)
+        raise
+    elapsed = time.perf_counter() - start
+    with _REGISTRY_LOCK:
+        _MODEL_REGISTRY[key] = model
+        del _LOADING[key]
+        _REGISTRY_STATS["loads"] += 1
+        _REGISTRY_STATS["load_seconds"] += elapsed
+    loading.set_result(model)
+    logger.info("Modelo %s cargado en %.2fs (n_ctx=%s, n_threads=%s)", model_path, elapsed, n_ctx, n_threads)
+    return model
+
+
+def warm_model_file(model_path: str, chunk_size: int = 16 * 1024 * 1024) -> Dict[str, Any]:
+    """Lee el GGUF completo para dejarlo en la page cache.
+
+    Pensado para el proceso maestro de gunicorn antes de crear los workers:
+    cada worker luego mapea el archivo (``use_mmap``) sin leerlo del disco y
+    todos comparten las mismas páginas físicas de los pesos.
+    """
+    start = time.perf_counter()
+    size = 0
+    buffer = bytearray(chunk_size)
+    with open(model_path, "rb", buffering=0) as f:
+        while True:
+            read = f.readinto(buffer)
+            if not read:
+                break
+            size += read
+    elapsed = time.perf_counter() - start
+    logger.info("GGUF %s precargado en la page cache: %.0f MB en %.2fs", model_path, size / 2**20, elapsed)
+    return {"bytes": size, "seconds": elapsed}
+
+
+def get_scheduler(model_path: str, n_ctx: int, n_threads: int) -> InferenceScheduler:
+    """Devuelve el planificador de inferencia asociado al modelo."""
+    key = (model_path, n_ctx, n_threads)
+    prefix_cache = get_prefix_cache(model_path, n_ctx, n_threads) if LLM_PREFIX_CACHE else None
+    with _REGISTRY_LOCK:
+        scheduler = _SCHEDULERS.get(key)
+        if scheduler is None:
+            scheduler = InferenceScheduler(
+                lambda: get_model(model_path, n_ctx, n_threads),
+                name=os.path.basename(model_path),
+                prepare=prefix_cache.prepare if prefix_cache else None,
+                observe=metrics.record_generation,
+                observe_batch=metrics.record_batch,
+            )
+            _SCHEDULERS[key] = scheduler
+    return scheduler
+
+
+def get_scheduler_stats() -> Dict[str, Any]:
+    """Métricas de cola y de generación de cada planificador activo."""
+    with _REGISTRY_LOCK:
+        schedulers = dict(_SCHEDULERS)
+    return {s.name: s.stats() for s in schedulers.values()}
+
+
+def get_prefix_cache_stats() -> Dict[str, Any]:
+    """Aciertos y tiempos de la caché de prefijos de cada modelo."""
+    with _REGISTRY_LOCK:
+        caches = dict(_PREFIX_CACHES)
+    return {os.path.basename(k[0]): c.stats() for k, c in caches.items()}
+
+
+def get_registry_stats() -> Dict[str, Any]:
+    """Contadores de carga y reutilización de modelos del proceso."""
+    with _REGISTRY_LOCK:
+        stats = dict(_REGISTRY_STATS)
+        stats["models"] = [
+            {"model_path": k[0], "n_ctx": k[1], "n_threads": k[2]} for k in _MODEL_REGISTRY
+        ]
+    return stats
+
 
 class LlamaClient:
-    def __init__(self, model_path=None, n_ctx=4096, n_threads=2):
+    def __init__(self, model_path=None, n_ctx=4096, n_threads=2, preload=True):
         self.model_path = model_path or os.getenv("LLAMA_MODEL_PATH", "models/Llama-3.2-3B-Instruct-Q6_K.gguf")
         self.n_ctx = int(os.getenv("N_CTX", n_ctx))
         self.n_threads = int(os.getenv("N_THREADS", n_threads))
-        self.llm = Llama(model_path=self.model_path, n_ctx=self.n_ctx, n_threads=self.n_threads)
+        with _REGISTRY_LOCK:
+            if (self.model_path, self.n_ctx, self.n_threads) in _MODEL_REGISTRY:
+                _REGISTRY_STATS["reuses"] += 1
+        # Carga (o reutiliza) el modelo al construir el cliente; con
+        # ``preload=False`` se carga en el primer uso de ``llm``/``scheduler``
+        if preload:
+            get_model(self.model_path, self.n_ctx, self.n_threads)
+
+    @property
+    def llm(self) -> Llama:
+        """Modelo compartido para la configuración de este cliente."""
+        return get_model(self.model_path, self.n_ctx, self.n_threads)
+
+    @property
+    def scheduler(self) -> InferenceScheduler:
+        """Planificador que serializa las llamadas a este modelo en orden de llegada."""
+        return get_scheduler(self.model_path, self.n_ctx, self.n_threads)
+
+    def register_prefix(self, prefix: str):
+        """Registra un prefijo de prompt estático cuya caché KV se reutilizará."""
+        get_prefix_cache(self.model_path, self.n_ctx, self.n_threads).register(prefix)
+
+    def submit(self, prompt: str, max_tokens: int = 512, temperature: float = 0.7) -> Future:
+        """Encola el prompt y devuelve un Future con la salida cruda del modelo."""
+        return self.scheduler.submit(prompt, max_tokens=max_tokens, temperature=temperature)
+
+    @staticmethod
+    def output_text(output: Dict[str, Any]) -> str:
+        return output["choices"][0]["text"].strip()
 
     def generate(self, prompt: str, max_tokens: int = 512, temperature: float = 0.7) -> str:
-        output = self.llm(
-            prompt,
-            max_tokens=max_tokens,
-            temperature=temperature
-        )
-        return output["choices"][0]["text"].strip()
\ No newline at end of file
+        return self.output_text(self.submit(prompt, max_tokens=max_tokens, temperature=temperature).result())
+
+    def generate_stream(self, prompt: str, max_tokens: int = 512, temperature: float = 0.7) -> TokenStream:
+        """Genera la respuesta token a token usando ``stream=True`` de llama_cpp.
+
+        El resultado admite ``for`` y ``async for``.
+        """
+        return self.scheduler.submit_stream(prompt, max_tokens=max_tokens, temperature=temperature)
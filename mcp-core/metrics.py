@@ -0,0 +1,280 @@
+"""Métricas Prometheus de mcp-core.
+
+- ``turn()`` envuelve un turno y al cerrarlo registra su duración y la ruta
+  que lo resolvió (``set_route``: faq, document, llm, scheduler, complaint,
+  fallback; ``other`` si nadie la fijó y ``error`` si el turno falló).
+- ``stage``/``timed`` miden las etapas del turno (FAQ, documentos, intención,
+  LLM, herramientas); ``timed`` acepta también corrutinas.
+- ``observe_dependency`` acumula el tiempo en Redis (por viaje de ida y
+  vuelta, con clientes síncronos o ``redis.asyncio``) y en Postgres (por
+  consulta, medido en el cursor o en el pool asíncrono); lo del turno,
+  incluidas sus búsquedas en paralelo, se registra además como etapa
+  ``redis``/``postgres`` del turno.
+- ``record_generation`` cuenta los tokens y segundos del modelo.
+
+``render`` produce la exposición de ``/metrics``. Con varios workers de
+gunicorn se define ``PROMETHEUS_MULTIPROC_DIR`` (un directorio vacío al
+arrancar) y cada scrape agrega los valores de todos los procesos.
+"""
+import inspect
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import lru_cache, wraps
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+ROUTES = ("faq", "document", "llm", "scheduler", "complaint", "fallback", "other", "error")
+
+_TURN_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 40)
+_STAGE_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20)
+
+TURN_SECONDS = Histogram(
+    "mcp_turn_duration_seconds", "Duración del turno por ruta resuelta", ["route"], buckets=_TURN_BUCKETS
+)
+TURNS = Counter("mcp_turns", "Turnos atendidos por ruta resuelta", ["route"])
+TURNS_IN_PROGRESS = Gauge("mcp_turns_in_progress", "Turnos en curso", multiprocess_mode="livesum")
+STAGE_SECONDS = Histogram(
+    "mcp_stage_duration_seconds", "Duración de cada etapa del turno", ["stage"], buckets=_STAGE_BUCKETS
+)
+TOOL_CALLS = Counter("mcp_tool_calls", "Llamadas a microservicios por herramienta y resultado", ["tool", "outcome"])
+DEPENDENCY_SECONDS = Counter("mcp_dependency_seconds", "Tiempo acumulado en Redis y Postgres", ["dependency"])
+DEPENDENCY_CALLS = Counter("mcp_dependency_calls", "Viajes a Redis y consultas a Postgres", ["dependency"])
+LLM_TOKENS = Counter("mcp_llm_tokens", "Tokens procesados por el LLM", ["model", "kind"])
+LLM_SECONDS = Counter("mcp_llm_generation_seconds", "Tiempo del LLM generando", ["model"])
+LLM_BATCH_SIZE = Histogram(
+    "mcp_llm_batch_size", "Peticiones por micro-batch de inferencia", ["model"], buckets=(1, 2, 3, 4, 6, 8, 16)
+)
+
+
+class _Turn:
+    __slots__ = ("route", "dependencies", "lock")
+
+    def __init__(self):
+        self.route = "other"
+        self.dependencies: Dict[str, float] = {}
+        # Las búsquedas del turno suman desde otros hilos
+        self.lock = threading.Lock()
+
+
+_CURRENT_TURN: ContextVar[Optional[_Turn]] = ContextVar("metrics_turn", default=None)
+
+
+@contextmanager
+def turn() -> Iterator[_Turn]:
+    state = _Turn()
+    token = _CURRENT_TURN.set(state)
+    TURNS_IN_PROGRESS.inc()
+    start = time.perf_counter()
+    try:
+        yield state
+    except BaseException:
+        state.route = "error"
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        _CURRENT_TURN.reset(token)
+        TURNS_IN_PROGRESS.dec()
+        TURN_SECONDS.labels(state.route).observe(elapsed)
+        TURNS.labels(state.route).inc()
+        for dependency, seconds in state.dependencies.items():
+            STAGE_SECONDS.labels(dependency).observe(seconds)
+
+
+def set_route(route: str):
+    """Fija la ruta que resolvió el turno en curso (la última gana)."""
+    state = _CURRENT_TURN.get()
+    if state is not None:
+        state.route = route
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.labels(name).observe(time.perf_counter() - start)
+
+
+def timed(name: str) -> Callable:
+    """Decorador que registra la duración de la función como etapa ``name``."""
+
+    def decorator(func: Callable) -> Callable:
+        if inspect.iscoroutinefunction(func):
+            @wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with stage(name):
+                    return await func(*args, **kwargs)
+
+            return async_wrapper
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def observe_stage(name: str, seconds: float):
+    STAGE_SECONDS.labels(name).observe(seconds)
+
+
+def record_tool_call(tool: str, result: Any):
+    outcome = "error" if isinstance(result, dict) and "error" in result else "ok"
+    TOOL_CALLS.labels(tool, outcome).inc()
+
+
+def observe_dependency(dependency: str, seconds: float, calls: int = 1):
+    DEPENDENCY_SECONDS.labels(dependency).inc(seconds)
+    if calls:
+        DEPENDENCY_CALLS.labels(dependency).inc(calls)
+    state = _CURRENT_TURN.get()
+    if state is not None:
+        with state.lock:
+            state.dependencies[dependency] = state.dependencies.get(dependency, 0.0) + seconds
+
+
+def record_generation(model: str, prompt_tokens: int, completion_tokens: int, seconds: float):
+    LLM_TOKENS.labels(model, "prompt").inc(prompt_tokens)
+    LLM_TOKENS.labels(model, "completion").inc(completion_tokens)
+    LLM_SECONDS.labels(model).inc(seconds)
+
+
+def record_batch(model: str, size: int):
+    LLM_BATCH_SIZE.labels(model).observe(size)
+
+
+@lru_cache(maxsize=None)
+def _timed_connection_class(base: type) -> type:
+    class TimedConnection(base):
+        def send_packed_command(self, *args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return super().send_packed_command(*args, **kwargs)
+            finally:
+                observe_dependency("redis", time.perf_counter() - start)
+
+        def read_response(self, *args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return super().read_response(*args, **kwargs)
+            finally:
+                # La llamada ya se contó al enviarla
+                observe_dependency("redis", time.perf_counter() - start, calls=0)
+
+    TimedConnection.__name__ = f"Timed{base.__name__}"
+    return TimedConnection
+
+
+@lru_cache(maxsize=None)
+def _timed_async_connection_class(base: type) -> type:
+    class TimedAsyncConnection(base):
+        async def send_packed_command(self, *args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await super().send_packed_command(*args, **kwargs)
+            finally:
+                observe_dependency("redis", time.perf_counter() - start)
+
+        async def read_response(self, *args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await super().read_response(*args, **kwargs)
+            finally:
+                observe_dependency("redis", time.perf_counter() - start, calls=0)
+
+    TimedAsyncConnection.__name__ = f"Timed{base.__name__}"
+    return TimedAsyncConnection
+
+
+def instrument_redis(client: Any) -> Any:
+    """Mide los comandos de un cliente Redis, síncrono o ``redis.asyncio``.
+
+    Cambia la clase de conexión del pool; debe llamarse antes del primer
+    comando para que todas las conexiones queden medidas.
+    """
+    pool = client.connection_pool
+    base = pool.connection_class
+    if not base.__name__.startswith("Timed"):
+        if inspect.iscoroutinefunction(base.read_response):
+            pool.connection_class = _timed_async_connection_class(base)
+        else:
+            pool.connection_class = _timed_connection_class(base)
+    return client
+
+
+@lru_cache(maxsize=None)
+def _timed_cursor_class(base: type) -> type:
+    class TimedCursor(base):
+        def execute(self, *args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return super().execute(*args, **kwargs)
+            finally:
+                observe_dependency("postgres", time.perf_counter() - start)
+
+        def executemany(self, *args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return super().executemany(*args, **kwargs)
+            finally:
+                observe_dependency("postgres", time.perf_counter() - start)
+
+        def callproc(self, *args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return super().callproc(*args, **kwargs)
+            finally:
+                observe_dependency("postgres", time.perf_counter() - start)
+
+    TimedCursor.__name__ = f"Timed{base.__name__}"
+    return TimedCursor
+
+
+@lru_cache(maxsize=None)
+def timed_postgres_connection() -> type:
+    """Clase de conexión psycopg2 que mide cada consulta en el cursor.
+
+    Se pasa como ``connection_factory`` a ``psycopg2.connect``; respeta el
+    ``cursor_factory`` pedido (p. ej. ``RealDictCursor``).
+    """
+    from psycopg2.extensions import connection, cursor
+
+    class TimedPostgresConnection(connection):
+        def cursor(self, *args, **kwargs):
+            base = kwargs.get("cursor_factory") or self.cursor_factory or cursor
+            kwargs["cursor_factory"] = _timed_cursor_class(base)
+            return super().cursor(*args, **kwargs)
+
+    return TimedPostgresConnection
+
+
+def render() -> Tuple[bytes, str]:
+    """Cuerpo y content type de ``/metrics``."""
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
+
+
+def mark_process_dead(pid: int):
+    """Limpia los gauges ``livesum`` de un worker que terminó."""
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        multiprocess.mark_process_dead(pid)
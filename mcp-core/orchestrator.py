@@ -1,10 +1,18 @@
 import os
 import sys
+import asyncio
+import contextlib
+import contextvars
+import functools
+import inspect
 sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
 import json
+import queue
+import httpx
 import requests
-from typing import Dict, Any, List, Optional
+from typing import AsyncIterator, Dict, Any, Iterator, List, Optional, Tuple
 from fastapi import FastAPI, HTTPException, Request, Body
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from pydantic import BaseModel
 import logging
 import psycopg2
@@ -12,18 +20,37 @@ from psycopg2.extras import RealDictCursor
 import re
 from email.utils import parseaddr
 import redis
+import redis.asyncio
 import uuid
 import threading
 import time
 import concurrent.futures
 from context_manager import ConversationalContextManager
-import unicodedata
+from response_cache import ResponseCache
+from session_lock import SessionOrderLock
+from db_pool import AsyncConnectionPool, ConnectionPool
+from analytics_sink import AnalyticsSink
+from document_cards import DocumentCards
+from document_search import DocumentSearch
+from session_archiver import SessionArchiver
+from service_clients import ServiceClientRegistry, ToolPolicy
+from faq_index import FAQIndex
+from doc_matcher import DocumentMatcher
+from knowledge_base import KnowledgeBase
+from startup import StartupManager
+from process_memory import memory_stats
+import metrics
 try:
-    from utils.text import normalize_text
+    from utils.text import fold_text, normalize_text
 except ModuleNotFoundError:
     sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'utils'))
-    from text import normalize_text
-from llama_client import LlamaClient
+    from text import fold_text, normalize_text
+from llama_client import (
+    LlamaClient,
+    get_prefix_cache_stats,
+    get_registry_stats,
+    get_scheduler_stats,
+)
 try:
     from utils.parser import parse_date_time
 except ModuleNotFoundError:
@@ -31,15 +58,11 @@ except ModuleNotFoundError:
     import importlib
     parse_date_time = importlib.import_module('utils.parser').parse_date_time
 import importlib.util
-service_path = '/app/scheduler-mcp/service.py'
-_spec = importlib.util.spec_from_file_location('scheduler_service', service_path)
-_svc = importlib.util.module_from_spec(_spec)
-_spec.loader.exec_module(_svc)
-select_exact_block = _svc.select_exact_block
 from utils.audit import audit_step
 from zoneinfo import ZoneInfo
 from utils.datetime_utils import (
     parse_nl_datetime,
+    preload_dateparser,
     compute_relative_date,
     compute_last_business_day,
 )
@@ -66,6 +89,9 @@ PROMPTS_PATH = os.getenv("PROMPTS_PATH")
 TOOL_SCHEMAS_PATH = os.getenv("TOOL_SCHEMAS_PATH")
 FAQ_DB_PATH = os.getenv("FAQ_DB_PATH")
 
+# Sesiones HTTP keep-alive, timeouts y circuito por microservicio
+service_clients = ServiceClientRegistry(TOOL_SCHEMAS_PATH)
+
 # == Parámetros de fuzzy [Ubrales de Coincidencias] ==
 FUZZY_STRICT_THRESHOLD = 90
 FUZZY_CLARIFY_THRESHOLD = 85
@@ -88,6 +114,17 @@ REDIS_HOST = os.getenv("REDIS_HOST", "redis")
 REDIS_PORT = int(os.getenv("REDIS_PORT", 6379))
 redis_client = redis.Redis(host=REDIS_HOST, port=REDIS_PORT, decode_responses=True)
 context_manager = ConversationalContextManager(host=REDIS_HOST, port=REDIS_PORT)
+response_cache = ResponseCache(host=REDIS_HOST, port=REDIS_PORT)
+# Orden de llegada por sesión; usa el mismo cliente Redis que las sesiones
+# Cliente asíncrono para esperar el turno de la sesión en el bucle de eventos
+async_redis_client = redis.asyncio.Redis(host=REDIS_HOST, port=REDIS_PORT, decode_responses=True)
+session_lock = SessionOrderLock(lambda: context_manager.redis_client, lambda: async_redis_client)
+# Tiempo en Redis para /metrics (comandos y pipelines, síncronos y asíncronos)
+for _client in (
+    redis_client, context_manager.redis_client, response_cache.redis_client,
+    async_redis_client, context_manager.async_redis_client, response_cache.async_redis_client,
+):
+    metrics.instrument_redis(_client)
 
 # == Campos requeridos por tool ==
 REQUIRED_FIELDS = {
@@ -127,18 +164,42 @@ FIELD_QUESTIONS = {
 HISTORIAL_TABLE = "conversaciones_historial"
 
 # Inicializa el FastAPI
-app = FastAPI()
+@contextlib.asynccontextmanager
+async def lifespan(_app: FastAPI):
+    # ``startup`` (arranque escalonado) se define al final del módulo
+    startup.start()
+    yield
+    startup.stop()
+    # Los clientes asíncronos se cierran en el loop de turnos, que es su dueño
+    if _turn_loop is not None:
+        await asyncio.wrap_future(_submit(_close_turn_clients()))
+
+
+app = FastAPI(lifespan=lifespan)
 logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"))
 logger = logging.getLogger(__name__)
 audit_logger = logging.getLogger("audit")
 if not audit_logger.handlers:
     audit_logger.addHandler(logging.StreamHandler())
 
-# --- CACHE FAQ EN MEMORIA ---
-_FAQ_CACHE = None
-
 # --- Instancia tu LLM local (única instancia) ---
-llm = LlamaClient()
+# El modelo se carga en el arranque escalonado (o en la primera inferencia)
+llm = LlamaClient(preload=False)
+
+# Servicio del scheduler montado en el contenedor; se carga en el primer uso
+SCHEDULER_SERVICE_PATH = os.getenv("SCHEDULER_SERVICE_PATH", "/app/scheduler-mcp/service.py")
+
+
+@functools.lru_cache(maxsize=None)
+def _scheduler_service():
+    spec = importlib.util.spec_from_file_location('scheduler_service', SCHEDULER_SERVICE_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def select_exact_block(*args, **kwargs):
+    return _scheduler_service().select_exact_block(*args, **kwargs)
 
 NAME_REGEX = r"^[A-Za-zÁÉÍÓÚÜáéíóúüÑñ]+(?: [A-Za-zÁÉÍÓÚÜáéíóúüÑñ]+)+$"
 EMAIL_REGEX = r"[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}"
@@ -206,26 +267,25 @@ def extract_email_with_llm(user_text: str, timeout: float = 1.0) -> Optional[str
         "encuentras un email válido.\n\n"
         f"Usuario: \"{user_text}\""
     )
+    future = llm.submit(prompt)
     try:
-        with concurrent.futures.ThreadPoolExecutor(max_workers=1) as ex:
-            future = ex.submit(llm.generate, prompt)
-            resp = future.result(timeout=timeout)
+        resp = LlamaClient.output_text(future.result(timeout=timeout))
     except Exception as e:
+        # Si expira el tiempo, se retira la petición de la cola de inferencia
+        future.cancel()
         logging.error(f"LLM error extrayendo correo: {e}")
         return None
     email = resp.strip().splitlines()[0]
     return email if es_email_valido(email) else None
 
 def load_faq_cache() -> list:
-    global _FAQ_CACHE
-    if _FAQ_CACHE is None:
-        try:
-            with open(FAQ_DB_PATH, "r", encoding="utf-8") as f:
-                _FAQ_CACHE = json.load(f)
-        except Exception as e:
-            logging.warning(f"No se pudo cargar FAQ: {e}")
-            _FAQ_CACHE = []
-    return _FAQ_CACHE
+    """FAQ (FAQ_DB_PATH) de la versión vigente de la base de conocimiento."""
+    return knowledge_base.snapshot["faq"]
+
+
+def load_faq_index() -> FAQIndex:
+    """Índice de búsqueda de la FAQ vigente."""
+    return knowledge_base.snapshot["faq_index"]
 
 
 
@@ -264,70 +324,91 @@ INTRO_PHRASES = [
 def strip_intro_phrase(text: str) -> str:
     return text
 
+INTRO_PHRASES_NORM = [normalize_text(phrase) for phrase in INTRO_PHRASES]
+
+
 def preprocess_input(text: str) -> str:
     t = normalize_text(text).strip()
-    for phrase in INTRO_PHRASES:
-        ph = normalize_text(phrase)
+    for ph in INTRO_PHRASES_NORM:
         if t.startswith(ph):
             return t[len(ph):].lstrip()
     return t
 
 
+def _apply_priority_filter(matches: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    if any(m["entry"].get("categoria") == "despedidas" for m in matches):
+        return [m for m in matches if m["entry"].get("categoria") == "despedidas"]
+    return matches
+
+
+def lookup_faq_batch(preguntas: List[str]) -> List[Optional[Dict[str, Any]]]:
+    """Resuelve varias preguntas contra la FAQ en una sola pasada.
+
+    Las coincidencias exactas se resuelven con el índice y todas las demás
+    preguntas se puntúan juntas en una matriz ``process.cdist``. Cada
+    resultado es el mismo que daría ``lookup_faq_respuesta`` por separado.
+    """
+    results: List[Optional[Dict[str, Any]]] = [None] * len(preguntas)
+    pending = []
+    try:
+        index = load_faq_index()
+        for i, pregunta in enumerate(preguntas):
+            pregunta_norm = normalize_text(pregunta)
+
+            if "cedula" in pregunta_norm and "identidad" not in pregunta_norm:
+                continue
+
+            # Coincidencia exacta (normalizada)
+            exact = index.exact(pregunta_norm)
+            if exact:
+                entry, alt = exact
+                results[i] = {
+                    "entry": entry,
+                    "pregunta": alt,
+                    "score": 100,
+                    "needs_confirmation": False,
+                }
+                continue
+            pending.append((i, pregunta, pregunta_norm))
+
+        # Fuzzy matching y score (ordenado de mayor a menor)
+        fuzzy_batch = index.fuzzy_batch(
+            [norm for _, _, norm in pending],
+            min(FUZZY_STRICT_THRESHOLD, FUZZY_CLARIFY_THRESHOLD),
+            workers=-1 if len(pending) > 1 else 1,
+        )
+    except Exception as e:
+        logging.warning(f"No se pudo consultar FAQ: {e}")
+        return results
+    for (i, pregunta, pregunta_norm), fuzzy_matches in zip(pending, fuzzy_batch):
+        results[i] = _resolver_faq(pregunta, pregunta_norm, index, fuzzy_matches)
+    return results
+
+
 def lookup_faq_respuesta(pregunta: str) -> Optional[Dict[str, Any]]:
     """Busca la mejor coincidencia en la base de FAQ y devuelve información
     para decidir la respuesta final."""
-    def apply_priority_filter(matches: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-        if any(m["entry"].get("categoria") == "despedidas" for m in matches):
-            return [m for m in matches if m["entry"].get("categoria") == "despedidas"]
-        return matches
+    return lookup_faq_batch([pregunta])[0]
+
+
+def _resolver_faq(
+    pregunta: str,
+    pregunta_norm: str,
+    index: FAQIndex,
+    fuzzy_matches: List[Tuple[Dict[str, Any], str, float]],
+) -> Optional[Dict[str, Any]]:
+    """Decide la respuesta FAQ a partir de las coincidencias fuzzy ya calculadas."""
     try:
-        faqs = load_faq_cache()
-        pregunta_norm = normalize_text(pregunta)
-
-        if "cedula" in pregunta_norm and "identidad" not in pregunta_norm:
-            return None
-
-        best_score = 0
-        best_entry = None
-        best_alt = None
-        high_matches: List[Dict[str, Any]] = []
-
-        # Coincidencia exacta (normalizada)
-        for entry in faqs:
-            entry_preguntas = entry["pregunta"]
-            if not isinstance(entry_preguntas, list):
-                entry_preguntas = [entry_preguntas]
-            for alt in entry_preguntas:
-                alt_norm = normalize_text(alt)
-                if alt_norm == pregunta_norm:
-                    return {
-                        "entry": entry,
-                        "pregunta": alt,
-                        "score": 100,
-                        "needs_confirmation": False,
-                    }
-
-        # Fuzzy matching y score
-        for entry in faqs:
-            entry_preguntas = entry["pregunta"]
-            if not isinstance(entry_preguntas, list):
-                entry_preguntas = [entry_preguntas]
-            for alt in entry_preguntas:
-                alt_norm = normalize_text(alt)
-                score = fuzz.ratio(pregunta_norm, alt_norm)
-                if score >= FUZZY_STRICT_THRESHOLD:
-                    high_matches.append(
-                        {"entry": entry, "pregunta": alt, "score": score}
-                    )
-                if score > best_score:
-                    best_score = score
-                    best_entry = entry
-                    best_alt = alt
+        best_entry, best_alt, best_score = fuzzy_matches[0] if fuzzy_matches else (None, None, 0)
+        high_matches: List[Dict[str, Any]] = [
+            {"entry": entry, "pregunta": alt, "score": score}
+            for entry, alt, score in fuzzy_matches
+            if score >= FUZZY_STRICT_THRESHOLD
+        ]
 
         if high_matches:
-            high_matches.sort(key=lambda x: x["score"], reverse=True)
             # FILTRO: DESPEDIDAS SIEMPRE TIENEN PRIORIDAD
-            high_matches = apply_priority_filter(high_matches)
+            high_matches = _apply_priority_filter(high_matches)
             # FILTRO SALUDOS/ESTADO_ANIMO + OTRA CATEGORIA
             if len(high_matches) > 1 and any(
                 m["entry"].get("categoria") in ("saludos", "estado_animo")
@@ -378,25 +459,14 @@ def lookup_faq_respuesta(pregunta: str) -> Optional[Dict[str, Any]]:
             }
 
         # Búsqueda por palabras clave
-        pregunta_tokens = set(tokenize(pregunta_norm))
-        keyword_hits = []
-        for entry in faqs:
-            entry_preguntas = entry["pregunta"]
-            if isinstance(entry_preguntas, str):
-                entry_preguntas = [entry_preguntas]
-            for alt in entry_preguntas:
-                entry_tokens = set(tokenize(normalize_text(alt)))
-                common = pregunta_tokens & entry_tokens
-                union = pregunta_tokens | entry_tokens
-                jaccard = len(common) / len(union) if union else 0
-                if len(common) >= 2 or jaccard >= 0.3:
-                    keyword_hits.append({"entry": entry, "pregunta": alt})
-                    break
+        keyword_hits = [
+            {"entry": entry, "pregunta": alt} for entry, alt in index.keyword_hits(pregunta_norm)
+        ]
         if keyword_hits:
             logging.info(
                 f"FAQ: Sugiriendo temas por palabras clave para '{pregunta}': {[h['pregunta'] for h in keyword_hits]}"
             )
-            keyword_hits = apply_priority_filter(keyword_hits)
+            keyword_hits = _apply_priority_filter(keyword_hits)
             # FILTRO SALUDOS/ESTADO_ANIMO + OTRA CATEGORIA
             if len(keyword_hits) > 1 and any(
                 k["entry"].get("categoria") in ("saludos", "estado_animo")
@@ -423,22 +493,46 @@ def lookup_faq_respuesta(pregunta: str) -> Optional[Dict[str, Any]]:
             }
 
         logging.warning(
-            f"FAQ: Pregunta no encontrada: '{pregunta}' (mejor score: {best_score} con '{best_alt}')"
+            f"FAQ: Pregunta no encontrada: '{pregunta}' (sin coincidencias fuzzy ≥ {FUZZY_CLARIFY_THRESHOLD})"
         )
     except Exception as e:
         logging.warning(f"No se pudo consultar FAQ: {e}")
     return None
 
 
-def lookup_multiple_faqs(pregunta: str) -> Optional[str]:
-    """Intenta dividir la consulta en posibles subpreguntas y responde a cada una."""
+def dividir_subpreguntas(pregunta: str) -> List[str]:
+    """Divide la consulta en posibles subpreguntas."""
     partes = re.split(r"\?|\by\b|\be\b", pregunta)
-    partes = [p.strip() for p in partes if p.strip()]
+    return [p.strip() for p in partes if p.strip()]
+
+
+@metrics.timed("faq_match")
+def match_faq_fragments(
+    pregunta: str,
+) -> Tuple[Optional[Dict[str, Any]], List[Tuple[str, Optional[Dict[str, Any]]]]]:
+    """Busca la pregunta completa y sus subpreguntas en la FAQ en una sola pasada.
+
+    Devuelve el resultado para la pregunta completa y la decisión de cada
+    fragmento (vacía si la consulta no se puede dividir).
+    """
+    partes = dividir_subpreguntas(pregunta)
     if len(partes) < 2:
+        partes = []
+    resultados = lookup_faq_batch([pregunta] + partes)
+    return resultados[0], list(zip(partes, resultados[1:]))
+
+
+def lookup_multiple_faqs(
+    pregunta: str,
+    fragmentos: Optional[List[Tuple[str, Optional[Dict[str, Any]]]]] = None,
+) -> Optional[str]:
+    """Intenta dividir la consulta en posibles subpreguntas y responde a cada una."""
+    if fragmentos is None:
+        _, fragmentos = match_faq_fragments(pregunta)
+    if len(fragmentos) < 2:
         return None
     respuestas = []
-    for p in partes:
-        faq = lookup_faq_respuesta(p)
+    for _, faq in fragmentos:
         if faq and not faq.get("needs_confirmation"):
             respuestas.append(faq["entry"]["respuesta"])
     if len(respuestas) >= 2:
@@ -500,16 +594,20 @@ def load_prompt(prompt_name: str) -> str:
         )
 
 
-def route_to_service(tool: str) -> str:
+def service_for_tool(tool: str) -> str:
     if tool.startswith("complaint-"):
-        return MICROSERVICES["complaints-mcp"]
+        return "complaints-mcp"
     if tool.startswith("doc-"):
-        return MICROSERVICES["llm_docs-mcp"]
+        return "llm_docs-mcp"
     if tool.startswith("scheduler-"):
-        return MICROSERVICES["scheduler-mcp"]
+        return "scheduler-mcp"
     raise Exception(f"No se encuentra microservicio para tool {tool}")
 
 
+def route_to_service(tool: str) -> str:
+    return MICROSERVICES[service_for_tool(tool)]
+
+
 def validate_against_schema(data: Dict[str, Any], schema: Dict[str, Any]) -> bool:
     for req in schema.get("input_schema", {}).get("required", []):
         if req not in data:
@@ -524,30 +622,64 @@ def fill_prompt(prompt_template: str, context: Dict[str, Any]) -> str:
     return prompt
 
 
-def call_tool_microservice(tool: str, params: Dict[str, Any]) -> Dict[str, Any]:
-    service_url = route_to_service(tool)
+def prompt_static_prefix(prompt_template: str, context: Dict[str, Any]) -> str:
+    """Parte inicial del prompt que no depende de la petición.
+
+    Se rellena con los valores fijos y se corta en el primer marcador
+    pendiente; el LLM reutiliza la caché KV de este prefijo entre llamadas.
+    """
+    prompt = fill_prompt(prompt_template, context)
+    cut = prompt.find("{{")
+    return prompt if cut < 0 else prompt[:cut]
+
+
+@metrics.timed("tool_call")
+async def call_tool_microservice(tool: str, params: Dict[str, Any]) -> Dict[str, Any]:
+    result = await _post_tool(tool, params)
+    metrics.record_tool_call(tool, result)
+    return result
+
+
+async def _post_tool(tool: str, params: Dict[str, Any]) -> Dict[str, Any]:
+    service = service_for_tool(tool)
     payload = {"tool": tool, "params": params}
     try:
-        resp = requests.post(service_url, json=payload, timeout=30)
+        resp = await service_clients.client(service).request_async(
+            "POST", MICROSERVICES[service], service_clients.policy(tool), json=payload
+        )
         if 200 <= resp.status_code < 300:
             return resp.json()
         return {"error": f"Error {resp.status_code}: {resp.text}"}
-    except requests.RequestException as e:
+    except (httpx.HTTPError, requests.RequestException) as e:
+        # ``CircuitOpenError`` es un ``requests.ConnectionError``
         return {"error": f"Connection error: {e}"}
 
 
-def call_scheduler_endpoint(endpoint: str, params: Dict[str, Any]) -> Dict[str, Any]:
+# Los endpoints REST directos del scheduler son consultas (GET)
+SCHEDULER_ENDPOINT_POLICY = ToolPolicy(idempotent=True, retries=2)
+
+
+@metrics.timed("tool_call")
+async def call_scheduler_endpoint(endpoint: str, params: Dict[str, Any]) -> Dict[str, Any]:
     """Call a direct REST endpoint on the scheduler microservice."""
+    result = await _get_scheduler_endpoint(endpoint, params)
+    metrics.record_tool_call(f"scheduler:{endpoint.strip('/')}", result)
+    return result
+
+
+async def _get_scheduler_endpoint(endpoint: str, params: Dict[str, Any]) -> Dict[str, Any]:
     base = MICROSERVICES["scheduler-mcp"]
     if base.endswith("/tools/call"):
         base = base[: -len("/tools/call")]
     url = f"{base.rstrip('/')}/{endpoint.lstrip('/')}"
     try:
-        resp = requests.get(url, params=params, timeout=30)
+        resp = await service_clients.client("scheduler-mcp").request_async(
+            "GET", url, SCHEDULER_ENDPOINT_POLICY, params=params
+        )
         if 200 <= resp.status_code < 300:
             return resp.json()
         return {"error": f"Error {resp.status_code}: {resp.text}"}
-    except requests.RequestException as e:
+    except (httpx.HTTPError, requests.RequestException) as e:
         return {"error": f"Connection error: {e}"}
 
 
@@ -558,11 +690,64 @@ def find_next_available_slot():
     # TODO: implement search in scheduler service
     pass
 
+@metrics.timed("llm_generation")
 def generate_response(prompt: str) -> str:
     """Genera una respuesta utilizando el modelo Llama local."""
     return llm.generate(prompt)
 
 
+def stream_response(prompt: str) -> Iterator[str]:
+    """Genera una respuesta con el modelo local entregando los tokens a medida que se producen.
+
+    El stream del planificador admite también ``async for``.
+    """
+    return llm.generate_stream(prompt)
+
+
+async def _aiter_tokens(tokens) -> AsyncIterator[str]:
+    """Tokens de un stream asíncrono o de un iterable común."""
+    if hasattr(tokens, "__aiter__"):
+        async for token in tokens:
+            yield token
+    else:
+        for token in tokens:
+            yield token
+
+
+async def _stream_llm_answer(
+    prompt: str, session_id: str, user_input: str, cache_key: Optional[str] = None
+) -> AsyncIterator[Dict[str, Any]]:
+    """Emite los tokens del LLM y persiste la respuesta final al terminar el stream.
+
+    Cada token se espera en el loop de turnos (``async for``), sin ocupar un
+    hilo mientras el modelo genera.
+    """
+    start = time.perf_counter()
+    parts: List[str] = []
+    async for token in _aiter_tokens(stream_response(prompt)):
+        if not parts:
+            token = token.lstrip()
+            if not token:
+                continue
+        parts.append(token)
+        yield {"token": token}
+    metrics.observe_stage("llm_generation", time.perf_counter() - start)
+    ans = "".join(parts).strip()
+    if cache_key:
+        await response_cache.set_async(cache_key, ans, time.perf_counter() - start)
+    feedback = "\n¿Te fue útil mi respuesta? (Sí/No)"
+    yield {"token": feedback}
+    ans += feedback
+    # Sigue bajo el cerrojo de la sesión (ver ``orchestrate``); se guarda en
+    # una sola escritura, sin bloques abiertos entre dos ``yield``
+    async with context_manager.unit_of_work_async():
+        await context_manager.preload_async(session_id)
+        context_manager.set_feedback_pending(session_id, None)
+        context_manager.update_context(session_id, user_input, ans)
+        context_manager.clear_context_field(session_id, "doc_actual")
+    yield {"done": True, "respuesta": ans, "session_id": session_id}
+
+
 def infer_intent_with_llm(prompt):
     return generate_response(prompt)
 
@@ -580,6 +765,22 @@ def handle_confirmation(session_id: str) -> str:
     return "Entendido. ¿En qué más puedo ayudarte?"
 
 
+# Instrucciones fijas del prompt de intención: van al inicio para que la
+# caché KV del prefijo se reutilice entre peticiones.
+INTENT_PROMPT_PREFIX = (
+    "Eres un orquestador inteligente. Analiza el mensaje del usuario y "
+    "devuelve un JSON con los campos 'intent', 'confidence' (0-1) y 'sentiment' (very_negative, negative, neutral, positive, very_positive).\n"
+    "Opciones de intent:\n"
+    "complaint-registrar_reclamo, doc-buscar_fragmento_documento, "
+    "doc-generar_respuesta_llm, scheduler-reservar_hora, "
+    "scheduler-appointment_create, scheduler-listar_horas_disponibles, "
+    "scheduler-cancelar_hora, scheduler-confirmar_hora.\n"
+    "Ejemplo de respuesta JSON:\n"
+    '{"intent": "doc-generar_respuesta_llm", "confidence": 0.95, "sentiment": "neutral"}\n'
+)
+llm.register_prefix(INTENT_PROMPT_PREFIX)
+
+
 def detect_intent_llm(
     user_input: str, history: List[Dict[str, str]] = None
 ) -> Dict[str, Any]:
@@ -599,23 +800,14 @@ def detect_intent_llm(
         history_text = context_manager.get_history_as_string(history)
 
     prompt = (
-        "Eres un orquestador inteligente. Analiza el mensaje del usuario y "
-        "devuelve un JSON con los campos 'intent', 'confidence' (0-1) y 'sentiment' (very_negative, negative, neutral, positive, very_positive).\n"
-        "Opciones de intent:\n"
-        "complaint-registrar_reclamo, doc-buscar_fragmento_documento, "
-        "doc-generar_respuesta_llm, scheduler-reservar_hora, "
-        "scheduler-appointment_create, scheduler-listar_horas_disponibles, "
-        "scheduler-cancelar_hora, scheduler-confirmar_hora.\n"
-        f"Historial:\n{history_text}\nMensaje: {user_input}\n"
-        "Ejemplo de respuesta JSON:\n"
-        '{"intent": "doc-generar_respuesta_llm", "confidence": 0.95, "sentiment": "neutral"}'
-        "\nJSON:"
+        INTENT_PROMPT_PREFIX
+        + f"Historial:\n{history_text}\nMensaje: {user_input}\n"
+        + "JSON:"
     )
     logging.info("Prompt enviado a Llama: %s", prompt)
     try:
-        # Usa el modelo local de Llama vía LlamaClient
-        llama = LlamaClient()
-        predicted = llama.generate(prompt, max_tokens=256)
+        # Usa la instancia compartida del modelo local (registro de modelos)
+        predicted = llm.generate(prompt, max_tokens=256)
         logging.info(f"LLM raw response: {predicted}")
         match = re.search(r"{.*}", predicted)
         if match:
@@ -639,11 +831,8 @@ def detect_intent_llm(
 
 
 def normalize(text):
-    """Convierte texto a minúsculas y elimina tildes."""
-    text = text.lower()
-    return "".join(
-        c for c in unicodedata.normalize("NFD", text) if unicodedata.category(c) != "Mn"
-    )
+    """Convierte texto a minúsculas y elimina tildes (conserva la puntuación)."""
+    return fold_text(text)
 
 
 # Lista de stopwords simples para tokenización básica
@@ -774,10 +963,12 @@ def detect_intent_keywords(user_input: str) -> str:
     return "unknown"
 
 
-def detect_intent(
-    user_input: str, history: List[Dict[str, str]] = None
-) -> Dict[str, Any]:
-    """Obtiene intención priorizando matcher de palabras clave y desactiva LLM en tests."""
+def detect_intent_local(user_input: str) -> Optional[Dict[str, Any]]:
+    """Parte de ``detect_intent`` que no usa el LLM.
+
+    Devuelve ``None`` cuando hace falta preguntar al LLM. No toca la sesión,
+    así que el turno la puede adelantar en paralelo.
+    """
     # 4) Desactivar LLM en entorno de test
     if os.getenv("ENV") == "test":
         intent = detect_intent_keywords(user_input)
@@ -787,52 +978,52 @@ def detect_intent(
     kw_intent = detect_intent_keywords(user_input)
     if kw_intent != "unknown":
         return {"intent": kw_intent, "confidence": 0.8, "sentiment": "neutral"}
+    return None
+
+
+@metrics.timed("intent_detection")
+def detect_intent(
+    user_input: str, history: List[Dict[str, str]] = None
+) -> Dict[str, Any]:
+    """Obtiene intención priorizando matcher de palabras clave y desactiva LLM en tests."""
+    local = detect_intent_local(user_input)
+    if local is not None:
+        return local
 
     # Llamar al LLM para casos no detectados por matcher
     return detect_intent_llm(user_input, history)
 
 
-def retrieve_context_snippets(pregunta: str, limit: int = 3) -> List[str]:
+async def retrieve_context_snippets(pregunta: str, limit: int = 3) -> List[str]:
     """Devuelve fragmentos relevantes de FAQ o documentos oficiales."""
     snippets: List[str] = []
 
-    # 1) Buscar coincidencias en FAQ
+    # 1) Buscar coincidencias en FAQ (tokens de cada alternativa ya precalculados)
     try:
-        with open(FAQ_DB_PATH, "r", encoding="utf-8") as f:
-            faqs = json.load(f)
+        index = load_faq_index()
         pregunta_tokens = set(tokenize(pregunta))
-        for entry in faqs:
-            entry_preguntas = entry["pregunta"]
-            if isinstance(entry_preguntas, str):
-                entry_preguntas = [entry_preguntas]
-            for alt in entry_preguntas:
-                entry_tokens = set(tokenize(normalize_text(alt)))
-                if pregunta_tokens & entry_tokens:
-                    snippets.append(entry["respuesta"].strip())
-                    break  # Solo una vez por entrada
-            if len(snippets) >= limit:
-                break
+        last_entry = None
+        for entry_id, entry_tokens in zip(index.entry_ids, index.token_sets):
+            if entry_id == last_entry:
+                continue  # Solo una vez por entrada
+            if pregunta_tokens & entry_tokens:
+                snippets.append(index.faqs[entry_id]["respuesta"].strip())
+                last_entry = entry_id
+                if len(snippets) >= limit:
+                    break
     except Exception as e:
         logging.warning(f"No se pudo consultar contexto FAQ: {e}")
 
-    # 2) Consultar documentos en la base de datos
+    # 2) Consultar documentos en la base de datos (búsqueda rankeada)
     try:
         if len(snippets) < limit:
-            conn = get_db()
-            cur = conn.cursor(cursor_factory=RealDictCursor)
-            like = f"%{pregunta.lower()}%"
-            cur.execute(
-                "SELECT nombre, descripcion FROM documentos WHERE LOWER(nombre) LIKE %s OR LOWER(descripcion) LIKE %s LIMIT %s",
-                (like, like, limit - len(snippets)),
-            )
-            docs = cur.fetchall()
-            for doc in docs:
+            for doc in await document_search.search_async(pregunta, limit - len(snippets)):
                 texto = doc.get("descripcion") or doc.get("nombre")
                 if texto:
+                    logging.debug(f"Documento '{doc.get('nombre')}' como contexto (score {doc.get('score')})")
                     snippets.append(texto.strip())
                     if len(snippets) >= limit:
                         break
-            conn.close()
     except Exception as e:
         logging.warning(f"No se pudo consultar documentos: {e}")
 
@@ -841,58 +1032,43 @@ def retrieve_context_snippets(pregunta: str, limit: int = 3) -> List[str]:
 
 def get_best_faq_match(pregunta: str):
     """Devuelve la pregunta más parecida y su puntaje."""
-    faqs = load_faq_cache()
+    index = load_faq_index()
     pregunta_norm = normalize_text(pregunta)
     best_score = 0
     best_entry = None
     best_alt = None
-    for entry in faqs:
-        entry_preguntas = entry["pregunta"]
-        if not isinstance(entry_preguntas, list):
-            entry_preguntas = [entry_preguntas]
-        for alt in entry_preguntas:
-            alt_norm = normalize_text(alt)
-            score = fuzz.ratio(pregunta_norm, alt_norm)
-            if score > best_score:
-                best_score = score
-                best_entry = entry
-                best_alt = alt
+    for pos, alt_norm in enumerate(index.choices):
+        score = fuzz.ratio(pregunta_norm, alt_norm)
+        if score > best_score:
+            best_score = score
+            best_entry = index.faqs[index.entry_ids[pos]]
+            best_alt = index.alternatives[pos]
     return best_alt, best_score, best_entry
 
 
 def find_related_faqs(pregunta: str, limit: int = 3) -> List[str]:
     """Busca preguntas frecuentes que compartan palabras clave."""
-    faqs = load_faq_cache()
+    index = load_faq_index()
     tokens = set(tokenize(normalize_text(pregunta)))
     related = []
-    for entry in faqs:
+    last_entry = None
+    for pos, entry_tokens in enumerate(index.token_sets):
         if len(related) >= limit:
             break
-        entry_preguntas = entry["pregunta"]
-        if isinstance(entry_preguntas, str):
-            entry_preguntas = [entry_preguntas]
-        for alt in entry_preguntas:
-            entry_tokens = set(tokenize(normalize_text(alt)))
-            common = tokens & entry_tokens
-            if len(common) >= 2:
-                related.append(alt)
-                break
+        entry_id = index.entry_ids[pos]
+        if entry_id == last_entry:
+            continue
+        if len(tokens & entry_tokens) >= 2:
+            related.append(index.alternatives[pos])
+            last_entry = entry_id
     return related
 
 
 def log_missed_question(
     question: str, best_alt: Optional[str] = None, best_score: Optional[int] = None
 ):
-    """Registra preguntas no respondidas en un archivo CSV."""
-    try:
-        first = not os.path.exists(MISSED_LOG_PATH)
-        with open(MISSED_LOG_PATH, "a", encoding="utf-8") as f:
-            if first:
-                f.write("timestamp,question,best_alt,best_score\n")
-            line = f"{datetime.now().isoformat()},{question.replace(',', ' ')},{best_alt or ''},{best_score or ''}\n"
-            f.write(line)
-    except Exception as e:
-        logging.warning(f"No se pudo registrar pregunta no respondida: {e}")
+    """Registra preguntas no respondidas en el CSV (escritura diferida por lotes)."""
+    analytics.record_missed(question, best_alt, best_score)
 
 
 def registrar_pregunta_no_contestada(
@@ -901,22 +1077,29 @@ def registrar_pregunta_no_contestada(
     intent_detectada: str = "unknown",
     canal: Optional[str] = None,
     usuario_id: Optional[str] = None,
+    esperar_id: bool = False,
 ) -> Optional[int]:
-    """Inserta en la BD una pregunta no respondida y devuelve su ID."""
+    """Registra en la BD una pregunta no respondida.
+
+    Por defecto el registro se encola en ``analytics`` y se devuelve ``None``;
+    con ``esperar_id=True`` se inserta en el momento y se devuelve su ID.
+    """
+    if not esperar_id:
+        analytics.record_unanswered(texto_pregunta, respuesta_dada, intent_detectada, canal, usuario_id)
+        return None
     try:
-        conn = get_db()
-        with conn.cursor() as cur:
-            cur.execute(
-                """
-                INSERT INTO preguntas_no_contestadas (texto_pregunta, respuesta_dada, intent_detectada, canal, usuario_id)
-                VALUES (%s, %s, %s, %s, %s)
-                RETURNING id
-                """,
-                (texto_pregunta, respuesta_dada, intent_detectada, canal, usuario_id),
-            )
-            qid = cur.fetchone()[0]
-            conn.commit()
-        conn.close()
+        with db_pool.connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    """
+                    INSERT INTO preguntas_no_contestadas (texto_pregunta, respuesta_dada, intent_detectada, canal, usuario_id)
+                    VALUES (%s, %s, %s, %s, %s)
+                    RETURNING id
+                    """,
+                    (texto_pregunta, respuesta_dada, intent_detectada, canal, usuario_id),
+                )
+                qid = cur.fetchone()[0]
+                conn.commit()
         return qid
     except Exception as e:
         logging.warning(f"No se pudo registrar en BD la pregunta no contestada: {e}")
@@ -926,154 +1109,105 @@ def registrar_pregunta_no_contestada(
 def registrar_feedback_usuario(
     pregunta_id: Optional[int], feedback_texto: str, usuario_id: Optional[str] = None
 ):
-    """Guarda el feedback del usuario asociado a una pregunta no contestada."""
-    try:
-        conn = get_db()
-        with conn.cursor() as cur:
-            cur.execute(
-                """
-                INSERT INTO feedback_usuario (pregunta_id, feedback_texto, usuario_id)
-                VALUES (%s, %s, %s)
-                """,
-                (pregunta_id, feedback_texto, usuario_id),
-            )
-            conn.commit()
-        conn.close()
-    except Exception as e:
-        logging.warning(f"No se pudo registrar feedback de usuario: {e}")
+    """Encola el feedback del usuario asociado a una pregunta no contestada."""
+    analytics.record_feedback(pregunta_id, feedback_texto, usuario_id)
 
 
 def get_db():
+    """Abre una conexión nueva; solo la usa el pool ``db_pool``."""
     return psycopg2.connect(
-        host=DB_HOST, port=DB_PORT, dbname=DB_NAME, user=DB_USER, password=DB_PASS
+        host=DB_HOST, port=DB_PORT, dbname=DB_NAME, user=DB_USER, password=DB_PASS,
+        connection_factory=metrics.timed_postgres_connection(),
     )
 
 
-def buscar_documento_por_accion(accion: str):
-    conn = get_db()
-    cur = conn.cursor(cursor_factory=RealDictCursor)
-    cur.execute(
-        "SELECT * FROM documentos WHERE LOWER(nombre) LIKE %s OR LOWER(descripcion) LIKE %s LIMIT 1",
-        (f"%{accion.lower()}%", f"%{accion.lower()}%"),
+def get_db_async():
+    """Abre una conexión en modo asíncrono; solo la usa el pool ``db_pool_async``."""
+    return psycopg2.connect(
+        host=DB_HOST, port=DB_PORT, dbname=DB_NAME, user=DB_USER, password=DB_PASS, async_=1,
     )
-    doc = cur.fetchone()
-    if not doc:
-        conn.close()
+
+
+# Conexiones a PostgreSQL compartidas por todas las consultas del orquestador
+db_pool = ConnectionPool(lambda: get_db())
+# Lecturas de los turnos (búsqueda y fichas de documentos) desde el loop de turnos
+db_pool_async = AsyncConnectionPool(
+    lambda: get_db_async(), observe=lambda seconds: metrics.observe_dependency("postgres", seconds)
+)
+# Preguntas no contestadas, feedback y CSV de preguntas perdidas, por lotes
+analytics = AnalyticsSink(lambda: db_pool.connection(), MISSED_LOG_PATH)
+analytics.register_shutdown()
+# Fichas de documento (documento + tablas relacionadas) con caché en Redis
+document_cards = DocumentCards(
+    lambda: db_pool.connection(), lambda: redis_client,
+    async_connection=lambda: db_pool_async.connection(), async_redis_getter=lambda: async_redis_client,
+)
+document_search = DocumentSearch(lambda: db_pool.connection(), lambda: db_pool_async.connection())
+session_archiver = SessionArchiver(context_manager, lambda: db_pool.connection(), HISTORIAL_TABLE)
+
+
+def buscar_documento_por_accion(accion: str):
+    encontrados = document_search.search(accion, 1)
+    if not encontrados:
+        return None
+    card = document_cards.get(encontrados[0]["id_documento"], ["requisitos"], por_nombre=False)
+    if not card:
         return None
-    cur.execute(
-        "SELECT requisito FROM documento_requisitos WHERE documento_id=%s", (doc["id"],)
-    )
-    requisitos = [r["requisito"] for r in cur.fetchall()]
-    conn.close()
     return {
-        "id_documento": doc["id_documento"],
-        "nombre": doc["nombre"],
-        "requisitos": requisitos,
+        "id_documento": card["id_documento"],
+        "nombre": card["nombre"],
+        "requisitos": card["requisitos"],
     }
 
 
 def buscar_oficina_documento(id_documento: str):
-    conn = get_db()
-    cur = conn.cursor(cursor_factory=RealDictCursor)
-    cur.execute("SELECT id FROM documentos WHERE id_documento=%s", (id_documento,))
-    doc = cur.fetchone()
-    if not doc:
-        conn.close()
+    card = document_cards.get(id_documento, ["oficinas"], por_nombre=False)
+    if not card:
         return None
-    cur.execute(
-        "SELECT nombre, direccion, horario, correo, holocom FROM documento_oficinas WHERE documento_id=%s",
-        (doc["id"],),
-    )
-    oficinas = cur.fetchall()
-    conn.close()
-    return {"oficinas": oficinas}
+    return {"oficinas": card["oficinas"]}
+
+
+# Campo consultable -> (sección de la ficha, clave dentro de cada elemento)
+CAMPOS_DOCUMENTO = {
+    "requisitos": ("requisitos", None),
+    "horario": ("oficinas", "horario"),
+    "direccion": ("oficinas", "direccion"),
+    "correo": ("oficinas", "correo"),
+    "holocom": ("oficinas", "holocom"),
+    "tiempo_validez": ("duracion", None),
+    "penalidad": ("sanciones", None),
+    "notas": ("notas", None),
+}
 
 
 def buscar_info_documento_campo(clave: str, campo: str):
-    conn = get_db()
-    cur = conn.cursor(cursor_factory=RealDictCursor)
-    cur.execute(
-        "SELECT id FROM documentos WHERE id_documento=%s OR LOWER(nombre) LIKE %s",
-        (clave, f"%{clave.lower()}%"),
-    )
-    doc = cur.fetchone()
-    if not doc:
-        conn.close()
+    if campo not in CAMPOS_DOCUMENTO:
+        return None
+    seccion, atributo = CAMPOS_DOCUMENTO[campo]
+    card = document_cards.get(clave, [seccion])
+    if not card or not card[seccion]:
         return None
-    doc_id = doc["id"]
-    valor = None
     if campo == "requisitos":
-        cur.execute(
-            "SELECT requisito FROM documento_requisitos WHERE documento_id=%s",
-            (doc_id,),
-        )
-        valor = ", ".join([r["requisito"] for r in cur.fetchall()])
-    elif campo == "horario":
-        cur.execute(
-            "SELECT horario FROM documento_oficinas WHERE documento_id=%s LIMIT 1",
-            (doc_id,),
-        )
-        r = cur.fetchone()
-        valor = r["horario"] if r else None
-    elif campo == "direccion":
-        cur.execute(
-            "SELECT direccion FROM documento_oficinas WHERE documento_id=%s LIMIT 1",
-            (doc_id,),
-        )
-        r = cur.fetchone()
-        valor = r["direccion"] if r else None
-    elif campo == "correo":
-        cur.execute(
-            "SELECT correo FROM documento_oficinas WHERE documento_id=%s LIMIT 1",
-            (doc_id,),
-        )
-        r = cur.fetchone()
-        valor = r["correo"] if r else None
-    elif campo == "holocom":
-        cur.execute(
-            "SELECT holocom FROM documento_oficinas WHERE documento_id=%s LIMIT 1",
-            (doc_id,),
-        )
-        r = cur.fetchone()
-        valor = r["holocom"] if r else None
-    elif campo == "tiempo_validez":
-        cur.execute(
-            "SELECT duracion FROM documento_duracion WHERE documento_id=%s LIMIT 1",
-            (doc_id,),
-        )
-        r = cur.fetchone()
-        valor = r["duracion"] if r else None
-    elif campo == "penalidad":
-        cur.execute(
-            "SELECT sancion FROM documento_sanciones WHERE documento_id=%s LIMIT 1",
-            (doc_id,),
-        )
-        r = cur.fetchone()
-        valor = r["sancion"] if r else None
-    elif campo == "notas":
-        cur.execute(
-            "SELECT nota FROM documento_notas WHERE documento_id=%s LIMIT 1", (doc_id,)
-        )
-        r = cur.fetchone()
-        valor = r["nota"] if r else None
-    conn.close()
+        valor = ", ".join(card[seccion])
+    else:
+        primero = card[seccion][0]
+        valor = primero.get(atributo) if atributo else primero
     return {"valor": valor} if valor else None
 
 
 def buscar_listar_documentos(clase: str = None, aplica_a: str = None):
-    conn = get_db()
-    cur = conn.cursor(cursor_factory=RealDictCursor)
-    query = "SELECT id_documento, nombre FROM documentos WHERE 1=1"
-    params = []
-    if clase:
-        query += " AND clase=%s"
-        params.append(clase)
-    if aplica_a:
-        query += " AND aplica_a=%s"
-        params.append(aplica_a)
-    cur.execute(query, tuple(params))
-    docs = cur.fetchall()
-    conn.close()
+    with db_pool.connection() as conn:
+        cur = conn.cursor(cursor_factory=RealDictCursor)
+        query = "SELECT id_documento, nombre FROM documentos WHERE 1=1"
+        params = []
+        if clase:
+            query += " AND clase=%s"
+            params.append(clase)
+        if aplica_a:
+            query += " AND aplica_a=%s"
+            params.append(aplica_a)
+        cur.execute(query, tuple(params))
+        docs = cur.fetchall()
     return {"documentos": docs}
 
 
@@ -1175,69 +1309,49 @@ def extract_entities_llm_docs(text: str) -> dict:
 
 def save_conversation_to_postgres(session_id, session_data):
     try:
-        conn = get_db()
-        cur = conn.cursor()
-        cur.execute(
-            f"""
-            CREATE TABLE IF NOT EXISTS {HISTORIAL_TABLE} (
-                session_id VARCHAR(64) PRIMARY KEY,
-                data JSONB,
-                created_at TIMESTAMPTZ DEFAULT now()
+        with db_pool.connection() as conn:
+            cur = conn.cursor()
+            cur.execute(
+                f"""
+                CREATE TABLE IF NOT EXISTS {HISTORIAL_TABLE} (
+                    session_id VARCHAR(64) PRIMARY KEY,
+                    data JSONB,
+                    created_at TIMESTAMPTZ DEFAULT now()
+                )
+            """
             )
-        """
-        )
-        cur.execute(
-            f"""
-            INSERT INTO {HISTORIAL_TABLE} (session_id, data) VALUES (%s, %s)
-            ON CONFLICT (session_id) DO UPDATE SET data = EXCLUDED.data
-        """,
-            (session_id, json.dumps(session_data)),
-        )
-        conn.commit()
-        conn.close()
+            cur.execute(
+                f"""
+                INSERT INTO {HISTORIAL_TABLE} (session_id, data) VALUES (%s, %s)
+                ON CONFLICT (session_id) DO UPDATE SET data = EXCLUDED.data
+            """,
+                (session_id, json.dumps(session_data)),
+            )
+            conn.commit()
     except Exception as e:
         logging.error(f"Error guardando historial en PostgreSQL: {e}")
 
 
 def get_session(session_id):
-    session_data = redis_client.get(f"session:{session_id}")
-    if session_data:
-        return json.loads(session_data)
-    return {}
+    return context_manager.get_stored_context(session_id)
 
 
 def save_session(session_id, data):
-    redis_client.set(
-        f"session:{session_id}", json.dumps(data), ex=3600 * 24 * 7
+    context_manager.replace_context(
+        session_id, data, expiry_seconds=3600 * 24 * 7
     )  # 1 semana de expiración
 
 
 def delete_session(session_id):
-    redis_client.delete(f"session:{session_id}")
+    context_manager.clear_context(session_id)
 
 
 def migrate_sessions_to_postgres():
-    for key in redis_client.scan_iter():
-        if key.startswith("session:"):
-            session_id = key.split(":", 1)[-1]
-            session_data = get_session(session_id)
-            save_conversation_to_postgres(session_id, session_data)
-            delete_session(session_id)
-    logging.info("Migración de sesiones de Redis a PostgreSQL completada.")
-
-
-def periodic_migration():
-    while True:
-        migrate_sessions_to_postgres()
-        time.sleep(3600 * 24 * 7)  # Ejecutar cada semana
-
-
-# Lanzar el thread de migración periódica (omitable en tests)
-if os.getenv("DISABLE_PERIODIC_MIGRATION") != "1":
-    threading.Thread(target=periodic_migration, daemon=True).start()
+    """Pasada única del archivador: copia las sesiones inactivas a PostgreSQL."""
+    return session_archiver.run_once()
 
 
-def _handle_slot_filling(user_input: str, sid: str, ctx: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+async def _handle_slot_filling(user_input: str, sid: str, ctx: Dict[str, Any]) -> Optional[Dict[str, Any]]:
     """Procesa el flujo de registro de reclamos cuando hay campos pendientes."""
 
     pending = ctx.get("pending_field")
@@ -1246,7 +1360,7 @@ def _handle_slot_filling(user_input: str, sid: str, ctx: Dict[str, Any]) -> Opti
 
 # NOMBRE (LLM extraction)
     if pending == "nombre":
-        nombre = extract_name_with_llm(user_input)
+        nombre = await _offload(llm_executor, extract_name_with_llm, user_input)
         if not nombre:
             return {
                 "respuesta": (
@@ -1332,7 +1446,7 @@ def _handle_slot_filling(user_input: str, sid: str, ctx: Dict[str, Any]) -> Opti
 
     # MAIL (LLM extraction & validation)
     if pending == "mail":
-        mail = extract_email_with_llm(user_input)
+        mail = await _offload(llm_executor, extract_email_with_llm, user_input)
         if not mail:
             return {
                 "respuesta": (
@@ -1358,7 +1472,7 @@ def _handle_slot_filling(user_input: str, sid: str, ctx: Dict[str, Any]) -> Opti
         logging.info(
             f"[ORQUESTADOR] Payload enviado a complaints-mcp: {params}, rut={params.get('rut')}"
         )
-        response = call_tool_microservice("complaint-registrar_reclamo", params)
+        response = await call_tool_microservice("complaint-registrar_reclamo", params)
         logging.info(f"[ORQUESTADOR] Respuesta recibida de complaints-mcp: {response}")
         context_manager.clear_complaint_state(sid)
         if "error" in response:
@@ -1381,7 +1495,7 @@ def _handle_slot_filling(user_input: str, sid: str, ctx: Dict[str, Any]) -> Opti
 
 
 @audit_step("handle_agenda")
-def handle_agenda(texto_usuario: str, sid: str) -> Dict[str, Any]:
+async def handle_agenda(texto_usuario: str, sid: str) -> Dict[str, Any]:
     fecha, hora = parse_date_time(texto_usuario, trace_id=sid)
     ctx = context_manager.get_context(sid)
     agenda = ctx.get("agenda", {"fecha": None, "hora": None})
@@ -1402,7 +1516,7 @@ def handle_agenda(texto_usuario: str, sid: str) -> Dict[str, Any]:
         return {"answer": msg, "pending": True}
 
     payload = {"fecha": agenda["fecha"], "hora": agenda["hora"]}
-    resultado = call_tool_microservice("scheduler-listar_horas_disponibles", payload)
+    resultado = await call_tool_microservice("scheduler-listar_horas_disponibles", payload)
     # Compatibilidad: acepta tanto 'data' como 'disponibles' como clave de bloques
     horas = resultado.get("data")
     if horas is None:
@@ -1419,7 +1533,7 @@ def handle_agenda(texto_usuario: str, sid: str) -> Dict[str, Any]:
     return {"answer": msg, "finish": True}
 
 
-def _handle_scheduler_flow(sid: str, user_text: str, base_dt: datetime) -> dict:
+async def _handle_scheduler_flow(sid: str, user_text: str, base_dt: datetime) -> dict:
     """Flujo paso a paso para agendar citas."""
 
     ctx = context_manager.get_context(sid)
@@ -1442,7 +1556,7 @@ def _handle_scheduler_flow(sid: str, user_text: str, base_dt: datetime) -> dict:
             return {"answer": FIELD_QUESTIONS["nombre_cita"], "pending": True}
         elif opciones and choice == len(opciones) + 1:
             excluidos = [b.get("id") for b in opciones]
-            nuevas = call_tool_microservice(
+            nuevas = await call_tool_microservice(
                 "scheduler-listar_horas_cercanas",
                 {
                     "fecha": ctx.get("last_search_fecha"),
@@ -1499,7 +1613,7 @@ def _handle_scheduler_flow(sid: str, user_text: str, base_dt: datetime) -> dict:
 
         # Buscar bloques disponibles
         payload = {"fecha": ctx["bloque_cita"]["fecha"], "hora": ctx["bloque_cita"]["hora"]}
-        raw = call_tool_microservice("scheduler-listar_horas_disponibles", payload)
+        raw = await call_tool_microservice("scheduler-listar_horas_disponibles", payload)
         bloques = raw.get("data") or raw.get("disponibles", [])
         hora_user_dt = datetime.strptime(
             ctx["bloque_cita"]["hora"], "%H:%M"
@@ -1529,7 +1643,7 @@ def _handle_scheduler_flow(sid: str, user_text: str, base_dt: datetime) -> dict:
             ]
             return {"answer": "\n".join(lines), "pending": True}
 
-        alternativas = call_tool_microservice(
+        alternativas = await call_tool_microservice(
             "scheduler-listar_horas_cercanas",
             {"fecha": ctx["bloque_cita"]["fecha"], "hora_rango": f"{ctx['bloque_cita']['hora']}-%", "limit": 5},
         )
@@ -1563,7 +1677,7 @@ def _handle_scheduler_flow(sid: str, user_text: str, base_dt: datetime) -> dict:
             context_manager.update_pending_field(sid, "hora_cita")
             return {"answer": "¿A qué hora te gustaría reservar la cita?", "pending": True}
         context_manager.update_pending_field(sid, "bloque_cita")
-        return _handle_scheduler_flow(sid, "", base_dt)
+        return await _handle_scheduler_flow(sid, "", base_dt)
 
     if pending == "hora_cita":
         hora = entities.get("hora")
@@ -1575,10 +1689,10 @@ def _handle_scheduler_flow(sid: str, user_text: str, base_dt: datetime) -> dict:
             context_manager.update_pending_field(sid, "fecha_cita")
             return {"answer": "¿En qué fecha deseas la cita?", "pending": True}
         context_manager.update_pending_field(sid, "bloque_cita")
-        return _handle_scheduler_flow(sid, "", base_dt)
+        return await _handle_scheduler_flow(sid, "", base_dt)
 
     if pending == "nombre_cita":
-        nombre = extract_name_with_llm(user_text)
+        nombre = await _offload(llm_executor, extract_name_with_llm, user_text)
         if not nombre:
             return {"answer": FIELD_QUESTIONS["nombre_cita"], "pending": True}
         ctx["nombre_cita"] = nombre
@@ -1626,7 +1740,7 @@ def _handle_scheduler_flow(sid: str, user_text: str, base_dt: datetime) -> dict:
         return {"answer": FIELD_QUESTIONS["mail_cita"], "pending": True}
 
     if pending == "mail_cita":
-        mail = extract_email_with_llm(user_text)
+        mail = await _offload(llm_executor, extract_email_with_llm, user_text)
         if not mail:
             return {"answer": FIELD_QUESTIONS["mail_cita"], "pending": True}
         ctx["mail_cita"] = mail
@@ -1649,7 +1763,7 @@ def _handle_scheduler_flow(sid: str, user_text: str, base_dt: datetime) -> dict:
             payload["departamento_codigo"] = ctx["depto_cita"]
         import logging
         logging.info(f"[SCHEDULER] Payload enviado a scheduler-reservar_hora: {payload}")
-        tool_result = call_tool_microservice("scheduler-reservar_hora", payload)
+        tool_result = await call_tool_microservice("scheduler-reservar_hora", payload)
         logging.info(f"[SCHEDULER] Respuesta recibida de scheduler-reservar_hora: {tool_result}")
         # Mostrar mensaje de error específico si está presente
         if tool_result.get("error"):
@@ -1677,10 +1791,310 @@ def orchestrate(
     user_input: str,
     extra_context: Optional[Dict[str, Any]] = None,
     session_id: Optional[str] = None,
+    stream: bool = False,
+) -> Dict[str, Any]:
+    """Procesa un turno de conversación.
+
+    Los turnos de una misma sesión se procesan en orden de llegada
+    (``session_lock``); la sesión se lee una vez y se guarda una vez al final
+    del turno (``context_manager.unit_of_work_async``). El turno corre en el
+    loop de turnos y este hilo espera su resultado. Con ``stream=True`` la
+    rama de respuesta generada por el LLM devuelve en ``"stream"`` un
+    iterador de eventos en lugar de esperar la respuesta completa; la sesión
+    sigue retenida hasta que el iterador termina (o se cierra), porque la
+    respuesta se guarda al final del stream.
+    """
+    with contextlib.ExitStack() as stack:
+        stack.enter_context(session_lock.hold(session_id))
+        result = _submit(_run_turn(user_input, extra_context, session_id, stream)).result()
+        if isinstance(result, dict) and result.get("stream") is not None:
+            result["stream"] = _HeldStream(result["stream"], stack.pop_all())
+        return result
+
+
+class _HeldStream:
+    """Eventos de un turno en streaming que retienen la sesión.
+
+    El stream del turno se consume en el loop de turnos (``_forward``) y sus
+    eventos llegan por una cola. ``stack`` (el cerrojo de la sesión) se
+    libera cuando el stream termina, falla, se cierra o se recolecta sin
+    haberse consumido.
+    """
+
+    def __init__(self, events: AsyncIterator[Dict[str, Any]], stack: contextlib.ExitStack):
+        self._events = pending = queue.Queue()
+        self._stack = stack
+        self._done = False
+        self._taken: Optional[asyncio.Future] = None
+        # ``pending`` y no ``self``: la tarea no debe mantener vivo el stream
+        self._pump = _submit(_forward(events, lambda *item: pending.put(item)))
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> Dict[str, Any]:
+        if self._done:
+            raise StopIteration
+        _take(self._taken)
+        event, self._taken = self._events.get()
+        if event is _END_OF_STREAM:
+            self._done = True
+            try:
+                self._pump.result()
+            finally:
+                self.close()
+            raise StopIteration
+        return event
+
+    def close(self):
+        self._done = True
+        try:
+            self._pump.cancel()
+        finally:
+            self._stack.close()
+
+    def __del__(self):
+        self.close()
+
+
+# Los turnos corren como corrutinas en un event loop propio, dueño de los
+# clientes asíncronos (Redis, PostgreSQL, HTTP): la espera de E/S no ocupa
+# hilos y el turno es el mismo tanto para los endpoints como para
+# ``orchestrate`` síncrono. Solo el LLM y las búsquedas difusas (rapidfuzz)
+# pasan a executors acotados.
+_turn_loop: Optional[asyncio.AbstractEventLoop] = None
+_turn_loop_lock = threading.Lock()
+
+
+def turn_loop() -> asyncio.AbstractEventLoop:
+    """Event loop de los turnos; se crea con su hilo en el primer uso."""
+    global _turn_loop
+    with _turn_loop_lock:
+        if _turn_loop is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="turn-loop", daemon=True).start()
+            _turn_loop = loop
+    return _turn_loop
+
+
+def _submit(coro) -> concurrent.futures.Future:
+    return asyncio.run_coroutine_threadsafe(coro, turn_loop())
+
+
+async def _close_turn_clients():
+    await service_clients.aclose()
+    db_pool_async.close()
+
+
+def _offload(executor: concurrent.futures.Executor, fn, *args) -> asyncio.Future:
+    """Ejecuta ``fn`` en ``executor`` con una copia del contexto del turno."""
+    context = contextvars.copy_context()
+    return asyncio.get_running_loop().run_in_executor(executor, functools.partial(context.run, fn, *args))
+
+
+# Turnos de /orchestrate en curso a la vez; el resto espera su lugar en el loop
+ORCHESTRATE_WORKERS = int(os.getenv("ORCHESTRATE_WORKERS", "32"))
+_turn_slots = asyncio.Semaphore(ORCHESTRATE_WORKERS)
+_turn_stats = {"queued": 0, "running": 0, "completed": 0}
+_turn_stats_lock = threading.Lock()
+# Generación, intención y extracción de datos con el LLM
+TURN_LLM_WORKERS = int(os.getenv("TURN_LLM_WORKERS", "8"))
+llm_executor = concurrent.futures.ThreadPoolExecutor(
+    max_workers=TURN_LLM_WORKERS, thread_name_prefix="llm"
+)
+
+
+def _count_turn(queued: int = 0, running: int = 0, completed: int = 0):
+    with _turn_stats_lock:
+        _turn_stats["queued"] += queued
+        _turn_stats["running"] += running
+        _turn_stats["completed"] += completed
+
+
+async def _orchestrate_unit(
+    user_input: str,
+    extra_context: Optional[Dict[str, Any]],
+    session_id: Optional[str],
+    stream: bool = False,
+) -> Dict[str, Any]:
+    lookups = _TurnLookups()
+    with metrics.turn():
+        async with context_manager.unit_of_work_async():
+            try:
+                return await _orchestrate_turn(user_input, extra_context, session_id, stream, lookups)
+            finally:
+                lookups.discard()
+
+
+async def _run_turn(*args) -> Dict[str, Any]:
+    _count_turn(queued=1)
+    try:
+        await _turn_slots.acquire()
+    finally:
+        _count_turn(queued=-1)
+    _count_turn(running=1)
+    try:
+        return await _orchestrate_unit(*args)
+    finally:
+        _turn_slots.release()
+        _count_turn(running=-1, completed=1)
+
+
+async def _held_turn(*args) -> Dict[str, Any]:
+    async with session_lock.hold_async(args[2]):
+        return await _run_turn(*args)
+
+
+async def orchestrate_async(
+    user_input: str,
+    extra_context: Optional[Dict[str, Any]] = None,
+    session_id: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Variante de ``orchestrate`` para corrutinas.
+
+    El turno, incluida la espera por los turnos anteriores de la sesión con
+    ``redis.asyncio``, corre en el loop de turnos; aquí solo se espera su
+    resultado. Los turnos en exceso esperan su lugar sin ocupar hilos.
+    """
+    return await asyncio.wrap_future(_submit(_held_turn(user_input, extra_context, session_id)))
+
+
+_END_OF_STREAM = object()
+
+
+async def _forward(events: AsyncIterator[Dict[str, Any]], emit) -> None:
+    """Consume ``events`` en una sola tarea y entrega cada evento a ``emit``.
+
+    ``emit`` recibe el evento y un future que el consumidor resuelve con
+    ``_take`` al pedir el siguiente: el turno avanza al ritmo del cliente y
+    retiene la sesión hasta que este recibe el último evento.
+    """
+    loop = asyncio.get_running_loop()
+    try:
+        async with contextlib.aclosing(events):
+            async for event in events:
+                taken = loop.create_future()
+                emit(event, taken)
+                await taken
+    finally:
+        emit(_END_OF_STREAM, None)
+
+
+def _take(taken: Optional[asyncio.Future]) -> None:
+    """Avisa a ``_forward`` (desde cualquier hilo) de que puede seguir."""
+    if taken is not None:
+        taken.get_loop().call_soon_threadsafe(lambda: taken.done() or taken.set_result(None))
+
+
+async def _turn_events(
+    user_input: str, extra_context: Optional[Dict[str, Any]], session_id: Optional[str]
+) -> AsyncIterator[Dict[str, Any]]:
+    async with session_lock.hold_async(session_id):
+        result = await _run_turn(user_input, extra_context, session_id, True)
+        if result is None:
+            logger.error("Tool handler returned None")
+            yield {"done": True, "respuesta": "Lo siento, hubo un error interno."}
+            return
+        token_stream = result.pop("stream", None)
+        if token_stream is None:
+            yield {"done": True, **result}
+            return
+        async with contextlib.aclosing(token_stream):
+            async for event in token_stream:
+                yield event
+
+
+async def orchestrate_stream_async(
+    user_input: str,
+    extra_context: Optional[Dict[str, Any]] = None,
+    session_id: Optional[str] = None,
+) -> AsyncIterator[Dict[str, Any]]:
+    """Variante en streaming de ``orchestrate_async``.
+
+    Emite los eventos del turno; el último lleva ``"done": True``. El turno y
+    su stream son una sola tarea del loop de turnos, que espera cada token
+    del LLM sin ocupar un hilo, y el cerrojo de la sesión se retiene hasta
+    que el stream termina o el cliente se desconecta (se cancela la tarea).
+    """
+    loop = asyncio.get_running_loop()
+    events: "asyncio.Queue[Any]" = asyncio.Queue()
+    pump = _submit(_forward(
+        _turn_events(user_input, extra_context, session_id),
+        lambda *item: loop.call_soon_threadsafe(events.put_nowait, item),
+    ))
+    try:
+        while True:
+            event, taken = await events.get()
+            if event is _END_OF_STREAM:
+                break
+            yield event
+            _take(taken)
+        await asyncio.wrap_future(pump)
+    finally:
+        pump.cancel()
+
+
+# Búsquedas de un turno que se adelantan en paralelo (TURN_FANOUT=0 las
+# ejecuta en serie, en el punto donde se usan)
+TURN_FANOUT = os.getenv("TURN_FANOUT", "1") != "0"
+TURN_LOOKUP_WORKERS = int(os.getenv("TURN_LOOKUP_WORKERS", "16"))
+lookup_executor = concurrent.futures.ThreadPoolExecutor(
+    max_workers=TURN_LOOKUP_WORKERS, thread_name_prefix="lookup"
+)
+
+
+class _TurnLookups:
+    """Candidatos independientes de un turno calculados de antemano.
+
+    ``start`` lanza la búsqueda como tarea del loop de turnos; ``get`` espera
+    su resultado o, si no se lanzó, la ejecuta en el momento. El orden de
+    prioridad lo sigue decidiendo el turno, que consulta los candidatos en
+    el mismo orden que antes. Las corrutinas (consultas a Postgres) corren en
+    el loop y las funciones síncronas (búsquedas difusas) en
+    ``lookup_executor``; todas con el contexto del turno, así su tiempo en
+    Redis y Postgres cuenta para el turno. Las búsquedas no deben tocar la
+    sesión.
+    """
+
+    def __init__(self):
+        self._tasks: Dict[str, asyncio.Future] = {}
+
+    @staticmethod
+    def _run(fn, *args):
+        if inspect.iscoroutinefunction(fn):
+            return fn(*args)
+        return _offload(lookup_executor, fn, *args)
+
+    def start(self, name: str, fn, *args):
+        if TURN_FANOUT:
+            self._tasks[name] = asyncio.ensure_future(self._run(fn, *args))
+
+    async def get(self, name: str, fn, *args):
+        task = self._tasks.pop(name, None)
+        return await (self._run(fn, *args) if task is None else task)
+
+    def discard(self):
+        for task in self._tasks.values():
+            task.cancel()
+        self._tasks.clear()
+
+
+async def _responder_documento(pregunta: str, sid: str, **kwargs) -> str:
+    """``responder_sobre_documento`` con la búsqueda difusa fuera del loop."""
+    match = await _offload(lookup_executor, match_documento, pregunta)
+    return responder_sobre_documento(pregunta, sid, match=match, **kwargs)
+
+
+async def _orchestrate_turn(
+    user_input: str,
+    extra_context: Optional[Dict[str, Any]],
+    session_id: Optional[str],
+    stream: bool,
+    lookups: _TurnLookups,
 ) -> Dict[str, Any]:
     sid = session_id or str(uuid.uuid4())
 
-    ctx = context_manager.get_context(sid)
+    ctx = await context_manager.get_context_async(sid)
 
     # Comando para cancelar flujo en curso (se revisa antes de slot-filling)
     if re.search(r"\b(cancelar|anular|olvida|olvídalo|terminar|salir)\b", user_input, re.IGNORECASE):
@@ -1709,8 +2123,9 @@ def orchestrate(
 
     # ----------- Inicio prioridad modo cita -----------
     if context_manager.get_current_flow(sid) == "scheduler":
-        result = _handle_scheduler_flow(sid, user_input, datetime.now(tz=SANTIAGO_TZ))
+        result = await _handle_scheduler_flow(sid, user_input, datetime.now(tz=SANTIAGO_TZ))
         if result.get("pending") or result.get("finish"):
+            metrics.set_route("scheduler")
             return format_response(result, sid, trace_id=sid)
     # ----------- Fin prioridad modo cita -----------
 
@@ -1718,11 +2133,13 @@ def orchestrate(
     pending = ctx.get("pending_field")
     if pending:
         try:
-            slot_resp = _handle_slot_filling(user_input, sid, ctx)
+            slot_resp = await _handle_slot_filling(user_input, sid, ctx)
         except Exception:
             logging.exception("[ORQUESTADOR] Error en _handle_slot_filling")
+            metrics.set_route("error")
             return {"respuesta": "Lo siento, hubo un error interno.", "session_id": sid}
         if slot_resp:
+            metrics.set_route("complaint")
             return slot_resp
     raw = user_input.strip()
     if not (
@@ -1793,7 +2210,7 @@ def orchestrate(
             }
             campo = campo_map.get(campo_raw.lower())
             if campo:
-                resp = responder_sobre_documento(
+                resp = await _responder_documento(
                     user_input,
                     sid,
                     tipo=tipo + "s",
@@ -1802,6 +2219,7 @@ def orchestrate(
                 )
                 context_manager.clear_consultas_tramites_pending(sid)
                 context_manager.update_context(sid, user_input, resp)
+                metrics.set_route("document")
                 return {"respuesta": resp, "session_id": sid}
 
     if context_manager.get_pending_confirmation(sid) and context_manager.get_current_flow(sid) == "documento":
@@ -1820,11 +2238,13 @@ def orchestrate(
 
     # Procesar formulario de reclamo si hay campos pendientes
     try:
-        resp = _handle_slot_filling(user_input, sid, ctx)
+        resp = await _handle_slot_filling(user_input, sid, ctx)
     except Exception:
         logging.exception("[ORQUESTADOR] Error en _handle_slot_filling")
+        metrics.set_route("error")
         return {"respuesta": "Lo siento, hubo un error interno.", "session_id": sid}
     if resp:
+        metrics.set_route("complaint")
         return resp
 
     # --- Manejar despedidas de forma prioritaria ---
@@ -1873,6 +2293,7 @@ def orchestrate(
                 context_manager.clear_faq_clarification(sid)
                 context_manager.reset_fallback_count(sid)
                 context_manager.set_last_sentiment(sid, "neutral")
+                metrics.set_route("faq")
                 return {"respuesta": answer, "session_id": sid}
             if re.fullmatch(r"(?i)no|n|nope", user_input.strip()):
                 context_manager.clear_faq_clarification(sid)
@@ -1899,6 +2320,7 @@ def orchestrate(
                 context_manager.clear_faq_clarification(sid)
                 context_manager.reset_fallback_count(sid)
                 context_manager.set_last_sentiment(sid, "neutral")
+                metrics.set_route("faq")
                 return {"respuesta": answer, "session_id": sid}
             else:
                 return {
@@ -1913,9 +2335,10 @@ def orchestrate(
             orig_q = pending_doc.get("question", "")
             doc_name = pending_doc.get("doc")
             context_manager.clear_doc_clarification(sid)
-            resp = responder_sobre_documento(f"{doc_name} {orig_q}", sid)
+            resp = await _responder_documento(f"{doc_name} {orig_q}", sid)
             context_manager.update_context(sid, user_input, resp)
             context_manager.set_current_flow(sid, "documento")
+            metrics.set_route("document")
             return {"respuesta": resp, "session_id": sid}
         if re.fullmatch(r"(?i)no|n|nope", user_input.strip()):
             context_manager.clear_doc_clarification(sid)
@@ -1976,10 +2399,11 @@ def orchestrate(
 
     # --- Listado de trámites solicitado directamente ---
     if is_list_request(user_input):
-        resp = responder_sobre_documento(user_input, sid, listar_todo=True)
+        resp = await _responder_documento(user_input, sid, listar_todo=True)
         context_manager.set_current_flow(sid, "documento")
         context_manager.update_context(sid, user_input, resp)
         context_manager.reset_fallback_count(sid)
+        metrics.set_route("document")
         return {"respuesta": resp, "session_id": sid}
 
     # --- Detectar intención de reclamo o cita antes de consultar FAQ ---
@@ -1994,7 +2418,8 @@ def orchestrate(
             or agenda.get("fecha")
             or agenda.get("hora")
         ):
-            result = handle_agenda(user_input, sid)
+            result = await handle_agenda(user_input, sid)
+            metrics.set_route("scheduler")
             return format_response(result, sid, trace_id=sid)
 
         if kw_intent == "scheduler-appointment_create" or re.search(
@@ -2004,6 +2429,7 @@ def orchestrate(
         ):
             context_manager.set_pending_confirmation(sid, True)
             context_manager.set_current_flow(sid, "cita")
+            metrics.set_route("scheduler")
             msg = (
                 "Entiendo. Si quieres reservar una cita con un funcionario, puedo ayudarte a agendarla por este mismo medio. "
                 "¿Quieres hacerla ahora mismo?"
@@ -2013,6 +2439,7 @@ def orchestrate(
         if kw_intent == "complaint-registrar_reclamo":
             context_manager.set_pending_confirmation(sid, True)
             context_manager.set_current_flow(sid, "reclamo")
+            metrics.set_route("complaint")
             # dividimos en dos burbujas 
             privacy_msg = (
                 "Si quieres hacer un reclamo o una denuncia estoy a tu disposición para registrarlo. "
@@ -2024,14 +2451,27 @@ def orchestrate(
             context_manager.update_context(sid, "", question_msg)
             return {"respuestas": [privacy_msg, question_msg], "session_id": sid}
 
+    # Los candidatos que no dependen entre sí ni tocan la sesión (FAQ,
+    # documento e intención sin LLM) se calculan en paralelo; el turno los
+    # consulta después en el mismo orden de prioridad de siempre. Con una
+    # confirmación pendiente solo la FAQ puede ganarle, así que el resto no
+    # se adelanta.
+    pending_confirmation = context_manager.get_pending_confirmation(sid)
+    lookups.start("faq", match_faq_fragments, user_input)
+    if not pending_confirmation:
+        lookups.start("document", match_documento, user_input)
+        lookups.start("intent", detect_intent_local, user_input)
+
     # === 0) Consultar primero en la base de FAQs ===
-    multi = lookup_multiple_faqs(user_input)
+    # La pregunta completa y sus subpreguntas se puntúan en una sola pasada
+    faq, fragmentos = await lookups.get("faq", match_faq_fragments, user_input)
+    multi = lookup_multiple_faqs(user_input, fragmentos)
     if multi:
         context_manager.update_context(sid, user_input, multi)
         context_manager.clear_context_field(sid, "doc_actual")
+        metrics.set_route("faq")
         return {"respuesta": multi, "session_id": sid}
 
-    faq = lookup_faq_respuesta(user_input)
     if faq is not None:
         if faq.get("needs_confirmation"):
             alts = faq.get("alternatives", [])
@@ -2052,6 +2492,7 @@ def orchestrate(
                 )
             context_manager.update_context(sid, user_input, msg)
             context_manager.clear_context_field(sid, "doc_actual")
+            metrics.set_route("faq")
             return {"respuesta": msg, "session_id": sid}
 
         answer = faq["entry"]["respuesta"]
@@ -2068,6 +2509,7 @@ def orchestrate(
         if faq["entry"].get("categoria") == "despedidas":
             context_manager.clear_context(sid)
             delete_session(sid)
+            metrics.set_route("faq")
             return {"respuesta": answer, "session_id": sid}
 
         if faq["entry"].get("categoria") == "consultas_tramites":
@@ -2081,10 +2523,11 @@ def orchestrate(
         context_manager.clear_context_field(sid, "doc_actual")
         context_manager.reset_fallback_count(sid)
         context_manager.set_last_sentiment(sid, "neutral")
+        metrics.set_route("faq")
         return {"respuesta": answer, "session_id": sid}
 
     # --- Handler UNIFICADO de confirmaciones ---
-    if context_manager.get_pending_confirmation(sid):
+    if pending_confirmation:
         answer = user_input.strip().lower()
         ok = bool(re.search(r"\b(s[ií]|si|claro|ok|vale|por supuesto|bueno|me parece|obvio que si|demosle|me parece|dale)\b", answer, re.IGNORECASE))
         flow = context_manager.get_current_flow(sid)
@@ -2116,6 +2559,7 @@ def orchestrate(
                 if availability_found is False and attempts >= 2:
                     find_next_available_slot()
                 pregunta = "Perfecto. Antes de agendar la cita recuerda que nuestros horarios de atención son de lunes a viernes de 8:30 a 12:30. ¿En qué fecha y hora te gustaría reservar?"
+            metrics.set_route("complaint" if flow == "reclamo" else "scheduler")
             return {"respuesta": pregunta, "session_id": sid}
         else:
             msg = "Entendido. ¿En qué más puedo ayudarte?"
@@ -2123,8 +2567,11 @@ def orchestrate(
             return {"respuesta": msg, "session_id": sid}
 
     # --- INTEGRACIÓN: Respuesta combinada de documentos/oficinas/FAQ ---
-    respuesta_doc = responder_sobre_documento(user_input, sid)
+    respuesta_doc = responder_sobre_documento(
+        user_input, sid, match=await lookups.get("document", match_documento, user_input)
+    )
     if respuesta_doc and not respuesta_doc.startswith("¿Podrías especificar"):
+        metrics.set_route("document")
         context_manager.update_context(sid, user_input, respuesta_doc)
         context_manager.set_current_flow(sid, "documento")
         context_manager.reset_fallback_count(sid)
@@ -2132,9 +2579,15 @@ def orchestrate(
         return {"respuesta": respuesta_doc, "session_id": sid}
 
 
-    # Obtener o crear session_id
-    if not session_id:
-        session_id = str(uuid.uuid4())
+    # Las palabras clave no llevan a herramientas que usen fragmentos; si la
+    # intención necesita el LLM, el contexto para la respuesta (consulta a
+    # Postgres) se busca mientras tanto, ya descartado el documento
+    intent_data = await lookups.get("intent", detect_intent_local, user_input)
+    if intent_data is None:
+        lookups.start("snippets", retrieve_context_snippets, user_input)
+
+    # El resto del turno usa la misma sesión que el principio
+    session_id = sid
     session = get_session(session_id)
     convo_ctx = context_manager.get_context(session_id)
     if extra_context:
@@ -2142,7 +2595,8 @@ def orchestrate(
     # Mantener la consulta original en la sesión para validaciones posteriores
     session["pregunta"] = user_input
     # Detectar intención
-    intent_data = detect_intent(user_input, convo_ctx.get("history"))
+    if intent_data is None:
+        intent_data = await _offload(llm_executor, detect_intent, user_input, convo_ctx.get("history"))
     tool = intent_data.get("intent")
     confidence = intent_data.get("confidence", 0)
     sentiment = intent_data.get("sentiment", "neutral")
@@ -2154,6 +2608,7 @@ def orchestrate(
         if fallback_count >= 3 or sentiment == "very_negative":
             fallback_resp = "Lo siento, no puedo ayudarte en esto. Te pasaré con un agente humano."
             context_manager.update_context(session_id, user_input, fallback_resp)
+            metrics.set_route("fallback")
             return {"respuesta": fallback_resp, "session_id": session_id, "escalado": True}
         elif fallback_count == 2:
             fallback_resp = (
@@ -2163,16 +2618,19 @@ def orchestrate(
             fallback_resp = "No encontré información precisa. ¿Podrías darme más detalles o especificar el trámite?"
         context_manager.update_context(session_id, user_input, fallback_resp)
         context_manager.clear_context_field(session_id, "doc_actual")
+        metrics.set_route("fallback")
         return {"respuesta": fallback_resp, "session_id": session_id}
     else:
         context_manager.reset_fallback_count(session_id)
 
     if tool == "scheduler-appointment_create":
-        result = _handle_scheduler_flow(sid, user_input, datetime.now(tz=SANTIAGO_TZ))
+        result = await _handle_scheduler_flow(sid, user_input, datetime.now(tz=SANTIAGO_TZ))
+        metrics.set_route("scheduler")
         return format_response(result, sid, trace_id=sid)
 
     if tool in ("unknown", "doc-generar_respuesta_llm"):
-        faq_hit = lookup_faq_respuesta(user_input)
+        # Reutiliza la búsqueda FAQ hecha al inicio del turno
+        faq_hit = faq
         if faq_hit:
             if faq_hit.get("needs_confirmation"):
                 context_manager.set_faq_clarification(session_id, faq_hit)
@@ -2189,6 +2647,7 @@ def orchestrate(
                     )
                 context_manager.update_context(session_id, user_input, msg)
                 context_manager.clear_context_field(session_id, "doc_actual")
+                metrics.set_route("faq")
                 return {"respuesta": msg, "session_id": session_id}
 
             answer = faq_hit["entry"]["respuesta"]
@@ -2196,26 +2655,41 @@ def orchestrate(
             context_manager.set_feedback_pending(session_id, None)
             context_manager.update_context(session_id, user_input, answer)
             context_manager.clear_context_field(session_id, "doc_actual")
+            metrics.set_route("faq")
             return {"respuesta": answer, "session_id": session_id}
 
-        snippets = retrieve_context_snippets(user_input)
+        snippets = await lookups.get("snippets", retrieve_context_snippets, user_input)
         history = convo_ctx.get("history", [])
         history_text = context_manager.get_history_as_string(history)
         prompt_template = load_prompt("doc-generar_respuesta_llm.txt")
-        prompt = fill_prompt(
-            prompt_template,
-            {
-                "pregunta": user_input,
-                "language": "es",
-                "faq_context": "\n".join(snippets),
-            },
-        )
-        prompt = f"{history_text}\n{prompt}"
-        ans = generate_response(prompt)
+        faq_context = "\n".join(snippets)
+        cache_key = response_cache.make_key(normalize_text(user_input), faq_context, prompt_template)
+        ans = await response_cache.get_async(cache_key)
+        if ans is None:
+            llm.register_prefix(prompt_static_prefix(prompt_template, {"language": "es"}))
+            prompt = fill_prompt(
+                prompt_template,
+                {
+                    "language": "es",
+                    "faq_context": faq_context,
+                    "historial": history_text,
+                    "pregunta": user_input,
+                },
+            )
+            if stream:
+                metrics.set_route("llm")
+                return {
+                    "session_id": session_id,
+                    "stream": _stream_llm_answer(prompt, session_id, user_input, cache_key),
+                }
+            start = time.perf_counter()
+            ans = await _offload(llm_executor, generate_response, prompt)
+            await response_cache.set_async(cache_key, ans, time.perf_counter() - start)
         ans += "\n¿Te fue útil mi respuesta? (Sí/No)"
         context_manager.set_feedback_pending(session_id, None)
         context_manager.update_context(session_id, user_input, ans)
         context_manager.clear_context_field(session_id, "doc_actual")
+        metrics.set_route("llm")
         return {"respuesta": ans, "session_id": session_id}
 
 
@@ -2230,7 +2704,7 @@ class OrchestratorInput(BaseModel):
 
 
 @app.post("/orchestrate")
-def orchestrate_api(input: OrchestratorInput, request: Request):
+async def orchestrate_api(input: OrchestratorInput, request: Request):
     """
     Endpoint principal para web-interface, evolution-api, etc.
     Recibe una pregunta o instrucción del usuario, y (opcional) contexto extra.
@@ -2240,7 +2714,7 @@ def orchestrate_api(input: OrchestratorInput, request: Request):
         extra_context = input.context or {}
         if ip:
             extra_context["ip"] = ip
-        result = orchestrate(input.pregunta, extra_context, input.session_id)
+        result = await orchestrate_async(input.pregunta, extra_context, input.session_id)
         if result is None:
             logger.error("Tool handler returned None")
             return {"answer": "Lo siento, hubo un error interno."}
@@ -2262,125 +2736,222 @@ def orchestrate_api(input: OrchestratorInput, request: Request):
         }
 
 
+@app.post("/orchestrate/stream")
+async def orchestrate_stream_api(input: OrchestratorInput, request: Request):
+    """
+    Variante en streaming de /orchestrate (NDJSON).
+    Las respuestas generadas por el LLM se emiten como líneas {"token": ...}
+    y terminan con {"done": true, "respuesta": ..., "session_id": ...}; el
+    resto de respuestas se entregan en una única línea con "done": true.
+    """
+
+    def ndjson(event: Dict[str, Any]) -> str:
+        return json.dumps(event, ensure_ascii=False) + "\n"
+
+    async def events() -> AsyncIterator[str]:
+        try:
+            ip = request.client.host if request and request.client else None
+            extra_context = input.context or {}
+            if ip:
+                extra_context["ip"] = ip
+            async for event in orchestrate_stream_async(
+                input.pregunta, extra_context, input.session_id
+            ):
+                if event.get("done"):
+                    if "respuestas" in event:
+                        event["respuestas"] = [
+                            adapt_markdown_for_channel(msg, input.channel)
+                            for msg in event["respuestas"]
+                        ]
+                    elif event.get("respuesta"):
+                        event["respuesta"] = adapt_markdown_for_channel(
+                            event["respuesta"], input.channel
+                        )
+                yield ndjson(event)
+        except Exception as e:
+            logging.error(f"Error en orquestación (stream): {e}", exc_info=True)
+            yield ndjson(
+                {
+                    "done": True,
+                    "respuesta": "Lo siento, hubo un error interno. Por favor, intenta de nuevo.",
+                    "session_id": getattr(input, "session_id", None),
+                }
+            )
+
+    return StreamingResponse(events(), media_type="application/x-ndjson")
+
+
 @app.get("/health")
 def health():
-    return {"status": "ok"}
+    """Liveness: el proceso responde aunque los componentes sigan cargando."""
+    return {
+        "status": "ok",
+        "startup": startup.stats(),
+        # Memoria de este worker; "shared_kb" incluye los pesos mapeados del GGUF
+        "process": memory_stats(),
+        "llm": get_registry_stats(),
+        "inference": get_scheduler_stats(),
+        "prefix_cache": get_prefix_cache_stats(),
+        "response_cache": response_cache.stats(),
+        "knowledge_base": knowledge_base.stats(),
+        "db_pool": db_pool.stats(),
+        "db_pool_async": db_pool_async.stats(),
+        "analytics": analytics.stats(),
+        "document_cards": document_cards.stats(),
+        "sessions": {
+            "redis_ops": context_manager.redis_ops,
+            "write_conflicts": context_manager.conflicts,
+            "ordering_lock": session_lock.stats(),
+            "archiver": session_archiver.stats(),
+        },
+        "turns": dict(_turn_stats, workers=ORCHESTRATE_WORKERS),
+        "services": service_clients.stats(),
+    }
+
+
+@app.get("/ready")
+def ready():
+    """Readiness: 503 hasta que los componentes obligatorios estén cargados."""
+    stats = startup.stats()
+    return JSONResponse(stats, status_code=200 if stats["ready"] else 503)
+
+
+@app.get("/metrics")
+def metrics_endpoint():
+    """Exposición Prometheus: turnos por ruta, etapas, dependencias y tokens."""
+    body, content_type = metrics.render()
+    return Response(body, media_type=content_type)
 
 
 @app.get("/")
 def root():
     return {
         "status": "MunBoT MCP Orchestrator running",
-        "endpoints": ["/orchestrate", "/health"],
+        "endpoints": ["/orchestrate", "/orchestrate/stream", "/health", "/ready", "/metrics"],
         "version": "1.0.0",
     }
 
 
+# === Endpoints de administración ===
+
+
+@app.post("/admin/cache/purge")
+def admin_purge_response_cache():
+    """Vacía la caché de respuestas del LLM (tras cambiar FAQs o prompts)."""
+    return {"purged": response_cache.purge()}
+
+
+@app.post("/admin/knowledge/reload")
+def admin_reload_knowledge_base():
+    """Recarga FAQ, documentos y oficinas sin reiniciar el servicio."""
+    try:
+        knowledge_base.reload(reason="admin")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error recargando la base de conocimiento: {e}")
+    return knowledge_base.stats()
+
+
 # === Endpoints de administración de documentos ===
 
 
 @app.post("/admin/documento")
 def admin_create_documento(data: dict = Body(...)):
     """Crear un documento oficial."""
-    conn = get_db()
-    cur = conn.cursor(cursor_factory=RealDictCursor)
-    cur.execute(
-        """
-        INSERT INTO documentos (id_documento, nombre, clase, aplica_a, descripcion)
-        VALUES (%s, %s, %s, %s, %s)
-        RETURNING *
-        """,
-        (
-            data["id_documento"],
-            data["nombre"],
-            data.get("clase"),
-            data.get("aplica_a"),
-            data.get("descripcion"),
-        ),
-    )
-    doc = cur.fetchone()
-    conn.commit()
-    conn.close()
+    with db_pool.connection() as conn:
+        cur = conn.cursor(cursor_factory=RealDictCursor)
+        cur.execute(
+            """
+            INSERT INTO documentos (id_documento, nombre, clase, aplica_a, descripcion)
+            VALUES (%s, %s, %s, %s, %s)
+            RETURNING *
+            """,
+            (
+                data["id_documento"],
+                data["nombre"],
+                data.get("clase"),
+                data.get("aplica_a"),
+                data.get("descripcion"),
+            ),
+        )
+        doc = cur.fetchone()
+        conn.commit()
+    document_cards.invalidate(data["id_documento"])
     return doc
 
 
 @app.post("/admin/documento/{id_documento}/requisito")
 def admin_add_requisito(id_documento: str, data: dict = Body(...)):
     """Agregar un requisito a un documento."""
-    conn = get_db()
-    cur = conn.cursor(cursor_factory=RealDictCursor)
-    cur.execute("SELECT id FROM documentos WHERE id_documento=%s", (id_documento,))
-    doc = cur.fetchone()
-    if not doc:
-        conn.close()
-        return {"error": "Documento no encontrado"}
-    cur.execute(
-        "INSERT INTO documento_requisitos (documento_id, requisito) VALUES (%s, %s) RETURNING *",
-        (doc["id"], data["requisito"]),
-    )
-    req = cur.fetchone()
-    conn.commit()
-    conn.close()
+    with db_pool.connection() as conn:
+        cur = conn.cursor(cursor_factory=RealDictCursor)
+        cur.execute("SELECT id FROM documentos WHERE id_documento=%s", (id_documento,))
+        doc = cur.fetchone()
+        if not doc:
+            return {"error": "Documento no encontrado"}
+        cur.execute(
+            "INSERT INTO documento_requisitos (documento_id, requisito) VALUES (%s, %s) RETURNING *",
+            (doc["id"], data["requisito"]),
+        )
+        req = cur.fetchone()
+        conn.commit()
+    document_cards.invalidate(id_documento)
     return req
 
 
 @app.post("/admin/documento/{id_documento}/duracion")
 def admin_add_duracion(id_documento: str, data: dict = Body(...)):
     """Agregar duración/validez a un documento."""
-    conn = get_db()
-    cur = conn.cursor(cursor_factory=RealDictCursor)
-    cur.execute("SELECT id FROM documentos WHERE id_documento=%s", (id_documento,))
-    doc = cur.fetchone()
-    if not doc:
-        conn.close()
-        return {"error": "Documento no encontrado"}
-    cur.execute(
-        "INSERT INTO documento_duracion (documento_id, duracion) VALUES (%s, %s) RETURNING *",
-        (doc["id"], data["duracion"]),
-    )
-    dur = cur.fetchone()
-    conn.commit()
-    conn.close()
+    with db_pool.connection() as conn:
+        cur = conn.cursor(cursor_factory=RealDictCursor)
+        cur.execute("SELECT id FROM documentos WHERE id_documento=%s", (id_documento,))
+        doc = cur.fetchone()
+        if not doc:
+            return {"error": "Documento no encontrado"}
+        cur.execute(
+            "INSERT INTO documento_duracion (documento_id, duracion) VALUES (%s, %s) RETURNING *",
+            (doc["id"], data["duracion"]),
+        )
+        dur = cur.fetchone()
+        conn.commit()
+    document_cards.invalidate(id_documento)
     return dur
 
 
 @app.post("/admin/documento/{id_documento}/sancion")
 def admin_add_sancion(id_documento: str, data: dict = Body(...)):
     """Agregar sanción a un documento."""
-    conn = get_db()
-    cur = conn.cursor(cursor_factory=RealDictCursor)
-    cur.execute("SELECT id FROM documentos WHERE id_documento=%s", (id_documento,))
-    doc = cur.fetchone()
-    if not doc:
-        conn.close()
-        return {"error": "Documento no encontrado"}
-    cur.execute(
-        "INSERT INTO documento_sanciones (documento_id, sancion) VALUES (%s, %s) RETURNING *",
-        (doc["id"], data["sancion"]),
-    )
-    sanc = cur.fetchone()
-    conn.commit()
-    conn.close()
+    with db_pool.connection() as conn:
+        cur = conn.cursor(cursor_factory=RealDictCursor)
+        cur.execute("SELECT id FROM documentos WHERE id_documento=%s", (id_documento,))
+        doc = cur.fetchone()
+        if not doc:
+            return {"error": "Documento no encontrado"}
+        cur.execute(
+            "INSERT INTO documento_sanciones (documento_id, sancion) VALUES (%s, %s) RETURNING *",
+            (doc["id"], data["sancion"]),
+        )
+        sanc = cur.fetchone()
+        conn.commit()
+    document_cards.invalidate(id_documento)
     return sanc
 
 
 @app.post("/admin/documento/{id_documento}/nota")
 def admin_add_nota(id_documento: str, data: dict = Body(...)):
     """Agregar nota a un documento."""
-    conn = get_db()
-    cur = conn.cursor(cursor_factory=RealDictCursor)
-    cur.execute("SELECT id FROM documentos WHERE id_documento=%s", (id_documento,))
-    doc = cur.fetchone()
-    if not doc:
-        conn.close()
-        return {"error": "Documento no encontrado"}
-    cur.execute(
-        "INSERT INTO documento_notas (documento_id, nota) VALUES (%s, %s) RETURNING *",
-        (doc["id"], data["nota"]),
-    )
-    nota = cur.fetchone()
-    conn.commit()
-    conn.close()
+    with db_pool.connection() as conn:
+        cur = conn.cursor(cursor_factory=RealDictCursor)
+        cur.execute("SELECT id FROM documentos WHERE id_documento=%s", (id_documento,))
+        doc = cur.fetchone()
+        if not doc:
+            return {"error": "Documento no encontrado"}
+        cur.execute(
+            "INSERT INTO documento_notas (documento_id, nota) VALUES (%s, %s) RETURNING *",
+            (doc["id"], data["nota"]),
+        )
+        nota = cur.fetchone()
+        conn.commit()
+    document_cards.invalidate(id_documento)
     return nota
 
 
@@ -2479,18 +3050,6 @@ def cargar_json(path):
         return json.load(f)
 
 
-documentos = cargar_json(DOCUMENTOS_PATH)
-oficinas = cargar_json(OFICINAS_PATH)
-faqs = cargar_json(FAQS_PATH)
-
-# Construir mapa de alias de documentos combinando los alias declarados en
-# el JSON con los alias definidos manualmente.
-DOC_ALIAS_MAP = {}
-for doc in documentos:
-    for alias in doc.get("alias", []):
-        DOC_ALIAS_MAP[normalize_text(alias)] = doc["Nombre_Documento"]
-
-
 # Controla si se incluyen todos los campos del documento cuando
 # el usuario no especifica un dato particular.
 INCLUIR_FICHA_COMPLETA_POR_DEFECTO = False
@@ -2689,8 +3248,83 @@ DOC_ALIASES = {
     normalize_text("permiso de circulacion"): "Permiso de Aterrizaje",
 }
 
-# Mezclar alias precargados con los derivados del JSON
-DOC_ALIAS_MAP.update(DOC_ALIASES)
+
+
+def _cargar_faq_db() -> list:
+    try:
+        return cargar_json(FAQ_DB_PATH)
+    except Exception as e:
+        logging.warning(f"No se pudo cargar FAQ: {e}")
+        return []
+
+
+def construir_base_conocimiento() -> Dict[str, Any]:
+    """Lee los JSON locales y construye todos los índices derivados."""
+    faq = _cargar_faq_db()
+    documentos = cargar_json(DOCUMENTOS_PATH)
+    # Construir mapa de alias de documentos combinando los alias declarados en
+    # el JSON con los alias definidos manualmente.
+    doc_alias_map = {}
+    for doc in documentos:
+        for alias in doc.get("alias", []):
+            doc_alias_map[normalize_text(alias)] = doc["Nombre_Documento"]
+    doc_alias_map.update(DOC_ALIASES)
+    return {
+        "faq": faq,
+        "faq_index": FAQIndex(faq, normalize=normalize_text, tokenize=tokenize),
+        "documentos": documentos,
+        "oficinas": cargar_json(OFICINAS_PATH),
+        "faqs": cargar_json(FAQS_PATH),
+        "doc_alias_map": doc_alias_map,
+        "doc_matcher": DocumentMatcher(documentos, doc_alias_map, KEYWORD_FIELDS, normalize_text),
+    }
+
+
+knowledge_base = KnowledgeBase(
+    construir_base_conocimiento,
+    [FAQ_DB_PATH, DOCUMENTOS_PATH, OFICINAS_PATH, FAQS_PATH],
+)
+
+
+# === Arranque escalonado ===
+# El servidor acepta peticiones apenas se importa el módulo; lo pesado se
+# inicializa en segundo plano al arrancar la app o en su primer uso.
+def _cargar_base_conocimiento() -> int:
+    version = knowledge_base.snapshot.version
+    knowledge_base.start_watcher()
+    return version
+
+
+def _probar_postgres():
+    with db_pool.connection():
+        pass
+
+
+startup = StartupManager()
+startup.register("redis", lambda: context_manager.redis_client.ping())
+startup.register("knowledge_base", _cargar_base_conocimiento)
+startup.register("llm", lambda: llm.llm)
+startup.register("postgres", _probar_postgres, required=False)
+startup.register("dateparser", preload_dateparser, required=False)
+startup.register("scheduler_service", _scheduler_service, required=False)
+# Archivado incremental de sesiones inactivas (omitable en tests); solo
+# la réplica líder ejecuta las pasadas
+if os.getenv("DISABLE_PERIODIC_MIGRATION") != "1":
+    startup.register("session_archiver", session_archiver.start, required=False)
+
+# Nombres históricos del módulo: se resuelven contra la versión vigente
+_KB_ATTRS = {
+    "documentos": "documentos",
+    "oficinas": "oficinas",
+    "faqs": "faqs",
+    "DOC_ALIAS_MAP": "doc_alias_map",
+}
+
+
+def __getattr__(name: str) -> Any:
+    if name in _KB_ATTRS:
+        return knowledge_base.snapshot[_KB_ATTRS[name]]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 CAMPO_LABELS = {
     "Nombre_Documento": "Nombre del documento",
@@ -2883,14 +3517,14 @@ def infer_type_from_doc_name(name: str) -> Optional[str]:
 
 def listar_documentos_por_tipo(tipo):
     encontrados = []
-    for doc in documentos:
+    for doc in knowledge_base.snapshot["documentos"]:
         if tipo in doc["Nombre_Documento"].lower():
             encontrados.append(doc["Nombre_Documento"])
     return encontrados
 
 
 def buscar_documento_por_nombre(nombre):
-    for doc in documentos:
+    for doc in knowledge_base.snapshot["documentos"]:
         if (
             nombre.lower() == doc["Nombre_Documento"].lower()
             or nombre.lower() in doc["Nombre_Documento"].lower()
@@ -2901,23 +3535,11 @@ def buscar_documento_por_nombre(nombre):
 
 def buscar_documento_fuzzy(pregunta):
     """Devuelve el documento con mejor coincidencia difusa y su puntuación."""
-    pregunta_norm = normalize_text(pregunta)
-    best_doc = None
-    best_score = 0
-    for doc in documentos:
-        nombre_norm = normalize_text(doc["Nombre_Documento"])
-        score = max(
-            fuzz.partial_ratio(pregunta_norm, nombre_norm),
-            fuzz.token_set_ratio(pregunta_norm, nombre_norm),
-        )
-        if score > best_score:
-            best_score = score
-            best_doc = doc
-    return best_doc, best_score
+    return knowledge_base.snapshot["doc_matcher"].fuzzy(pregunta)
 
 
 def buscar_oficina_por_documento(nombre_doc):
-    for oficina in oficinas:
+    for oficina in knowledge_base.snapshot["oficinas"]:
         if "Documentos" in oficina and any(
             nombre_doc in d for d in oficina["Documentos"]
         ):
@@ -2926,22 +3548,49 @@ def buscar_oficina_por_documento(nombre_doc):
 
 
 def buscar_faq_por_pregunta(pregunta):
-    for entry in faqs:
+    for entry in knowledge_base.snapshot["faqs"]:
         for alt in entry["pregunta"]:
             if pregunta.lower() == alt.lower():
                 return entry
     return None
 
 
+def match_documento(pregunta_usuario) -> Dict[str, Any]:
+    """Coincidencias de documento de la pregunta, sin leer ni escribir la sesión.
+
+    Es la parte cara de ``responder_sobre_documento`` (la búsqueda difusa) y
+    el turno la adelanta en paralelo; el resultado se le pasa en ``match``.
+    """
+    matcher = knowledge_base.snapshot["doc_matcher"]
+    pregunta_norm = normalize_text(pregunta_usuario)
+    directo = matcher.by_name(pregunta_usuario)
+    alias = None if directo is not None else matcher.by_alias(pregunta_norm)
+    fuzzy = (None, 0)
+    if directo is None and not alias:
+        fuzzy = matcher.fuzzy(pregunta_usuario, score_cutoff=80)
+    return {
+        "tipo": detectar_tipo_documento(pregunta_usuario),
+        "pregunta_norm": pregunta_norm,
+        "directo": directo,
+        "alias": alias,
+        "fuzzy": fuzzy,
+        "matcher": matcher,
+    }
+
+
+@metrics.timed("document_match")
 def responder_sobre_documento(
     pregunta_usuario,
     session_id: Optional[str] = None,
     listar_todo: bool = False,
     channel: Optional[str] = None,
+    match: Optional[Dict[str, Any]] = None,
 ):
-    tipo = detectar_tipo_documento(pregunta_usuario)
+    if match is None:
+        match = match_documento(pregunta_usuario)
+    tipo = match["tipo"]
     nombre = None
-    pregunta_norm = normalize_text(pregunta_usuario)
+    pregunta_norm = match["pregunta_norm"]
     ctx = context_manager.get_context(session_id) if session_id else {}
 
     # Reutilizar documento en contexto si no se menciona uno nuevo
@@ -2950,21 +3599,18 @@ def responder_sobre_documento(
         tipo = infer_type_from_doc_name(nombre)
 
     # coincidencia directa por substring
-    for doc in documentos:
-        if doc["Nombre_Documento"].lower() in pregunta_usuario.lower():
-            nombre = doc["Nombre_Documento"]
-            break
+    matcher = match["matcher"]
+    doc_directo = match["directo"]
+    if doc_directo is not None:
+        nombre = doc_directo["Nombre_Documento"]
 
     # Revisar alias conocidos
     if not nombre:
-        for alias_norm, real in DOC_ALIAS_MAP.items():
-            if alias_norm in pregunta_norm:
-                nombre = real
-                break
+        nombre = match["alias"]
 
     # si no hubo match directo, probar búsqueda difusa
     if not nombre:
-        best_doc, score = buscar_documento_fuzzy(pregunta_usuario)
+        best_doc, score = match["fuzzy"]
         if score >= 90 and best_doc:
             nombre = best_doc["Nombre_Documento"]
         elif best_doc and 80 <= score < 90 and session_id:
@@ -3017,16 +3663,7 @@ def responder_sobre_documento(
                 if ctx.get("doc_actual") != nombre:
                     context_manager.update_context_data(session_id, {"doc_actual": nombre})
 
-            campos_solicitados: List[str] = []
-            for campo, kws in KEYWORD_FIELDS.items():
-                for kw in kws:
-                    kw_norm = normalize_text(kw)
-                    if kw_norm in pregunta_norm:
-                        campos_solicitados.append(campo)
-                        break
-                    if fuzz.partial_ratio(pregunta_norm, kw_norm) >= 85:
-                        campos_solicitados.append(campo)
-                        break
+            campos_solicitados = matcher.requested_fields(pregunta_norm)
 
             if not campos_solicitados:
                 if INCLUIR_FICHA_COMPLETA_POR_DEFECTO:
@@ -0,0 +1,85 @@
+"""Memoria de los procesos de mcp-core leída de /proc (Linux).
+
+``memory_stats`` resume ``/proc/<pid>/smaps_rollup``: RSS, PSS (RSS con
+las páginas compartidas repartidas entre los procesos que las usan) y la
+parte compartida/privada. Con varios workers que mapean el mismo GGUF, los
+pesos aparecen como ``shared_kb`` y el PSS de cada worker baja en proporción.
+
+Uso (desde mcp-core), para el maestro de gunicorn y todos sus workers:
+
+    python process_memory.py <pid_maestro>
+"""
+import json
+import os
+import sys
+from typing import Dict, List, Optional
+
+_ROLLUP_FIELDS = {
+    "Rss": "rss_kb",
+    "Pss": "pss_kb",
+    "Shared_Clean": "shared_clean_kb",
+    "Shared_Dirty": "shared_dirty_kb",
+    "Private_Clean": "private_clean_kb",
+    "Private_Dirty": "private_dirty_kb",
+    "Swap": "swap_kb",
+}
+
+
+def parse_smaps_rollup(text: str) -> Dict[str, int]:
+    """Campos de ``smaps_rollup`` en kB, más los totales compartido y privado."""
+    stats: Dict[str, int] = {}
+    for line in text.splitlines():
+        name, _, rest = line.partition(":")
+        key = _ROLLUP_FIELDS.get(name.strip())
+        if key and rest.split():
+            stats[key] = int(rest.split()[0])
+    stats["shared_kb"] = stats.get("shared_clean_kb", 0) + stats.get("shared_dirty_kb", 0)
+    stats["private_kb"] = stats.get("private_clean_kb", 0) + stats.get("private_dirty_kb", 0)
+    return stats
+
+
+def memory_stats(pid: Optional[int] = None) -> Dict[str, Optional[int]]:
+    """Memoria del proceso ``pid`` (por defecto el actual) en kB.
+
+    Sin ``smaps_rollup`` (kernels < 4.14) recurre a ``VmRSS`` de
+    ``/proc/<pid>/status``; fuera de Linux devuelve solo el pid.
+    """
+    proc = f"/proc/{pid or 'self'}"
+    stats: Dict[str, Optional[int]] = {"pid": pid or os.getpid()}
+    try:
+        with open(f"{proc}/smaps_rollup", "r") as f:
+            stats.update(parse_smaps_rollup(f.read()))
+        return stats
+    except OSError:
+        pass
+    try:
+        with open(f"{proc}/status", "r") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    stats["rss_kb"] = int(line.split()[1])
+    except OSError:
+        pass
+    return stats
+
+
+def child_pids(pid: int) -> List[int]:
+    children: List[int] = []
+    try:
+        for task in os.listdir(f"/proc/{pid}/task"):
+            with open(f"/proc/{pid}/task/{task}/children", "r") as f:
+                children.extend(int(c) for c in f.read().split())
+    except OSError:
+        pass
+    return children
+
+
+def main():
+    master = int(sys.argv[1]) if len(sys.argv) > 1 else os.getpid()
+    report = {"master": memory_stats(master), "workers": [memory_stats(p) for p in child_pids(master)]}
+    workers = report["workers"]
+    report["total_pss_kb"] = sum(s.get("pss_kb") or 0 for s in [report["master"], *workers])
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, Optional
+
+import redis
+import redis.asyncio
+
+logger = logging.getLogger(__name__)
+
+# Vigencia y tamaño máximo de la caché de respuestas del LLM
+LLM_CACHE_TTL = int(os.getenv("LLM_CACHE_TTL", str(24 * 3600)))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "5000"))
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "1") != "0"
+
+
+class ResponseCache:
+    """Caché en Redis de respuestas generadas por el LLM.
+
+    La clave combina la pregunta normalizada, el contexto FAQ recuperado y la
+    plantilla del prompt, por lo que cambiar cualquiera de ellos produce una
+    entrada nueva. Cada respuesta expira a los ``ttl`` segundos y un índice
+    ordenado por último uso (``llmcache:index``) permite desalojar las menos
+    usadas cuando se supera ``max_entries``. Un fallo de Redis cuenta como
+    fallo de caché: nunca impide responder. ``get_async``/``set_async`` hacen
+    lo mismo con ``async_redis_client`` para los turnos que corren en un
+    event loop.
+    """
+
+    PREFIX = "llmcache"
+
+    def __init__(
+        self,
+        host: str = "localhost",
+        port: int = 6379,
+        db: int = 0,
+        ttl: int = LLM_CACHE_TTL,
+        max_entries: int = LLM_CACHE_MAX_ENTRIES,
+        enabled: bool = LLM_CACHE_ENABLED,
+    ):
+        self.redis_client = redis.Redis(host=host, port=port, db=db, decode_responses=True)
+        self.async_redis_client = redis.asyncio.Redis(host=host, port=port, db=db, decode_responses=True)
+        self.ttl = ttl
+        self.max_entries = max(1, max_entries)
+        self.enabled = enabled
+        self.index_key = f"{self.PREFIX}:index"
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._errors = 0
+        self._saved_seconds = 0.0
+
+    @staticmethod
+    def _digest(text: str) -> str:
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+
+    def make_key(self, pregunta_normalizada: str, faq_context: str, template: str) -> str:
+        """Clave de la respuesta para la pregunta, el contexto y la versión de plantilla."""
+        return (
+            f"{self.PREFIX}:{self._digest(pregunta_normalizada)}"
+            f":{self._digest(faq_context)}:{self._digest(template)}"
+        )
+
+    def get(self, key: str) -> Optional[str]:
+        """Respuesta almacenada o ``None``; un acierto renueva su posición en el índice."""
+        if not self.enabled:
+            return None
+        try:
+            raw = self.redis_client.get(key)
+            if raw is not None:
+                self.redis_client.zadd(self.index_key, {key: time.time()})
+        except redis.RedisError as e:
+            logger.warning("Caché de respuestas no disponible: %s", e)
+            raw = None
+            with self._lock:
+                self._errors += 1
+        return self._answer(raw)
+
+    async def get_async(self, key: str) -> Optional[str]:
+        """Variante de ``get`` con el cliente asíncrono."""
+        if not self.enabled:
+            return None
+        try:
+            raw = await self.async_redis_client.get(key)
+            if raw is not None:
+                await self.async_redis_client.zadd(self.index_key, {key: time.time()})
+        except redis.RedisError as e:
+            logger.warning("Caché de respuestas no disponible: %s", e)
+            raw = None
+            with self._lock:
+                self._errors += 1
+        return self._answer(raw)
+
+    def _answer(self, raw: Optional[str]) -> Optional[str]:
+        if raw is None:
+            with self._lock:
+                self._misses += 1
+            return None
+        entry = json.loads(raw)
+        with self._lock:
+            self._hits += 1
+            self._saved_seconds += entry.get("seconds", 0.0)
+        return entry["respuesta"]
+
+    def set(self, key: str, respuesta: str, seconds: float):
+        """Guarda la respuesta junto al tiempo de inferencia que costó generarla."""
+        if not self.enabled or not respuesta:
+            return
+        try:
+            pipe = self.redis_client.pipeline()
+            self._queue_set(pipe, key, respuesta, seconds)
+            size = pipe.execute()[-1]
+            if size > self.max_entries:
+                self._evict(size - self.max_entries)
+        except redis.RedisError as e:
+            logger.warning("No se pudo guardar en la caché de respuestas: %s", e)
+            with self._lock:
+                self._errors += 1
+
+    async def set_async(self, key: str, respuesta: str, seconds: float):
+        """Variante de ``set`` con el cliente asíncrono."""
+        if not self.enabled or not respuesta:
+            return
+        try:
+            pipe = self.async_redis_client.pipeline()
+            self._queue_set(pipe, key, respuesta, seconds)
+            size = (await pipe.execute())[-1]
+            if size > self.max_entries:
+                await self._evict_async(size - self.max_entries)
+        except redis.RedisError as e:
+            logger.warning("No se pudo guardar en la caché de respuestas: %s", e)
+            with self._lock:
+                self._errors += 1
+
+    def _queue_set(self, pipe, key: str, respuesta: str, seconds: float):
+        """Encola la respuesta, su entrada en el índice y el tamaño resultante."""
+        now = time.time()
+        entry = json.dumps({"respuesta": respuesta, "seconds": seconds}, ensure_ascii=False)
+        pipe.set(key, entry, ex=self.ttl)
+        pipe.zadd(self.index_key, {key: now})
+        # Olvida en el índice las claves que ya expiraron
+        pipe.zremrangebyscore(self.index_key, "-inf", now - self.ttl)
+        pipe.zcard(self.index_key)
+
+    def _evict(self, count: int):
+        """Elimina las ``count`` entradas usadas hace más tiempo."""
+        oldest = self.redis_client.zpopmin(self.index_key, count)
+        keys = [k for k, _ in oldest]
+        if keys:
+            self.redis_client.delete(*keys)
+
+    async def _evict_async(self, count: int):
+        oldest = await self.async_redis_client.zpopmin(self.index_key, count)
+        keys = [k for k, _ in oldest]
+        if keys:
+            await self.async_redis_client.delete(*keys)
+
+    def purge(self) -> int:
+        """Borra todas las respuestas almacenadas y devuelve cuántas había."""
+        keys = list(self.redis_client.scan_iter(match=f"{self.PREFIX}:*", count=500))
+        entries = [k for k in keys if k not in (self.index_key, self.index_key.encode())]
+        if keys:
+            self.redis_client.delete(*keys)
+        logger.info("Caché de respuestas purgada: %s entradas", len(entries))
+        return len(entries)
+
+    def stats(self) -> Dict[str, Any]:
+        """Aciertos, fallos y segundos de inferencia ahorrados en este proceso."""
+        try:
+            entries = self.redis_client.zcard(self.index_key)
+        except redis.RedisError:
+            entries = None
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "enabled": self.enabled,
+                "entries": entries,
+                "hits": self._hits,
+                "misses": self._misses,
+                "errors": self._errors,
+                "hit_ratio": (self._hits / lookups) if lookups else 0.0,
+                "saved_inference_seconds": self._saved_seconds,
+            }
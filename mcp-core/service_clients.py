@@ -0,0 +1,294 @@
+import asyncio
+import json
+import logging
+import os
+import random
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+# Timeouts por defecto (segundos) de las herramientas sin "x-client" en su esquema
+SERVICE_CONNECT_TIMEOUT = float(os.getenv("SERVICE_CONNECT_TIMEOUT", "3"))
+SERVICE_READ_TIMEOUT = float(os.getenv("SERVICE_READ_TIMEOUT", "30"))
+# Conexiones keep-alive por microservicio
+SERVICE_POOL_SIZE = int(os.getenv("SERVICE_POOL_SIZE", "20"))
+# Fallos seguidos que abren el circuito y segundos que permanece abierto
+SERVICE_BREAKER_FAILURES = int(os.getenv("SERVICE_BREAKER_FAILURES", "5"))
+SERVICE_BREAKER_RESET = float(os.getenv("SERVICE_BREAKER_RESET", "30"))
+# Espera base del reintento (se duplica en cada intento, con jitter completo)
+SERVICE_RETRY_BACKOFF = float(os.getenv("SERVICE_RETRY_BACKOFF", "0.2"))
+
+RETRY_STATUS = (502, 503, 504)
+
+
+class CircuitOpenError(requests.ConnectionError):
+    """El microservicio falló seguido y no se le envían peticiones por ahora."""
+
+
+@dataclass(frozen=True)
+class ToolPolicy:
+    """Cómo llamar a una herramienta; se lee de ``x-client`` en su esquema."""
+    connect_timeout: float = SERVICE_CONNECT_TIMEOUT
+    read_timeout: float = SERVICE_READ_TIMEOUT
+    idempotent: bool = False
+    retries: int = 0
+
+    @classmethod
+    def from_schema(cls, schema: Dict[str, Any]) -> "ToolPolicy":
+        conf = schema.get("x-client") or {}
+        idempotent = bool(conf.get("idempotent", False))
+        return cls(
+            connect_timeout=float(conf.get("connect_timeout", SERVICE_CONNECT_TIMEOUT)),
+            read_timeout=float(conf.get("read_timeout", SERVICE_READ_TIMEOUT)),
+            idempotent=idempotent,
+            # Solo se reintenta lo que puede repetirse sin efectos duplicados
+            retries=int(conf.get("retries", 2)) if idempotent else 0,
+        )
+
+
+def load_tool_policies(schemas_path: Optional[str]) -> Dict[str, ToolPolicy]:
+    """Políticas por herramienta (nombre de archivo sin ``.json``)."""
+    policies: Dict[str, ToolPolicy] = {}
+    if not schemas_path or not os.path.isdir(schemas_path):
+        return policies
+    for fname in os.listdir(schemas_path):
+        if not fname.endswith(".json"):
+            continue
+        try:
+            with open(os.path.join(schemas_path, fname), "r", encoding="utf-8") as f:
+                policies[fname[:-len(".json")]] = ToolPolicy.from_schema(json.load(f))
+        except (OSError, ValueError) as e:
+            logger.warning("Esquema de herramienta inválido %s: %s", fname, e)
+    return policies
+
+
+class CircuitBreaker:
+    """Circuito por servicio: cerrado, abierto tras ``failures`` fallos seguidos
+    y semiabierto (una petición de prueba) pasados ``reset_after`` segundos."""
+
+    def __init__(self, failures: int = SERVICE_BREAKER_FAILURES, reset_after: float = SERVICE_BREAKER_RESET):
+        self.failures = failures
+        self.reset_after = reset_after
+        self._lock = threading.Lock()
+        self._consecutive = 0
+        self._opened_at: Optional[float] = None
+        self._probing = False
+        self.opened = 0
+        self.rejected = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            if time.monotonic() - self._opened_at < self.reset_after:
+                return "open"
+            return "half_open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at >= self.reset_after and not self._probing:
+                self._probing = True
+                return True
+            self.rejected += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._consecutive = 0
+            self._opened_at = None
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._consecutive += 1
+            if self._probing or self._consecutive >= self.failures:
+                if self._opened_at is None or self._probing:
+                    self.opened += 1
+                self._opened_at = time.monotonic()
+                self._probing = False
+
+    def release(self):
+        """Libera la prueba en curso sin juzgar al servicio (falló antes de llegar a él)."""
+        with self._lock:
+            self._probing = False
+
+
+class ServiceClient:
+    """Cliente HTTP keep-alive de un microservicio con su circuito.
+
+    ``request`` usa una sesión de ``requests``; ``request_async`` un
+    ``httpx.AsyncClient`` (creado en el primer uso dentro de cada event loop)
+    con el mismo circuito, estadísticas y política de reintentos.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        pool_size: int = SERVICE_POOL_SIZE,
+        breaker: Optional[CircuitBreaker] = None,
+        backoff: float = SERVICE_RETRY_BACKOFF,
+        sleep: Callable[[float], None] = time.sleep,
+        async_sleep: Callable[[float], Awaitable[None]] = asyncio.sleep,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self.name = name
+        self.pool_size = pool_size
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.breaker = breaker or CircuitBreaker()
+        self.backoff = backoff
+        self._sleep = sleep
+        self._async_sleep = async_sleep
+        self._transport = transport
+        self._async: Optional[Tuple[asyncio.AbstractEventLoop, httpx.AsyncClient]] = None
+        self._stats_lock = threading.Lock()
+        self._stats = {"requests": 0, "errors": 0, "retries": 0}
+
+    def _count(self, name: str):
+        with self._stats_lock:
+            self._stats[name] += 1
+
+    # ---- Circuito y reintentos (comunes a ambas variantes) ----
+    def _begin(self):
+        if not self.breaker.allow():
+            raise CircuitOpenError(f"{self.name} no disponible (circuito abierto)")
+        self._count("requests")
+
+    def _retry_error(self, attempt: int, policy: ToolPolicy, retryable: bool) -> bool:
+        """Registra un error de red; indica si corresponde reintentar."""
+        self._count("errors")
+        self.breaker.record_failure()
+        return retryable and attempt < policy.retries
+
+    def _accept(self, status_code: int, attempt: int, policy: ToolPolicy) -> bool:
+        """Registra la respuesta; indica si se entrega sin reintentar."""
+        if status_code < 500:
+            self.breaker.record_success()
+            return True
+        self._count("errors")
+        self.breaker.record_failure()
+        return attempt >= policy.retries or status_code not in RETRY_STATUS
+
+    def _next_delay(self, attempt: int) -> float:
+        self._count("retries")
+        return random.uniform(0, self.backoff * (2 ** attempt))
+
+    def request(self, method: str, url: str, policy: ToolPolicy, **kwargs) -> requests.Response:
+        """Envía la petición; reintenta con backoff si ``policy.idempotent``.
+
+        Lanza ``CircuitOpenError`` sin tocar la red si el circuito está abierto.
+        Los errores de conexión, timeouts y respuestas 5xx cuentan como fallos;
+        cualquier otra excepción libera la petición de prueba del circuito.
+        """
+        attempt = 0
+        while True:
+            self._begin()
+            try:
+                resp = self.session.request(
+                    method, url, timeout=(policy.connect_timeout, policy.read_timeout), **kwargs
+                )
+            except requests.RequestException as e:
+                retryable = isinstance(e, (requests.ConnectionError, requests.Timeout))
+                if not self._retry_error(attempt, policy, retryable):
+                    raise
+            except BaseException:
+                self.breaker.release()
+                raise
+            else:
+                if self._accept(resp.status_code, attempt, policy):
+                    return resp
+            attempt += 1
+            self._sleep(self._next_delay(attempt))
+
+    def _async_client(self) -> httpx.AsyncClient:
+        # Las conexiones de httpx pertenecen al event loop que las abrió
+        loop = asyncio.get_running_loop()
+        if self._async is None or self._async[0] is not loop:
+            limits = httpx.Limits(max_connections=self.pool_size, max_keepalive_connections=self.pool_size)
+            self._async = (loop, httpx.AsyncClient(limits=limits, transport=self._transport))
+        return self._async[1]
+
+    async def request_async(self, method: str, url: str, policy: ToolPolicy, **kwargs) -> httpx.Response:
+        """Variante de ``request`` para corrutinas; la espera entre intentos no ocupa un hilo.
+
+        Los errores de red se lanzan como ``httpx.HTTPError`` y el circuito
+        abierto como ``CircuitOpenError``.
+        """
+        client = self._async_client()
+        timeout = httpx.Timeout(policy.read_timeout, connect=policy.connect_timeout)
+        attempt = 0
+        while True:
+            self._begin()
+            try:
+                resp = await client.request(method, url, timeout=timeout, **kwargs)
+            except httpx.HTTPError as e:
+                retryable = isinstance(e, (httpx.NetworkError, httpx.TimeoutException))
+                if not self._retry_error(attempt, policy, retryable):
+                    raise
+            except BaseException:
+                self.breaker.release()
+                raise
+            else:
+                if self._accept(resp.status_code, attempt, policy):
+                    return resp
+            attempt += 1
+            await self._async_sleep(self._next_delay(attempt))
+
+    async def aclose(self):
+        """Cierra las conexiones del cliente asíncrono (en su event loop)."""
+        if self._async is not None:
+            _, client = self._async
+            self._async = None
+            await client.aclose()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats.update(state=self.breaker.state, opened=self.breaker.opened, rejected=self.breaker.rejected)
+        return stats
+
+
+class ServiceClientRegistry:
+    """Un ``ServiceClient`` por microservicio y la política de cada herramienta."""
+
+    def __init__(self, schemas_path: Optional[str] = None, **client_kwargs: Any):
+        self._schemas_path = schemas_path
+        self._client_kwargs = client_kwargs
+        self._clients: Dict[str, ServiceClient] = {}
+        self._policies: Optional[Dict[str, ToolPolicy]] = None
+        self._lock = threading.Lock()
+
+    def client(self, service: str) -> ServiceClient:
+        with self._lock:
+            client = self._clients.get(service)
+            if client is None:
+                client = self._clients[service] = ServiceClient(service, **self._client_kwargs)
+            return client
+
+    def policy(self, tool: str) -> ToolPolicy:
+        if self._policies is None:
+            self._policies = load_tool_policies(self._schemas_path)
+        return self._policies.get(tool, ToolPolicy())
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            clients = dict(self._clients)
+        return {name: client.stats() for name, client in clients.items()}
+
+    async def aclose(self):
+        with self._lock:
+            clients = list(self._clients.values())
+        for client in clients:
+            await client.aclose()
@@ -0,0 +1,208 @@
+import json
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from contextlib import AbstractContextManager
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+import redis
+from psycopg2.extras import execute_values
+
+logger = logging.getLogger(__name__)
+
+# Segundos sin actividad para archivar una sesión; debe ser menor que la
+# expiración de las sesiones en Redis (300 s) para alcanzar a guardarlas
+SESSION_ARCHIVE_IDLE = float(os.getenv("SESSION_ARCHIVE_IDLE", "120"))
+# Segundos entre pasadas del archivador
+SESSION_ARCHIVE_INTERVAL = float(os.getenv("SESSION_ARCHIVE_INTERVAL", "60"))
+# Claves pedidas por SCAN y sesiones por upsert
+SESSION_ARCHIVE_SCAN_COUNT = int(os.getenv("SESSION_ARCHIVE_SCAN_COUNT", "500"))
+SESSION_ARCHIVE_BATCH = int(os.getenv("SESSION_ARCHIVE_BATCH", "200"))
+
+
+class SessionArchiver:
+    """Copia a PostgreSQL las sesiones inactivas de Redis, por lotes.
+
+    Cada pasada recorre solo las claves ``session:*`` con ``SCAN MATCH`` y
+    lee las sesiones de cada lote en un pipeline (``load_many``). Se
+    archivan las que llevan ``idle_seconds`` sin actividad (``last_activity``)
+    con un único ``INSERT ... ON CONFLICT`` por lote; la marca
+    ``session_archived:{id}`` guarda la versión archivada para no repetir
+    sesiones que no cambiaron. Las sesiones no se borran: vencen solas en
+    Redis. Entre varias réplicas solo el líder (``SET NX EX`` en
+    ``session_archiver:leader``) ejecuta las pasadas.
+    """
+
+    LEADER_KEY = "session_archiver:leader"
+    MARK_PREFIX = "session_archived"
+
+    def __init__(
+        self,
+        context_manager: Any,
+        connection: Callable[[], AbstractContextManager],
+        table: str,
+        idle_seconds: float = SESSION_ARCHIVE_IDLE,
+        interval: float = SESSION_ARCHIVE_INTERVAL,
+        scan_count: int = SESSION_ARCHIVE_SCAN_COUNT,
+        batch_size: int = SESSION_ARCHIVE_BATCH,
+    ):
+        self.context_manager = context_manager
+        self._connection = connection
+        self.table = table
+        self.idle_seconds = idle_seconds
+        self.interval = interval
+        self.scan_count = scan_count
+        self.batch_size = max(1, batch_size)
+        self._token = uuid.uuid4().hex[:8]
+        self._table_ready = False
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._stats: Dict[str, Any] = {
+            "passes": 0, "scanned": 0, "archived": 0, "active": 0, "unchanged": 0,
+            "errors": 0, "last_pass_seconds": None, "leader": False,
+        }
+
+    @property
+    def instance_id(self) -> str:
+        # Con el pid en vivo: los workers de gunicorn hijos del mismo proceso
+        # (preload_app) compiten por el liderazgo con identidades distintas
+        return f"{socket.gethostname()}:{os.getpid()}:{self._token}"
+
+    @property
+    def redis_client(self) -> redis.Redis:
+        return self.context_manager.redis_client
+
+    # ---- Elección de líder ----
+    def _lease_seconds(self) -> int:
+        return max(10, int(self.interval * 3))
+
+    def acquire_leadership(self) -> bool:
+        """Toma o renueva el liderazgo; devuelve si esta réplica es la líder."""
+        client = self.redis_client
+        lease = self._lease_seconds()
+        if client.set(self.LEADER_KEY, self.instance_id, nx=True, ex=lease):
+            return True
+        with client.pipeline() as pipe:
+            try:
+                pipe.watch(self.LEADER_KEY)
+                holder = pipe.get(self.LEADER_KEY)
+                if isinstance(holder, bytes):
+                    holder = holder.decode("utf-8")
+                if holder != self.instance_id:
+                    return False
+                pipe.multi()
+                pipe.expire(self.LEADER_KEY, lease)
+                pipe.execute()
+                return True
+            except redis.WatchError:
+                return False
+
+    # ---- Pasada de archivado ----
+    def _ensure_table(self, cur):
+        if self._table_ready:
+            return
+        cur.execute(
+            f"""
+            CREATE TABLE IF NOT EXISTS {self.table} (
+                session_id VARCHAR(64) PRIMARY KEY,
+                data JSONB,
+                created_at TIMESTAMPTZ DEFAULT now()
+            )
+            """
+        )
+        self._table_ready = True
+
+    def _is_idle(self, context: Dict[str, Any], now: datetime) -> bool:
+        last_activity = context.get("last_activity")
+        if not last_activity:
+            return True
+        try:
+            return (now - datetime.fromisoformat(last_activity)).total_seconds() >= self.idle_seconds
+        except (TypeError, ValueError):
+            return True
+
+    def _archive_batch(self, session_ids: List[str]) -> int:
+        sessions = self.context_manager.load_many(session_ids)
+        ids = list(sessions)
+        marks = self.redis_client.mget([f"{self.MARK_PREFIX}:{sid}" for sid in ids]) if ids else []
+        now = datetime.now()
+        rows, archived = [], {}
+        for sid, mark in zip(ids, marks):
+            context, version = sessions[sid]
+            if not self._is_idle(context, now):
+                self._stats["active"] += 1
+            elif mark is not None and int(mark) == version:
+                self._stats["unchanged"] += 1
+            else:
+                rows.append((sid, json.dumps(context, ensure_ascii=False)))
+                archived[sid] = version
+        if not rows:
+            return 0
+        with self._connection() as conn:
+            with conn.cursor() as cur:
+                self._ensure_table(cur)
+                execute_values(
+                    cur,
+                    f"INSERT INTO {self.table} (session_id, data) VALUES %s "
+                    "ON CONFLICT (session_id) DO UPDATE SET data = EXCLUDED.data",
+                    rows,
+                    page_size=len(rows),
+                )
+            conn.commit()
+        pipe = self.redis_client.pipeline(transaction=False)
+        for sid, version in archived.items():
+            pipe.set(f"{self.MARK_PREFIX}:{sid}", version, ex=7 * 24 * 3600)
+        pipe.execute()
+        return len(rows)
+
+    def run_once(self) -> int:
+        """Archiva las sesiones inactivas y devuelve cuántas se guardaron."""
+        start = time.perf_counter()
+        archived = 0
+        batch: List[str] = []
+        for key in self.redis_client.scan_iter(match="session:*", count=self.scan_count):
+            if isinstance(key, bytes):
+                key = key.decode("utf-8")
+            # session:{id} es el hash; session:{id}:history pertenece a la misma sesión
+            if key.count(":") != 1:
+                continue
+            self._stats["scanned"] += 1
+            batch.append(key.split(":", 1)[1])
+            if len(batch) >= self.batch_size:
+                archived += self._archive_batch(batch)
+                batch = []
+        if batch:
+            archived += self._archive_batch(batch)
+        self._stats["passes"] += 1
+        self._stats["archived"] += archived
+        self._stats["last_pass_seconds"] = time.perf_counter() - start
+        logger.info("Sesiones archivadas en PostgreSQL: %s", archived)
+        return archived
+
+    # ---- Hilo periódico ----
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self._stats["leader"] = self.acquire_leadership()
+                if self._stats["leader"]:
+                    self.run_once()
+            except Exception as e:
+                self._stats["errors"] += 1
+                logger.error("Error archivando sesiones: %s", e)
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="session-archiver", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def stats(self) -> Dict[str, Any]:
+        return dict(self._stats, instance=self.instance_id)
@@ -0,0 +1,354 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+import uuid
+from contextlib import asynccontextmanager, contextmanager
+from typing import AsyncIterator, Callable, Dict, Iterator, Optional, Tuple
+
+import redis
+import redis.asyncio
+
+logger = logging.getLogger(__name__)
+
+# Permite desactivar el orden por sesión (SESSION_ORDERING_LOCK=0)
+SESSION_ORDERING_LOCK = os.getenv("SESSION_ORDERING_LOCK", "1") != "0"
+# Vigencia del anuncio del turno en curso; se renueva cada TTL/3 mientras el
+# turno sigue, así solo vence (y los siguientes lo saltean) si su proceso murió
+SESSION_LOCK_TTL = float(os.getenv("SESSION_LOCK_TTL", "30"))
+# Segundos sin dueño tras los cuales un turno que nunca tomó su número se saltea
+SESSION_LOCK_STALE = float(os.getenv("SESSION_LOCK_STALE", "2"))
+# Espera máxima de un turno antes de procesarse sin orden garantizado
+SESSION_LOCK_WAIT = float(os.getenv("SESSION_LOCK_WAIT", "180"))
+
+
+class SessionOrderLock:
+    """Cerrojo FIFO por sesión en Redis (algoritmo de tickets).
+
+    Cada turno toma un número con ``INCR session_lock:{id}:ticket`` y espera
+    hasta que ``session_lock:{id}:serving`` alcance el número anterior, así
+    los mensajes de una misma sesión se procesan en orden de llegada mientras
+    que sesiones distintas no comparten nada. El turno en curso se anuncia en
+    ``session_lock:{id}:holder`` con vencimiento, que se renueva cada
+    ``ttl / 3`` mientras el turno sigue (un hilo para ``hold``, una tarea por
+    turno para ``hold_async``); si su proceso muere, los siguientes lo
+    saltean al expirar. Si Redis falla el turno sigue sin orden: el cerrojo
+    nunca impide responder.
+
+    ``hold`` espera bloqueando el hilo; ``hold_async`` hace la misma espera
+    con ``redis.asyncio`` sobre el bucle de eventos, sin ocupar un hilo
+    mientras el turno anterior de la sesión no termina.
+    """
+
+    PREFIX = "session_lock"
+
+    def __init__(
+        self,
+        client_getter: Callable[[], redis.Redis],
+        async_client_getter: Optional[Callable[[], redis.asyncio.Redis]] = None,
+        ttl: float = SESSION_LOCK_TTL,
+        stale_after: float = SESSION_LOCK_STALE,
+        max_wait: float = SESSION_LOCK_WAIT,
+        enabled: bool = SESSION_ORDERING_LOCK,
+    ):
+        self._client_getter = client_getter
+        self._async_client_getter = async_client_getter
+        self.ttl = ttl
+        self.stale_after = stale_after
+        self.max_wait = max_wait
+        self.enabled = enabled
+        self._counter_ttl = max(60, int(ttl * 10))
+        self._renew_every = ttl / 3
+        self._lock = threading.Lock()
+        # Turnos retenidos con ``hold``: token -> (cliente, clave holder, valor)
+        self._held: Dict[str, Tuple[redis.Redis, str, str]] = {}
+        self._renewer: Optional[threading.Thread] = None
+        self._stats: Dict[str, float] = {
+            "acquired": 0, "waited": 0, "skipped_stale": 0, "timeouts": 0, "errors": 0,
+            "wait_seconds": 0.0, "renewals": 0, "lost": 0,
+        }
+
+    def _keys(self, session_id: str):
+        base = f"{self.PREFIX}:{session_id}"
+        return f"{base}:ticket", f"{base}:serving", f"{base}:holder"
+
+    def _count(self, name: str, amount: float = 1):
+        with self._lock:
+            self._stats[name] += amount
+
+    def _count_acquired(self, start: float):
+        waited = time.monotonic() - start
+        self._count("acquired")
+        if waited > 0.001:
+            self._count("waited")
+            self._count("wait_seconds", waited)
+
+    def _advance(self, client: redis.Redis, serving_key: str, expected: int) -> bool:
+        """Pasa el turno de ``expected`` a ``expected + 1`` si nadie lo hizo antes."""
+        with client.pipeline() as pipe:
+            try:
+                pipe.watch(serving_key)
+                if int(pipe.get(serving_key) or 0) != expected:
+                    return False
+                pipe.multi()
+                pipe.set(serving_key, expected + 1, ex=self._counter_ttl)
+                pipe.execute()
+                return True
+            except redis.WatchError:
+                return False
+
+    def _acquire(self, client: redis.Redis, session_id: str, token: str) -> Optional[int]:
+        ticket_key, serving_key, holder_key = self._keys(session_id)
+        # Ambos contadores vencen juntos para que no queden desfasados
+        pipe = client.pipeline()
+        pipe.incr(ticket_key)
+        pipe.expire(ticket_key, self._counter_ttl)
+        pipe.expire(serving_key, self._counter_ttl)
+        ticket = int(pipe.execute()[0])
+        start = time.monotonic()
+        last_serving, since = None, start
+        delay = 0.005
+        while True:
+            serving = int(client.get(serving_key) or 0)
+            if serving >= ticket - 1:
+                client.set(holder_key, f"{ticket}:{token}", px=int(self.ttl * 1000))
+                self._count_acquired(start)
+                return ticket
+            now = time.monotonic()
+            if serving != last_serving:
+                last_serving, since = serving, now
+            elif not client.exists(holder_key) and now - since > self.stale_after:
+                # El turno serving+1 no tomó su número o su proceso murió
+                if self._advance(client, serving_key, serving):
+                    logger.warning("Sesión %s: turno %s abandonado, se saltea", session_id, serving + 1)
+                    self._count("skipped_stale")
+                since = now
+            if now - start > self.max_wait:
+                logger.error("Sesión %s: se procesa el turno %s sin esperar su orden", session_id, ticket)
+                self._count("timeouts")
+                return None
+            time.sleep(delay)
+            delay = min(delay * 2, 0.1)
+
+    def _renew(self, client: redis.Redis, holder_key: str, value: str) -> bool:
+        """Alarga el anuncio del turno si sigue siendo nuestro."""
+        with client.pipeline() as pipe:
+            try:
+                pipe.watch(holder_key)
+                holder = pipe.get(holder_key)
+                if isinstance(holder, bytes):
+                    holder = holder.decode("utf-8")
+                if holder != value:
+                    return False
+                pipe.multi()
+                pipe.pexpire(holder_key, int(self.ttl * 1000))
+                pipe.execute()
+                return True
+            except redis.WatchError:
+                return False
+
+    def _renewed(self, renewed: bool, holder_key: str) -> bool:
+        if renewed:
+            self._count("renewals")
+        else:
+            logger.error("%s: el turno perdió la sesión antes de terminar", holder_key)
+            self._count("lost")
+        return renewed
+
+    def _renew_loop(self):
+        while True:
+            time.sleep(self._renew_every)
+            with self._lock:
+                held = list(self._held.items())
+            for token, (client, holder_key, value) in held:
+                try:
+                    renewed = self._renewed(self._renew(client, holder_key, value), holder_key)
+                except redis.RedisError as e:
+                    logger.warning("No se pudo renovar %s: %s", holder_key, e)
+                    self._count("errors")
+                    continue
+                if not renewed:
+                    with self._lock:
+                        self._held.pop(token, None)
+
+    def _start_renewal(self, client: redis.Redis, session_id: str, ticket: int, token: str):
+        holder_key = self._keys(session_id)[2]
+        with self._lock:
+            self._held[token] = (client, holder_key, f"{ticket}:{token}")
+            if self._renewer is None or not self._renewer.is_alive():
+                self._renewer = threading.Thread(
+                    target=self._renew_loop, name="session-lock-renewer", daemon=True
+                )
+                self._renewer.start()
+
+    def _stop_renewal(self, token: str):
+        with self._lock:
+            self._held.pop(token, None)
+
+    def _release(self, client: redis.Redis, session_id: str, ticket: int, token: str):
+        _, serving_key, holder_key = self._keys(session_id)
+        with client.pipeline() as pipe:
+            try:
+                pipe.watch(holder_key)
+                holder = pipe.get(holder_key)
+                if isinstance(holder, bytes):
+                    holder = holder.decode("utf-8")
+                pipe.multi()
+                if holder == f"{ticket}:{token}":
+                    pipe.delete(holder_key)
+                pipe.execute()
+            except redis.WatchError:
+                pass
+        # Solo avanza si nadie nos salteó por vencimiento
+        self._advance(client, serving_key, ticket - 1)
+
+    @contextmanager
+    def hold(self, session_id: Optional[str]) -> Iterator[None]:
+        """Procesa el bloque cuando terminaron los turnos anteriores de la sesión."""
+        if not self.enabled or not session_id:
+            yield
+            return
+        client = self._client_getter()
+        token = uuid.uuid4().hex
+        try:
+            ticket = self._acquire(client, session_id, token)
+        except redis.RedisError as e:
+            logger.warning("Cerrojo de sesión no disponible: %s", e)
+            self._count("errors")
+            ticket = None
+        if ticket is not None:
+            self._start_renewal(client, session_id, ticket, token)
+        try:
+            yield
+        finally:
+            if ticket is not None:
+                self._stop_renewal(token)
+                try:
+                    self._release(client, session_id, ticket, token)
+                except redis.RedisError as e:
+                    logger.warning("No se pudo liberar el cerrojo de la sesión %s: %s", session_id, e)
+                    self._count("errors")
+
+    # ---- Variante asíncrona ----
+    async def _advance_async(self, client: redis.asyncio.Redis, serving_key: str, expected: int) -> bool:
+        async with client.pipeline() as pipe:
+            try:
+                await pipe.watch(serving_key)
+                if int(await pipe.get(serving_key) or 0) != expected:
+                    return False
+                pipe.multi()
+                pipe.set(serving_key, expected + 1, ex=self._counter_ttl)
+                await pipe.execute()
+                return True
+            except redis.WatchError:
+                return False
+
+    async def _acquire_async(self, client: redis.asyncio.Redis, session_id: str, token: str) -> Optional[int]:
+        ticket_key, serving_key, holder_key = self._keys(session_id)
+        pipe = client.pipeline()
+        pipe.incr(ticket_key)
+        pipe.expire(ticket_key, self._counter_ttl)
+        pipe.expire(serving_key, self._counter_ttl)
+        ticket = int((await pipe.execute())[0])
+        start = time.monotonic()
+        last_serving, since = None, start
+        delay = 0.005
+        while True:
+            serving = int(await client.get(serving_key) or 0)
+            if serving >= ticket - 1:
+                await client.set(holder_key, f"{ticket}:{token}", px=int(self.ttl * 1000))
+                self._count_acquired(start)
+                return ticket
+            now = time.monotonic()
+            if serving != last_serving:
+                last_serving, since = serving, now
+            elif not await client.exists(holder_key) and now - since > self.stale_after:
+                if await self._advance_async(client, serving_key, serving):
+                    logger.warning("Sesión %s: turno %s abandonado, se saltea", session_id, serving + 1)
+                    self._count("skipped_stale")
+                since = now
+            if now - start > self.max_wait:
+                logger.error("Sesión %s: se procesa el turno %s sin esperar su orden", session_id, ticket)
+                self._count("timeouts")
+                return None
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 0.1)
+
+    async def _renew_async(self, client: redis.asyncio.Redis, holder_key: str, value: str) -> bool:
+        async with client.pipeline() as pipe:
+            try:
+                await pipe.watch(holder_key)
+                holder = await pipe.get(holder_key)
+                if isinstance(holder, bytes):
+                    holder = holder.decode("utf-8")
+                if holder != value:
+                    return False
+                pipe.multi()
+                pipe.pexpire(holder_key, int(self.ttl * 1000))
+                await pipe.execute()
+                return True
+            except redis.WatchError:
+                return False
+
+    async def _renew_async_loop(self, client: redis.asyncio.Redis, session_id: str, ticket: int, token: str):
+        holder_key = self._keys(session_id)[2]
+        while True:
+            await asyncio.sleep(self._renew_every)
+            try:
+                renewed = await self._renew_async(client, holder_key, f"{ticket}:{token}")
+            except (redis.RedisError, OSError) as e:
+                logger.warning("No se pudo renovar %s: %s", holder_key, e)
+                self._count("errors")
+                continue
+            if not self._renewed(renewed, holder_key):
+                return
+
+    async def _release_async(self, client: redis.asyncio.Redis, session_id: str, ticket: int, token: str):
+        _, serving_key, holder_key = self._keys(session_id)
+        async with client.pipeline() as pipe:
+            try:
+                await pipe.watch(holder_key)
+                holder = await pipe.get(holder_key)
+                if isinstance(holder, bytes):
+                    holder = holder.decode("utf-8")
+                pipe.multi()
+                if holder == f"{ticket}:{token}":
+                    pipe.delete(holder_key)
+                await pipe.execute()
+            except redis.WatchError:
+                pass
+        await self._advance_async(client, serving_key, ticket - 1)
+
+    @asynccontextmanager
+    async def hold_async(self, session_id: Optional[str]) -> AsyncIterator[None]:
+        """Igual que ``hold`` pero esperando el turno sin bloquear el bucle de eventos."""
+        if not self.enabled or not session_id or self._async_client_getter is None:
+            yield
+            return
+        client = self._async_client_getter()
+        token = uuid.uuid4().hex
+        try:
+            ticket = await self._acquire_async(client, session_id, token)
+        except (redis.RedisError, OSError) as e:
+            logger.warning("Cerrojo de sesión no disponible: %s", e)
+            self._count("errors")
+            ticket = None
+        renewer = None
+        if ticket is not None:
+            renewer = asyncio.create_task(self._renew_async_loop(client, session_id, ticket, token))
+        try:
+            yield
+        finally:
+            if renewer is not None:
+                renewer.cancel()
+            if ticket is not None:
+                try:
+                    await self._release_async(client, session_id, ticket, token)
+                except (redis.RedisError, OSError) as e:
+                    logger.warning("No se pudo liberar el cerrojo de la sesión %s: %s", session_id, e)
+                    self._count("errors")
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            return dict(self._stats)
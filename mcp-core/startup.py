@@ -0,0 +1,134 @@
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Segundos entre reintentos de un componente obligatorio que falló al iniciar
+STARTUP_RETRY_INTERVAL = float(os.getenv("STARTUP_RETRY_INTERVAL", "5"))
+
+
+class Component:
+    """Parte pesada del servicio que se inicializa una sola vez.
+
+    ``get`` la inicializa en el primer uso (bloqueando solo a quien la
+    necesita) y devuelve el resultado; el calentamiento de ``StartupManager``
+    llama al mismo ``get`` en segundo plano. Si ``init`` falla, el siguiente
+    ``get`` vuelve a intentarlo.
+    """
+
+    def __init__(self, name: str, init: Callable[[], Any], required: bool = True):
+        self.name = name
+        self.required = required
+        self._init = init
+        self._lock = threading.Lock()
+        self._done = False
+        self._value: Any = None
+        self.state = "pending"
+        self.seconds: Optional[float] = None
+        self.attempts = 0
+        self.error: Optional[str] = None
+
+    @property
+    def ready(self) -> bool:
+        return self._done
+
+    def get(self) -> Any:
+        if self._done:
+            return self._value
+        with self._lock:
+            if self._done:
+                return self._value
+            self.state = "loading"
+            self.attempts += 1
+            start = time.perf_counter()
+            try:
+                self._value = self._init()
+            except Exception as e:
+                self.seconds = time.perf_counter() - start
+                self.state = "failed"
+                self.error = f"{type(e).__name__}: {e}"
+                raise
+            self.seconds = time.perf_counter() - start
+            self.state = "ready"
+            self.error = None
+            self._done = True
+        logger.info("Componente %s listo en %.2fs", self.name, self.seconds)
+        return self._value
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "required": self.required,
+            "seconds": round(self.seconds, 3) if self.seconds is not None else None,
+            "attempts": self.attempts,
+            "error": self.error,
+        }
+
+
+class StartupManager:
+    """Arranque escalonado: el servidor HTTP responde de inmediato y los
+    componentes se inicializan en un hilo, en orden de registro.
+
+    El servicio está listo (``/ready``) cuando todos los componentes
+    obligatorios lo están; los opcionales solo se informan. Un obligatorio
+    que falla se reintenta cada ``retry_interval`` segundos.
+    """
+
+    def __init__(self, retry_interval: float = STARTUP_RETRY_INTERVAL):
+        self.retry_interval = retry_interval
+        self.components: Dict[str, Component] = {}
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._started_at: Optional[float] = None
+        self.ready_seconds: Optional[float] = None
+
+    def register(self, name: str, init: Callable[[], Any], required: bool = True) -> Component:
+        component = self.components[name] = Component(name, init, required=required)
+        return component
+
+    @property
+    def ready(self) -> bool:
+        return all(c.ready for c in self.components.values() if c.required)
+
+    def _warm(self, component: Component) -> bool:
+        try:
+            component.get()
+            return True
+        except Exception as e:
+            log = logger.error if component.required else logger.warning
+            log("Componente %s falló tras %.2fs: %s", component.name, component.seconds or 0, e)
+            return False
+
+    def _run(self):
+        pending: List[Component] = [c for c in self.components.values() if not self._warm(c) and c.required]
+        while pending and not self._stop.wait(self.retry_interval):
+            pending = [c for c in pending if not self._warm(c)]
+        if self.ready and self._started_at is not None:
+            self.ready_seconds = time.perf_counter() - self._started_at
+            logger.info("Servicio listo en %.2fs", self.ready_seconds)
+
+    def start(self):
+        """Inicia el calentamiento en segundo plano (idempotente)."""
+        if self._thread is not None:
+            return
+        self._started_at = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="startup", daemon=True)
+        self._thread.start()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        if self._thread is not None:
+            self._thread.join(timeout)
+        return self.ready
+
+    def stop(self):
+        self._stop.set()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "ready": self.ready,
+            "ready_seconds": round(self.ready_seconds, 3) if self.ready_seconds is not None else None,
+            "components": {name: c.stats() for name, c in self.components.items()},
+        }
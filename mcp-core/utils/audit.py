@@ -13,8 +13,7 @@ def audit_step(label):
         if not ENABLED:
             return fn
 
-        @functools.wraps(fn)
-        def inner(*args, **kw):
+        def before(args, kw):
             trace_id = kw.get("trace_id")
             if trace_id is None and args:
                 trace_id = getattr(args[0], "sid", None)
@@ -26,11 +25,26 @@ def audit_step(label):
                 "kwargs": kw,
             }
             logger.debug(json.dumps(payload, default=str))
-            out = fn(*args, **kw)
+            return payload
+
+        def after(payload, out):
             payload.update({"return": out})
             logger.debug(json.dumps(payload, default=str))
             return out
 
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def inner(*args, **kw):
+                payload = before(args, kw)
+                return after(payload, await fn(*args, **kw))
+
+            return inner
+
+        @functools.wraps(fn)
+        def inner(*args, **kw):
+            payload = before(args, kw)
+            return after(payload, fn(*args, **kw))
+
         return inner
 
     return wrapper
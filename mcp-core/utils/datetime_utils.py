@@ -1,10 +1,28 @@
-from datetime import datetime, date, timedelta
+from datetime import datetime, date, time, timedelta
+from functools import lru_cache
+import os
 import re
 from typing import Optional
-from dateparser.search import search_dates
 
+# Resultados recordados por (texto, fecha base)
+DATE_PARSE_CACHE_SIZE = int(os.getenv("DATE_PARSE_CACHE_SIZE", "1024"))
 
+
+@lru_cache(maxsize=DATE_PARSE_CACHE_SIZE)
 def parse_nl_datetime(text: str, base_dt: datetime) -> tuple[datetime | None, str | None]:
+    """Fecha y hora mencionadas en ``text`` y el fragmento reconocido.
+
+    Primero prueba las formas habituales ("mañana a las 10", "el lunes 9:30",
+    "15/08", "2025-08-14", "14 de julio"); si el texto no calza completo con
+    ninguna, recurre a ``dateparser.search_dates``.
+    """
+    return parse_fast_datetime(text, base_dt) or _search_dates(text, base_dt)
+
+
+def _search_dates(text: str, base_dt: datetime) -> tuple[datetime | None, str | None]:
+    # dateparser tarda ~0,5 s en importarse: solo se carga si hace falta
+    from dateparser.search import search_dates
+
     settings = {
         "RELATIVE_BASE": base_dt,
         "PREFER_DATES_FROM": "future",
@@ -24,6 +42,11 @@ def parse_nl_datetime(text: str, base_dt: datetime) -> tuple[datetime | None, st
     return dt, match_text
 
 
+def preload_dateparser():
+    """Importa dateparser y carga sus datos del español antes del primer turno."""
+    _search_dates("mañana a las 10", datetime.now())
+
+
 WEEKDAYS = {
     "lunes": 0,
     "martes": 1,
@@ -37,6 +60,105 @@ WEEKDAYS = {
 }
 
 
+MONTHS = {
+    "enero": 1,
+    "febrero": 2,
+    "marzo": 3,
+    "abril": 4,
+    "mayo": 5,
+    "junio": 6,
+    "julio": 7,
+    "agosto": 8,
+    "septiembre": 9,
+    "setiembre": 9,
+    "octubre": 10,
+    "noviembre": 11,
+    "diciembre": 12,
+}
+
+RELATIVE_DAYS = {"hoy": 0, "mañana": 1, "manana": 1, "pasado mañana": 2, "pasado manana": 2}
+
+_WEEKDAY_RE = "|".join(WEEKDAYS)
+_MONTH_RE = "|".join(MONTHS)
+_DATE_RE = rf"""
+    (?P<rel>pasado\s+ma[ñn]ana|ma[ñn]ana|hoy)
+  | (?:(?:el|este|pr[óo]ximo)\s+)?(?P<wd>{_WEEKDAY_RE})
+    (?:\s+(?P<wd_day>\d{{1,2}})\s+de\s+(?P<wd_month>{_MONTH_RE}))?
+  | (?P<day>\d{{1,2}})\s+de\s+(?P<month>{_MONTH_RE})(?:\s+(?:de|del)\s+(?P<year>\d{{4}}))?
+  | (?P<s_day>\d{{1,2}})/(?P<s_month>\d{{1,2}})(?:/(?P<s_year>\d{{4}}))?
+  | (?P<iso_year>\d{{4}})-(?P<iso_month>\d{{2}})-(?P<iso_day>\d{{2}})
+"""
+_TIME_RE = r"""
+    (?:a\s+las?\s+(?P<hour>\d{1,2})(?::(?P<minute>\d{2}))?
+      | (?P<c_hour>\d{1,2}):(?P<c_minute>\d{2}))
+    (?:\s*(?:hrs?|horas)\.?)?
+    (?:\s*(?P<meridiem>am|pm|de\s+la\s+ma[ñn]ana|de\s+la\s+tarde|de\s+la\s+noche))?
+"""
+# El texto completo debe ser una fecha con hora opcional (antes o después),
+# a lo más precedida de "para" o "el"; cualquier otra cosa va a dateparser.
+_FAST_DATETIME = re.compile(
+    rf"""\s*(?:para\s+)?(?:el\s+)?
+    (?P<expr>
+        (?:{_DATE_RE})(?:\s*,?\s*{_TIME_RE})?
+      | {_TIME_RE.replace("?P<", "?P<t_")}\s+(?:del?\s+|el\s+)?(?:{_DATE_RE.replace("?P<", "?P<t_")})
+    )
+    \s*[.!]?\s*""",
+    re.IGNORECASE | re.VERBOSE,
+)
+
+
+def parse_fast_datetime(text: str, base_dt: datetime) -> Optional[tuple[datetime, str]]:
+    """Ruta rápida de ``parse_nl_datetime`` para las formas habituales.
+
+    Devuelve ``None`` si el texto no es exactamente una de ellas. Resuelve
+    igual que dateparser con ``PREFER_DATES_FROM="future"``: "hoy"/"mañana"
+    conservan la hora base, un día de la semana es el próximo (nunca hoy)
+    y una fecha sin año ya pasada cae en el año siguiente.
+    """
+    m = _FAST_DATETIME.fullmatch(text)
+    if not m:
+        return None
+    g = {k.removeprefix("t_"): v for k, v in m.groupdict().items() if v is not None}
+    tz = base_dt.tzinfo or base_dt.astimezone().tzinfo
+    base_naive = base_dt.replace(tzinfo=None)
+    try:
+        default_time = time(0, 0)
+        if "rel" in g:
+            day = base_naive.date() + timedelta(days=RELATIVE_DAYS[re.sub(r"\s+", " ", g["rel"].lower())])
+            default_time = base_naive.time()
+        elif "wd" in g and "wd_day" not in g:
+            diff = (WEEKDAYS[g["wd"].lower()] - base_naive.weekday() - 1) % 7 + 1
+            day = base_naive.date() + timedelta(days=diff)
+        elif "iso_year" in g:
+            day = date(int(g["iso_year"]), int(g["iso_month"]), int(g["iso_day"]))
+        else:
+            d = g.get("wd_day") or g.get("day") or g["s_day"]
+            mo = g.get("wd_month") or g.get("month")
+            month = MONTHS[mo.lower()] if mo else int(g["s_month"])
+            year = g.get("year") or g.get("s_year")
+            if year:
+                day = date(int(year), month, int(d))
+            else:
+                day = date(base_naive.year, month, int(d))
+                if datetime.combine(day, time(0, 0)) < base_naive:
+                    day = day.replace(year=day.year + 1)
+        hour = g.get("hour") or g.get("c_hour")
+        if hour is None:
+            clock = default_time
+        else:
+            h = int(hour)
+            meridiem = (g.get("meridiem") or "").lower()
+            if h < 12 and (meridiem == "pm" or meridiem.endswith(("tarde", "noche"))):
+                h += 12
+            elif h == 12 and (meridiem == "am" or meridiem.endswith(("mañana", "manana"))):
+                h = 0
+            clock = time(h, int(g.get("minute") or g.get("c_minute") or 0))
+    except ValueError:
+        # 31/02, 25:00, ...: que decida dateparser
+        return None
+    return datetime.combine(day, clock, tzinfo=tz), m.group("expr")
+
+
 def compute_relative_date(base: date, texto: str) -> Optional[date]:
     """Calcula una fecha relativa a partir de un texto y un día base."""
     for name, wd in WEEKDAYS.items():
@@ -1,11 +1,12 @@
-import phonenumbers
-from phonenumbers import PhoneNumberFormat, PhoneNumberType, phonenumberutil
-
 def validar_telefono_movil(numero_raw: str, region: str = "CL") -> str | None:
     """
     Retorna el número formateado E.164 (+56912345678)
     solo si es válido, posible y de tipo móvil.
     """
+    # phonenumbers carga sus metadatos al importarse: se difiere al primer uso
+    import phonenumbers
+    from phonenumbers import PhoneNumberFormat, PhoneNumberType, phonenumberutil
+
     try:
         num = phonenumbers.parse(numero_raw, region)
     except phonenumbers.NumberParseException:
@@ -1,8 +1,50 @@
+import os
 import unicodedata
+from functools import lru_cache
 
+# Entradas distintas recordadas por cada normalizador
+NORMALIZE_CACHE_SIZE = int(os.getenv("NORMALIZE_CACHE_SIZE", "16384"))
+
+
+def _strip_marks(text: str) -> str:
+    return "".join(c for c in unicodedata.normalize("NFD", text) if unicodedata.category(c) != "Mn")
+
+
+def _accent_table() -> dict:
+    """Tabla ``str.translate`` que quita tildes (á→a, ñ→n, ü→u, ...).
+
+    Cubre los alfabetos latinos y las marcas combinantes sueltas; se calcula
+    con la misma descomposición NFD que la implementación de referencia.
+    """
+    table = {}
+    for cp in range(0x80, 0x250):
+        ch = chr(cp)
+        folded = _strip_marks(ch)
+        if folded != ch:
+            table[cp] = folded
+    for cp in range(0x300, 0x370):
+        table[cp] = None
+    return table
+
+
+_ACCENTS = _accent_table()
+# ASCII que normalize_text descarta (ni alfanumérico ni espacio)
+_ASCII_SYMBOLS = {cp: None for cp in range(128) if not (chr(cp).isalnum() or chr(cp).isspace())}
+
+
+@lru_cache(maxsize=NORMALIZE_CACHE_SIZE)
+def fold_text(text: str) -> str:
+    """Lowercase and remove accents, keeping punctuation."""
+    text = text.lower().translate(_ACCENTS)
+    # Caracteres fuera de la tabla (otros alfabetos, símbolos): ruta NFD completa
+    return text if text.isascii() else _strip_marks(text)
+
+
+@lru_cache(maxsize=NORMALIZE_CACHE_SIZE)
 def normalize_text(text: str) -> str:
     """Lowercase, remove accents and keep only alphanumerics and spaces."""
-    text = text.lower().strip()
-    text = "".join(c for c in unicodedata.normalize("NFD", text) if unicodedata.category(c) != "Mn")
-    text = "".join(c for c in text if c.isalnum() or c.isspace())
-    return text
+    text = text.lower().strip().translate(_ACCENTS)
+    if text.isascii():
+        return text.translate(_ASCII_SYMBOLS)
+    text = _strip_marks(text)
+    return "".join(c for c in text if c.isalnum() or c.isspace())
@@ -2,13 +2,16 @@ import os
 import json
 import glob
 import logging
+import time
 import traceback
 import requests
 from fastapi import FastAPI, HTTPException, Request, Depends
 from fastapi.security import HTTPBasic, HTTPBasicCredentials
 from fastapi.middleware.cors import CORSMiddleware
 from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.responses import JSONResponse
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import JSONResponse, Response
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.metrics.pairwise import cosine_similarity
 from llama_client import LlamaClient
@@ -39,8 +42,8 @@ API_USERNAME = os.getenv("API_USERNAME", "admin")
 API_PASSWORD = os.getenv("API_PASSWORD", "admin")
 class IPWhitelistMiddleware(BaseHTTPMiddleware):
     async def dispatch(self, request: Request, call_next):
-        # Permitir acceso sin restricciones a healthcheck y raíz
-        if request.url.path in ("/health", "/"):
+        # Permitir acceso sin restricciones a healthcheck, métricas y raíz
+        if request.url.path in ("/health", "/metrics", "/"):
             return await call_next(request)
             
         client_ip = request.client.host
@@ -120,8 +123,38 @@ def buscar_similitud_en_documentos(pregunta, docs_relevantes):
         return corpus[idx_max], nombres[idx_max]
     return None, None
 
+# ==== Métricas Prometheus ====
+TOOLS = ("buscar_documento_por_tag", "generar_respuesta_llm")
+TOOL_CALLS = Counter(
+    "llm_docs_tool_calls", "Llamadas a /tools/call por herramienta y origen de la respuesta", ["tool", "outcome"]
+)
+TOOL_SECONDS = Histogram(
+    "llm_docs_tool_call_duration_seconds",
+    "Duración de /tools/call por herramienta",
+    ["tool"],
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 40),
+)
+LLM_TOKENS = Counter("llm_docs_llm_tokens", "Tokens procesados por el LLM", ["kind"])
+LLM_SECONDS = Counter("llm_docs_llm_generation_seconds", "Tiempo del LLM generando")
+INFERENCE_QUEUE = Gauge("llm_docs_inference_queue_depth", "Peticiones esperando al modelo")
+LLM_BATCH_SIZE = Histogram(
+    "llm_docs_llm_batch_size", "Peticiones por micro-batch de inferencia", buckets=(1, 2, 3, 4, 6, 8, 16)
+)
+
+
+def record_generation(model: str, prompt_tokens: int, completion_tokens: int, seconds: float):
+    LLM_TOKENS.labels("prompt").inc(prompt_tokens)
+    LLM_TOKENS.labels("completion").inc(completion_tokens)
+    LLM_SECONDS.inc(seconds)
+
+
+def record_batch(model: str, size: int):
+    LLM_BATCH_SIZE.observe(size)
+
+
 # === Cliente Llama ===
-llama = LlamaClient()
+llama = LlamaClient(observe=record_generation, observe_batch=record_batch)
+INFERENCE_QUEUE.set_function(lambda: llama.scheduler.stats()["queue_depth"])
 
 def generate_response(prompt: str) -> str:
     """Genera una respuesta utilizando el modelo Llama local."""
@@ -137,6 +170,19 @@ async def tools_call(request: Request, credentials: HTTPBasicCredentials = Depen
     req = await request.json()
     tool = req.get("tool")
     params = req.get("params", {})
+    label = tool if tool in TOOLS else "unknown"
+    outcome = "error"
+    start = time.perf_counter()
+    try:
+        respuesta, outcome = await run_in_threadpool(call_tool, tool, params)
+        return respuesta
+    finally:
+        TOOL_CALLS.labels(label, outcome).inc()
+        TOOL_SECONDS.labels(label).observe(time.perf_counter() - start)
+
+
+def call_tool(tool: str, params: dict):
+    """Ejecuta la herramienta; devuelve el texto y si lo respondió un documento o el LLM."""
     faq_context = params.get("faq_context")
     if tool == "buscar_documento_por_tag":
         pregunta = params["pregunta"]
@@ -148,23 +194,23 @@ async def tools_call(request: Request, credentials: HTTPBasicCredentials = Depen
         texto, docname = buscar_similitud_en_documentos(pregunta, docs_filtrados)
         if texto:
             logger.info(f"Respuesta encontrada en documento: {docname}")
-            return texto  # Solo el texto
+            return texto, "document"  # Solo el texto
         # Fallback LLM
         respuesta = generate_response(pregunta)
         logger.info("Respuesta generada por Llama (fallback MCP)")
-        return respuesta  # Solo el texto
+        return respuesta, "llm"  # Solo el texto
     elif tool == "generar_respuesta_llm":
         pregunta = params["pregunta"]
         language = params.get("language", "es")
         respuesta = generate_response(pregunta)
         logger.info("Respuesta generada por Llama (tool directo MCP)")
-        return respuesta  # Solo el texto
+        return respuesta, "llm"  # Solo el texto
     else:
         raise HTTPException(status_code=400, detail=f"Herramienta desconocida: {tool}")
 
 @app.get("/health")
 def health():
-    return {"status": "ok"}
+    return {"status": "ok", "inference": llama.scheduler.stats()}
 
 @app.get("/endpoints")
 def list_endpoints():
@@ -172,7 +218,7 @@ def list_endpoints():
 
 @app.get("/metrics")
 def metrics():
-    return "# HELP dummy"  # simplified for tests
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
 
 @app.post("/process")
 def process(data: dict, credentials: HTTPBasicCredentials = Depends(authenticate)):
@@ -1,8 +1,9 @@
 import os
 from llama_cpp import Llama
+from inference_scheduler import InferenceScheduler
 
 class LlamaClient:
-    def __init__(self, model_path=None, n_ctx=4096, n_threads=2):
+    def __init__(self, model_path=None, n_ctx=4096, n_threads=2, observe=None, observe_batch=None):
         self.model_path = model_path or os.getenv("LLAMA_MODEL_PATH", "models/Llama-3.2-3B-Instruct-Q6_K.gguf")
         self.n_ctx = int(os.getenv("N_CTX", n_ctx))
         self.n_threads = int(os.getenv("N_THREADS", n_threads))
@@ -10,14 +11,21 @@ class LlamaClient:
             self.llm = None
         else:
             self.llm = Llama(model_path=self.model_path, n_ctx=self.n_ctx, n_threads=self.n_threads)
+        # Todas las llamadas al modelo pasan por la cola de inferencia
+        self.scheduler = InferenceScheduler(
+            lambda: self.llm,
+            name=os.path.basename(self.model_path),
+            observe=observe,
+            observe_batch=observe_batch,
+        )
 
     def generate(self, prompt: str, max_tokens: int = 256, temperature: float = 0.7) -> str:
         if self.llm is None:
             return ""
-        output = self.llm(
+        output = self.scheduler.submit(
             prompt,
             max_tokens=max_tokens,
             temperature=temperature,
             stop=["</s>", "<|endoftext|>"]
-        )
+        ).result()
         return output["choices"][0]["text"].strip()
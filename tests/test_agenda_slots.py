@@ -29,9 +29,13 @@ spec = importlib.util.spec_from_file_location('orchestrator', os.path.join('mcp-
 orchestrator = importlib.util.module_from_spec(spec)
 spec.loader.exec_module(orchestrator)
 
-fake = fakeredis.FakeRedis()
+server = fakeredis.FakeServer()
+fake = fakeredis.FakeRedis(server=server)
+async_fake = fakeredis.FakeAsyncRedis(server=server)
 orchestrator.redis_client = fake
 orchestrator.context_manager.redis_client = fake
+orchestrator.async_redis_client = async_fake
+orchestrator.context_manager.async_redis_client = async_fake
 
 
 def test_agenda_slot_flow(monkeypatch, caplog):
@@ -47,7 +51,7 @@ def test_agenda_slot_flow(monkeypatch, caplog):
     monkeypatch.setattr(orchestrator, "parse_date_time", fake_parse_date_time)
 
     captured = {}
-    def fake_call(tool, payload):
+    async def fake_call(tool, payload):
         captured["tool"] = tool
         captured["payload"] = payload.copy()
         return {"data": [{"fecha": payload["fecha"], "hora": payload["hora"]}]}
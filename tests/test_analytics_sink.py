@@ -0,0 +1,100 @@
+import importlib.util
+import os
+import threading
+from contextlib import contextmanager
+
+spec = importlib.util.spec_from_file_location('analytics_sink', os.path.join('mcp-core', 'analytics_sink.py'))
+analytics_sink = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(analytics_sink)
+
+
+class FakeConn:
+    def __init__(self):
+        self.commits = 0
+
+    def cursor(self):
+        return contextmanager(lambda: (yield object()))()
+
+    def commit(self):
+        self.commits += 1
+
+
+def make_sink(tmp_path, monkeypatch, connection=None, **kwargs):
+    calls = []
+    monkeypatch.setattr(
+        analytics_sink, 'execute_values',
+        lambda cur, sql, rows, page_size=None: calls.append((sql, list(rows))),
+    )
+    conn = FakeConn()
+
+    @contextmanager
+    def default_connection():
+        yield conn
+
+    sink = analytics_sink.AnalyticsSink(
+        connection or default_connection, str(tmp_path / 'missed.csv'), **kwargs
+    )
+    return sink, calls, conn
+
+
+def test_events_are_written_in_one_batch_per_table(tmp_path, monkeypatch):
+    sink, calls, conn = make_sink(tmp_path, monkeypatch, batch_size=50, flush_seconds=0.2)
+    for i in range(5):
+        sink.record_feedback(None, f'fb{i}')
+        sink.record_unanswered(f'p{i}', 'no sé')
+        sink.record_missed(f'pregunta, {i}', 'alt', 70)
+    assert sink.flush(5)
+    tables = sorted(sql.split()[2] for sql, _ in calls)
+    assert tables == ['feedback_usuario', 'preguntas_no_contestadas']
+    assert all(len(rows) == 5 for _, rows in calls)
+    assert conn.commits == 2
+    lines = (tmp_path / 'missed.csv').read_text(encoding='utf-8').splitlines()
+    assert lines[0] == 'timestamp,question,best_alt,best_score'
+    assert len(lines) == 6 and lines[1].endswith(',pregunta  0,alt,70')
+    stats = sink.stats()
+    assert stats['written'] == 15 and stats['batches'] == 1 and stats['dropped'] == 0
+
+
+def test_full_queue_drops_instead_of_blocking(tmp_path, monkeypatch):
+    release = threading.Event()
+
+    @contextmanager
+    def slow_connection():
+        release.wait(5)
+        yield FakeConn()
+
+    sink, _, _ = make_sink(
+        tmp_path, monkeypatch, connection=slow_connection, max_queue=3, batch_size=1, flush_seconds=0
+    )
+    for i in range(10):
+        sink.record_feedback(None, f'fb{i}')
+    assert sink.stats()['dropped'] >= 6
+    release.set()
+    assert sink.flush(5)
+    stats = sink.stats()
+    assert stats['written'] + stats['dropped'] == 10
+
+
+def test_database_down_counts_dropped_events(tmp_path, monkeypatch):
+    @contextmanager
+    def broken_connection():
+        raise RuntimeError('could not connect to server')
+        yield
+
+    sink, _, _ = make_sink(tmp_path, monkeypatch, connection=broken_connection, flush_seconds=0.05)
+    sink.record_feedback(1, 'sí')
+    sink.record_feedback(2, 'no')
+    sink.record_missed('hola')
+    assert sink.flush(5)
+    stats = sink.stats()
+    assert stats['dropped'] == 2 and stats['written'] == 1
+
+
+def test_close_flushes_pending_events(tmp_path, monkeypatch):
+    sink, calls, _ = make_sink(tmp_path, monkeypatch, batch_size=100, flush_seconds=30)
+    for i in range(3):
+        sink.record_unanswered(f'p{i}', 'r')
+    sink.close(5)
+    assert [len(rows) for _, rows in calls] == [3]
+    sink.record_unanswered('tarde', 'r')
+    assert sink.stats()['dropped'] == 1
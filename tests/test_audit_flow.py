@@ -71,9 +71,13 @@ orch_spec = importlib.util.spec_from_file_location('orchestrator', os.path.join(
 orchestrator = importlib.util.module_from_spec(orch_spec)
 orch_spec.loader.exec_module(orchestrator)
 
-fake = fakeredis.FakeRedis()
+server = fakeredis.FakeServer()
+fake = fakeredis.FakeRedis(server=server)
+async_fake = fakeredis.FakeAsyncRedis(server=server)
 orchestrator.redis_client = fake
 orchestrator.context_manager.redis_client = fake
+orchestrator.async_redis_client = async_fake
+orchestrator.context_manager.async_redis_client = async_fake
 
 
 def test_audit_tracing(caplog):
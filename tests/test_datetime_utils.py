@@ -2,6 +2,7 @@ import importlib.util
 import os
 import sys
 from datetime import datetime
+from zoneinfo import ZoneInfo
 
 sys.path.insert(0, os.path.abspath('mcp-core'))
 spec = importlib.util.spec_from_file_location('datetime_utils', os.path.join('mcp-core', 'utils', 'datetime_utils.py'))
@@ -31,3 +32,43 @@ def test_last_business_day():
     base = datetime(2025, 8, 15)
     last = datetime_utils.compute_last_business_day(base)
     assert last == datetime(2025, 8, 29).date()
+
+
+FAST_PHRASES = [
+    'mañana a las 10', 'hoy a las 16:30', 'el lunes 9:30', 'próximo jueves', 'sábado',
+    '24/08', '15/08 a las 10:00', '2025-08-14 10:30', 'el 14 de julio a las 10:00',
+    'el 7 de julio', 'martes 10 de julio', '15:00 del jueves', 'Para el Viernes a las 10:30.',
+]
+
+
+def test_fast_path_agrees_with_dateparser():
+    base = datetime(2025, 7, 7, 15, 55, tzinfo=ZoneInfo('America/Santiago'))
+    for phrase in FAST_PHRASES:
+        fast = datetime_utils.parse_fast_datetime(phrase, base)
+        assert fast is not None, phrase
+        slow, _ = datetime_utils._search_dates(phrase, base)
+        assert fast[0].strftime('%Y-%m-%d %H:%M') == slow.strftime('%Y-%m-%d %H:%M'), phrase
+    # Donde dateparser se equivoca (toma la hora como mes o ignora "de la tarde")
+    assert datetime_utils.parse_fast_datetime('el martes a las 11', base)[0].strftime('%Y-%m-%d %H:%M') == '2025-07-08 11:00'
+    assert datetime_utils.parse_fast_datetime('mañana a las 3 de la tarde', base)[0].hour == 15
+    assert datetime_utils.parse_fast_datetime('pasado mañana', base)[0].day == 9
+
+
+def test_unknown_forms_fall_back_to_dateparser_once(monkeypatch):
+    calls = []
+
+    def fake_search(text, base_dt):
+        calls.append(text)
+        return None, None
+
+    monkeypatch.setattr(datetime_utils, '_search_dates', fake_search)
+    base = datetime(2025, 7, 7, 12, 0)
+    for text in ('a las 9 de la mañana', 'mi nombre es Ana', '31/02'):
+        assert datetime_utils.parse_fast_datetime(text, base) is None
+        assert datetime_utils.parse_nl_datetime(text, base) == (None, None)
+        # Misma frase y misma fecha base: se responde desde el memo
+        assert datetime_utils.parse_nl_datetime(text, base) == (None, None)
+    assert calls == ['a las 9 de la mañana', 'mi nombre es Ana', '31/02']
+    dt, match = datetime_utils.parse_nl_datetime('el lunes 9:30', base)
+    assert (dt.day, dt.hour, dt.minute, match) == (14, 9, 30, 'lunes 9:30')
+    assert len(calls) == 3
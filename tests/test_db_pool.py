@@ -0,0 +1,264 @@
+import asyncio
+import importlib.util
+import os
+import socket
+import threading
+import time
+
+import pytest
+
+spec = importlib.util.spec_from_file_location('db_pool', os.path.join('mcp-core', 'db_pool.py'))
+db_pool = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(db_pool)
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params=None):
+        if self.conn.dead:
+            raise RuntimeError('server closed the connection')
+        self.conn.executed.append(sql)
+
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = 0
+        self.dead = False
+        self.rollbacks = 0
+        self.executed = []
+
+    def cursor(self, **kwargs):
+        return FakeCursor(self)
+
+    def rollback(self):
+        if self.dead:
+            raise RuntimeError('server closed the connection')
+        self.rollbacks += 1
+
+    def close(self):
+        self.closed = 1
+
+
+def make_pool(**kwargs):
+    created = []
+
+    def connect():
+        conn = FakeConnection()
+        created.append(conn)
+        return conn
+    return db_pool.ConnectionPool(connect, **kwargs), created
+
+
+def test_connections_are_reused_and_rolled_back():
+    pool, created = make_pool(max_size=2)
+    for _ in range(5):
+        with pool.connection() as conn:
+            conn.cursor().execute('SELECT 1')
+    assert len(created) == 1
+    assert created[0].rollbacks == 5
+    stats = pool.stats()
+    assert stats['acquired'] == 5 and stats['created'] == 1
+    assert stats['in_use'] == 0 and stats['idle'] == 1
+
+
+def test_exception_returns_connection_to_pool():
+    pool, created = make_pool(max_size=1, timeout=0.1)
+    with pytest.raises(ValueError):
+        with pool.connection():
+            raise ValueError('consulta fallida')
+    with pool.connection() as conn:
+        assert conn is created[0]
+    assert created[0].rollbacks == 2
+
+
+def test_acquire_times_out_when_pool_is_exhausted():
+    pool, _ = make_pool(max_size=1, timeout=0.05)
+    with pool.connection():
+        with pytest.raises(db_pool.PoolTimeout):
+            with pool.connection():
+                pass
+    assert pool.stats()['timeouts'] == 1
+    assert pool.stats()['utilization'] == 0
+
+
+def test_dead_idle_connection_is_replaced():
+    pool, created = make_pool(max_size=1, check_after=0)
+    with pool.connection():
+        pass
+    created[0].dead = True
+    with pool.connection() as conn:
+        assert conn is not created[0]
+    assert created[0].closed and pool.stats()['discarded'] == 1
+
+
+def test_concurrent_use_never_exceeds_max_size():
+    pool, created = make_pool(max_size=3, timeout=2)
+    active, peak = [0], [0]
+    lock = threading.Lock()
+
+    def worker():
+        for _ in range(20):
+            with pool.connection():
+                with lock:
+                    active[0] += 1
+                    peak[0] = max(peak[0], active[0])
+                with lock:
+                    active[0] -= 1
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert peak[0] <= 3 and len(created) <= 3
+    assert pool.stats()['acquired'] == 160
+
+
+def test_held_seconds_counts_time_until_release():
+    pool = db_pool.ConnectionPool(FakeConnection, max_size=1)
+    with pool.connection():
+        time.sleep(0.02)
+    with pytest.raises(ValueError):
+        with pool.connection():
+            raise ValueError('fallo dentro del bloque')
+    assert pool.stats()['held_seconds'] >= 0.02
+
+
+class FakeAsyncCursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def execute(self, sql, params=None):
+        self.conn.pending = sql
+        # El "servidor" responde más tarde por el socket
+        asyncio.get_running_loop().call_later(self.conn.delay, self.conn.server.send, b'x')
+
+    def fetchall(self):
+        return [(self.conn.executed[-1],)]
+
+
+class FakeAsyncConnection:
+    """Conexión con la API asíncrona de psycopg2 (``poll``/``fileno``) sobre un socketpair."""
+
+    def __init__(self, delay=0.0):
+        self.sock, self.server = socket.socketpair()
+        self.sock.setblocking(False)
+        self.delay = delay
+        self.closed = 0
+        self.connecting = True
+        self.pending = None
+        self.executed = []
+
+    def fileno(self):
+        return self.sock.fileno()
+
+    def poll(self):
+        if self.connecting:
+            self.connecting = False
+            return db_pool.POLL_WRITE
+        if self.pending is not None:
+            try:
+                self.sock.recv(1)
+            except BlockingIOError:
+                return db_pool.POLL_READ
+            sql, self.pending = self.pending, None
+            if sql == 'FAIL':
+                raise RuntimeError('syntax error')
+            self.executed.append(sql)
+        return db_pool.POLL_OK
+
+    def cursor(self, cursor_factory=None):
+        return FakeAsyncCursor(self)
+
+    def close(self):
+        self.closed = 1
+        self.sock.close()
+        self.server.close()
+
+
+def make_async_pool(delays=(0.0,), **kwargs):
+    """Pool asíncrono; la conexión ``i`` responde con ``delays[i]`` (o el último)."""
+    created = []
+    observed = []
+
+    def connect():
+        conn = FakeAsyncConnection(delays[min(len(created), len(delays) - 1)])
+        created.append(conn)
+        return conn
+    return db_pool.AsyncConnectionPool(connect, observe=observed.append, **kwargs), created, observed
+
+
+def test_async_queries_wait_on_the_event_loop():
+    pool, created, observed = make_async_pool(delays=(0.1,), max_size=5)
+
+    async def query(i):
+        async with pool.connection() as conn:
+            cur = await conn.execute(f'SELECT {i}')
+            return cur.fetchall()
+
+    async def main():
+        return await asyncio.gather(*(query(i) for i in range(5)))
+
+    threads = threading.active_count()
+    start = time.perf_counter()
+    rows = asyncio.run(main())
+    # Cinco consultas de 0.1 s a la vez, sin hilos extra
+    assert time.perf_counter() - start < 0.3
+    assert threading.active_count() == threads
+    assert rows == [[(f'SELECT {i}',)] for i in range(5)]
+    assert len(observed) == 5 and min(observed) >= 0.1
+    stats = pool.stats()
+    assert stats['created'] == 5 and stats['idle'] == 5 and stats['in_use'] == 0
+
+
+def test_async_pool_reuses_connections_and_keeps_them_after_query_errors():
+    pool, created, _ = make_async_pool(max_size=1)
+
+    async def main():
+        async with pool.connection() as conn:
+            with pytest.raises(RuntimeError):
+                await conn.execute('FAIL')
+        async with pool.connection() as conn:
+            await conn.execute('SELECT 1')
+
+    asyncio.run(main())
+    assert len(created) == 1 and created[0].executed == ['SELECT 1']
+    assert pool.stats()['acquired'] == 2
+
+
+def test_async_acquire_times_out_when_pool_is_exhausted():
+    pool, _, _ = make_async_pool(max_size=1, timeout=0.05)
+
+    async def main():
+        async with pool.connection():
+            with pytest.raises(db_pool.PoolTimeout):
+                async with pool.connection():
+                    pass
+
+    asyncio.run(main())
+    assert pool.stats()['timeouts'] == 1 and pool.stats()['in_use'] == 0
+
+
+def test_interrupted_async_query_discards_the_connection():
+    pool, created, _ = make_async_pool(delays=(1.0, 0.0), max_size=1)
+
+    async def main():
+        with pytest.raises(asyncio.TimeoutError):
+            async with pool.connection() as conn:
+                await asyncio.wait_for(conn.execute('SELECT pg_sleep(1)'), 0.05)
+        async with pool.connection() as conn:
+            await conn.execute('SELECT 1')
+
+    asyncio.run(main())
+    # La consulta quedó a medias: esa conexión no vuelve al pool
+    assert created[0].closed
+    assert len(created) == 2 and created[1].executed == ['SELECT 1']
+    assert pool.stats()['discarded'] == 1
@@ -0,0 +1,121 @@
+import importlib.util
+import json
+import os
+import sys
+import types
+from rapidfuzz import fuzz
+
+os.environ["DISABLE_PERIODIC_MIGRATION"] = "1"
+os.environ["FAQ_DB_PATH"] = os.path.join('mcp-core', 'databases', 'faq_respuestas.json')
+os.environ["PROMPTS_PATH"] = os.path.join('mcp-core', 'prompts')
+
+# Mock llama_cpp before importing orchestrator
+fake_llama = types.ModuleType('llama_cpp')
+class FakeLlama:
+    def __init__(self, *args, **kwargs):
+        pass
+    def __call__(self, *args, **kwargs):
+        return {"choices": [{"text": "ok"}]}
+
+fake_llama.Llama = FakeLlama
+sys.modules['llama_cpp'] = fake_llama
+
+sys.path.insert(0, os.path.abspath('mcp-core'))
+
+spec = importlib.util.spec_from_file_location('orchestrator', os.path.join('mcp-core','orchestrator.py'))
+orchestrator = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(orchestrator)
+os.environ.pop("FAQ_DB_PATH", None)
+os.environ.pop("PROMPTS_PATH", None)
+
+
+from doc_matcher import AhoCorasick  # noqa: E402
+
+normalize_text = orchestrator.normalize_text
+kb = orchestrator.knowledge_base.snapshot
+matcher = kb["doc_matcher"]
+
+
+# --- Implementación anterior de responder_sobre_documento (referencia) ---
+def legacy_by_name(pregunta):
+    for doc in kb["documentos"]:
+        if doc["Nombre_Documento"].lower() in pregunta.lower():
+            return doc["Nombre_Documento"]
+    return None
+
+
+def legacy_by_alias(pregunta_norm):
+    for alias_norm, real in kb["doc_alias_map"].items():
+        if alias_norm in pregunta_norm:
+            return real
+    return None
+
+
+def legacy_fuzzy(pregunta):
+    pregunta_norm = normalize_text(pregunta)
+    best_doc, best_score = None, 0
+    for doc in kb["documentos"]:
+        nombre_norm = normalize_text(doc["Nombre_Documento"])
+        score = max(
+            fuzz.partial_ratio(pregunta_norm, nombre_norm),
+            fuzz.token_set_ratio(pregunta_norm, nombre_norm),
+        )
+        if score > best_score:
+            best_score, best_doc = score, doc
+    return best_doc, best_score
+
+
+def legacy_fields(pregunta_norm):
+    campos = []
+    for campo, kws in orchestrator.KEYWORD_FIELDS.items():
+        for kw in kws:
+            kw_norm = normalize_text(kw)
+            if kw_norm in pregunta_norm or fuzz.partial_ratio(pregunta_norm, kw_norm) >= 85:
+                campos.append(campo)
+                break
+    return campos
+
+
+def typo(text):
+    return text[:3] + text[4:5] + text[3:4] + text[5:] if len(text) > 6 else text
+
+
+def preguntas():
+    with open(os.path.join('mcp-core', 'databases', 'faq_respuestas.json'), encoding='utf-8') as f:
+        faq = json.load(f)
+    for entry in faq:
+        alts = entry["pregunta"] if isinstance(entry["pregunta"], list) else [entry["pregunta"]]
+        yield from alts
+    aliases = list(kb["doc_alias_map"])
+    keywords = [kw for kws in orchestrator.KEYWORD_FIELDS.values() for kw in kws]
+    for i, doc in enumerate(kb["documentos"]):
+        nombre = doc["Nombre_Documento"]
+        kw = keywords[(i * 7) % len(keywords)]
+        yield nombre
+        yield f"{kw} para el {nombre.upper()}?"
+        yield f"{typo(kw)} {typo(nombre.lower())}"
+        yield " ".join(nombre.split()[:2])
+        yield f"horario y dirección de {aliases[i % len(aliases)]}"
+    yield from ["", "hola", "costo", "cuanto cuesta", "donde queda la oficina", "que documentos tengo que traer"]
+
+
+def test_matcher_decisions_match_previous_implementation():
+    checked = 0
+    for pregunta in preguntas():
+        pregunta_norm = normalize_text(pregunta)
+        doc = matcher.by_name(pregunta)
+        assert (doc and doc["Nombre_Documento"]) == legacy_by_name(pregunta), pregunta
+        assert matcher.by_alias(pregunta_norm) == legacy_by_alias(pregunta_norm), pregunta
+        assert matcher.fuzzy(pregunta) == legacy_fuzzy(pregunta), pregunta
+        best_doc, score = legacy_fuzzy(pregunta)
+        expected = (best_doc, score) if score >= 80 else (None, 0)
+        assert matcher.fuzzy(pregunta, score_cutoff=80) == expected, pregunta
+        assert matcher.requested_fields(pregunta_norm) == legacy_fields(pregunta_norm), pregunta
+        checked += 1
+    assert checked > 100
+
+
+def test_aho_corasick_reports_overlapping_patterns():
+    automaton = AhoCorasick(["he", "she", "his", "hers", ""])
+    assert automaton.matches("ushers") == {0, 1, 3, 4}
+    assert automaton.first("ahishers") == 0
@@ -0,0 +1,175 @@
+import asyncio
+import importlib.util
+import os
+from contextlib import asynccontextmanager, contextmanager
+
+import fakeredis
+import pytest
+
+spec = importlib.util.spec_from_file_location('document_cards', os.path.join('mcp-core', 'document_cards.py'))
+document_cards = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(document_cards)
+
+DOCUMENTO = {'id': 7, 'id_documento': 'PAT-01', 'nombre': 'Patente comercial', 'descripcion': 'Permiso'}
+TABLAS = {
+    'requisitos': ['Cédula', 'Contrato'],
+    'oficinas': [{'nombre': 'Rentas', 'direccion': 'Plaza 1', 'horario': '8-14', 'correo': None, 'holocom': None}],
+    'duracion': ['1 año'],
+    'sanciones': [],
+    'notas': ['Renovar en enero'],
+}
+
+
+class FakeDB:
+    def __init__(self):
+        self.queries = []
+
+    @contextmanager
+    def connection(self):
+        db = self
+
+        class Cursor:
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *exc):
+                return False
+
+            def execute(self, sql, params):
+                db.queries.append((sql, params))
+                self.row = None
+                if 'PAT-01' in params or any('patente' in str(p) for p in params):
+                    self.row = {'documento': dict(DOCUMENTO)}
+                    for seccion in document_cards.SECTIONS:
+                        if f' AS {seccion}' in sql:
+                            self.row[seccion] = TABLAS[seccion]
+
+            def fetchone(self):
+                return self.row
+
+        class Conn:
+            def cursor(self, **kwargs):
+                return Cursor()
+
+        yield Conn()
+
+    @asynccontextmanager
+    async def async_connection(self):
+        with self.connection() as conn:
+            class AsyncConn:
+                async def execute(self, sql, params=None, cursor_factory=None):
+                    with conn.cursor() as cur:
+                        cur.execute(sql, params)
+                        return cur
+
+            yield AsyncConn()
+
+
+def make_cards():
+    db = FakeDB()
+    client = fakeredis.FakeRedis()
+    return document_cards.DocumentCards(db.connection, lambda: client), db, client
+
+
+def test_requested_sections_come_from_one_query():
+    cards, db, _ = make_cards()
+    card = cards.get('PAT-01', ['requisitos', 'oficinas', 'notas'])
+    assert len(db.queries) == 1
+    sql = db.queries[0][0]
+    assert sql.count('json_agg') == 3 and 'documento_duracion' not in sql
+    assert card['nombre'] == 'Patente comercial'
+    assert card['requisitos'] == ['Cédula', 'Contrato']
+    assert card['oficinas'][0]['horario'] == '8-14'
+    assert 'duracion' not in card
+
+
+def test_cache_serves_repeat_lookups_and_fills_missing_sections():
+    cards, db, _ = make_cards()
+    cards.get('PAT-01', ['requisitos'])
+    assert cards.get('PAT-01', ['requisitos'])['requisitos'] == ['Cédula', 'Contrato']
+    assert len(db.queries) == 1
+    card = cards.get('PAT-01', ['requisitos', 'duracion'])
+    assert card['duracion'] == ['1 año'] and len(db.queries) == 2
+    cards.get('PAT-01', ['duracion', 'requisitos'])
+    assert len(db.queries) == 2
+    assert cards.stats() == {'hits': 2, 'misses': 2}
+
+
+def test_name_lookup_is_cached_through_alias():
+    cards, db, client = make_cards()
+    assert cards.get('patente', ['notas'])['id_documento'] == 'PAT-01'
+    assert cards.get('Patente', ['notas'])['notas'] == ['Renovar en enero']
+    assert len(db.queries) == 1
+    assert client.get('doccard:alias:patente') == b'PAT-01'
+
+
+def test_invalidate_forces_reload():
+    cards, db, client = make_cards()
+    cards.get('patente', ['requisitos'])
+    assert client.smembers('doccard:PAT-01:aliases') == {b'doccard:alias:patente'}
+    # Alias de otro documento: no se toca al invalidar PAT-01
+    client.set('doccard:alias:licencia', 'LIC-02')
+    cards.invalidate('PAT-01')
+    assert not client.exists('doccard:PAT-01', 'doccard:alias:patente', 'doccard:PAT-01:aliases')
+    assert client.get('doccard:alias:licencia') == b'LIC-02'
+    cards.get('PAT-01', ['requisitos'])
+    assert len(db.queries) == 2
+
+
+def test_missing_document_and_unknown_section():
+    cards, db, _ = make_cards()
+    assert cards.get('NOPE', ['requisitos']) is None
+    with pytest.raises(ValueError):
+        cards.get('PAT-01', ['precio'])
+
+
+def test_redis_down_falls_back_to_database():
+    db = FakeDB()
+    server = fakeredis.FakeServer()
+    server.connected = False
+    cards = document_cards.DocumentCards(db.connection, lambda: fakeredis.FakeRedis(server=server))
+    assert cards.get('PAT-01', ['requisitos'])['requisitos'] == ['Cédula', 'Contrato']
+    assert len(db.queries) == 1
+
+
+def test_filling_sections_does_not_extend_the_card_ttl():
+    cards, db, client = make_cards()
+    cards.get('PAT-01', ['requisitos'])
+    client.expire('doccard:PAT-01', 10)
+    cards.get('PAT-01', ['requisitos', 'notas'])
+    assert len(db.queries) == 2
+    assert 0 < client.ttl('doccard:PAT-01') <= 10
+
+
+def test_name_lookup_without_alias_skips_the_card_read():
+    cards, db, client = make_cards()
+    cards.get('PAT-01', ['requisitos'], por_nombre=False)
+    reads = []
+    hmget = client.hmget
+    client.hmget = lambda *a: reads.append(a) or hmget(*a)
+    # Sin alias guardado es un fallo de caché: va directo a la base
+    assert cards.get('patente', ['requisitos'])['id_documento'] == 'PAT-01'
+    assert reads == [] and len(db.queries) == 2
+    cards.get('patente', ['requisitos'])
+    assert len(reads) == 1 and len(db.queries) == 2
+
+
+def test_async_lookups_share_the_cache_with_sync_ones():
+    db = FakeDB()
+    server = fakeredis.FakeServer()
+    client = fakeredis.FakeRedis(server=server)
+    async_client = fakeredis.FakeAsyncRedis(server=server)
+    cards = document_cards.DocumentCards(
+        db.connection, lambda: client,
+        async_connection=db.async_connection, async_redis_getter=lambda: async_client,
+    )
+
+    async def lookups():
+        first = await cards.get_async('patente', ['requisitos'])
+        again = await cards.get_async('patente', ['requisitos'])
+        return first, again
+
+    first, again = asyncio.run(lookups())
+    assert first == again and first['requisitos'] == ['Cédula', 'Contrato']
+    assert cards.get('patente', ['requisitos']) == first
+    assert len(db.queries) == 1 and cards.stats() == {'hits': 2, 'misses': 1}
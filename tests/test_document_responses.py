@@ -23,9 +23,13 @@ spec = importlib.util.spec_from_file_location('orchestrator', os.path.join('mcp-
 orchestrator = importlib.util.module_from_spec(spec)
 spec.loader.exec_module(orchestrator)
 
-fake = fakeredis.FakeRedis()
+server = fakeredis.FakeServer()
+fake = fakeredis.FakeRedis(server=server)
+async_fake = fakeredis.FakeAsyncRedis(server=server)
 orchestrator.redis_client = fake
 orchestrator.context_manager.redis_client = fake
+orchestrator.async_redis_client = async_fake
+orchestrator.context_manager.async_redis_client = async_fake
 
 
 def test_alias_mail():
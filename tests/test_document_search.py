@@ -0,0 +1,102 @@
+import asyncio
+import importlib.util
+import os
+from contextlib import asynccontextmanager, contextmanager
+
+import psycopg2
+
+spec = importlib.util.spec_from_file_location('document_search', os.path.join('mcp-core', 'document_search.py'))
+document_search = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(document_search)
+
+
+class FakeDB:
+    def __init__(self, ranked_available=True, error=psycopg2.errors.UndefinedFunction):
+        self.ranked_available = ranked_available
+        self.error = error
+        self.queries = []
+
+    @contextmanager
+    def connection(self):
+        db = self
+
+        class Cursor:
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *exc):
+                return False
+
+            def execute(self, sql, params):
+                db.queries.append((sql, params))
+                if 'buscar_documentos' in sql and not db.ranked_available:
+                    raise db.error('buscar_documentos no disponible')
+
+            def fetchall(self):
+                return [{'id_documento': 'PAT-01', 'nombre': 'Patente comercial', 'descripcion': 'Permiso', 'score': 0.8}]
+
+        class Conn:
+            def cursor(self, **kwargs):
+                return Cursor()
+
+        yield Conn()
+
+
+def test_ranked_search_passes_question_and_limit():
+    db = FakeDB()
+    search = document_search.DocumentSearch(db.connection)
+    results = search.search('quiero sacar la patente comercial', 2)
+    assert results[0]['score'] == 0.8
+    assert db.queries == [(search.RANKED_SQL, ('quiero sacar la patente comercial', 2))]
+
+
+def test_falls_back_to_like_once_when_migration_is_missing():
+    db = FakeDB(ranked_available=False)
+    search = document_search.DocumentSearch(db.connection)
+    assert search.search('Patente', 3)[0]['id_documento'] == 'PAT-01'
+    search.search('licencia', 1)
+    sqls = [sql for sql, _ in db.queries]
+    assert sqls == [search.RANKED_SQL, search.LIKE_SQL, search.LIKE_SQL]
+    assert db.queries[1][1] == ('%patente%', '%patente%', 3)
+
+
+def test_falls_back_to_like_when_function_cannot_query_the_table():
+    db = FakeDB(ranked_available=False, error=psycopg2.errors.UndefinedTable)
+    search = document_search.DocumentSearch(db.connection)
+    assert search.search('Patente', 3)[0]['id_documento'] == 'PAT-01'
+    assert not search.ranked
+
+
+def test_empty_question_skips_database():
+    db = FakeDB()
+    search = document_search.DocumentSearch(db.connection)
+    assert search.search('   ') == [] and search.search('x', 0) == []
+    assert db.queries == []
+
+
+class FakeAsyncDB(FakeDB):
+    @asynccontextmanager
+    async def async_connection(self):
+        db = self
+
+        class Cursor:
+            def fetchall(self):
+                return [{'id_documento': 'PAT-01', 'nombre': 'Patente comercial', 'descripcion': 'Permiso', 'score': 0.8}]
+
+        class Conn:
+            async def execute(self, sql, params=None, cursor_factory=None):
+                db.queries.append((sql, params))
+                if 'buscar_documentos' in sql and not db.ranked_available:
+                    raise db.error('buscar_documentos no disponible')
+                return Cursor()
+
+        yield Conn()
+
+
+def test_async_search_shares_the_like_fallback():
+    db = FakeAsyncDB(ranked_available=False)
+    search = document_search.DocumentSearch(db.connection, db.async_connection)
+    assert asyncio.run(search.search_async('Patente', 3))[0]['id_documento'] == 'PAT-01'
+    assert search.search('licencia', 1)[0]['id_documento'] == 'PAT-01'
+    sqls = [sql for sql, _ in db.queries]
+    assert sqls == [search.RANKED_SQL, search.LIKE_SQL, search.LIKE_SQL]
@@ -0,0 +1,184 @@
+import importlib.util
+import os
+import random
+import sys
+import types
+import fakeredis
+from rapidfuzz import fuzz
+
+os.environ["DISABLE_PERIODIC_MIGRATION"] = "1"
+os.environ["FAQ_DB_PATH"] = os.path.join('mcp-core', 'databases', 'faq_respuestas.json')
+
+# Mock llama_cpp before importing orchestrator
+fake_llama = types.ModuleType('llama_cpp')
+class FakeLlama:
+    def __init__(self, *args, **kwargs):
+        pass
+    def __call__(self, *args, **kwargs):
+        return {"choices": [{"text": "ok"}]}
+
+fake_llama.Llama = FakeLlama
+sys.modules['llama_cpp'] = fake_llama
+
+sys.path.insert(0, os.path.abspath('mcp-core'))
+
+spec = importlib.util.spec_from_file_location('orchestrator', os.path.join('mcp-core','orchestrator.py'))
+orchestrator = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(orchestrator)
+os.environ.pop("FAQ_DB_PATH", None)
+
+server = fakeredis.FakeServer()
+fake = fakeredis.FakeRedis(server=server)
+async_fake = fakeredis.FakeAsyncRedis(server=server)
+orchestrator.redis_client = fake
+orchestrator.context_manager.redis_client = fake
+orchestrator.async_redis_client = async_fake
+orchestrator.context_manager.async_redis_client = async_fake
+
+
+def legacy_lookup(faqs, pregunta):
+    """Recorrido lineal original de lookup_faq_respuesta (referencia)."""
+    try:
+        return _legacy_lookup(faqs, pregunta)
+    except Exception:
+        return None
+
+
+def _legacy_lookup(faqs, pregunta):
+    normalize_text = orchestrator.normalize_text
+    tokenize = orchestrator.tokenize
+
+    def apply_priority_filter(matches):
+        if any(m["entry"].get("categoria") == "despedidas" for m in matches):
+            return [m for m in matches if m["entry"].get("categoria") == "despedidas"]
+        return matches
+
+    def alternatives(entry):
+        alts = entry["pregunta"]
+        return alts if isinstance(alts, list) else [alts]
+
+    pregunta_norm = normalize_text(pregunta)
+    if "cedula" in pregunta_norm and "identidad" not in pregunta_norm:
+        return None
+    for entry in faqs:
+        for alt in alternatives(entry):
+            if normalize_text(alt) == pregunta_norm:
+                return {"entry": entry, "pregunta": alt, "score": 100, "needs_confirmation": False}
+    best_score, best_entry, best_alt, high = 0, None, None, []
+    for entry in faqs:
+        for alt in alternatives(entry):
+            score = fuzz.ratio(pregunta_norm, normalize_text(alt))
+            if score >= orchestrator.FUZZY_STRICT_THRESHOLD:
+                high.append({"entry": entry, "pregunta": alt, "score": score})
+            if score > best_score:
+                best_score, best_entry, best_alt = score, entry, alt
+    if high:
+        high.sort(key=lambda x: x["score"], reverse=True)
+        high = apply_priority_filter(high)
+        if len(high) > 1 and any(m["entry"].get("categoria") in ("saludos", "estado_animo") for m in high):
+            high = [m for m in high if m["entry"].get("categoria") not in ("saludos", "estado_animo")]
+        if len(high) > 1 and any(m["entry"].get("categoria") == "saludos" for m in high):
+            high = [m for m in high if m["entry"].get("categoria") != "saludos"]
+        if len(high) == 1:
+            m = high[0]
+            return {"entry": m["entry"], "pregunta": m["pregunta"], "score": m["score"], "needs_confirmation": False}
+        return {
+            "alternatives": [m["pregunta"] for m in high[:3]],
+            "matches": [m["entry"] for m in high[:3]],
+            "score": high[0]["score"],
+            "needs_confirmation": True,
+            "type": "choose",
+        }
+    if best_score >= orchestrator.FUZZY_CLARIFY_THRESHOLD and best_entry is not None:
+        return {"entry": best_entry, "pregunta": best_alt, "score": best_score,
+                "needs_confirmation": True, "type": "confirm"}
+    q = set(tokenize(pregunta_norm))
+    hits = []
+    for entry in faqs:
+        for alt in alternatives(entry):
+            t = set(tokenize(normalize_text(alt)))
+            common, union = q & t, q | t
+            if len(common) >= 2 or (len(common) / len(union) if union else 0) >= 0.3:
+                hits.append({"entry": entry, "pregunta": alt})
+                break
+    if hits:
+        hits = apply_priority_filter(hits)
+        if len(hits) > 1 and any(k["entry"].get("categoria") in ("saludos", "estado_animo") for k in hits):
+            hits = [k for k in hits if k["entry"].get("categoria") not in ("saludos", "estado_animo")]
+        if len(hits) == 1:
+            return {"entry": hits[0]["entry"], "pregunta": hits[0]["pregunta"], "score": 0, "needs_confirmation": False}
+        return {
+            "alternatives": [h["pregunta"] for h in hits[:3]],
+            "matches": [h["entry"] for h in hits[:3]],
+            "needs_confirmation": True,
+            "type": "choose",
+        }
+    return None
+
+
+def sample_queries(faqs, seed=7):
+    rnd = random.Random(seed)
+    queries = ["hola", "chao gracias", "que requisitos necesito para sacar una cedula", "zorblax", ""]
+    for entry in faqs:
+        alts = entry["pregunta"] if isinstance(entry["pregunta"], list) else [entry["pregunta"]]
+        for alt in alts:
+            queries.append(alt)
+            chars = list(alt)
+            if len(chars) > 4:
+                del chars[rnd.randrange(len(chars))]
+                queries.append("".join(chars))
+            words = alt.split()
+            rnd.shuffle(words)
+            queries.append(" ".join(words[: max(1, len(words) - 1)]))
+            queries.append(alt + " por favor")
+    return queries
+
+
+def test_index_matches_linear_scan_on_shipped_faq():
+    faqs = orchestrator.load_faq_cache()
+    assert faqs
+    queries = sample_queries(faqs)
+    for q in queries[:5] + random.Random(5).sample(queries[5:], 300):
+        assert orchestrator.lookup_faq_respuesta(q) == legacy_lookup(faqs, q), q
+
+
+def test_index_matches_linear_scan_on_synthetic_faq(monkeypatch):
+    rnd = random.Random(3)
+    vocab = ["permiso", "circulacion", "licencia", "patente", "basura", "retiro", "horario",
+             "oficina", "pago", "multa", "hora", "reclamo", "vecino", "ruido", "poda"]
+    cats = ["tramites", "saludos", "estado_animo", "despedidas", "reclamos"]
+    faqs = [
+        {
+            "pregunta": [" ".join(rnd.sample(vocab, rnd.randint(2, 5))) for _ in range(rnd.randint(1, 4))],
+            "respuesta": f"r{i}",
+            "categoria": rnd.choice(cats),
+        }
+        for i in range(60)
+    ]
+    index = orchestrator.FAQIndex(faqs, normalize=orchestrator.normalize_text, tokenize=orchestrator.tokenize)
+    monkeypatch.setattr(orchestrator, "load_faq_index", lambda: index)
+    queries = sample_queries(faqs, seed=11)
+    queries += [" ".join(rnd.sample(vocab, 3)) for _ in range(100)]
+    for q in queries:
+        assert orchestrator.lookup_faq_respuesta(q) == legacy_lookup(faqs, q), q
+
+
+def test_batch_lookup_matches_individual_lookups():
+    faqs = orchestrator.load_faq_cache()
+    queries = random.Random(9).sample(sample_queries(faqs), 80)
+    assert orchestrator.lookup_faq_batch(queries) == [legacy_lookup(faqs, q) for q in queries]
+
+
+def test_fragments_and_full_question_scored_in_one_pass(monkeypatch):
+    index = orchestrator.load_faq_index()
+    calls = []
+    original = index.fuzzy_batch
+    monkeypatch.setattr(index, "fuzzy_batch", lambda qs, *a, **kw: calls.append(qs) or original(qs, *a, **kw))
+    pregunta = "cual es el horario de atencion y donde estan ubicados"
+    full, fragmentos = orchestrator.match_faq_fragments(pregunta)
+    assert len(calls) == 1
+    assert [f for f, _ in fragmentos] == orchestrator.dividir_subpreguntas(pregunta)
+    faqs = orchestrator.load_faq_cache()
+    assert full == legacy_lookup(faqs, pregunta)
+    for fragmento, decision in fragmentos:
+        assert decision == legacy_lookup(faqs, fragmento)
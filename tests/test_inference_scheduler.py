@@ -0,0 +1,177 @@
+import asyncio
+import importlib.util
+import os
+import threading
+import time
+
+spec = importlib.util.spec_from_file_location('inference_scheduler', os.path.join('mcp-core', 'inference_scheduler.py'))
+inference_scheduler = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(inference_scheduler)
+
+
+class RecordingModel:
+    def __init__(self, delay=0.0):
+        self.calls = []
+        self.delay = delay
+        self.active = 0
+        self.max_active = 0
+        self.lock = threading.Lock()
+
+    def __call__(self, prompt, **params):
+        with self.lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        time.sleep(self.delay)
+        self.calls.append((prompt, params))
+        with self.lock:
+            self.active -= 1
+        return {"choices": [{"text": f"r:{prompt}"}]}
+
+
+def test_futures_resolve_and_model_is_never_called_concurrently():
+    model = RecordingModel(delay=0.01)
+    sched = inference_scheduler.InferenceScheduler(lambda: model, max_batch_size=4, batch_wait_ms=20)
+    futures = []
+    threads = [
+        threading.Thread(target=lambda i=i: futures.append((i, sched.submit(f"p{i}", max_tokens=8))))
+        for i in range(8)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    for i, f in futures:
+        assert f.result(timeout=5)["choices"][0]["text"] == f"r:p{i}"
+    assert model.max_active == 1
+    stats = sched.stats()
+    assert stats["requests"] == 8
+    assert stats["max_batch_size"] > 1
+    assert sum(size * n for size, n in stats["batch_sizes"].items()) == 8
+    assert stats["avg_batch_size"] == 8 / stats["batches"]
+    assert stats["queue_depth"] == 0
+
+
+def test_incompatible_params_are_not_batched_together():
+    model = RecordingModel()
+    batches = []
+    sched = inference_scheduler.InferenceScheduler(
+        lambda: model, max_batch_size=8, batch_wait_ms=50, observe_batch=lambda *args: batches.append(args)
+    )
+    f1 = sched.submit("a", max_tokens=8)
+    f2 = sched.submit("b", max_tokens=16, temperature=0.1)
+    f3 = sched.submit("c", max_tokens=8)
+    for f in (f1, f2, f3):
+        f.result(timeout=5)
+    # El grupo de "a" sale primero porque llegó primero
+    assert [c[0] for c in model.calls] == ["a", "c", "b"]
+    assert model.calls[2][1] == {"max_tokens": 16, "temperature": 0.1}
+    stats = sched.stats()
+    assert stats["batches"] == 2
+    assert stats["batch_sizes"] == {1: 1, 2: 1}
+    assert batches == [("llm", 2), ("llm", 1)]
+
+
+def test_without_wait_window_requests_run_in_arrival_order():
+    model = RecordingModel(delay=0.05)
+    sched = inference_scheduler.InferenceScheduler(lambda: model, max_batch_size=1)
+    futures = [sched.submit(p, max_tokens=m) for p, m in (("a", 8), ("b", 16), ("c", 8))]
+    for f in futures:
+        f.result(timeout=5)
+    assert [c[0] for c in model.calls] == ["a", "b", "c"]
+    assert sched.stats()["last_batch_size"] == 1
+
+
+def test_model_errors_propagate_to_caller():
+    def broken(prompt, **params):
+        raise RuntimeError("boom")
+    sched = inference_scheduler.InferenceScheduler(lambda: broken, batch_wait_ms=0)
+    f = sched.submit("x")
+    try:
+        f.result(timeout=5)
+        assert False, "se esperaba una excepción"
+    except RuntimeError as e:
+        assert "boom" in str(e)
+
+
+def test_stream_yields_tokens_and_records_ttft():
+    def streaming(prompt, stream=False, **params):
+        assert stream
+        return iter([{"choices": [{"text": t}]} for t in ("ho", "la")])
+    sched = inference_scheduler.InferenceScheduler(lambda: streaming, batch_wait_ms=0)
+    token_stream = sched.submit_stream("x")
+    assert list(token_stream) == ["ho", "la"]
+    assert token_stream.future.result(timeout=5)["choices"][0]["text"] == "hola"
+    stats = sched.stats()
+    assert stats["streams"] == 1
+    assert stats["avg_ttft_ms"] > 0
+
+
+def test_async_stream_waits_without_holding_a_thread():
+    release = threading.Event()
+
+    def streaming(prompt, stream=False, **params):
+        yield {"choices": [{"text": "ho"}]}
+        release.wait(5)
+        yield {"choices": [{"text": "la"}]}
+
+    sched = inference_scheduler.InferenceScheduler(lambda: streaming, batch_wait_ms=0)
+
+    async def consume():
+        tokens = []
+        async for token in sched.submit_stream("x"):
+            tokens.append(token)
+            if len(tokens) == 1:
+                # Mientras el modelo está parado solo vive el hilo de inferencia
+                await asyncio.sleep(0.05)
+                assert threading.active_count() == threads_before
+                release.set()
+        return tokens
+
+    threads_before = threading.active_count() + 1
+    assert asyncio.run(consume()) == ["ho", "la"]
+
+
+def test_async_stream_propagates_model_errors():
+    def failing(prompt, stream=False, **params):
+        raise RuntimeError("boom")
+
+    sched = inference_scheduler.InferenceScheduler(lambda: failing, batch_wait_ms=0)
+
+    async def consume():
+        return [token async for token in sched.submit_stream("x")]
+
+    try:
+        asyncio.run(consume())
+        assert False, "se esperaba una excepción"
+    except RuntimeError as e:
+        assert "boom" in str(e)
+
+
+def test_generation_tokens_are_counted_and_observed():
+    observed = []
+
+    def model(prompt, stream=False, **params):
+        if stream:
+            return iter([{"choices": [{"text": t}]} for t in ("a", "b", "c")])
+        return {"choices": [{"text": "ok"}], "usage": {"prompt_tokens": 12, "completion_tokens": 4}}
+
+    model.tokenize = lambda data: data.split()
+    sched = inference_scheduler.InferenceScheduler(
+        lambda: model, batch_wait_ms=0, observe=lambda *args: observed.append(args)
+    )
+    sched.submit("hola").result(timeout=5)
+    # En streaming se cuenta un token por fragmento y el prompt con tokenize
+    list(sched.submit_stream("uno dos"))
+    stats = sched.stats()
+    assert stats["prompt_tokens"] == 14 and stats["completion_tokens"] == 7
+    assert stats["generation_seconds"] > 0
+    assert [args[1:3] for args in observed] == [(12, 4), (2, 3)]
+
+
+def test_llm_docs_copy_matches_core():
+    # llm_docs-mcp se construye desde su carpeta y lleva su propia copia
+    with open(os.path.join('mcp-core', 'inference_scheduler.py'), 'rb') as f:
+        core = f.read()
+    with open(os.path.join('services', 'llm_docs-mcp', 'inference_scheduler.py'), 'rb') as f:
+        service = f.read()
+    assert service == core
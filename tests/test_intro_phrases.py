@@ -27,9 +27,13 @@ spec.loader.exec_module(orchestrator)
 os.environ.pop("FAQ_DB_PATH", None)
 os.environ.pop("PROMPTS_PATH", None)
 
-fake = fakeredis.FakeRedis()
+server = fakeredis.FakeServer()
+fake = fakeredis.FakeRedis(server=server)
+async_fake = fakeredis.FakeAsyncRedis(server=server)
 orchestrator.redis_client = fake
 orchestrator.context_manager.redis_client = fake
+orchestrator.async_redis_client = async_fake
+orchestrator.context_manager.async_redis_client = async_fake
 
 
 def test_intro_phrase_disponibilidad():
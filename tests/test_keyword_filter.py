@@ -25,9 +25,13 @@ orchestrator = importlib.util.module_from_spec(spec)
 spec.loader.exec_module(orchestrator)
 os.environ.pop("FAQ_DB_PATH", None)
 
-fake = fakeredis.FakeRedis()
+server = fakeredis.FakeServer()
+fake = fakeredis.FakeRedis(server=server)
+async_fake = fakeredis.FakeAsyncRedis(server=server)
 orchestrator.redis_client = fake
 orchestrator.context_manager.redis_client = fake
+orchestrator.async_redis_client = async_fake
+orchestrator.context_manager.async_redis_client = async_fake
 
 
 def test_keyword_overlap_requirement():
@@ -0,0 +1,69 @@
+import importlib.util
+import json
+import os
+import threading
+import time
+
+spec = importlib.util.spec_from_file_location('knowledge_base', os.path.join('mcp-core', 'knowledge_base.py'))
+knowledge_base = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(knowledge_base)
+
+
+def make_kb(tmp_path, build=None):
+    path = tmp_path / "faq.json"
+    path.write_text(json.dumps([{"pregunta": ["hola"], "respuesta": "Hola"}]), encoding="utf-8")
+
+    def default_build():
+        data = json.loads(path.read_text(encoding="utf-8"))
+        return {"faq": data, "preguntas": {p for e in data for p in e["pregunta"]}}
+
+    return knowledge_base.KnowledgeBase(build or default_build, [str(path), None]), path
+
+
+def test_reload_publishes_new_version(tmp_path):
+    kb, path = make_kb(tmp_path)
+    first = kb.snapshot
+    assert first.version == 1 and first["preguntas"] == {"hola"}
+    path.write_text(json.dumps([{"pregunta": ["chao"], "respuesta": "Chao"}]), encoding="utf-8")
+    os.utime(path, (time.time() + 10, time.time() + 10))
+    assert kb.changed()
+    second = kb.reload()
+    assert second.version == 2 and second["preguntas"] == {"chao"}
+    # Quien ya tenía el snapshot anterior lo conserva intacto
+    assert first["preguntas"] == {"hola"}
+    assert kb.stats()["version"] == 2 and not kb.changed()
+
+
+def test_failed_reload_keeps_previous_version(tmp_path):
+    kb, path = make_kb(tmp_path)
+    kb.snapshot
+    path.write_text("{roto", encoding="utf-8")
+    try:
+        kb.reload()
+        assert False, "se esperaba un error de JSON"
+    except ValueError:
+        pass
+    assert kb.snapshot.version == 1
+    assert kb.stats()["last_error"].startswith("JSONDecodeError")
+
+
+def test_readers_never_see_partial_build(tmp_path):
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def slow_build():
+        calls.append(1)
+        if len(calls) > 1:
+            started.set()
+            release.wait(5)
+        return {"n": len(calls)}
+
+    kb, _ = make_kb(tmp_path, build=slow_build)
+    assert kb.snapshot["n"] == 1
+    thread = kb.reload_async()
+    started.wait(5)
+    assert kb.snapshot["n"] == 1
+    release.set()
+    thread.join(5)
+    assert kb.snapshot["n"] == 2
@@ -0,0 +1,131 @@
+import importlib.util
+import os
+import sys
+import types
+
+# Mock llama_cpp counting how many times the model is loaded
+fake_llama = types.ModuleType('llama_cpp')
+LOADS = []
+class FakeLlama:
+    def __init__(self, *args, **kwargs):
+        LOADS.append(kwargs)
+    def __call__(self, *args, **kwargs):
+        return {"choices": [{"text": " ok "}]}
+
+fake_llama.Llama = FakeLlama
+sys.modules['llama_cpp'] = fake_llama
+
+sys.path.insert(0, os.path.abspath('mcp-core'))
+
+spec = importlib.util.spec_from_file_location('llama_client_registry', os.path.join('mcp-core', 'llama_client.py'))
+llama_client = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(llama_client)
+
+
+def test_model_loaded_once_per_config():
+    a = llama_client.LlamaClient(model_path='m.gguf', n_ctx=128, n_threads=1)
+    b = llama_client.LlamaClient(model_path='m.gguf', n_ctx=128, n_threads=1)
+    assert a.llm is b.llm
+    assert a.generate('hola') == 'ok'
+    assert len(LOADS) == 1
+    stats = llama_client.get_registry_stats()
+    assert stats['loads'] == 1
+    # Solo el segundo cliente reutiliza; usar ``llm`` o generar no cuenta
+    assert stats['reuses'] == 1
+
+
+def test_distinct_config_loads_new_model():
+    llama_client.LlamaClient(model_path='otro.gguf', n_ctx=128, n_threads=1)
+    stats = llama_client.get_registry_stats()
+    assert stats['loads'] == 2
+    assert len(stats['models']) == 2
+
+
+def test_slow_load_blocks_only_its_own_model(monkeypatch):
+    import threading
+    started, release = threading.Event(), threading.Event()
+
+    class SlowLlama(FakeLlama):
+        def __init__(self, *args, **kwargs):
+            started.set()
+            release.wait(5)
+            super().__init__(*args, **kwargs)
+
+    monkeypatch.setattr(llama_client, 'Llama', SlowLlama)
+    models = []
+    loaders = [
+        threading.Thread(target=lambda: models.append(llama_client.get_model('lento.gguf', 128, 1)))
+        for _ in range(2)
+    ]
+    for t in loaders:
+        t.start()
+    assert started.wait(5)
+    # Las estadísticas de /health no esperan a la carga
+    done = threading.Event()
+    threading.Thread(target=lambda: (llama_client.get_registry_stats(), done.set())).start()
+    assert done.wait(1)
+    release.set()
+    for t in loaders:
+        t.join(5)
+    assert len(models) == 2 and models[0] is models[1]
+    assert sum(1 for k in LOADS if k['model_path'] == 'lento.gguf') == 1
+
+
+def test_weights_are_memory_mapped_and_can_be_prewarmed(tmp_path):
+    # Mapeo de solo lectura: los workers comparten las páginas del GGUF
+    llama_client.LlamaClient(model_path='m.gguf', n_ctx=128, n_threads=1)
+    assert LOADS[0]['use_mmap'] is True and LOADS[0]['use_mlock'] is False
+    # Sin precarga el modelo se carga en el primer uso
+    before = len(LOADS)
+    client = llama_client.LlamaClient(model_path='diferido.gguf', n_ctx=128, n_threads=1, preload=False)
+    assert len(LOADS) == before
+    assert client.llm is client.llm and len(LOADS) == before + 1
+
+    model = tmp_path / 'm.gguf'
+    model.write_bytes(b'x' * 1000)
+    assert llama_client.warm_model_file(str(model), chunk_size=64)['bytes'] == 1000
+
+
+class StatefulModel:
+    """Modelo falso que registra evaluaciones y restauraciones de estado."""
+    def __init__(self):
+        self.evaluated = []
+        self.loaded = []
+    def tokenize(self, text, add_bos=True, special=False):
+        return list(text.decode('utf-8'))
+    def reset(self):
+        pass
+    def eval(self, tokens):
+        self.evaluated.append("".join(tokens))
+    def save_state(self):
+        return ("state", self.evaluated[-1])
+    def load_state(self, state):
+        self.loaded.append(state)
+
+
+def test_prefix_state_is_saved_once_and_restored():
+    cache = llama_client.PrefixStateCache(max_entries=2)
+    cache.register("Instrucciones fijas\n")
+    model = StatefulModel()
+    cache.prepare(model, "Instrucciones fijas\nPregunta: a")
+    cache.prepare(model, "Instrucciones fijas\nPregunta: b")
+    cache.prepare(model, "Otro prompt")
+    assert model.evaluated == ["Instrucciones fijas\n"]
+    assert model.loaded == [("state", "Instrucciones fijas\n")]
+    stats = cache.stats()
+    assert stats["hits"] == 1 and stats["misses"] == 1
+
+
+def test_prefix_cache_evicts_least_recent_and_skips_stateless_models():
+    cache = llama_client.PrefixStateCache(max_entries=1)
+    cache.register("A:")
+    cache.register("B:")
+    model = StatefulModel()
+    cache.prepare(model, "A: 1")
+    cache.prepare(model, "B: 2")
+    cache.prepare(model, "A: 3")
+    assert model.evaluated == ["A:", "B:", "A:"]
+    assert cache.stats()["evictions"] == 2
+    # Modelos sin save_state (p. ej. simulados) se invocan sin preparar
+    cache.prepare(FakeLlama(), "A: 4")
+    assert cache.stats()["misses"] == 3
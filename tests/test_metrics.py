@@ -0,0 +1,182 @@
+import asyncio
+import importlib.util
+import os
+import sys
+import time
+import types
+import fakeredis
+from fastapi.testclient import TestClient
+
+os.environ["DISABLE_PERIODIC_MIGRATION"] = "1"
+os.environ["FAQ_DB_PATH"] = os.path.join('mcp-core', 'databases', 'faq_respuestas.json')
+os.environ["PROMPTS_PATH"] = os.path.join('mcp-core', 'prompts')
+
+# Mock llama_cpp before importing orchestrator
+fake_llama = types.ModuleType('llama_cpp')
+class FakeLlama:
+    def __init__(self, *args, **kwargs):
+        pass
+    def __call__(self, *args, **kwargs):
+        return {"choices": [{"text": "ok"}]}
+
+fake_llama.Llama = FakeLlama
+sys.modules['llama_cpp'] = fake_llama
+
+sys.path.insert(0, os.path.abspath('mcp-core'))
+
+# El orquestador registra sus métricas en el módulo compartido ``metrics``
+import metrics
+from prometheus_client import REGISTRY
+
+spec = importlib.util.spec_from_file_location('orchestrator', os.path.join('mcp-core','orchestrator.py'))
+orchestrator = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(orchestrator)
+os.environ.pop("FAQ_DB_PATH", None)
+os.environ.pop("PROMPTS_PATH", None)
+
+server = fakeredis.FakeServer()
+fake = metrics.instrument_redis(fakeredis.FakeRedis(server=server))
+async_fake = metrics.instrument_redis(fakeredis.FakeAsyncRedis(server=server))
+orchestrator.redis_client = fake
+orchestrator.context_manager.redis_client = fake
+orchestrator.response_cache.redis_client = fake
+orchestrator.async_redis_client = async_fake
+orchestrator.context_manager.async_redis_client = async_fake
+orchestrator.response_cache.async_redis_client = async_fake
+orchestrator.get_db = lambda: (_ for _ in ()).throw(Exception("db disabled"))
+orchestrator.get_db_async = lambda: (_ for _ in ()).throw(Exception("db disabled"))
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+def test_turn_records_route_stages_and_dependencies():
+    before_turns = sample('mcp_turns_total', route='faq')
+    before_stage = sample('mcp_stage_duration_seconds_count', stage='faq_match')
+    before_pg = sample('mcp_stage_duration_seconds_count', stage='postgres')
+
+    @metrics.timed('faq_match')
+    def match():
+        time.sleep(0.01)
+        return 'faq'
+
+    with metrics.turn():
+        metrics.set_route(match())
+        metrics.observe_dependency('postgres', 0.002)
+        metrics.observe_dependency('postgres', 0.003)
+
+    assert sample('mcp_turns_total', route='faq') == before_turns + 1
+    assert sample('mcp_stage_duration_seconds_count', stage='faq_match') == before_stage + 1
+    assert sample('mcp_stage_duration_seconds_sum', stage='faq_match') >= 0.01
+    # Las dependencias del turno se registran como una sola observación
+    assert sample('mcp_stage_duration_seconds_count', stage='postgres') == before_pg + 1
+
+
+def test_failed_turn_is_counted_as_error():
+    before = sample('mcp_turns_total', route='error')
+    try:
+        with metrics.turn():
+            metrics.set_route('llm')
+            raise RuntimeError('boom')
+    except RuntimeError:
+        pass
+    assert sample('mcp_turns_total', route='error') == before + 1
+
+
+def test_redis_commands_are_timed_inside_the_turn():
+    client = metrics.instrument_redis(fakeredis.FakeRedis())
+    client.ping()  # abre la conexión (su saludo también son viajes)
+    before_calls = sample('mcp_dependency_calls_total', dependency='redis')
+    with metrics.turn() as state:
+        client.set('k', 'v')
+        with client.pipeline() as pipe:
+            pipe.get('k').get('k').execute()
+    # Un comando suelto y un pipeline: dos viajes, aunque cada uno lea respuestas
+    assert sample('mcp_dependency_calls_total', dependency='redis') == before_calls + 2
+    assert state.dependencies['redis'] > 0
+
+
+
+def test_async_redis_commands_and_coroutines_are_timed():
+    client = metrics.instrument_redis(fakeredis.FakeAsyncRedis())
+    before_stage = sample('mcp_stage_duration_seconds_count', stage='async_stage')
+
+    @metrics.timed('async_stage')
+    async def lookup():
+        await asyncio.sleep(0.01)
+        return await client.get('k')
+
+    async def run():
+        await client.ping()  # abre la conexión (su saludo también son viajes)
+        before = sample('mcp_dependency_calls_total', dependency='redis')
+        with metrics.turn() as state:
+            await client.set('k', 'v')
+            assert await lookup() == b'v'
+        return state, before
+
+    state, before_calls = asyncio.run(run())
+    assert sample('mcp_dependency_calls_total', dependency='redis') == before_calls + 2
+    assert sample('mcp_stage_duration_seconds_count', stage='async_stage') == before_stage + 1
+    assert sample('mcp_stage_duration_seconds_sum', stage='async_stage') >= 0.01
+    assert state.dependencies['redis'] > 0
+
+def test_postgres_queries_are_timed_at_the_cursor():
+    class FakeCursor:
+        def execute(self, query, params=None):
+            time.sleep(0.01)
+
+        def executemany(self, query, rows):
+            pass
+
+    cursor = metrics._timed_cursor_class(FakeCursor)()
+    before_calls = sample('mcp_dependency_calls_total', dependency='postgres')
+    with metrics.turn() as state:
+        cursor.execute('SELECT 1')
+        cursor.executemany('INSERT', [(1,), (2,)])
+    assert sample('mcp_dependency_calls_total', dependency='postgres') == before_calls + 2
+    assert state.dependencies['postgres'] >= 0.01
+
+
+def test_batch_sizes_are_exposed_on_metrics():
+    before = sample('mcp_llm_batch_size_count', model='batch-test')
+    metrics.record_batch('batch-test', 3)
+    assert sample('mcp_llm_batch_size_count', model='batch-test') == before + 1
+    assert sample('mcp_llm_batch_size_bucket', model='batch-test', le='2.0') == 0
+    assert sample('mcp_llm_batch_size_bucket', model='batch-test', le='3.0') == before + 1
+
+
+def test_turn_lookups_count_for_the_turn():
+    async def turn():
+        lookups = orchestrator._TurnLookups()
+        with metrics.turn() as state:
+            lookups.start('pg', metrics.observe_dependency, 'postgres', 0.25)
+            await lookups.get('pg', metrics.observe_dependency, 'postgres', 0.25)
+        return state
+
+    state = asyncio.run(turn())
+    assert state.dependencies['postgres'] == 0.25
+
+
+def test_orchestrated_turn_is_exposed_on_metrics(monkeypatch):
+    monkeypatch.setattr(orchestrator, 'responder_sobre_documento', lambda *a, **k: None)
+    monkeypatch.setattr(
+        orchestrator, 'detect_intent', lambda *a, **k: {'intent': 'unknown', 'confidence': 0.9, 'sentiment': 'neutral'}
+    )
+    monkeypatch.setattr(orchestrator, 'retrieve_context_snippets', lambda *a: [])
+    monkeypatch.setattr(orchestrator, 'generate_response', lambda prompt: 'Generada')
+    orchestrator.response_cache.purge()
+    before = sample('mcp_turns_total', route='llm')
+    before_faq = sample('mcp_turns_total', route='faq')
+
+    result = orchestrator.orchestrate('zorblax quintuple fenomeno', session_id='met1')
+    assert result['respuesta'].startswith('Generada')
+    assert sample('mcp_turns_total', route='llm') == before + 1
+    # La ruta la fija quien responde: un turno que pasa de largo por la FAQ no cuenta como faq
+    assert sample('mcp_turns_total', route='faq') == before_faq
+
+    response = TestClient(orchestrator.app).get('/metrics')
+    assert response.status_code == 200
+    assert '# HELP mcp_turns_total' in response.text
+    assert 'mcp_stage_duration_seconds_bucket{le="0.001",stage="redis"}' in response.text
+
@@ -0,0 +1,176 @@
+import importlib.util
+import json
+import os
+import time
+import sys
+import types
+import fakeredis
+from fastapi.testclient import TestClient
+
+os.environ["DISABLE_PERIODIC_MIGRATION"] = "1"
+os.environ["FAQ_DB_PATH"] = os.path.join('mcp-core', 'databases', 'faq_respuestas.json')
+os.environ["PROMPTS_PATH"] = os.path.join('mcp-core', 'prompts')
+
+# Mock llama_cpp before importing orchestrator
+fake_llama = types.ModuleType('llama_cpp')
+class FakeLlama:
+    def __init__(self, *args, **kwargs):
+        pass
+    def __call__(self, *args, **kwargs):
+        return {"choices": [{"text": "ok"}]}
+
+fake_llama.Llama = FakeLlama
+sys.modules['llama_cpp'] = fake_llama
+
+sys.path.insert(0, os.path.abspath('mcp-core'))
+
+spec = importlib.util.spec_from_file_location('orchestrator', os.path.join('mcp-core','orchestrator.py'))
+orchestrator = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(orchestrator)
+os.environ.pop("FAQ_DB_PATH", None)
+os.environ.pop("PROMPTS_PATH", None)
+
+server = fakeredis.FakeServer()
+fake = fakeredis.FakeRedis(server=server)
+async_fake = fakeredis.FakeAsyncRedis(server=server)
+orchestrator.redis_client = fake
+orchestrator.context_manager.redis_client = fake
+orchestrator.response_cache.redis_client = fake
+orchestrator.async_redis_client = async_fake
+orchestrator.context_manager.async_redis_client = async_fake
+orchestrator.response_cache.async_redis_client = async_fake
+orchestrator.get_db = lambda: (_ for _ in ()).throw(Exception("db disabled"))
+orchestrator.get_db_async = lambda: (_ for _ in ()).throw(Exception("db disabled"))
+
+client = TestClient(orchestrator.app)
+
+
+def read_events(resp):
+    return [json.loads(line) for line in resp.text.splitlines() if line.strip()]
+
+
+def test_llm_answer_is_streamed_and_persisted(monkeypatch):
+    monkeypatch.setattr(orchestrator, 'stream_response', lambda prompt: iter([" Hola", ",", " vecino"]))
+    r = client.post('/orchestrate/stream', json={'pregunta': 'zorblax quintuple fenomeno', 'session_id': 'st1'})
+    assert r.status_code == 200
+    assert r.headers['content-type'].startswith('application/x-ndjson')
+    events = read_events(r)
+    tokens = [e['token'] for e in events if 'token' in e]
+    assert tokens[:3] == ["Hola", ",", " vecino"]
+    final = events[-1]
+    assert final['done'] is True
+    assert final['respuesta'].startswith('Hola, vecino')
+    history = orchestrator.context_manager.get_history('st1')
+    assert history[-1]['content'] == final['respuesta']
+    assert orchestrator.context_manager.has_feedback_pending('st1')
+
+
+def test_non_llm_answer_is_single_event():
+    r = client.post('/orchestrate/stream', json={'pregunta': 'hola', 'session_id': 'st2'})
+    events = read_events(r)
+    assert len(events) == 1
+    assert events[0]['done'] is True
+    assert events[0]['respuesta']
+
+
+def test_repeated_llm_question_is_served_from_cache(monkeypatch):
+    calls = []
+    def fake_generate(prompt):
+        calls.append(prompt)
+        return "Respuesta generada"
+    monkeypatch.setattr(orchestrator, 'generate_response', fake_generate)
+    orchestrator.response_cache.purge()
+    first = orchestrator.orchestrate('zorblax quintuple fenomeno', session_id='rc1')
+    second = orchestrator.orchestrate('Zorblax quíntuple fenómeno', session_id='rc2')
+    assert len(calls) == 1
+    assert first['respuesta'] == second['respuesta']
+    assert orchestrator.response_cache.stats()['hits'] >= 1
+    r = client.post('/admin/cache/purge')
+    assert r.json()['purged'] == 1
+
+
+def test_session_stays_locked_until_the_stream_is_persisted(monkeypatch):
+    import threading
+    monkeypatch.setattr(orchestrator, 'stream_response', lambda prompt: iter([" Hola", " vecino"]))
+    orchestrator.response_cache.purge()
+    result = orchestrator.orchestrate('zorblax quintuple fenomeno', session_id='st3', stream=True)
+    events = result['stream']
+    assert next(events) == {'token': 'Hola'}
+
+    seen = []
+    def second_turn():
+        orchestrator.orchestrate('hola', session_id='st3')
+        seen.append(orchestrator.context_manager.get_history('st3'))
+    worker = threading.Thread(target=second_turn)
+    worker.start()
+    worker.join(0.3)
+    # El turno siguiente espera a que la respuesta en streaming se guarde
+    assert worker.is_alive()
+    final = list(events)[-1]
+    worker.join(5)
+    assert not worker.is_alive()
+    assert any(m['content'] == final['respuesta'] for m in seen[0])
+
+
+def test_unconsumed_stream_releases_the_session(monkeypatch):
+    import gc
+    monkeypatch.setattr(orchestrator, 'stream_response', lambda prompt: iter([" Hola"]))
+    orchestrator.response_cache.purge()
+    result = orchestrator.orchestrate('zorblax quintuple fenomeno', session_id='st4', stream=True)
+    del result
+    gc.collect()
+    start = time.perf_counter()
+    orchestrator.orchestrate('hola', session_id='st4')
+    assert time.perf_counter() - start < 1
+
+
+def test_async_stream_holds_the_session_until_persisted(monkeypatch):
+    import asyncio
+    import threading
+    server = fakeredis.FakeServer()
+    monkeypatch.setattr(orchestrator, 'session_lock', orchestrator.SessionOrderLock(
+        lambda: fakeredis.FakeRedis(server=server), lambda: fakeredis.FakeAsyncRedis(server=server)
+    ))
+    monkeypatch.setattr(orchestrator, 'stream_response', lambda prompt: iter([" Hola", " vecino"]))
+    orchestrator.response_cache.purge()
+    seen = []
+
+    def second_turn():
+        orchestrator.orchestrate('hola', session_id='st5')
+        seen.append(orchestrator.context_manager.get_history('st5'))
+
+    async def main():
+        events = orchestrator.orchestrate_stream_async('zorblax quintuple fenomeno', session_id='st5')
+        assert await events.__anext__() == {'token': 'Hola'}
+        worker = threading.Thread(target=second_turn)
+        worker.start()
+        await asyncio.sleep(0.3)
+        # El turno siguiente espera a que la respuesta en streaming se guarde
+        assert worker.is_alive()
+        final = [event async for event in events][-1]
+        await asyncio.to_thread(worker.join, 5)
+        assert not worker.is_alive()
+        return final
+
+    final = asyncio.run(main())
+    assert any(m['content'] == final['respuesta'] for m in seen[0])
+
+
+def test_stream_tokens_are_awaited_on_the_turn_loop(monkeypatch):
+    import asyncio
+    import threading
+    threads = []
+
+    async def tokens(prompt):
+        for token in [" Hola", " vecino"]:
+            threads.append(threading.current_thread().name)
+            await asyncio.sleep(0.01)
+            yield token
+
+    monkeypatch.setattr(orchestrator, 'stream_response', tokens)
+    orchestrator.response_cache.purge()
+    result = orchestrator.orchestrate('zorblax quintuple fenomeno', session_id='st6', stream=True)
+    events = list(result['stream'])
+    assert [e['token'] for e in events if 'token' in e][:2] == ['Hola', ' vecino']
+    # Ningún hilo de executor queda esperando tokens: el loop de turnos los espera
+    assert threads == ['turn-loop', 'turn-loop']
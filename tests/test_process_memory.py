@@ -0,0 +1,34 @@
+import importlib.util
+import os
+
+spec = importlib.util.spec_from_file_location('process_memory', os.path.join('mcp-core', 'process_memory.py'))
+process_memory = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(process_memory)
+
+ROLLUP = """00400000-7ffc2a3f1000 ---p 00000000 00:00 0                          [rollup]
+Rss:             3412004 kB
+Pss:             1230010 kB
+Pss_Anon:          61200 kB
+Shared_Clean:    2703400 kB
+Shared_Dirty:       1024 kB
+Private_Clean:     12000 kB
+Private_Dirty:    695580 kB
+Referenced:      3412004 kB
+Anonymous:        690000 kB
+Swap:                  0 kB
+"""
+
+
+def test_parse_smaps_rollup():
+    stats = process_memory.parse_smaps_rollup(ROLLUP)
+    assert stats['rss_kb'] == 3412004 and stats['pss_kb'] == 1230010
+    assert stats['shared_kb'] == 2704424
+    assert stats['private_kb'] == 707580
+    assert stats['swap_kb'] == 0
+
+
+def test_memory_stats_of_current_process():
+    stats = process_memory.memory_stats()
+    assert stats['pid'] == os.getpid()
+    if os.path.exists('/proc/self/status'):
+        assert stats['rss_kb'] > 0
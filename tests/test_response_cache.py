@@ -0,0 +1,79 @@
+import asyncio
+import importlib.util
+import os
+import fakeredis
+
+spec = importlib.util.spec_from_file_location('response_cache', os.path.join('mcp-core', 'response_cache.py'))
+response_cache = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(response_cache)
+
+
+def make_cache(**kwargs):
+    cache = response_cache.ResponseCache(**kwargs)
+    cache.redis_client = fakeredis.FakeRedis()
+    return cache
+
+
+def test_hit_after_set_counts_saved_seconds():
+    cache = make_cache()
+    key = cache.make_key("horario oficina partes", "ctx", "plantilla v1")
+    assert cache.get(key) is None
+    cache.set(key, "Abre a las 8:30.", 2.5)
+    assert cache.get(key) == "Abre a las 8:30."
+    stats = cache.stats()
+    assert stats["hits"] == 1 and stats["misses"] == 1
+    assert stats["hit_ratio"] == 0.5
+    assert stats["saved_inference_seconds"] == 2.5
+
+
+def test_key_changes_with_context_and_template():
+    cache = make_cache()
+    base = cache.make_key("pregunta", "ctx", "plantilla v1")
+    assert base != cache.make_key("pregunta", "otro ctx", "plantilla v1")
+    assert base != cache.make_key("pregunta", "ctx", "plantilla v2")
+
+
+def test_least_recently_used_entries_are_evicted():
+    cache = make_cache(max_entries=2)
+    keys = [cache.make_key(f"p{i}", "", "t") for i in range(3)]
+    cache.set(keys[0], "r0", 1.0)
+    cache.set(keys[1], "r1", 1.0)
+    cache.get(keys[0])  # renueva p0
+    cache.set(keys[2], "r2", 1.0)
+    assert cache.get(keys[1]) is None
+    assert cache.get(keys[0]) == "r0"
+    assert cache.stats()["entries"] == 2
+
+
+def test_purge_and_redis_errors():
+    cache = make_cache()
+    cache.set(cache.make_key("a", "", "t"), "r", 1.0)
+    cache.set(cache.make_key("b", "", "t"), "r", 1.0)
+    assert cache.purge() == 2
+    assert cache.stats()["entries"] == 0
+    server = fakeredis.FakeServer()
+    server.connected = False
+    down = make_cache()
+    down.redis_client = fakeredis.FakeRedis(server=server)
+    assert down.get("llmcache:x") is None
+    assert down.stats()["errors"] == 1
+
+
+def test_async_lookups_share_entries_and_eviction():
+    cache = make_cache(max_entries=2)
+    server = fakeredis.FakeServer()
+    cache.redis_client = fakeredis.FakeRedis(server=server)
+    cache.async_redis_client = fakeredis.FakeAsyncRedis(server=server)
+    keys = [cache.make_key(f"p{i}", "", "t") for i in range(3)]
+
+    async def turns():
+        assert await cache.get_async(keys[0]) is None
+        await cache.set_async(keys[0], "r0", 1.5)
+        await cache.set_async(keys[1], "r1", 1.0)
+        assert await cache.get_async(keys[0]) == "r0"
+        await cache.set_async(keys[2], "r2", 1.0)
+
+    asyncio.run(turns())
+    assert cache.get(keys[1]) is None and cache.get(keys[2]) == "r2"
+    stats = cache.stats()
+    assert stats["entries"] == 2 and stats["saved_inference_seconds"] == 2.5
@@ -1,3 +1,4 @@
+import asyncio
 import importlib.util
 import os
 import sys
@@ -25,16 +26,21 @@ orchestrator = importlib.util.module_from_spec(spec)
 spec.loader.exec_module(orchestrator)
 os.environ.pop("FAQ_DB_PATH", None)
 
-fake = fakeredis.FakeRedis()
+server = fakeredis.FakeServer()
+fake = fakeredis.FakeRedis(server=server)
+async_fake = fakeredis.FakeAsyncRedis(server=server)
 orchestrator.redis_client = fake
 orchestrator.context_manager.redis_client = fake
+orchestrator.async_redis_client = async_fake
+orchestrator.context_manager.async_redis_client = async_fake
 
 # Disable DB access
 orchestrator.get_db = lambda: (_ for _ in ()).throw(Exception("db disabled"))
+orchestrator.get_db_async = lambda: (_ for _ in ()).throw(Exception("db disabled"))
 
 
 def test_retrieve_context_snippets_from_faq():
-    snippets = orchestrator.retrieve_context_snippets('¿Dónde estás ubicado?')
+    snippets = asyncio.run(orchestrator.retrieve_context_snippets('¿Dónde estás ubicado?'))
     assert any('No tengo oficina virtual' in s for s in snippets)
 
 
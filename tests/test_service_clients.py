@@ -0,0 +1,170 @@
+import asyncio
+import importlib.util
+import os
+
+import httpx
+import pytest
+import requests
+
+spec = importlib.util.spec_from_file_location('service_clients', os.path.join('mcp-core', 'service_clients.py'))
+service_clients = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(service_clients)
+
+IDEMPOTENT = service_clients.ToolPolicy(idempotent=True, retries=2)
+NOT_IDEMPOTENT = service_clients.ToolPolicy()
+
+
+class FakeResponse:
+    def __init__(self, status_code):
+        self.status_code = status_code
+
+
+def make_client(outcomes, failures=5, reset_after=30):
+    """Cliente cuyas peticiones devuelven (o lanzan) ``outcomes`` en orden."""
+    sleeps = []
+    client = service_clients.ServiceClient(
+        'scheduler-mcp',
+        breaker=service_clients.CircuitBreaker(failures=failures, reset_after=reset_after),
+        sleep=sleeps.append,
+    )
+    calls = []
+
+    def fake_request(method, url, timeout=None, **kwargs):
+        calls.append((method, url, timeout))
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return FakeResponse(outcome)
+
+    client.session.request = fake_request
+    return client, calls, sleeps
+
+
+def test_policies_come_from_tool_schemas():
+    policies = service_clients.load_tool_policies(os.path.join('mcp-core', 'tool_schemas'))
+    listar = policies['scheduler-listar_horas_disponibles']
+    assert listar.idempotent and listar.retries == 2
+    assert (listar.connect_timeout, listar.read_timeout) == (2, 10)
+    reservar = policies['scheduler-reservar_hora']
+    assert not reservar.idempotent and reservar.retries == 0
+    # Una generación que vence el timeout no se vuelve a encolar tras de sí misma
+    assert policies['doc-generar_respuesta_llm'].retries == 0
+    # Sin "x-client" se usan los valores por defecto
+    assert policies['info-respuesta_faq'] == service_clients.ToolPolicy()
+
+
+def test_idempotent_tool_retries_with_jittered_backoff():
+    client, calls, sleeps = make_client([requests.ConnectionError('reset'), 503, 200])
+    resp = client.request('POST', 'http://scheduler/tools/call', IDEMPOTENT, json={})
+    assert resp.status_code == 200
+    assert len(calls) == 3
+    assert calls[0][2] == (IDEMPOTENT.connect_timeout, IDEMPOTENT.read_timeout)
+    assert len(sleeps) == 2
+    assert 0 <= sleeps[0] <= client.backoff * 2 and 0 <= sleeps[1] <= client.backoff * 4
+    assert client.stats()['retries'] == 2
+
+
+def test_non_idempotent_tool_is_not_retried():
+    client, calls, sleeps = make_client([requests.Timeout('lento')])
+    with pytest.raises(requests.Timeout):
+        client.request('POST', 'http://scheduler/tools/call', NOT_IDEMPOTENT, json={})
+    assert len(calls) == 1 and sleeps == []
+
+
+def test_breaker_opens_and_recovers(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(service_clients.time, 'monotonic', lambda: now[0])
+    client, calls, _ = make_client([requests.ConnectionError('caído')] * 3 + [200], failures=3, reset_after=10)
+
+    for _ in range(3):
+        with pytest.raises(requests.ConnectionError):
+            client.request('POST', 'http://scheduler/tools/call', NOT_IDEMPOTENT)
+    assert client.stats()['state'] == 'open'
+
+    # Con el circuito abierto no se toca la red y el error sigue siendo de conexión
+    with pytest.raises(service_clients.CircuitOpenError) as exc:
+        client.request('POST', 'http://scheduler/tools/call', NOT_IDEMPOTENT)
+    assert isinstance(exc.value, requests.RequestException)
+    assert len(calls) == 3
+
+    now[0] += 10
+    assert client.stats()['state'] == 'half_open'
+    assert client.request('POST', 'http://scheduler/tools/call', NOT_IDEMPOTENT).status_code == 200
+    stats = client.stats()
+    assert stats['state'] == 'closed' and stats['opened'] == 1 and stats['rejected'] == 1
+
+
+def test_probe_that_raises_unexpectedly_releases_the_breaker(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(service_clients.time, 'monotonic', lambda: now[0])
+    client, calls, _ = make_client(
+        [requests.ConnectionError('caído'), TypeError('payload inválido'), 200], failures=1, reset_after=10
+    )
+    with pytest.raises(requests.ConnectionError):
+        client.request('POST', 'http://scheduler/tools/call', NOT_IDEMPOTENT)
+    now[0] += 10
+    with pytest.raises(TypeError):
+        client.request('POST', 'http://scheduler/tools/call', NOT_IDEMPOTENT)
+    # La prueba no quedó tomada: la siguiente petición vuelve a probar y cierra el circuito
+    assert client.request('POST', 'http://scheduler/tools/call', NOT_IDEMPOTENT).status_code == 200
+    assert client.stats()['state'] == 'closed'
+
+
+def make_async_client(outcomes, failures=5):
+    """Como ``make_client`` pero con ``httpx.AsyncClient`` sobre un transporte simulado."""
+    sleeps = []
+    calls = []
+
+    def handler(request):
+        calls.append((request.method, str(request.url), request.extensions['timeout']))
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return httpx.Response(outcome, json={'ok': outcome})
+
+    async def fake_sleep(delay):
+        sleeps.append(delay)
+
+    client = service_clients.ServiceClient(
+        'scheduler-mcp',
+        breaker=service_clients.CircuitBreaker(failures=failures),
+        async_sleep=fake_sleep,
+        transport=httpx.MockTransport(handler),
+    )
+    return client, calls, sleeps
+
+
+def test_async_request_retries_idempotent_tools():
+    client, calls, sleeps = make_async_client([httpx.ConnectError('reset'), 503, 200])
+
+    async def call():
+        try:
+            return await client.request_async('GET', 'http://scheduler/available', IDEMPOTENT, params={'f': 1})
+        finally:
+            await client.aclose()
+
+    resp = asyncio.run(call())
+    assert resp.status_code == 200 and resp.json() == {'ok': 200}
+    assert len(calls) == 3 and calls[0][1] == 'http://scheduler/available?f=1'
+    assert calls[0][2]['connect'] == IDEMPOTENT.connect_timeout
+    assert calls[0][2]['read'] == IDEMPOTENT.read_timeout
+    assert len(sleeps) == 2
+    assert client.stats()['retries'] == 2
+
+
+def test_async_request_shares_the_breaker():
+    client, calls, sleeps = make_async_client([httpx.ReadTimeout('lento')] * 2, failures=2)
+
+    async def call():
+        return await client.request_async('POST', 'http://scheduler/tools/call', NOT_IDEMPOTENT, json={})
+
+    for _ in range(2):
+        with pytest.raises(httpx.TimeoutException):
+            asyncio.run(call())
+    assert len(calls) == 2 and sleeps == []
+    # El circuito abierto corta también las llamadas síncronas
+    with pytest.raises(service_clients.CircuitOpenError):
+        client.request('POST', 'http://scheduler/tools/call', NOT_IDEMPOTENT)
+    with pytest.raises(service_clients.CircuitOpenError):
+        asyncio.run(call())
+    assert client.stats()['rejected'] == 2
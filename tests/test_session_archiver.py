@@ -0,0 +1,120 @@
+import importlib.util
+import json
+import os
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+import fakeredis
+
+spec = importlib.util.spec_from_file_location('context_manager_archiver', os.path.join('mcp-core', 'context_manager.py'))
+context_manager = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(context_manager)
+
+spec = importlib.util.spec_from_file_location('session_archiver', os.path.join('mcp-core', 'session_archiver.py'))
+session_archiver = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(session_archiver)
+
+
+class FakeDB:
+    def __init__(self):
+        self.rows = {}
+        self.batches = []
+
+    @contextmanager
+    def connection(self):
+        class Cursor:
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *exc):
+                return False
+
+            def execute(self, sql, params=None):
+                pass
+
+        class Conn:
+            def cursor(self):
+                return Cursor()
+
+            def commit(self):
+                pass
+
+        yield Conn()
+
+
+def make_archiver(monkeypatch, server=None, batch_size=200):
+    db = FakeDB()
+
+    def fake_execute_values(cur, sql, rows, page_size=None):
+        assert 'ON CONFLICT (session_id)' in sql
+        db.batches.append(len(rows))
+        db.rows.update({sid: json.loads(data) for sid, data in rows})
+
+    monkeypatch.setattr(session_archiver, 'execute_values', fake_execute_values)
+    cm = context_manager.ConversationalContextManager()
+    cm.redis_client = fakeredis.FakeRedis(server=server or fakeredis.FakeServer())
+    archiver = session_archiver.SessionArchiver(
+        cm, db.connection, 'conversaciones_historial', idle_seconds=60, batch_size=batch_size
+    )
+    return archiver, cm, db
+
+
+def hace(segundos):
+    return (datetime.now() - timedelta(seconds=segundos)).isoformat()
+
+
+def test_archiva_solo_sesiones_inactivas(monkeypatch):
+    archiver, cm, db = make_archiver(monkeypatch, batch_size=2)
+    for i in range(3):
+        cm.update_context(f'idle{i}', 'hola', 'respuesta')
+        cm._set_fields(f'idle{i}', last_activity=hace(600))
+    cm.update_context('activa', 'hola', 'respuesta')
+    cm._set_fields('activa', last_activity=hace(5))
+    cm.redis_client.set('session_lock:idle0:ticket', 1)
+
+    assert archiver.run_once() == 3
+    assert set(db.rows) == {'idle0', 'idle1', 'idle2'}
+    assert db.rows['idle0']['history'][0]['content'] == 'hola'
+    assert archiver.stats()['active'] == 1
+    # Las sesiones archivadas siguen en Redis hasta que venzan
+    assert cm.get_stored_context('idle0')['history']
+
+
+def test_no_repite_sesiones_sin_cambios(monkeypatch):
+    archiver, cm, db = make_archiver(monkeypatch)
+    cm.update_context('s1', 'hola', 'respuesta')
+    cm._set_fields('s1', last_activity=hace(600))
+
+    assert archiver.run_once() == 1
+    assert archiver.run_once() == 0
+    assert archiver.stats()['unchanged'] == 1
+
+    cm.update_context('s1', 'otra', 'respuesta')
+    assert archiver.run_once() == 0
+    cm._set_fields('s1', last_activity=hace(600))
+    assert archiver.run_once() == 1
+    assert len(db.rows['s1']['history']) == 4
+
+
+def test_solo_una_replica_es_lider(monkeypatch):
+    server = fakeredis.FakeServer()
+    a, _, _ = make_archiver(monkeypatch, server=server)
+    b, _, _ = make_archiver(monkeypatch, server=server)
+
+    assert a.acquire_leadership()
+    assert not b.acquire_leadership()
+    # El líder renueva su turno
+    assert a.acquire_leadership()
+
+    a.redis_client.delete(a.LEADER_KEY)
+    assert b.acquire_leadership()
+    assert not a.acquire_leadership()
+
+
+def test_workers_hijos_del_mismo_maestro_no_comparten_liderazgo(monkeypatch):
+    # Con preload_app el archivador se construye en el maestro antes del fork
+    archiver, _, _ = make_archiver(monkeypatch)
+    monkeypatch.setattr(session_archiver.os, 'getpid', lambda: 101)
+    assert archiver.acquire_leadership()
+    monkeypatch.setattr(session_archiver.os, 'getpid', lambda: 102)
+    assert not archiver.acquire_leadership()
@@ -0,0 +1,242 @@
+import asyncio
+import importlib.util
+import os
+import sys
+import threading
+import time
+
+import fakeredis
+
+sys.path.insert(0, os.path.abspath('mcp-core'))
+
+spec = importlib.util.spec_from_file_location('context_manager_cas', os.path.join('mcp-core', 'context_manager.py'))
+context_manager = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(context_manager)
+
+spec = importlib.util.spec_from_file_location('session_lock', os.path.join('mcp-core', 'session_lock.py'))
+session_lock = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(session_lock)
+
+
+def make_managers(n=2):
+    server = fakeredis.FakeServer()
+    managers = []
+    for _ in range(n):
+        cm = context_manager.ConversationalContextManager()
+        cm.redis_client = fakeredis.FakeRedis(server=server)
+        cm.async_redis_client = fakeredis.FakeAsyncRedis(server=server)
+        managers.append(cm)
+    return managers
+
+
+def run_in_thread(fn):
+    result = {}
+
+    def target():
+        try:
+            result['value'] = fn()
+        except Exception as e:  # pragma: no cover - se reporta en el assert
+            result['error'] = e
+    t = threading.Thread(target=target)
+    t.start()
+    t.join()
+    assert 'error' not in result, result.get('error')
+    return result.get('value')
+
+
+def test_concurrent_turns_keep_both_updates():
+    a, b = make_managers()
+    a.update_context('s1', 'hola', 'Hola!')
+    with a.unit_of_work():
+        a.update_pending_field('s1', 'nombre')
+        a.update_context('s1', 'quiero reclamar', 'Decime tu nombre')
+
+        def other_turn():
+            with b.unit_of_work():
+                b.set_current_flow('s1', 'reclamo')
+                b.update_context('s1', 'es por la luz', 'Entendido')
+        run_in_thread(other_turn)
+    ctx = b.get_context('s1')
+    assert ctx['pending_field'] == 'nombre'
+    assert ctx['current_flow'] == 'reclamo'
+    assert [m['content'] for m in ctx['history']] == [
+        'hola', 'Hola!', 'es por la luz', 'Entendido', 'quiero reclamar', 'Decime tu nombre',
+    ]
+    assert a.conflicts == 1 and b.conflicts == 0
+
+
+
+def test_async_turn_rebases_over_a_concurrent_write():
+    a, b = make_managers()
+    a.update_context('s9', 'hola', 'Hola!')
+
+    async def turn():
+        async with a.unit_of_work_async():
+            await a.preload_async('s9')
+            a.update_pending_field('s9', 'nombre')
+            a.update_context('s9', 'quiero reclamar', 'Decime tu nombre')
+            run_in_thread(lambda: b.set_current_flow('s9', 'reclamo'))
+
+    asyncio.run(turn())
+    ctx = b.get_context('s9')
+    assert ctx['pending_field'] == 'nombre' and ctx['current_flow'] == 'reclamo'
+    assert len(ctx['history']) == 4 and a.conflicts == 1
+
+def test_concurrent_removal_and_update_merge_by_field():
+    a, b = make_managers()
+    a.set_faq_clarification('s2', {'type': 'confirm'})
+    a.set_selected_document('s2', 'Patente')
+    with a.unit_of_work():
+        a.clear_faq_clarification('s2')
+        run_in_thread(lambda: b.set_selected_document('s2', 'Licencia'))
+    ctx = b.get_context('s2')
+    assert 'faq_pending' not in ctx
+    assert ctx['selected_document'] == 'Licencia'
+
+
+def test_counter_increments_are_not_lost():
+    managers = make_managers(4)
+    threads = [
+        threading.Thread(target=lambda cm=cm: [cm.increment_fallback_count('s3') for _ in range(10)])
+        for cm in managers
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert managers[0].get_fallback_count('s3') == 40
+
+
+def test_ordering_lock_serves_turns_in_arrival_order():
+    server = fakeredis.FakeServer()
+    lock = session_lock.SessionOrderLock(lambda: fakeredis.FakeRedis(server=server))
+    order = []
+    first_inside = threading.Event()
+
+    def turn(i, delay):
+        with lock.hold('s4'):
+            if i == 0:
+                first_inside.set()
+            order.append(i)
+            time.sleep(delay)
+
+    threads = [threading.Thread(target=turn, args=(0, 0.05))]
+    threads[0].start()
+    first_inside.wait(1)
+    for i in range(1, 5):
+        t = threading.Thread(target=turn, args=(i, 0.0))
+        t.start()
+        threads.append(t)
+        time.sleep(0.02)  # llegada escalonada
+    for t in threads:
+        t.join(5)
+    assert order == [0, 1, 2, 3, 4]
+    assert lock.stats()['acquired'] == 5
+
+
+def test_ordering_lock_skips_abandoned_ticket():
+    server = fakeredis.FakeServer()
+    client = fakeredis.FakeRedis(server=server)
+    lock = session_lock.SessionOrderLock(lambda: client, stale_after=0.05, max_wait=2)
+    client.incr('session_lock:s5:ticket')  # un turno que tomó número y murió
+    start = time.monotonic()
+    with lock.hold('s5'):
+        pass
+    assert time.monotonic() - start < 1
+    assert lock.stats()['skipped_stale'] == 1
+
+
+def test_other_sessions_do_not_wait():
+    server = fakeredis.FakeServer()
+    lock = session_lock.SessionOrderLock(lambda: fakeredis.FakeRedis(server=server))
+    with lock.hold('s6'):
+        done = threading.Event()
+
+        def other():
+            with lock.hold('s7'):
+                done.set()
+        threading.Thread(target=other).start()
+        assert done.wait(1)
+
+
+def test_async_lock_orders_turns_with_sync_holders():
+    server = fakeredis.FakeServer()
+    lock = session_lock.SessionOrderLock(
+        lambda: fakeredis.FakeRedis(server=server), lambda: fakeredis.FakeAsyncRedis(server=server)
+    )
+    order = []
+
+    async def turn(i):
+        async with lock.hold_async('s8'):
+            order.append(i)
+            await asyncio.sleep(0.01)
+
+    def sync_turn():
+        with lock.hold('s8'):
+            order.append('sync')
+
+    async def main():
+        tasks = []
+        for i in range(4):
+            tasks.append(asyncio.create_task(turn(i)))
+            await asyncio.sleep(0.005)  # llegada escalonada
+        # Un turno síncrono (otro hilo) respeta la misma fila
+        tasks.append(asyncio.create_task(asyncio.to_thread(sync_turn)))
+        await asyncio.gather(*tasks)
+
+    asyncio.run(main())
+    assert order == [0, 1, 2, 3, 'sync']
+    assert lock.stats()['acquired'] == 5
+
+
+def test_turn_longer_than_the_ttl_keeps_the_session():
+    server = fakeredis.FakeServer()
+    lock = session_lock.SessionOrderLock(
+        lambda: fakeredis.FakeRedis(server=server), ttl=0.15, stale_after=0.02, max_wait=5
+    )
+    order = []
+    first_inside = threading.Event()
+
+    def slow_turn():
+        with lock.hold('s9'):
+            first_inside.set()
+            time.sleep(0.6)  # cuatro veces el TTL del anuncio
+            order.append('lento')
+
+    def next_turn():
+        with lock.hold('s9'):
+            order.append('siguiente')
+
+    slow = threading.Thread(target=slow_turn)
+    slow.start()
+    first_inside.wait(1)
+    nxt = threading.Thread(target=next_turn)
+    nxt.start()
+    slow.join(5)
+    nxt.join(5)
+    assert order == ['lento', 'siguiente']
+    stats = lock.stats()
+    assert stats['skipped_stale'] == 0 and stats['renewals'] >= 2 and stats['lost'] == 0
+
+
+def test_async_turn_longer_than_the_ttl_keeps_the_session():
+    server = fakeredis.FakeServer()
+    lock = session_lock.SessionOrderLock(
+        lambda: fakeredis.FakeRedis(server=server), lambda: fakeredis.FakeAsyncRedis(server=server),
+        ttl=0.15, stale_after=0.02, max_wait=5,
+    )
+    order = []
+
+    async def turn(name, delay):
+        async with lock.hold_async('s10'):
+            await asyncio.sleep(delay)
+            order.append(name)
+
+    async def main():
+        slow = asyncio.create_task(turn('lento', 0.6))
+        await asyncio.sleep(0.05)
+        await asyncio.gather(slow, turn('siguiente', 0))
+
+    asyncio.run(main())
+    assert order == ['lento', 'siguiente']
+    assert lock.stats()['skipped_stale'] == 0
@@ -0,0 +1,159 @@
+import asyncio
+import importlib.util
+import json
+import os
+import fakeredis
+
+spec = importlib.util.spec_from_file_location('context_manager_uow', os.path.join('mcp-core', 'context_manager.py'))
+context_manager = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(context_manager)
+
+
+class CountingRedis(fakeredis.FakeRedis):
+    """FakeRedis que registra cada viaje a Redis (un pipeline cuenta como uno)."""
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.commands = []
+
+    def execute_command(self, *args, **kwargs):
+        self.commands.append(args[0])
+        return super().execute_command(*args, **kwargs)
+
+    def pipeline(self, *args, **kwargs):
+        pipe = super().pipeline(*args, **kwargs)
+        execute = pipe.execute
+
+        def counted_execute(*a, **kw):
+            self.commands.append([cmd[0][0] for cmd in pipe.command_stack])
+            return execute(*a, **kw)
+
+        pipe.execute = counted_execute
+        return pipe
+
+
+READ = ['HGETALL', 'LRANGE']
+
+
+def make_manager():
+    cm = context_manager.ConversationalContextManager()
+    cm.redis_client = CountingRedis()
+    return cm
+
+
+def test_turn_reads_once_and_writes_once():
+    cm = make_manager()
+    with cm.unit_of_work():
+        cm.update_pending_field('s1', 'nombre')
+        cm.set_faq_clarification('s1', {'type': 'confirm'})
+        cm.reset_fallback_count('s1')
+        cm.update_context('s1', 'hola', 'Hola!')
+        assert cm.get_pending_field('s1') == 'nombre'
+        assert cm.redis_client.commands == [READ]
+    assert len(cm.redis_client.commands) == 2
+    ctx = cm.get_context('s1')
+    assert ctx['pending_field'] == 'nombre'
+    assert ctx['faq_pending'] == {'type': 'confirm'}
+    assert ctx['history'][-1]['content'] == 'Hola!'
+
+
+def test_untouched_session_is_not_rewritten():
+    cm = make_manager()
+    cm.set_current_flow('s2', 'reclamo')
+    cm.redis_client.commands.clear()
+    with cm.unit_of_work():
+        assert cm.get_current_flow('s2') == 'reclamo'
+        assert cm.get_context('s2')['current_flow'] == 'reclamo'
+    assert cm.redis_client.commands == [READ]
+
+
+def test_returned_context_is_a_copy():
+    cm = make_manager()
+    with cm.unit_of_work():
+        ctx = cm.get_context('s3')
+        ctx['pending_field'] = 'mail'
+        assert cm.get_pending_field('s3') is None
+    assert cm.redis_client.commands == [READ]
+
+
+def test_clear_then_write_and_flush_on_error():
+    cm = make_manager()
+    cm.set_selected_document('s4', 'Patente')
+    try:
+        with cm.unit_of_work():
+            cm.clear_context('s4')
+            assert cm.get_selected_document('s4') is None
+            cm.set_current_flow('s4', 'documento')
+            raise RuntimeError('fallo en el handler')
+    except RuntimeError:
+        pass
+    ctx = cm.get_context('s4')
+    assert ctx['current_flow'] == 'documento'
+    assert 'selected_document' not in ctx
+
+
+def test_without_unit_each_call_hits_redis():
+    cm = make_manager()
+    cm.update_pending_field('s5', 'nombre')
+    cm.reset_fallback_count('s5')
+    assert len(cm.redis_client.commands) == 4
+    assert cm.redis_client.commands[0] == cm.redis_client.commands[2] == READ
+
+
+def test_single_field_update_writes_only_that_field():
+    cm = make_manager()
+    cm.update_context('s6', 'hola', 'Hola!')
+    cm.set_current_flow('s6', 'reclamo')
+    cm.redis_client.commands.clear()
+    cm.set_current_flow('s6', 'documento')
+    write = cm.redis_client.commands[-1]
+    assert 'HSET' in write and 'RPUSH' not in write and 'DEL' not in write
+    assert cm.redis_client.hget('session:s6', 'current_flow') == b'"documento"'
+
+
+def test_history_append_pushes_only_new_messages():
+    cm = make_manager()
+    for i in range(7):
+        cm.update_context('s7', f'u{i}', f'b{i}')
+    cm.redis_client.commands.clear()
+    cm.update_context('s7', 'u7', 'b7')
+    write = cm.redis_client.commands[-1]
+    assert 'RPUSH' in write and 'LTRIM' in write and 'DEL' not in write
+    history = cm.get_history('s7')
+    assert len(history) == 10
+    assert [m['content'] for m in history[-2:]] == ['u7', 'b7']
+    assert cm.redis_client.llen('session:s7:history') == 10
+
+
+def test_legacy_string_session_is_migrated():
+    cm = make_manager()
+    legacy = {'current_flow': 'reclamo', 'history': [{'role': 'user', 'content': 'hola'}]}
+    cm.redis_client.set('session:s8', json.dumps(legacy), ex=100)
+    assert cm.get_current_flow('s8') == 'reclamo'
+    assert cm.redis_client.type('session:s8') == b'hash'
+    assert cm.get_history('s8') == legacy['history']
+    assert 0 < cm.redis_client.ttl('session:s8') <= 100
+    cm.clear_context('s8')
+    assert not cm.redis_client.exists('session:s8', 'session:s8:history')
+
+
+def test_async_unit_reads_and_writes_without_the_sync_client():
+    cm = make_manager()
+    server = fakeredis.FakeServer()
+    cm.redis_client = CountingRedis(server=server)
+    cm.async_redis_client = fakeredis.FakeAsyncRedis(server=server)
+    cm.redis_client.hset('session:s9', mapping={'current_flow': json.dumps('reclamo')})
+    cm.redis_client.commands.clear()
+
+    async def turn():
+        async with cm.unit_of_work_async():
+            ctx = await cm.get_context_async('s9')
+            cm.update_pending_field('s9', 'nombre')
+            cm.update_context('s9', 'hola', 'Hola!')
+            return ctx
+
+    assert asyncio.run(turn())['current_flow'] == 'reclamo'
+    assert cm.redis_client.commands == []
+    ctx = cm.get_context('s9')
+    assert ctx['pending_field'] == 'nombre' and ctx['current_flow'] == 'reclamo'
+    assert [m['content'] for m in ctx['history']] == ['hola', 'Hola!']
+    assert asyncio.run(cm.get_context_async('s9'))['pending_field'] == 'nombre'
@@ -0,0 +1,66 @@
+import importlib.util
+import os
+import threading
+import time
+
+spec = importlib.util.spec_from_file_location('startup', os.path.join('mcp-core', 'startup.py'))
+startup = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(startup)
+
+
+def test_components_warm_in_background_and_optional_failures_do_not_block():
+    order = []
+    manager = startup.StartupManager(retry_interval=0.01)
+    manager.register('redis', lambda: order.append('redis'))
+    manager.register('modelo', lambda: order.append('modelo') or 'llm')
+    manager.register('postgres', lambda: 1 / 0, required=False)
+    assert not manager.ready
+
+    manager.start()
+    assert manager.wait(timeout=2)
+    assert order == ['redis', 'modelo']
+    stats = manager.stats()
+    assert stats['ready'] and stats['ready_seconds'] is not None
+    assert stats['components']['modelo']['state'] == 'ready'
+    assert stats['components']['postgres']['state'] == 'failed'
+    assert 'ZeroDivisionError' in stats['components']['postgres']['error']
+    # Ya inicializado: no se vuelve a ejecutar
+    assert manager.components['modelo'].get() == 'llm' and order == ['redis', 'modelo']
+
+
+def test_required_component_is_retried_until_it_succeeds():
+    attempts = []
+
+    def flaky():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise ConnectionError('redis caído')
+
+    manager = startup.StartupManager(retry_interval=0.01)
+    manager.register('redis', flaky)
+    manager.start()
+    assert manager.wait(timeout=2)
+    assert len(attempts) == 3
+    assert manager.stats()['components']['redis']['attempts'] == 3
+
+
+def test_first_use_waits_for_a_single_initialization():
+    calls = []
+    release = threading.Event()
+
+    def slow_model():
+        calls.append(1)
+        release.wait(2)
+        return 'modelo'
+
+    component = startup.Component('llm', slow_model)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(component.get())) for _ in range(4)]
+    for t in threads:
+        t.start()
+    time.sleep(0.05)
+    assert component.state == 'loading' and not component.ready
+    release.set()
+    for t in threads:
+        t.join(2)
+    assert results == ['modelo'] * 4 and len(calls) == 1
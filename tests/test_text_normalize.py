@@ -0,0 +1,58 @@
+import importlib.util
+import json
+import os
+import unicodedata
+
+spec = importlib.util.spec_from_file_location('text', os.path.join('mcp-core', 'utils', 'text.py'))
+text = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(text)
+
+
+# --- Implementación anterior (referencia) ---
+def legacy_normalize_text(value):
+    value = value.lower().strip()
+    value = "".join(c for c in unicodedata.normalize("NFD", value) if unicodedata.category(c) != "Mn")
+    return "".join(c for c in value if c.isalnum() or c.isspace())
+
+
+def legacy_fold(value):
+    value = value.lower()
+    return "".join(c for c in unicodedata.normalize("NFD", value) if unicodedata.category(c) != "Mn")
+
+
+def corpus_strings(value):
+    if isinstance(value, str):
+        yield value
+    elif isinstance(value, dict):
+        for v in value.values():
+            yield from corpus_strings(v)
+    elif isinstance(value, list):
+        for v in value:
+            yield from corpus_strings(v)
+
+
+TRICKY = [
+    "", "  ", "¿Cuál es el HORARIO de atención?", "Cédula de Identidad", "PEQUEÑO año",
+    "pingüino", "  espacios\tfinales \n", "Ça va, Müller", "İstanbul", "straße", "Øresund",
+    "café decompuesto", "emoji 🙂 y números 123", "tab\x1cseparador", "日本語のテキスト",
+    "ǅemal", "ﬁnanzas", "Ωmega – guion largo", "á̧ marcas apiladas",
+]
+
+
+def test_matches_previous_implementation():
+    strings = list(TRICKY)
+    for name in ('faq_respuestas.json', 'documento_requisito.json'):
+        with open(os.path.join('mcp-core', 'databases', name), encoding='utf-8') as f:
+            strings.extend(corpus_strings(json.load(f)))
+    assert len(strings) > 200
+    for s in strings:
+        assert text.normalize_text(s) == legacy_normalize_text(s), s
+        assert text.fold_text(s) == legacy_fold(s), s
+
+
+def test_fold_keeps_punctuation_and_results_are_memoized():
+    assert text.fold_text("¿Dónde está la Oficina?") == "¿donde esta la oficina?"
+    assert text.normalize_text("¿Dónde está la Oficina?") == "donde esta la oficina"
+    before = text.normalize_text.cache_info().hits
+    text.normalize_text("¿Dónde está la Oficina?")
+    assert text.normalize_text.cache_info().hits == before + 1
@@ -23,8 +23,11 @@ orchestrator = importlib.util.module_from_spec(spec)
 spec.loader.exec_module(orchestrator)
 
 # replace redis client to avoid connection
-fake = fakeredis.FakeRedis()
+server = fakeredis.FakeServer()
+fake = fakeredis.FakeRedis(server=server)
+async_fake = fakeredis.FakeAsyncRedis(server=server)
 orchestrator.redis_client = fake
+orchestrator.async_redis_client = async_fake
 
 
 def test_tokenize_removes_common_words():
@@ -0,0 +1,130 @@
+import importlib.util
+import os
+import sys
+import threading
+import time
+import types
+import fakeredis
+
+os.environ["DISABLE_PERIODIC_MIGRATION"] = "1"
+os.environ["FAQ_DB_PATH"] = os.path.join('mcp-core', 'databases', 'faq_respuestas.json')
+os.environ["PROMPTS_PATH"] = os.path.join('mcp-core', 'prompts')
+
+# Mock llama_cpp before importing orchestrator
+fake_llama = types.ModuleType('llama_cpp')
+class FakeLlama:
+    def __init__(self, *args, **kwargs):
+        pass
+    def __call__(self, *args, **kwargs):
+        return {"choices": [{"text": "ok"}]}
+
+fake_llama.Llama = FakeLlama
+sys.modules['llama_cpp'] = fake_llama
+
+sys.path.insert(0, os.path.abspath('mcp-core'))
+
+spec = importlib.util.spec_from_file_location('orchestrator', os.path.join('mcp-core','orchestrator.py'))
+orchestrator = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(orchestrator)
+os.environ.pop("FAQ_DB_PATH", None)
+os.environ.pop("PROMPTS_PATH", None)
+
+server = fakeredis.FakeServer()
+fake = fakeredis.FakeRedis(server=server)
+async_fake = fakeredis.FakeAsyncRedis(server=server)
+orchestrator.redis_client = fake
+orchestrator.context_manager.redis_client = fake
+orchestrator.response_cache.redis_client = fake
+orchestrator.async_redis_client = async_fake
+orchestrator.context_manager.async_redis_client = async_fake
+orchestrator.response_cache.async_redis_client = async_fake
+orchestrator.get_db = lambda: (_ for _ in ()).throw(Exception("db disabled"))
+orchestrator.get_db_async = lambda: (_ for _ in ()).throw(Exception("db disabled"))
+
+
+def slow(value, delay=0.3):
+    def fn(*args, **kwargs):
+        time.sleep(delay)
+        return value
+    return fn
+
+
+def recorded(calls, name, fn):
+    def wrapper(*args, **kwargs):
+        calls.append((name, threading.current_thread().name))
+        return fn(*args, **kwargs)
+    return wrapper
+
+
+def patch_lookups(monkeypatch, respuesta_doc=None):
+    monkeypatch.setattr(orchestrator, 'match_faq_fragments', slow((None, [])))
+    monkeypatch.setattr(orchestrator, 'match_documento', slow({}))
+    monkeypatch.setattr(orchestrator, 'responder_sobre_documento', lambda *a, **k: respuesta_doc)
+    # Sin palabras clave la intención llama al LLM después de los documentos
+    monkeypatch.setattr(orchestrator, 'detect_intent_local', lambda *a: None)
+    monkeypatch.setattr(
+        orchestrator, 'detect_intent', slow({'intent': 'unknown', 'confidence': 0.9, 'sentiment': 'neutral'})
+    )
+    monkeypatch.setattr(orchestrator, 'retrieve_context_snippets', slow(['Contexto del trámite']))
+    prompts = []
+    monkeypatch.setattr(orchestrator, 'generate_response', lambda prompt: prompts.append(prompt) or 'Generada')
+    orchestrator.response_cache.purge()
+    return prompts
+
+
+def test_fallthrough_lookups_run_concurrently(monkeypatch):
+    prompts = patch_lookups(monkeypatch)
+    start = time.perf_counter()
+    result = orchestrator.orchestrate('zorblax quintuple fenomeno', session_id='fo1')
+    elapsed = time.perf_counter() - start
+    assert result['respuesta'].startswith('Generada')
+    assert 'Contexto del trámite' in prompts[0]
+    # En serie tardarían 1.2 s: la FAQ va junto al documento y los
+    # fragmentos junto a la intención por LLM
+    assert elapsed < 0.9
+
+
+def test_document_answer_keeps_priority(monkeypatch):
+    prompts = patch_lookups(monkeypatch, respuesta_doc='Requisitos del documento')
+    intents = []
+    snippets = []
+    monkeypatch.setattr(orchestrator, 'detect_intent', lambda *a: intents.append(a) or {})
+    monkeypatch.setattr(orchestrator, 'retrieve_context_snippets', lambda *a: snippets.append(a) or [])
+    result = orchestrator.orchestrate('zorblax quintuple fenomeno', session_id='fo2')
+    assert result['respuesta'] == 'Requisitos del documento'
+    assert prompts == []
+    # La intención (posible llamada al LLM) no se calcula si responde un documento
+    assert intents == []
+    # y la consulta de fragmentos tampoco se lanza
+    assert snippets == []
+
+
+def test_priority_is_unchanged_when_several_candidates_hit(monkeypatch):
+    patch_lookups(monkeypatch, respuesta_doc='Requisitos del documento')
+    calls = []
+    faq_hit = {'entry': {'respuesta': 'Respuesta FAQ', 'categoria': 'general'}}
+    monkeypatch.setattr(orchestrator, 'match_faq_fragments', recorded(calls, 'faq', lambda q: (faq_hit, [])))
+    monkeypatch.setattr(orchestrator, 'match_documento', recorded(calls, 'document', lambda q: {}))
+    intent = {'intent': 'scheduler-appointment_create', 'confidence': 0.8, 'sentiment': 'neutral'}
+    monkeypatch.setattr(orchestrator, 'detect_intent_local', recorded(calls, 'intent', lambda q: intent))
+
+    # FAQ, documento e intención aciertan: gana la FAQ
+    result = orchestrator.orchestrate('zorblax quintuple fenomeno', session_id='fo4')
+    assert result['respuesta'] == 'Respuesta FAQ'
+    # Los tres candidatos se calcularon en paralelo, fuera del hilo del turno
+    threads = dict(calls)
+    assert sorted(threads) == ['document', 'faq', 'intent']
+    assert all(name.startswith('lookup') for name in threads.values())
+
+    # Sin FAQ gana el documento antes que la intención
+    monkeypatch.setattr(orchestrator, 'match_faq_fragments', lambda q: (None, []))
+    result = orchestrator.orchestrate('zorblax quintuple fenomeno', session_id='fo5')
+    assert result['respuesta'] == 'Requisitos del documento'
+
+
+def test_sequential_mode_gives_same_answer(monkeypatch):
+    monkeypatch.setattr(orchestrator, 'TURN_FANOUT', False)
+    prompts = patch_lookups(monkeypatch)
+    result = orchestrator.orchestrate('zorblax quintuple fenomeno', session_id='fo3')
+    assert result['respuesta'].startswith('Generada')
+    assert 'Contexto del trámite' in prompts[0]